@@ -1,32 +1,75 @@
 import logging
 import os
+import sys
 import json
+import importlib.util
 from functools import wraps
 from datetime import datetime
 
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, abort
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, abort, Response, stream_with_context, send_file
+from config import (POSTS_PAGE_SIZE, POSTS_MAX_PAGE_SIZE, MEDIA_HTTP_MAX_AGE, UPDATE_MODE, WEBHOOK_URL, WEBHOOK_PATH,
+                    LOG_FILE)
+import bulk_io
+import metrics
+from media_store import media_url, preview_url
+from updates import UpdateHandler, UpdatePoller, WebhookReceiver, SECRET_HEADER, webhook_secret
+from log_tail import LogTail, LEVELS
+from structured_log import setup_logging, dropped_records
+from posting_schedule import ScheduleError
 
-# Configuração de logs
-logging.basicConfig(level=logging.INFO,
-                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                   handlers=[
-                       logging.StreamHandler(),
-                       logging.FileHandler('app.log')
-                   ])
+# Configuração de logs (gravação assíncrona; arquivo em JSON, ver structured_log.py)
+setup_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Leitura do log (últimas linhas, índice e acompanhamento em tempo real)
+log_tail = LogTail(LOG_FILE)
+
 # Inicialização do Flask
 app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "sua_chave_secreta_aqui")
+app.add_template_filter(preview_url, 'preview_url')
+
+def start_update_receiver(token, pipeline, welcome_batcher):
+    """
+    Inicia o recebimento de updates: webhook (UPDATE_MODE='webhook') ou polling (getUpdates).
+    
+    Sem WEBHOOK_URL ou se o setWebhook falhar, o polling é usado.
+    
+    Returns:
+        WebhookReceiver, UpdatePoller ou None (sem pipeline de envio ou se o polling falhar).
+    """
+    if pipeline is None:
+        logger.warning("Pipeline de envio não disponível. Nenhum update será recebido.")
+        return None
+    handler = UpdateHandler(welcome_batcher)
+    if UPDATE_MODE == 'webhook':
+        if WEBHOOK_URL:
+            receiver = WebhookReceiver(handler, webhook_secret(token))
+            if receiver.start() and receiver.register(pipeline, WEBHOOK_URL):
+                return receiver
+            receiver.stop()
+        logger.warning("Webhook não disponível (verifique WEBHOOK_URL). Usando polling.")
+    poller = UpdatePoller(handler, pipeline)
+    if poller.start():
+        return poller
+    poller.stop()
+    return None
 
 try:
-    from bot_handler_new import TelegramBotHandler
+    from bot_handler import MessageScheduler, TelegramBotHandler
+    from scheduler import GroupScheduler
     from data_manager import DataManager
-    from scheduler import MessageScheduler
+    from send_pipeline import SendPipeline
+    from outbox import Outbox, OutboxSender
+    from welcome_batcher import WelcomeBatcher
 
     # Inicialização dos componentes
     data_manager = DataManager()
-    data_manager.init()
+
+    # Contadores do Stats também expostos em /metrics
+    messages_sent = metrics.counter('bot_messages_sent_total', 'Mensagens enviadas pelo bot (estatísticas salvas)', ('kind',))
+    messages_sent.labels(kind='welcome').set_function(lambda: data_manager.get_stats().get('welcome_messages_sent', 0))
+    messages_sent.labels(kind='promo').set_function(lambda: data_manager.get_stats().get('promo_messages_sent', 0))
 
     # Verificar se existe um token nos env vars e usar como padrão se não existir no data_manager
     env_token = os.environ.get("TELEGRAM_TOKEN", "")
@@ -44,23 +87,56 @@ try:
 
     bot_handler = None
     scheduler = None
+    group_scheduler = None
+    pipeline = None
+    outbox = None
+    welcome_batcher = None
+    update_receiver = None
 
     if token and group_id:
         try:
-            bot_handler = TelegramBotHandler(token, group_id, data_manager)
-            bot_handler.setup()
+            # Pipeline de envio assíncrono (sessão HTTP compartilhada)
+            pipeline = SendPipeline(token, media_cache=data_manager.media_cache,
+                                    media_store=data_manager.media_store)
+            if not pipeline.start():
+                pipeline = None
+            
+            bot_handler = TelegramBotHandler(token, group_id, data_manager, pipeline=pipeline)
+            
+            # Fila de saída persistente: reenvia o que ficou pendente antes de uma queda
+            # Posts pendentes reenviados na inicialização ainda contam nas estatísticas
+            outbox = OutboxSender(Outbox(), bot_handler, pipeline,
+                                  stats={'promo': data_manager.increment_promo_messages_stat})
+            outbox.start()
+            
+            # Entradas de membros são saudadas em lotes
+            welcome_batcher = WelcomeBatcher(data_manager, outbox)
+            welcome_batcher.start()
+            
+            # Updates do Telegram: webhook (sem thread de polling no servidor web) ou polling
+            update_receiver = start_update_receiver(token, pipeline, welcome_batcher)
             
-            scheduler = MessageScheduler(bot_handler, data_manager)
+            scheduler = MessageScheduler(bot_handler, data_manager, pipeline=pipeline, outbox=outbox)
             scheduler.start()
+            
+            # Grupos adicionais (data_manager.save_group), todos numa única roda de tempo
+            group_scheduler = GroupScheduler(bot_handler, data_manager, pipeline=pipeline, outbox=outbox,
+                                             exclude_primary=True)
+            group_scheduler.start()
         except Exception as e:
-            logger.error(f"Erro ao inicializar bot ou agendador: {str(e)}")
+            logger.error("Erro ao inicializar bot ou agendador: %s", e)
     else:
         logger.warning("Token ou ID do grupo não configurados. O bot não será inicializado.")
 except Exception as e:
-    logger.error(f"Erro durante a inicialização da aplicação: {str(e)}")
+    logger.error("Erro durante a inicialização da aplicação: %s", e)
     data_manager = None
     bot_handler = None
     scheduler = None
+    group_scheduler = None
+    pipeline = None
+    outbox = None
+    welcome_batcher = None
+    update_receiver = None
 
 @app.route('/')
 def index():
@@ -71,37 +147,37 @@ def index():
             return render_template('error.html', error="Sistema de gerenciamento de dados não disponível"), 500
         
         promo_posts = []
+        post_count = 0
         try:
-            promo_posts = data_manager.get_promo_posts() or []
-            
-            # Ordenar posts do mais recente para o mais antigo
-            if promo_posts:
-                promo_posts = sorted(promo_posts, key=lambda x: x.get('created_at', ''), reverse=True)
+            # Apenas os 3 posts mais recentes, lidos do índice ordenado
+            page = data_manager.get_posts_page(limit=3)
+            promo_posts = page['posts']
+            post_count = page['total']
         except Exception as e:
-            logger.error(f"Erro ao obter posts promocionais: {str(e)}")
+            logger.error("Erro ao obter posts promocionais: %s", e)
             flash(f'Erro ao carregar posts promocionais: {str(e)}', 'danger')
         
         bot_active = False
         try:
             bot_active = data_manager.get_bot_status()
         except Exception as e:
-            logger.error(f"Erro ao obter status do bot: {str(e)}")
+            logger.error("Erro ao obter status do bot: %s", e)
             flash(f'Erro ao verificar status do bot: {str(e)}', 'warning')
         
         interval = 10  # Valor padrão
         try:
             interval = data_manager.get_interval()
         except Exception as e:
-            logger.error(f"Erro ao obter intervalo: {str(e)}")
+            logger.error("Erro ao obter intervalo: %s", e)
             flash(f'Erro ao carregar intervalo de posts: {str(e)}', 'warning')
         
         return render_template('index.html', 
-                              promo_posts=promo_posts[:3], 
+                              promo_posts=promo_posts, 
                               bot_active=bot_active,
-                              post_count=len(promo_posts),
+                              post_count=post_count,
                               interval=interval)
     except Exception as e:
-        logger.error(f"Erro não tratado na rota /: {str(e)}")
+        logger.error("Erro não tratado na rota /: %s", e)
         return render_template('error.html', error=str(e)), 500
 
 @app.route('/welcome', methods=['GET', 'POST'])
@@ -121,7 +197,7 @@ def welcome():
                 else:
                     flash('Erro ao atualizar mensagem de boas-vindas. Verifique os logs.', 'danger')
             except Exception as e:
-                logger.error(f"Erro ao salvar mensagem de boas-vindas: {str(e)}")
+                logger.error("Erro ao salvar mensagem de boas-vindas: %s", e)
                 flash(f'Erro ao atualizar mensagem: {str(e)}', 'danger')
             
             return redirect(url_for('welcome'))
@@ -130,21 +206,21 @@ def welcome():
         try:
             welcome_message = data_manager.get_welcome_message()
         except Exception as e:
-            logger.error(f"Erro ao obter mensagem de boas-vindas: {str(e)}")
+            logger.error("Erro ao obter mensagem de boas-vindas: %s", e)
             flash(f'Erro ao carregar mensagem de boas-vindas: {str(e)}', 'danger')
         
         bot_active = False
         try:
             bot_active = data_manager.get_bot_status()
         except Exception as e:
-            logger.error(f"Erro ao obter status do bot: {str(e)}")
+            logger.error("Erro ao obter status do bot: %s", e)
             flash(f'Erro ao verificar status do bot: {str(e)}', 'warning')
         
         return render_template('welcome.html', 
                               welcome_message=welcome_message,
                               bot_active=bot_active)
     except Exception as e:
-        logger.error(f"Erro não tratado na rota /welcome: {str(e)}")
+        logger.error("Erro não tratado na rota /welcome: %s", e)
         return render_template('error.html', error=str(e)), 500
 
 @app.route('/promo', methods=['GET', 'POST'])
@@ -158,55 +234,59 @@ def promo():
         if request.method == 'POST':
             action = request.form.get('action')
             
-            if action == 'add':
-                text = request.form.get('text', '')
+            if action == 'create':
+                title = request.form.get('title', '')
+                content = request.form.get('content', '')
                 image_url = request.form.get('image_url', '')
                 external_link = request.form.get('external_link', '')
                 
-                if text:
+                if content:
                     try:
-                        success = data_manager.add_promo_post(text, image_url, external_link)
+                        image_url = _store_upload(request.files.get('image_file')) or image_url
+                        success = data_manager.add_promotional_post(title, content, image_url, external_link)
                         if success:
                             flash('Post promocional adicionado com sucesso!', 'success')
                         else:
                             flash('Erro ao adicionar post promocional. Verifique os logs.', 'danger')
                     except Exception as e:
-                        logger.error(f"Erro ao adicionar post promocional: {str(e)}")
+                        logger.error("Erro ao adicionar post promocional: %s", e)
                         flash(f'Erro ao adicionar post: {str(e)}', 'danger')
                 else:
-                    flash('O texto do post não pode estar vazio!', 'danger')
+                    flash('O conteúdo do post não pode estar vazio!', 'danger')
             
             elif action == 'edit':
-                post_id = request.form.get('id')
-                text = request.form.get('text', '')
+                post_id = request.form.get('post_id')
+                title = request.form.get('title', '')
+                content = request.form.get('content', '')
                 image_url = request.form.get('image_url', '')
                 external_link = request.form.get('external_link', '')
                 
-                if text and post_id:
+                if content and post_id:
                     try:
-                        success = data_manager.update_promo_post(post_id, text, image_url, external_link)
+                        image_url = _store_upload(request.files.get('image_file')) or image_url
+                        success = data_manager.update_promotional_post(post_id, title, content, image_url, external_link)
                         if success:
                             flash('Post promocional atualizado com sucesso!', 'success')
                         else:
                             flash('Erro ao atualizar post promocional. Verifique os logs.', 'danger')
                     except Exception as e:
-                        logger.error(f"Erro ao atualizar post promocional: {str(e)}")
+                        logger.error("Erro ao atualizar post promocional: %s", e)
                         flash(f'Erro ao atualizar post: {str(e)}', 'danger')
                 else:
-                    flash('ID do post ou texto inválido!', 'danger')
+                    flash('ID do post ou conteúdo inválido!', 'danger')
             
             elif action == 'delete':
-                post_id = request.form.get('id')
+                post_id = request.form.get('post_id')
                 
                 if post_id:
                     try:
-                        success = data_manager.delete_promo_post(post_id)
+                        success = data_manager.delete_promotional_post(post_id)
                         if success:
                             flash('Post promocional excluído com sucesso!', 'success')
                         else:
                             flash('Erro ao excluir post promocional. Verifique os logs.', 'danger')
                     except Exception as e:
-                        logger.error(f"Erro ao excluir post promocional: {str(e)}")
+                        logger.error("Erro ao excluir post promocional: %s", e)
                         flash(f'Erro ao excluir post: {str(e)}', 'danger')
                 else:
                     flash('ID do post inválido!', 'danger')
@@ -215,29 +295,46 @@ def promo():
         
         # Para requisições GET
         promo_posts = []
+        next_cursor = None
+        post_count = 0
         try:
-            promo_posts = data_manager.get_promo_posts() or []
-            
-            # Ordenar posts do mais recente para o mais antigo
-            if promo_posts:
-                promo_posts = sorted(promo_posts, key=lambda x: x.get('created_at', ''), reverse=True)
+            query = request.args.get('q', '').strip()
+            if query:
+                # Busca pelo índice invertido (sem acentos/maiúsculas)
+                results = data_manager.search_posts(query, limit=POSTS_MAX_PAGE_SIZE)
+                promo_posts = results['posts']
+                post_count = results['total']
+            else:
+                page = data_manager.get_posts_page(**_post_page_args(request.args))
+                promo_posts = page['posts']
+                next_cursor = page['next_cursor']
+                post_count = page['total']
+        except ValueError as e:
+            logger.warning("Parâmetros de paginação inválidos: %s", e)
+            flash('Página inválida. Mostrando os posts mais recentes.', 'warning')
+            page = data_manager.get_posts_page()
+            promo_posts = page['posts']
+            next_cursor = page['next_cursor']
+            post_count = page['total']
         except Exception as e:
-            logger.error(f"Erro ao obter posts promocionais: {str(e)}")
+            logger.error("Erro ao obter posts promocionais: %s", e)
             flash(f'Erro ao carregar posts: {str(e)}', 'danger')
         
         bot_active = False
         try:
             bot_active = data_manager.get_bot_status()
         except Exception as e:
-            logger.error(f"Erro ao obter status do bot: {str(e)}")
+            logger.error("Erro ao obter status do bot: %s", e)
             flash(f'Erro ao verificar status do bot: {str(e)}', 'warning')
         
-        return render_template('promo.html', 
-                              promo_posts=promo_posts,
+        return render_template('promotional_posts.html', 
+                              posts=promo_posts,
+                              next_cursor=next_cursor,
+                              post_count=post_count,
                               bot_active=bot_active)
     except Exception as e:
         # Log do erro geral
-        logger.error(f"Erro não tratado na rota /promo: {str(e)}")
+        logger.error("Erro não tratado na rota /promo: %s", e)
         flash(f'Ocorreu um erro: {str(e)}', 'danger')
         # Retornar uma página de erro em vez de uma tela branca
         return render_template('error.html', error=str(e)), 500
@@ -264,7 +361,7 @@ def settings():
                     else:
                         flash('Erro ao alterar status do bot. Verifique os logs.', 'danger')
                 except Exception as e:
-                    logger.error(f"Erro ao alterar status do bot: {str(e)}")
+                    logger.error("Erro ao alterar status do bot: %s", e)
                     flash(f'Erro ao alterar status: {str(e)}', 'danger')
             
             elif action == 'update_interval':
@@ -280,7 +377,7 @@ def settings():
                             if scheduler:
                                 scheduler.update_interval(interval)
                         except Exception as e:
-                            logger.error(f"Erro ao atualizar intervalo no agendador: {str(e)}")
+                            logger.error("Erro ao atualizar intervalo no agendador: %s", e)
                             # Não mostrar erro ao usuário pois a configuração foi salva
                         
                         flash(f'Intervalo atualizado para {interval} minutos!', 'success')
@@ -289,7 +386,7 @@ def settings():
                 except ValueError:
                     flash('Intervalo inválido! Use apenas números.', 'danger')
                 except Exception as e:
-                    logger.error(f"Erro ao atualizar intervalo: {str(e)}")
+                    logger.error("Erro ao atualizar intervalo: %s", e)
                     flash(f'Erro ao atualizar intervalo: {str(e)}', 'danger')
             
             return redirect(url_for('settings'))
@@ -299,26 +396,27 @@ def settings():
         try:
             bot_active = data_manager.get_bot_status()
         except Exception as e:
-            logger.error(f"Erro ao obter status do bot: {str(e)}")
+            logger.error("Erro ao obter status do bot: %s", e)
             flash(f'Erro ao verificar status do bot: {str(e)}', 'warning')
         
         interval = 10  # Valor padrão
         try:
             interval = data_manager.get_interval()
         except Exception as e:
-            logger.error(f"Erro ao obter intervalo: {str(e)}")
+            logger.error("Erro ao obter intervalo: %s", e)
             flash(f'Erro ao carregar intervalo: {str(e)}', 'warning')
         
         return render_template('settings.html', 
                               bot_active=bot_active,
                               interval=interval)
     except Exception as e:
-        logger.error(f"Erro não tratado na rota /settings: {str(e)}")
+        logger.error("Erro não tratado na rota /settings: %s", e)
         return render_template('error.html', error=str(e)), 500
 
 @app.route('/bot_config', methods=['GET', 'POST'])
 def bot_config():
     """Página de configuração do bot."""
+    global bot_handler, scheduler, group_scheduler, pipeline, outbox, welcome_batcher, update_receiver
     try:
         if not data_manager:
             flash("Erro no sistema de gerenciamento de dados. Entre em contato com o suporte.", "danger")
@@ -348,29 +446,63 @@ def bot_config():
                             # Para o bot e o agendador existentes
                             if scheduler:
                                 scheduler.stop()
+                            if group_scheduler:
+                                group_scheduler.stop()
+                            if update_receiver:
+                                update_receiver.stop()
+                            # Os lotes de boas-vindas pendentes ainda saem pela fila e pelo
+                            # pipeline antigos; a fila só é fechada depois dos envios em andamento
+                            if welcome_batcher:
+                                welcome_batcher.stop()
+                            if outbox:
+                                outbox.stop()
                             if bot_handler:
                                 bot_handler.stop()
+                            if pipeline:
+                                pipeline.stop()
+                            if outbox:
+                                outbox.outbox.close()
                             
-                            global bot_handler, scheduler
+                            update_receiver = None
+                            welcome_batcher = None
+                            outbox = None
                             
                             # Reinicia com as novas credenciais
                             if token and group_id:
-                                bot_handler = TelegramBotHandler(token, group_id, data_manager)
-                                bot_handler.setup()
+                                pipeline = SendPipeline(token, media_cache=data_manager.media_cache,
+                                    media_store=data_manager.media_store)
+                                if not pipeline.start():
+                                    pipeline = None
+                                
+                                bot_handler = TelegramBotHandler(token, group_id, data_manager, pipeline=pipeline)
+                                
+                                outbox = OutboxSender(Outbox(), bot_handler, pipeline,
+                                                      stats={'promo': data_manager.increment_promo_messages_stat})
+                                outbox.start()
+                                
+                                welcome_batcher = WelcomeBatcher(data_manager, outbox)
+                                welcome_batcher.start()
                                 
-                                scheduler = MessageScheduler(bot_handler, data_manager)
+                                update_receiver = start_update_receiver(token, pipeline, welcome_batcher)
+                                
+                                scheduler = MessageScheduler(bot_handler, data_manager, pipeline=pipeline,
+                                                             outbox=outbox)
                                 scheduler.start()
                                 
+                                group_scheduler = GroupScheduler(bot_handler, data_manager, pipeline=pipeline,
+                                                                 outbox=outbox, exclude_primary=True)
+                                group_scheduler.start()
+                                
                                 flash('Credenciais do bot atualizadas e bot reiniciado!', 'success')
                             else:
                                 flash('Credenciais atualizadas, mas bot não iniciado devido a credenciais vazias.', 'warning')
                         except Exception as e:
-                            logger.error(f"Erro ao reiniciar bot com novas credenciais: {str(e)}")
+                            logger.error("Erro ao reiniciar bot com novas credenciais: %s", e)
                             flash(f'Erro ao reiniciar bot: {str(e)}', 'danger')
                     else:
                         flash('Credenciais do bot atualizadas!', 'success')
                 except Exception as e:
-                    logger.error(f"Erro ao atualizar credenciais do bot: {str(e)}")
+                    logger.error("Erro ao atualizar credenciais do bot: %s", e)
                     flash(f'Erro ao atualizar credenciais: {str(e)}', 'danger')
             
             return redirect(url_for('bot_config'))
@@ -380,21 +512,21 @@ def bot_config():
         try:
             token = data_manager.get_telegram_token()
         except Exception as e:
-            logger.error(f"Erro ao obter token do Telegram: {str(e)}")
+            logger.error("Erro ao obter token do Telegram: %s", e)
             flash(f'Erro ao carregar token: {str(e)}', 'warning')
         
         group_id = ""
         try:
             group_id = data_manager.get_group_id()
         except Exception as e:
-            logger.error(f"Erro ao obter ID do grupo: {str(e)}")
+            logger.error("Erro ao obter ID do grupo: %s", e)
             flash(f'Erro ao carregar ID do grupo: {str(e)}', 'warning')
         
         bot_active = False
         try:
             bot_active = data_manager.get_bot_status()
         except Exception as e:
-            logger.error(f"Erro ao obter status do bot: {str(e)}")
+            logger.error("Erro ao obter status do bot: %s", e)
             flash(f'Erro ao verificar status do bot: {str(e)}', 'warning')
         
         return render_template('bot_config.html', 
@@ -402,7 +534,7 @@ def bot_config():
                               group_id=group_id,
                               bot_active=bot_active)
     except Exception as e:
-        logger.error(f"Erro não tratado na rota /bot_config: {str(e)}")
+        logger.error("Erro não tratado na rota /bot_config: %s", e)
         return render_template('error.html', error=str(e)), 500
 
 @app.route('/toggle_bot', methods=['POST'])
@@ -430,10 +562,10 @@ def toggle_bot():
                 if bot_handler and scheduler:
                     # Iniciar bot e agendador
                     try:
-                        bot_handler.setup()
+                        # Os updates continuam chegando (webhook ou polling); só o agendador para
                         scheduler.start()
                     except Exception as e:
-                        logger.error(f"Erro ao iniciar bot/agendador: {str(e)}")
+                        logger.error("Erro ao iniciar bot/agendador: %s", e)
                         # Não retornar erro aqui, pois o status foi alterado com sucesso
             else:
                 # Se o novo status for inativo, tentar parar o bot e o agendador
@@ -441,15 +573,15 @@ def toggle_bot():
                     try:
                         scheduler.stop()
                     except Exception as e:
-                        logger.error(f"Erro ao parar agendador: {str(e)}")
+                        logger.error("Erro ao parar agendador: %s", e)
                 
                 if bot_handler:
                     try:
                         bot_handler.stop()
                     except Exception as e:
-                        logger.error(f"Erro ao parar bot: {str(e)}")
+                        logger.error("Erro ao parar bot: %s", e)
             
-            logger.info(f"Status do bot alterado para: {'Ativo' if new_status else 'Inativo'}")
+            logger.info("Status do bot alterado para: %s", 'Ativo' if new_status else 'Inativo')
             
             return jsonify({
                 'success': True,
@@ -457,13 +589,13 @@ def toggle_bot():
                 'message': f'Bot {"ativado" if new_status else "desativado"} com sucesso'
             })
         except Exception as e:
-            logger.error(f"Erro ao alterar status do bot: {str(e)}")
+            logger.error("Erro ao alterar status do bot: %s", e)
             return jsonify({
                 'success': False,
                 'message': f'Erro ao alterar status: {str(e)}'
             })
     except Exception as e:
-        logger.error(f"Erro não tratado ao alterar status do bot: {str(e)}")
+        logger.error("Erro não tratado ao alterar status do bot: %s", e)
         return jsonify({
             'success': False,
             'message': f'Erro interno: {str(e)}'
@@ -492,7 +624,8 @@ def diagnostics():
             },
             'system': {
                 'data_dir_exists': False,
-                'data_files_ok': False
+                'data_files_ok': False,
+                'logs_dropped': dropped_records()
             },
             'logs': []
         }
@@ -515,7 +648,7 @@ def diagnostics():
                 diag['bot_status']['active'] = data_manager.get_bot_status()
                 diag['bot_status']['configured'] = diag['bot_status']['token_set'] and diag['bot_status']['group_id_set']
             except Exception as e:
-                logger.error(f"Erro ao verificar status do bot para diagnóstico: {str(e)}")
+                logger.error("Erro ao verificar status do bot para diagnóstico: %s", e)
             
             # Status do manipulador e agendador
             diag['bot_status']['handler_created'] = bot_handler is not None
@@ -523,44 +656,127 @@ def diagnostics():
             
             # Informações sobre posts
             try:
-                posts = data_manager.get_promo_posts() or []
-                diag['posts']['count'] = len(posts)
+                page = data_manager.get_posts_page(limit=1)
+                diag['posts']['count'] = page['total']
                 
-                if posts:
-                    # Ordenar por data de criação, mais recente primeiro
-                    sorted_posts = sorted(posts, key=lambda x: x.get('created_at', ''), reverse=True)
-                    latest = sorted_posts[0]
+                if page['posts']:
+                    latest = page['posts'][0]
                     diag['posts']['latest'] = {
                         'id': latest.get('id', ''),
                         'text': latest.get('text', '')[:50] + ('...' if len(latest.get('text', '')) > 50 else ''),
                         'created_at': latest.get('created_at', '')
                     }
             except Exception as e:
-                logger.error(f"Erro ao verificar posts para diagnóstico: {str(e)}")
+                logger.error("Erro ao verificar posts para diagnóstico: %s", e)
             
             # Informações sobre mensagem de boas-vindas
             try:
                 welcome_message = data_manager.get_welcome_message()
                 diag['welcome']['message_set'] = bool(welcome_message)
             except Exception as e:
-                logger.error(f"Erro ao verificar mensagem de boas-vindas para diagnóstico: {str(e)}")
+                logger.error("Erro ao verificar mensagem de boas-vindas para diagnóstico: %s", e)
         
-        # Ler logs (últimas 50 linhas)
-        log_file = 'app.log'  # Ajuste para o nome correto do seu arquivo de log
+        # Ler logs (últimas 50 linhas, lidas do fim do arquivo)
         try:
-            if os.path.exists(log_file):
-                with open(log_file, 'r') as f:
-                    lines = f.readlines()
-                    diag['logs'] = lines[-50:]  # Últimas 50 linhas
+            diag['logs'], _ = log_tail.tail(50)
         except Exception as e:
-            logger.error(f"Erro ao ler arquivo de log: {str(e)}")
+            logger.error("Erro ao ler arquivo de log: %s", e)
             diag['logs'] = [f"Erro ao ler logs: {str(e)}"]
         
         return render_template('diagnostics.html', diag=diag)
     except Exception as e:
-        logger.error(f"Erro ao gerar diagnóstico: {str(e)}")
+        logger.error("Erro ao gerar diagnóstico: %s", e)
         return render_template('error.html', error=f"Erro ao gerar diagnóstico: {str(e)}"), 500
 
+def _log_filters(args):
+    """Filtros de nível e logger da visualização de logs"""
+    level = (args.get('level') or '').upper() or None
+    if level and level not in LEVELS:
+        raise ValueError(f"Nível inválido: {level} (use {', '.join(LEVELS)})")
+    return {'level': level, 'logger_name': args.get('logger') or None}
+
+@app.route('/logs')
+def logs():
+    """Página de logs: últimas linhas, com filtros e acompanhamento em tempo real."""
+    try:
+        try:
+            filters = _log_filters(request.args)
+        except ValueError as e:
+            flash(str(e), 'warning')
+            filters = {'level': None, 'logger_name': None}
+        
+        # Posição do fim do log: o acompanhamento em tempo real continua daqui
+        log_end = os.path.getsize(LOG_FILE) if os.path.exists(LOG_FILE) else 0
+        lines, before = log_tail.tail(200, **filters)
+        try:
+            log_stats = log_tail.stats()
+        except Exception as e:
+            logger.error("Erro ao indexar arquivo de log: %s", e)
+            log_stats = None
+        
+        diagnostic = {
+            'python_version': sys.version.split()[0],
+            'app_path': os.path.dirname(os.path.abspath(__file__)),
+            'data_dir_exists': bool(data_manager) and os.path.exists(data_manager.data_dir),
+            'telegram_module': importlib.util.find_spec('telegram') is not None
+        }
+        return render_template('logs.html', logs=lines, before=before, log_end=log_end, log_stats=log_stats,
+                               levels=LEVELS, filters=filters, diagnostic=diagnostic)
+    except Exception as e:
+        logger.error("Erro não tratado na rota /logs: %s", e)
+        return render_template('error.html', error=str(e)), 500
+
+@app.route('/api/logs')
+def api_logs():
+    """
+    Linhas do log, das mais recentes para trás.
+    
+    Parâmetros: limit, level (nível mínimo), logger (nome ou prefixo) e before
+    (posição devolvida pela página anterior, para ler registros mais antigos).
+    """
+    try:
+        try:
+            filters = _log_filters(request.args)
+            limit = min(int(request.args.get('limit') or 200), 1000)
+            before = int(request.args['before']) if request.args.get('before') else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        lines, start = log_tail.tail(limit, before=before, **filters)
+        return jsonify({'lines': lines, 'before': start if start > 0 else None})
+    except Exception as e:
+        logger.error("Erro não tratado na rota /api/logs: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/logs/stream')
+def api_logs_stream():
+    """
+    Acompanha o log em tempo real (Server-Sent Events).
+    
+    Cada linha nova é enviada como um evento com id = posição no arquivo; ao
+    reconectar, o navegador envia Last-Event-ID e a leitura continua de onde parou.
+    Aceita os mesmos filtros de /api/logs.
+    """
+    try:
+        filters = _log_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('offset')
+    offset = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    
+    def events():
+        yield "retry: 3000\n\n"
+        for item in log_tail.follow(offset, **filters):
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            position, line = item
+            yield f"id: {position}\ndata: {line}\n\n"
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/status')
 def get_status():
     """Endpoint da API para obter o status atual do bot."""
@@ -576,22 +792,288 @@ def get_status():
         try:
             active = data_manager.get_bot_status()
         except Exception as e:
-            logger.error(f"Erro ao obter status do bot: {str(e)}")
+            logger.error("Erro ao obter status do bot: %s", e)
         
         interval = 10
         try:
             interval = data_manager.get_interval()
         except Exception as e:
-            logger.error(f"Erro ao obter intervalo: {str(e)}")
+            logger.error("Erro ao obter intervalo: %s", e)
         
         return jsonify({
             'active': active,
             'interval': interval
         })
     except Exception as e:
-        logger.error(f"Erro não tratado na rota /api/status: {str(e)}")
+        logger.error("Erro não tratado na rota /api/status: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/scheduler/drift')
+def api_scheduler_drift():
+    """Atraso dos posts agendados em relação aos horários previstos (último, médio, máximo e jitter)."""
+    try:
+        drift_stats = getattr(scheduler, 'drift_stats', None) if scheduler is not None else None
+        if drift_stats is None:
+            return jsonify({'error': 'Agendador não está em execução'}), 503
+        return jsonify({'scheduler': type(scheduler).__name__, 'drift': drift_stats()})
+    except Exception as e:
+        logger.error("Erro ao obter atraso do agendador: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/groups', methods=['GET', 'POST'])
+def api_groups():
+    """
+    Grupos de destino dos posts, cada um com intervalo e status próprios.
+    
+    GET lista os grupos e os que estão agendados; POST recebe em JSON group_id e,
+    opcionalmente, interval (minutos) e active, e adiciona ou atualiza o grupo.
+    """
+    try:
+        if not data_manager:
+            return jsonify({'error': 'Sistema de gerenciamento de dados não disponível'}), 500
+        
+        if request.method == 'POST':
+            group = request.get_json(silent=True) or {}
+            if not str(group.get('group_id') or '').strip():
+                return jsonify({'error': 'Informe o group_id'}), 400
+            if not data_manager.save_group(group['group_id'], group.get('interval'), group.get('active')):
+                return jsonify({'error': 'Erro ao salvar o grupo'}), 500
+        
+        return jsonify({
+            'groups': data_manager.get_groups(),
+            'scheduled': group_scheduler.scheduled_groups() if group_scheduler is not None else {}
+        })
+    except Exception as e:
+        logger.error("Erro não tratado na rota /api/groups: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/groups/<group_id>', methods=['DELETE'])
+def api_remove_group(group_id):
+    """Remove um grupo de destino."""
+    try:
+        if not data_manager:
+            return jsonify({'error': 'Sistema de gerenciamento de dados não disponível'}), 500
+        if not data_manager.remove_group(group_id):
+            return jsonify({'error': 'Grupo não encontrado'}), 404
+        return jsonify({'groups': data_manager.get_groups()})
+    except Exception as e:
+        logger.error("Erro não tratado na rota /api/groups/%s: %s", group_id, e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/schedule', methods=['GET', 'POST'])
+def api_schedule():
+    """
+    Calendário de posts (horário ativo, dias da semana, cron e pesos).
+    
+    GET retorna o calendário e os próximos horários de post; POST recebe o calendário
+    em JSON (ou null para voltar a postar apenas pelo intervalo).
+    """
+    try:
+        if not data_manager:
+            return jsonify({'error': 'Sistema de gerenciamento de dados não disponível'}), 500
+        
+        if request.method == 'POST':
+            schedule = request.get_json(silent=True)
+            try:
+                saved = data_manager.update_schedule(schedule)
+            except ScheduleError as e:
+                return jsonify({'error': str(e)}), 400
+            if not saved:
+                return jsonify({'error': 'Erro ao salvar o calendário de posts'}), 500
+        
+        compiled = data_manager.get_schedule()
+        return jsonify({
+            'schedule': data_manager.get_bot_config().get('schedule'),
+            'timezone': compiled.timezone if compiled is not None else None,
+            'upcoming': compiled.upcoming(min(int(request.args.get('count') or 10), 100)) if compiled is not None else []
+        })
+    except Exception as e:
+        logger.error("Erro não tratado na rota /api/schedule: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métricas do processo (latências, filas, respostas 429) no formato de texto do Prometheus."""
+    try:
+        return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+    except Exception as e:
+        logger.error("Erro ao gerar métricas: %s", e)
+        return Response(f"# Erro ao gerar métricas: {str(e)}\n", status=500, content_type=metrics.CONTENT_TYPE)
+
+def _store_upload(upload):
+    """Grava a imagem enviada no formulário no repositório de mídia e retorna sua URL local (ou None)"""
+    if upload is None or not upload.filename:
+        return None
+    return media_url(data_manager.media_store.save(upload.stream, upload.filename))
+
+def _send_media(path):
+    """Serve um arquivo do repositório de mídia com cache de longa duração"""
+    if path is None:
+        abort(404)
+    # O conteúdo de um nome nunca muda: o navegador pode guardá-lo indefinidamente
+    response = send_file(path, max_age=MEDIA_HTTP_MAX_AGE, conditional=True)
+    response.headers['Cache-Control'] = f'public, max-age={MEDIA_HTTP_MAX_AGE}, immutable'
+    return response
+
+@app.route('/media/<name>')
+def media_file(name):
+    """Imagem original do repositório de mídia."""
+    if not data_manager:
+        abort(404)
+    return _send_media(data_manager.media_store.path(name))
+
+@app.route('/media/preview/<name>')
+def media_preview(name):
+    """Prévia reduzida de uma imagem do repositório de mídia."""
+    if not data_manager:
+        abort(404)
+    return _send_media(data_manager.media_store.preview_path(name))
+
+def _post_page_args(args):
+    """Converte os parâmetros de consulta da listagem de posts em argumentos de get_posts_page"""
+    def flag(name):
+        value = args.get(name)
+        if value in (None, ''):
+            return None
+        if value.lower() in ('1', 'true', 'sim', 'yes'):
+            return True
+        if value.lower() in ('0', 'false', 'nao', 'não', 'no'):
+            return False
+        raise ValueError(f"Valor inválido para {name}: {value}")
+    
+    return {
+        'cursor': args.get('cursor') or None,
+        'limit': int(args.get('limit') or POSTS_PAGE_SIZE),
+        'text': args.get('q') or None,
+        'has_image': flag('has_image'),
+        'has_link': flag('has_link')
+    }
+
+@app.route('/api/posts')
+def api_posts():
+    """
+    Endpoint da API para listar posts promocionais com paginação por cursor.
+    
+    Parâmetros: cursor, limit, q (texto), has_image, has_link.
+    """
+    try:
+        if not data_manager:
+            return jsonify({'error': 'Sistema de gerenciamento de dados não disponível'}), 500
+        
+        try:
+            page = data_manager.get_posts_page(**_post_page_args(request.args))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify(page)
+    except Exception as e:
+        logger.error("Erro não tratado na rota /api/posts: %s", e)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/posts/search')
+def api_search_posts():
+    """
+    Endpoint da API para buscar posts promocionais por texto.
+    
+    Parâmetros: q (termos da busca; acentos e maiúsculas são ignorados), limit.
+    """
+    try:
+        if not data_manager:
+            return jsonify({'error': 'Sistema de gerenciamento de dados não disponível'}), 500
+        
+        query = request.args.get('q', '')
+        try:
+            limit = int(request.args.get('limit') or POSTS_PAGE_SIZE)
+        except ValueError:
+            return jsonify({'error': 'Parâmetro limit inválido'}), 400
+        
+        return jsonify(data_manager.search_posts(query, limit))
+    except Exception as e:
+        logger.error("Erro não tratado na rota /api/posts/search: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/posts/export')
+def api_export_posts():
+    """
+    Exporta todos os posts promocionais (parâmetro format: ndjson ou csv).
+    
+    A resposta é gerada em partes, sem montar o arquivo inteiro em memória.
+    """
+    try:
+        if not data_manager:
+            return jsonify({'error': 'Sistema de gerenciamento de dados não disponível'}), 500
+        
+        file_format = request.args.get('format', 'ndjson')
+        try:
+            writer = bulk_io.writer_for(file_format)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        mimetype = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        filename = f"posts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{file_format}"
+        return Response(stream_with_context(writer(data_manager.iter_promotional_posts())),
+                        mimetype=f"{mimetype}; charset=utf-8",
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+    except Exception as e:
+        logger.error("Erro não tratado na rota /api/posts/export: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/posts/import', methods=['POST'])
+def api_import_posts():
+    """
+    Importa posts promocionais em massa (NDJSON ou CSV).
+    
+    Aceita um arquivo enviado no campo 'file' de um formulário ou o corpo da
+    requisição. O formato vem do parâmetro format, da extensão do arquivo ou do
+    Content-Type. O conteúdo é lido de forma incremental e gravado em lotes.
+    """
+    try:
+        if not data_manager:
+            return jsonify({'error': 'Sistema de gerenciamento de dados não disponível'}), 500
+        
+        upload = request.files.get('file')
+        if upload is not None:
+            stream = upload.stream
+            default_format = bulk_io.guess_format(upload.filename)
+        else:
+            stream = request.stream
+            default_format = 'csv' if (request.mimetype or '').endswith('csv') else 'ndjson'
+        
+        try:
+            reader = bulk_io.reader_for(request.args.get('format', default_format))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        result = bulk_io.import_posts(data_manager, reader(stream))
+        status = 400 if result['aborted'] else 200
+        return jsonify(result), status
+    except Exception as e:
+        logger.error("Erro não tratado na rota /api/posts/import: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route(WEBHOOK_PATH, methods=['POST'])
+def telegram_webhook():
+    """
+    Recebe os updates do Telegram no modo webhook.
+    
+    O update é apenas enfileirado: a resposta sai na hora e o processamento
+    acontece no pool do receptor. Com a fila cheia a resposta é 503 e o Telegram
+    reenvia o update mais tarde.
+    """
+    # No modo polling (ou sem bot) a rota não existe para o Telegram
+    if not isinstance(update_receiver, WebhookReceiver):
+        return jsonify({'ok': False, 'error': 'Webhook não configurado'}), 404
+    if not update_receiver.verify(request.headers.get(SECRET_HEADER)):
+        logger.warning("Update recebido com segredo inválido de %s", request.remote_addr)
+        return jsonify({'ok': False, 'error': 'Segredo inválido'}), 403
+    
+    update = request.get_json(silent=True)
+    if not isinstance(update, dict):
+        return jsonify({'ok': False, 'error': 'Update inválido'}), 400
+    if not update_receiver.submit(update):
+        return jsonify({'ok': False, 'error': 'Fila de updates cheia'}), 503
+    return jsonify({'ok': True})
+
 @app.route('/test_send', methods=['GET'])
 def test_send():
     """Endpoint para testar o envio de mensagens."""
@@ -605,18 +1087,23 @@ def test_send():
             return redirect(url_for('bot_config'))
             
         try:
-            success = bot_handler.send_message("Teste de mensagem do painel administrativo!")
+            text = "Teste de mensagem do painel administrativo!"
+            if pipeline and pipeline.is_running():
+                pipeline.send_message(data_manager.get_group_id(), text).result(timeout=pipeline.timeout)
+                success = True
+            else:
+                success = bot_handler.send_message(text)
             if success:
                 flash("Mensagem de teste enviada com sucesso!", "success")
             else:
                 flash("Falha ao enviar mensagem de teste. Verifique os logs.", "danger")
         except Exception as e:
-            logger.error(f"Erro ao enviar mensagem de teste: {str(e)}")
+            logger.error("Erro ao enviar mensagem de teste: %s", e)
             flash(f"Erro ao enviar mensagem: {str(e)}", "danger")
         
         return redirect(url_for('index'))
     except Exception as e:
-        logger.error(f"Erro não tratado na rota /test_send: {str(e)}")
+        logger.error("Erro não tratado na rota /test_send: %s", e)
         flash(f"Erro: {str(e)}", "danger")
         return redirect(url_for('index'))
 
@@ -628,7 +1115,7 @@ def page_not_found(e):
 @app.errorhandler(500)
 def server_error(e):
     """Manipulador para erro interno do servidor."""
-    logger.error(f"Erro 500: {str(e)}")
+    logger.error("Erro 500: %s", e)
     return render_template('500.html'), 500
 
 # Limpar recursos ao encerrar a aplicação
@@ -640,10 +1127,22 @@ def cleanup():
     try:
         if scheduler:
             scheduler.stop()
+        if group_scheduler:
+            group_scheduler.stop()
+        if update_receiver:
+            update_receiver.stop()
+        if welcome_batcher:
+            welcome_batcher.stop()
+        if outbox:
+            outbox.stop()
         if bot_handler:
             bot_handler.stop()
+        if pipeline:
+            pipeline.stop()
+        if outbox:
+            outbox.outbox.close()
     except Exception as e:
-        logger.error(f"Erro ao limpar recursos: {str(e)}")
+        logger.error("Erro ao limpar recursos: %s", e)
 
 atexit.register(cleanup)
 
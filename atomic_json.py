@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from config import JSON_WRITE_WINDOW
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+def dumps(data: Any) -> bytes:
+    """Serializa em JSON compacto (sem indentação nem espaços), em UTF-8"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class _Batch:
+    """Gravações reunidas em um mesmo commit"""
+
+    def __init__(self):
+        self.files: Dict[str, bytes] = {}
+        self.errors: Dict[str, Exception] = {}
+        self.done = threading.Event()
+
+
+class AtomicJSONWriter:
+    """
+    Grava arquivos JSON de forma atômica, agrupando gravações próximas.
+
+    Cada arquivo é escrito em um arquivo temporário no mesmo diretório, sincronizado
+    com fsync e renomeado por cima do original: um leitor (ou uma queda do processo)
+    vê sempre a versão antiga ou a nova inteira, nunca um arquivo truncado.
+
+    Gravações que chegam dentro de `window` segundos formam um único lote. A primeira
+    thread do lote espera a janela e grava tudo; as demais só aguardam o resultado.
+    Várias gravações do mesmo arquivo no lote custam um único fsync (vale a última),
+    e cada diretório é sincronizado uma vez por lote. Em sistemas de arquivos de rede
+    lentos, onde cada fsync custa dezenas de milissegundos, isso evita uma fila de
+    fsyncs quando vários contadores e configurações mudam ao mesmo tempo.
+    """
+
+    def __init__(self, window: float = JSON_WRITE_WINDOW):
+        """
+        Inicializa o gravador.
+
+        Args:
+            window: Tempo (em segundos) que o primeiro gravador espera por outras gravações
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._batch: Optional[_Batch] = None
+
+    def write(self, path: str, data: Any):
+        """
+        Grava um objeto como JSON em `path` e só retorna depois que ele está em disco.
+
+        Args:
+            path: Arquivo de destino
+            data: Objeto serializável em JSON
+
+        Raises:
+            TypeError, ValueError: Se o objeto não puder ser serializado.
+            OSError: Se a gravação falhar (o arquivo original fica intacto).
+        """
+        payload = dumps(data)
+        path = os.path.abspath(path)
+
+        with self._lock:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch()
+            batch.files[path] = payload
+
+        if leader:
+            if self.window > 0:
+                time.sleep(self.window)
+            with self._commit_lock:
+                with self._lock:
+                    self._batch = None
+                self._commit(batch)
+                batch.done.set()
+        else:
+            batch.done.wait()
+
+        error = batch.errors.get(path)
+        if error is not None:
+            raise error
+
+    def _commit(self, batch: _Batch):
+        """Grava os arquivos de um lote: temporário + fsync, rename e fsync do diretório"""
+        directories = set()
+        for path, payload in batch.files.items():
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+                directories.add(os.path.dirname(path))
+            except Exception as e:
+                logger.error("Erro ao gravar %s: %s", path, e)
+                batch.errors[path] = e
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+        # O rename só é durável depois do fsync do diretório (não suportado no Windows)
+        for directory in directories:
+            try:
+                fd = os.open(directory, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.fsync(fd)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+
+
+_writer = AtomicJSONWriter()
+
+
+def write_json(path: str, data: Any):
+    """Grava um arquivo JSON pelo gravador atômico compartilhado do processo"""
+    _writer.write(path, data)
@@ -26,7 +26,7 @@ def create_default_user():
                     logger.info("Usuários já existem no sistema")
                     return
         except Exception as e:
-            logger.error(f"Erro ao verificar usuários existentes: {str(e)}")
+            logger.error("Erro ao verificar usuários existentes: %s", e)
     
     try:
         # Cria um usuário padrão
@@ -41,7 +41,7 @@ def create_default_user():
         
         logger.info("Usuário padrão criado com sucesso")
     except Exception as e:
-        logger.error(f"Erro ao criar usuário padrão: {str(e)}")
+        logger.error("Erro ao criar usuário padrão: %s", e)
 
 def authenticate_user(username, password):
     """Autentica um usuário"""
@@ -59,13 +59,13 @@ def authenticate_user(username, password):
         
         for user in users:
             if user.get('username') == username and user.get('password_hash') == password_hash:
-                logger.info(f"Usuário autenticado com sucesso: {username}")
+                logger.info("Usuário autenticado com sucesso: %s", username)
                 return True
         
-        logger.warning(f"Tentativa de autenticação falhou para o usuário: {username}")
+        logger.warning("Tentativa de autenticação falhou para o usuário: %s", username)
         return False
     except Exception as e:
-        logger.error(f"Erro ao autenticar usuário: {str(e)}")
+        logger.error("Erro ao autenticar usuário: %s", e)
         return False
 
 def check_auth(username, password):
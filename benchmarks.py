@@ -0,0 +1,399 @@
+"""
+Benchmarks de desempenho dos componentes do bot.
+
+Uso:
+    python benchmarks.py rotation rate_limiter welcome_template post_index search update_dispatcher logging metrics schedule_drift posting_schedule
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+import logging
+from datetime import datetime, timedelta
+
+
+def _make_posts(count):
+    """Gera posts sintéticos com created_at crescente"""
+    base = datetime(2024, 1, 1)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "title": f"Post {i}",
+            "content": f"Conteúdo do post {i}",
+            "image_url": "",
+            "external_link": "",
+            "created_at": (base + timedelta(seconds=i)).isoformat()
+        }
+        for i in range(count)
+    ]
+
+
+def bench_rotation(sizes=(10, 100, 1000, 10000, 100000), picks=2000):
+    """Latência de get_next_sequential_post em função do tamanho do catálogo (backends JSON e SQLite)"""
+    from config import PROMOTIONAL_POSTS_FILE
+    from data_manager import DataManager
+    from sqlite_storage import SQLiteStorage
+
+    print(f"{'posts':>8} {'json us/post':>13} {'sqlite us/post':>15}")
+    cwd = os.getcwd()
+    for size in sizes:
+        results = []
+        for backend in ('json', 'sqlite'):
+            with tempfile.TemporaryDirectory() as tmp:
+                os.chdir(tmp)
+                try:
+                    os.makedirs(os.path.dirname(PROMOTIONAL_POSTS_FILE), exist_ok=True)
+                    with open(PROMOTIONAL_POSTS_FILE, 'w', encoding='utf-8') as f:
+                        json.dump(_make_posts(size), f)
+
+                    storage = None
+                    if backend == 'sqlite':
+                        storage = SQLiteStorage()
+                        storage.migrate_from_json()
+                    data_manager = DataManager(storage=storage)
+                    data_manager.get_next_sequential_post()  # carga e construção do índice
+
+                    # O JSON grava o cursor com fsync a cada post: menos escolhas
+                    count = picks if backend == 'sqlite' else max(1, picks // 20)
+                    start = time.perf_counter()
+                    for _ in range(count):
+                        data_manager.get_next_sequential_post()
+                    results.append((time.perf_counter() - start) / count)
+                    if storage is not None:
+                        storage.close()
+                finally:
+                    os.chdir(cwd)
+        print(f"{size:>8} {results[0] * 1e6:>13.1f} {results[1] * 1e6:>15.1f}")
+
+
+def bench_rate_limiter(messages=5000, chats=(1, 10, 100, 1000)):
+    """Vazão do limitador em uma onda de mensagens simultâneas (relógio simulado)"""
+    from rate_limiter import RateLimiter, SimulatedClock
+
+    print(f"{'chats':>6} {'msg/s':>8} {'max/s':>6} {'max/min/chat':>13} {'us/reserve':>11}")
+    for chat_count in chats:
+        clock = SimulatedClock()
+        limiter = RateLimiter(clock=clock)
+
+        # Todas as mensagens chegam em t=0, distribuídas entre os chats
+        sends = []
+        start = time.perf_counter()
+        for i in range(messages):
+            chat_id = -1000 - (i % chat_count)
+            sends.append((limiter.reserve(chat_id), chat_id))
+        elapsed = time.perf_counter() - start
+
+        times = sorted(at for at, _ in sends)
+        duration = times[-1] or 1.0
+        max_per_second = _max_in_window(times, 1.0)
+        max_per_minute = max(
+            _max_in_window(sorted(at for at, chat_id in sends if chat_id == -1000 - c), 60.0)
+            for c in range(min(chat_count, 20))
+        )
+        print(f"{chat_count:>6} {messages / duration:>8.1f} {max_per_second:>6} "
+              f"{max_per_minute:>13} {elapsed / messages * 1e6:>11.2f}")
+
+
+def _max_in_window(times, window):
+    """Maior número de eventos (tempos ordenados) dentro de qualquer janela [t, t + window)"""
+    best = 0
+    first = 0
+    for last, at in enumerate(times):
+        while at - times[first] >= window - 1e-9:
+            first += 1
+        best = max(best, last - first + 1)
+    return best
+
+
+def bench_welcome_template(joins=100000):
+    """Custo por entrada de membro: modelo compilado vs. reanálise a cada entrada"""
+    from welcome_template import compile_template
+    from welcome_batcher import build_context
+
+    source = ("Olá {mention}! {if group_title}Bem-vindo(a) ao {group_title}!{else}Bem-vindo(a)!{end} "
+              "{if member_count}Agora somos {member_count} membros.{end} Leia as regras fixadas.")
+    contexts = [
+        build_context([{'id': i, 'first_name': f"Usuario{i}", 'username': f"user{i}"}],
+                      group_title="Grupo de Ofertas", member_count=1000 + i)
+        for i in range(1000)
+    ]
+
+    template = compile_template(source)
+    start = time.perf_counter()
+    for i in range(joins):
+        template.render(contexts[i % 1000])
+    compiled = (time.perf_counter() - start) / joins
+
+    reparse_joins = joins // 10
+    start = time.perf_counter()
+    for i in range(reparse_joins):
+        compile_template(source).render(contexts[i % 1000])
+    reparse = (time.perf_counter() - start) / reparse_joins
+
+    print(f"{'modo':>10} {'us/entrada':>11} {'entradas/s':>12}")
+    print(f"{'compilado':>10} {compiled * 1e6:>11.2f} {1 / compiled:>12.0f}")
+    print(f"{'reanálise':>10} {reparse * 1e6:>11.2f} {1 / reparse:>12.0f}")
+
+
+def bench_post_index(sizes=(100, 1000, 10000, 100000), pages=2000):
+    """Latência de uma página da listagem de posts: índice ordenado vs. ordenar tudo"""
+    from post_index import PostIndex
+
+    print(f"{'posts':>8} {'us/página':>10} {'us/sorted':>10}")
+    for size in sizes:
+        posts = _make_posts(size)
+        index = PostIndex(posts)
+
+        start = time.perf_counter()
+        cursor = None
+        for _ in range(pages):
+            # Percorre as páginas em sequência; ao chegar ao fim recomeça da primeira
+            _, cursor = index.page(cursor, limit=20)
+        indexed = (time.perf_counter() - start) / pages
+
+        sorted_pages = max(1, pages // 100)
+        start = time.perf_counter()
+        for _ in range(sorted_pages):
+            sorted(posts, key=lambda x: x.get('created_at', ''), reverse=True)[:20]
+        full_sort = (time.perf_counter() - start) / sorted_pages
+
+        print(f"{size:>8} {indexed * 1e6:>10.1f} {full_sort * 1e6:>10.1f}")
+
+
+def bench_search(size=100000, queries=200):
+    """Busca por texto em 100 mil posts: latência das consultas, construção e carga do índice"""
+    from search_index import SearchIndex
+
+    words = ["promoção", "desconto", "frete", "grátis", "cupom", "oferta", "relâmpago", "loja",
+             "camiseta", "tênis", "celular", "notebook", "livro", "curso", "viagem", "hotel"]
+    vocabulary = words + [f"termo{n}" for n in range(2000)]
+    rng = random.Random(42)
+    posts = _make_posts(size)
+    for i, post in enumerate(posts):
+        post["content"] = " ".join(rng.choice(vocabulary) for _ in range(30)) + f" item{i}"
+
+    start = time.perf_counter()
+    index = SearchIndex(posts)
+    build = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'index.json')
+        index.save(path, (1, 2))
+        start = time.perf_counter()
+        SearchIndex.load(path, (1, 2))
+        load = time.perf_counter() - start
+
+    print(f"{'índice':>22} {'ms':>8}")
+    print(f"{'construção':>22} {build * 1e3:>8.0f}")
+    print(f"{'carga do disco':>22} {load * 1e3:>8.0f}")
+    print(f"{'consulta':>22} {'ms/busca':>8} {'resultados':>11}")
+    for query in ("item4242", "promocao", "frete gratis", "cupom rel", "termo1", "termo"):
+        start = time.perf_counter()
+        for _ in range(queries):
+            _, total = index.search(query, 20)
+        elapsed = (time.perf_counter() - start) / queries
+        print(f"{query:>22} {elapsed * 1e3:>8.2f} {total:>11}")
+
+
+def bench_update_dispatcher(chats=50, updates_per_chat=20, handle_time=0.002, workers=(1, 2, 4, 8, 16)):
+    """Vazão do UpdateDispatcher (tratamento lento simulado) e ordem dentro de cada chat"""
+    import threading
+    from update_dispatcher import UpdateDispatcher
+
+    updates = [
+        {"update_id": n * chats + chat, "message": {"chat": {"id": chat}, "seq": n}}
+        for n in range(updates_per_chat) for chat in range(chats)
+    ]
+
+    print(f"{'threads':>8} {'updates/s':>10} {'ordem':>6}")
+    for count in workers:
+        seen = {}
+        lock = threading.Lock()
+
+        def handle(update):
+            time.sleep(handle_time)
+            with lock:
+                seen.setdefault(update["message"]["chat"]["id"], []).append(update["message"]["seq"])
+
+        dispatcher = UpdateDispatcher(handle, workers=count, max_pending=len(updates),
+                                      max_chat_depth=updates_per_chat)
+        dispatcher.start()
+        start = time.perf_counter()
+        for update in updates:
+            dispatcher.submit(update)
+        dispatcher.stop()
+        elapsed = time.perf_counter() - start
+        ordered = all(seqs == sorted(seqs) for seqs in seen.values())
+        print(f"{count:>8} {len(updates) / elapsed:>10.0f} {'ok' if ordered else 'ERRO':>6}")
+
+
+def bench_logging(records=20000):
+    """Custo por chamada de log: FileHandler síncrono x fila assíncrona, e nível desativado"""
+    import queue
+    from logging.handlers import QueueListener
+    from structured_log import DroppingQueueHandler, JsonFormatter
+
+    logging.disable(logging.NOTSET)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"{'handler':>14} {'us/registro':>12} {'descartados':>12}")
+            for name in ('sincrono', 'fila'):
+                bench_logger = logging.getLogger(f"bench.{name}")
+                bench_logger.propagate = False
+                bench_logger.setLevel(logging.INFO)
+                file_handler = logging.FileHandler(os.path.join(tmp, f"{name}.log"), encoding='utf-8')
+                file_handler.setFormatter(JsonFormatter())
+                listener = None
+                if name == 'fila':
+                    handler = DroppingQueueHandler(queue.Queue(maxsize=records))
+                    listener = QueueListener(handler.queue, file_handler)
+                    listener.start()
+                else:
+                    handler = file_handler
+                bench_logger.addHandler(handler)
+
+                start = time.perf_counter()
+                for i in range(records):
+                    bench_logger.info("Post promocional enviado para %s: %s", -100 - i % 10, f"Post {i}",
+                                      extra={'post_id': i, 'chat_id': -100 - i % 10, 'latency_ms': 12.5})
+                elapsed = time.perf_counter() - start
+                if listener is not None:
+                    listener.stop()
+                bench_logger.removeHandler(handler)
+                file_handler.close()
+                dropped = getattr(handler, 'dropped', 0)
+                print(f"{name:>14} {elapsed / records * 1e6:>12.2f} {dropped:>12}")
+
+            bench_logger = logging.getLogger("bench.desativado")
+            bench_logger.setLevel(logging.INFO)
+            post = {'id': 'abc', 'title': 'Post'}
+            print(f"{'debug desativado':>18} {'us/chamada':>12}")
+            start = time.perf_counter()
+            for i in range(records):
+                bench_logger.debug("Enviando post %s: %s", i, post)
+            print(f"{'f-string':>18} {(time.perf_counter() - start) / records * 1e6:>12.3f}")
+            start = time.perf_counter()
+            for i in range(records):
+                bench_logger.debug("Enviando post %s: %s", i, post)
+            print(f"{'argumentos':>18} {(time.perf_counter() - start) / records * 1e6:>12.3f}")
+    finally:
+        logging.disable(logging.INFO)
+
+
+def bench_metrics(operations=200000, threads=(1, 4, 16)):
+    """Custo de Counter.inc e Histogram.observe, com várias threads escrevendo ao mesmo tempo"""
+    import threading
+    from metrics import Registry, Counter, Histogram
+
+    print(f"{'threads':>8} {'inc ns/op':>10} {'observe ns/op':>14} {'total ok':>9}")
+    for count in threads:
+        registry = Registry()
+        bench_counter = registry.get_or_create(Counter, 'bench_total', 'bench')
+        bench_histogram = registry.get_or_create(Histogram, 'bench_seconds', 'bench')
+        per_thread = operations // count
+        results = {}
+        for name, operation in (('inc', bench_counter.inc), ('observe', lambda: bench_histogram.observe(0.003))):
+            def work():
+                for _ in range(per_thread):
+                    operation()
+            workers = [threading.Thread(target=work) for _ in range(count)]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            results[name] = (time.perf_counter() - start) / (per_thread * count) * 1e9
+        ok = bench_counter.value() == per_thread * count and bench_histogram.snapshot()[2] == per_thread * count
+        print(f"{count:>8} {results['inc']:>10.0f} {results['observe']:>14.0f} {'ok' if ok else 'ERRO':>9}")
+
+
+def bench_schedule_drift(hours=24, interval_minutes=10, seed=42):
+    """Deslize acumulado dos horários dos posts em um dia simulado: modo 'anchored' x 'completion'"""
+    from tick_schedule import TickSchedule
+
+    interval = interval_minutes * 60
+    ticks = int(hours * 3600 // interval)
+    print(f"{'modo':>11} {'posts':>6} {'atraso médio (s)':>17} {'deslize final (s)':>18}")
+    for mode in ('anchored', 'completion'):
+        rng = random.Random(seed)
+        schedule = TickSchedule(interval, interval, name='bench', mode=mode)
+        now = 0.0
+        drifts = []
+        for _ in range(ticks):
+            now = max(now, schedule.due(now)) + rng.uniform(0, 0.015)  # Atraso do temporizador
+            schedule.fired(now)
+            drifts.append(now - len(drifts) * interval - interval)
+            now += rng.uniform(0.2, 3.0)  # Duração do envio
+            schedule.completed(now)
+        print(f"{mode:>11} {ticks:>6} {sum(drifts) / len(drifts):>17.3f} {drifts[-1]:>18.3f}")
+
+
+def bench_posting_schedule(lookups=20000, wakeups=200):
+    """Próximo horário de post: busca binária na tabela compilada x reavaliar as regras a cada disparo"""
+    from posting_schedule import CompiledSchedule
+
+    calendars = {
+        'janelas 1min': {'active_hours': [["08:00", "12:00"], ["14:00", "22:00"]], 'days': ['mon-sat'], 'interval': 1},
+        'janelas 30min': {'active_hours': [["08:00", "22:00"]], 'days': ['mon-fri'], 'interval': 30},
+        'cron': {'cron': ['*/15 9-18 * * 1-5', '0 10 * * sat'], 'active_hours': ["09:00-17:00"]},
+    }
+    rng = random.Random(42)
+    print(f"{'calendário':>14} {'horários':>9} {'compilar (ms)':>14} {'tabela (us)':>12} {'reavaliar (us)':>15}")
+    for name, spec in calendars.items():
+        now = time.time()
+        start = time.perf_counter()
+        schedule = CompiledSchedule(spec, now=now)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        instants = [now + rng.uniform(0, 6 * 86400) for _ in range(lookups)]
+        start = time.perf_counter()
+        for t in instants:
+            schedule.next_after(t)
+        table_us = (time.perf_counter() - start) / lookups * 1e6
+
+        # Sem tabela: cada disparo avalia as regras do instante atual até achar o próximo horário
+        start = time.perf_counter()
+        for t in instants[:wakeups]:
+            window = 86400
+            while not any(fire > t for fire in schedule.evaluate(t, t + window)):
+                window *= 2
+        rules_us = (time.perf_counter() - start) / wakeups * 1e6
+        print(f"{name:>14} {len(schedule):>9} {compile_ms:>14.1f} {table_us:>12.2f} {rules_us:>15.0f}")
+
+
+BENCHMARKS = {
+    'rotation': bench_rotation,
+    'rate_limiter': bench_rate_limiter,
+    'welcome_template': bench_welcome_template,
+    'post_index': bench_post_index,
+    'search': bench_search,
+    'update_dispatcher': bench_update_dispatcher,
+    'logging': bench_logging,
+    'metrics': bench_metrics,
+    'schedule_drift': bench_schedule_drift,
+    'posting_schedule': bench_posting_schedule,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do bot")
+    parser.add_argument('names', nargs='*', metavar='nome',
+                        help=f"Benchmarks a executar: {', '.join(sorted(BENCHMARKS))} (padrão: todos)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"benchmark desconhecido: {', '.join(unknown)}")
+
+    logging.disable(logging.INFO)
+    for name in args.names or sorted(BENCHMARKS):
+        print(f"== {name}")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -1,26 +1,46 @@
 import logging
-import threading
-import time
 from datetime import datetime
 from typing import Optional, List, Dict, Any, Union
 
+from outbox import OutboxSender, post_key
+from posting_schedule import ticks_for
+from send_pipeline import SendPipeline
+from tick_schedule import TickSchedule
+from timer_engine import TimerEngine
+
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Espera (segundos) antes de tentar novamente após uma falha de envio
+RETRY_DELAY = 10
+
 class MessageScheduler:
-    def __init__(self, bot_handler, data_manager):
+    def __init__(self, bot_handler, data_manager, engine: Optional[TimerEngine] = None,
+                 pipeline: Optional[SendPipeline] = None, outbox: Optional[OutboxSender] = None):
         """
         Inicializa o agendador de mensagens.
         
         Args:
             bot_handler: Instância do manipulador do bot
             data_manager: Instância do gerenciador de dados
+            engine: TimerEngine compartilhado opcional; se None, o agendador cria o seu
+            pipeline: SendPipeline opcional; se informado, os posts são enviados de forma
+                      assíncrona em vez de bloquear a thread do agendador
+            outbox: OutboxSender opcional; se informado, cada post passa pela fila de
+                    saída persistente antes de ser enviado
         """
         self.bot_handler = bot_handler
         self.data_manager = data_manager
+        self.pipeline = pipeline
+        self.outbox = outbox
         self.thread = None
         self.running = False
-        self.last_sent = 0  # Timestamp do último envio
+        self.last_sent = None  # Horário (relógio do motor) do último envio
+        self.schedule: Optional[TickSchedule] = None  # Horários previstos dos posts (intervalo ou calendário)
+        
+        self.engine = engine
+        self._owns_engine = engine is None
+        self._job_key = f"message-{id(self)}"
     
     def start(self) -> bool:
         """
@@ -34,16 +54,21 @@ class MessageScheduler:
                 logger.info("Agendador já está em execução.")
                 return True
             
-            # Iniciar thread do agendador
+            # Iniciar motor de temporizadores do agendador
             self.running = True
-            self.thread = threading.Thread(target=self._scheduler_loop)
-            self.thread.daemon = True
-            self.thread.start()
+            if self._owns_engine:
+                self.engine = TimerEngine("MessageScheduler")
+            self.engine.start()
+            self.thread = self.engine.thread
+            
+            # Reage imediatamente a mudanças de intervalo/status
+            self.data_manager.add_config_listener(self._reschedule)
+            self._reschedule()
             
             logger.info("Agendador de mensagens iniciado com sucesso.")
             return True
         except Exception as e:
-            logger.error(f"Erro ao iniciar agendador: {str(e)}")
+            logger.error("Erro ao iniciar agendador: %s", e)
             self.running = False
             return False
     
@@ -60,13 +85,16 @@ class MessageScheduler:
                 return True
             
             self.running = False
-            if self.thread:
-                self.thread.join(timeout=5)
+            self.data_manager.remove_config_listener(self._reschedule)
+            self.engine.cancel(self._job_key)
+            if self._owns_engine:
+                self.engine.stop(timeout=5)
+            self.thread = None
             
             logger.info("Agendador de mensagens parado com sucesso.")
             return True
         except Exception as e:
-            logger.error(f"Erro ao parar agendador: {str(e)}")
+            logger.error("Erro ao parar agendador: %s", e)
             return False
     
     def is_running(self) -> bool:
@@ -89,45 +117,70 @@ class MessageScheduler:
             bool: True se o intervalo foi atualizado com sucesso, False caso contrário.
         """
         try:
-            # Não precisa fazer nada especial, pois o intervalo é obtido
-            # diretamente do data_manager a cada iteração
-            logger.info(f"Intervalo atualizado para: {interval} minutos")
+            # O data_manager já notifica o agendador; reagendar aqui cobre
+            # chamadas feitas sem passar pelos setters
+            self._reschedule()
+            logger.info("Intervalo atualizado para: %s minutos", interval)
             return True
         except Exception as e:
-            logger.error(f"Erro ao atualizar intervalo: {str(e)}")
+            logger.error("Erro ao atualizar intervalo: %s", e)
             return False
     
-    def _scheduler_loop(self):
-        """Loop principal do agendador."""
-        logger.info("Loop do agendador iniciado.")
+    def _reschedule(self):
+        """Agenda o próximo envio conforme o status e o intervalo atuais."""
+        if not self.running:
+            return
         
-        while self.running:
-            try:
-                # Verificar se o bot está ativo
-                if not self.data_manager.get_bot_status():
-                    time.sleep(10)  # Esperar 10 segundos antes de verificar novamente
-                    continue
-                
-                # Obter intervalo atual (em minutos)
-                interval = self.data_manager.get_interval()
-                if interval < 1:
-                    interval = 1  # Mínimo de 1 minuto
-                
-                # Converter para segundos
-                interval_seconds = interval * 60
-                
-                # Verificar se é hora de enviar uma nova mensagem
-                current_time = time.time()
-                if current_time - self.last_sent >= interval_seconds:
-                    # Enviar mensagem
-                    if self.send_scheduled_post():
-                        self.last_sent = current_time
-                    
-                # Dormir por um curto período para não sobrecarregar a CPU
-                time.sleep(5)
-            except Exception as e:
-                logger.error(f"Erro no loop do agendador: {str(e)}")
-                time.sleep(10)  # Esperar um pouco antes de tentar novamente
+        # Bot inativo: nenhum job até o status mudar (e os horários recomeçam na reativação)
+        if not self.data_manager.get_bot_status():
+            self.engine.cancel(self._job_key)
+            self.schedule = None
+            return
+        
+        # Obter intervalo atual (em minutos)
+        interval = self.data_manager.get_interval()
+        if interval < 1:
+            interval = 1  # Mínimo de 1 minuto
+        
+        now = self.engine.clock()
+        # Sem calendário: primeiro post logo ao iniciar; após uma reativação, um intervalo
+        # depois do último envio. Com calendário, no próximo horário dele
+        first_due = now if self.last_sent is None else max(now, self.last_sent + interval * 60)
+        self.schedule = ticks_for(self.schedule, self.data_manager.get_schedule(), interval * 60,
+                                  first_due, "MessageScheduler")
+        self.engine.schedule_at(self._job_key, self.schedule.due(now), self._on_due)
+    
+    def drift_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Atraso dos posts em relação aos horários previstos.
+        
+        Returns:
+            Optional[Dict[str, Any]]: Resumo de TickSchedule.stats(), ou None se não há horários agendados.
+        """
+        schedule = self.schedule
+        return schedule.stats(self.engine.clock()) if schedule is not None else None
+    
+    def _on_due(self, retry: bool = False):
+        """Executado pelo motor quando é hora de enviar uma nova mensagem."""
+        schedule = self.schedule
+        # Uma nova tentativa não consome outro horário previsto
+        if schedule is not None and not retry:
+            schedule.fired(self.engine.clock())
+        try:
+            if self.send_scheduled_post():
+                self.last_sent = self.engine.clock()
+                if schedule is not None:
+                    schedule.completed(self.last_sent)
+            elif self.running and self.data_manager.get_bot_status():
+                # Falha no envio: tenta novamente em breve
+                self.engine.schedule(self._job_key, RETRY_DELAY, lambda: self._on_due(retry=True))
+                return
+        except Exception as e:
+            logger.error("Erro no agendador: %s", e)
+            self.engine.schedule(self._job_key, RETRY_DELAY, lambda: self._on_due(retry=True))
+            return
+        
+        self._reschedule()
     
     def send_scheduled_post(self) -> bool:
         """
@@ -143,48 +196,140 @@ class MessageScheduler:
                 return False
 
             # Obter o próximo post
-            next_post = self.data_manager.get_next_post()
+            next_post = self.data_manager.peek_next_sequential_post()
             if not next_post:
                 logger.warning("Não há posts para enviar.")
                 return False
             
-            # Tentar enviar a mensagem com tratamento de erro robusto
+            # Fila de saída: o post só é confirmado quando o envio for concluído, e a
+            # rotação só avança depois que ele está gravado na fila
+            if self.outbox is not None:
+                group_id = self.data_manager.get_group_id()
+                return self.outbox.send_post(
+                    group_id,
+                    next_post,
+                    key=post_key(group_id, next_post),
+                    on_sent=self.data_manager.increment_promo_messages_stat,
+                    on_queued=lambda: self.data_manager.advance_rotation(next_post),
+                    stat='promo'
+                )
+            
+            self.data_manager.advance_rotation(next_post)
+            
+            # Envio assíncrono: o resultado é tratado quando a requisição terminar
+            if self.pipeline is not None and self.pipeline.is_running():
+                self.pipeline.submit_post(
+                    self.data_manager.get_group_id(),
+                    next_post,
+                    on_sent=lambda _: self.data_manager.increment_promo_messages_stat()
+                )
+                return True
+            
+            # Envio síncrono com a mensagem já compilada do post (payload)
             try:
-                # Extrair texto e imagem do post
-                text = next_post.get('text', '')
-                image_url = next_post.get('image_url', '')
-                external_link = next_post.get('external_link', '')
-                
-                # Construir o texto da mensagem
-                message_text = text
-                if external_link:
-                    message_text += f"\n\n{external_link}"
-                
-                # Enviar mensagem
-                result = False
-                if image_url:
-                    # Mensagem com imagem
-                    try:
-                        result = self.bot_handler.send_photo(image_url, message_text)
-                    except Exception as e:
-                        logger.error(f"Erro ao enviar mensagem com imagem: {str(e)}")
-                        # Tentar enviar apenas o texto como fallback
-                        result = self.bot_handler.send_message(message_text)
-                else:
-                    # Mensagem de texto simples
-                    result = self.bot_handler.send_message(message_text)
+                text = next_post.get('text') or next_post.get('content', '')
+                result = self.bot_handler.send_promotional_post(next_post)
                 
                 if result:
                     # Incrementar estatística
                     self.data_manager.increment_promo_messages_stat()
-                    logger.info(f"Post promocional enviado com sucesso: {text[:30]}...")
+                    logger.info("Post promocional enviado com sucesso: %s...", text[:30])
                     return True
                 else:
                     logger.error("Falha ao enviar post promocional.")
                     return False
             except Exception as e:
-                logger.error(f"Erro ao processar e enviar post: {str(e)}")
+                logger.error("Erro ao processar e enviar post: %s", e)
                 return False
         except Exception as e:
-            logger.error(f"Erro inesperado ao enviar post programado: {str(e)}")
+            logger.error("Erro inesperado ao enviar post programado: %s", e)
+            return False
+
+
+class TelegramBotHandler:
+    def __init__(self, token: str, group_id, data_manager, pipeline: Optional[SendPipeline] = None):
+        """
+        Inicializa o manipulador do bot.
+        
+        Os envios passam pelo SendPipeline (sessão HTTP compartilhada, limites de envio
+        e cache de imagens); o manipulador apenas aguarda o resultado, para quem precisa
+        da resposta na hora (mensagem de teste, fila de saída sem pipeline em execução).
+        
+        Args:
+            token: Token do bot
+            group_id: ID do grupo padrão dos envios
+            data_manager: Instância do gerenciador de dados
+            pipeline: SendPipeline usado nos envios
+        """
+        self.token = token
+        self.group_id = group_id
+        self.data_manager = data_manager
+        self.pipeline = pipeline
+        self.bot_info: Optional[Dict[str, Any]] = None
+    
+    def setup(self) -> bool:
+        """
+        Confere o token do bot (getMe).
+        
+        Returns:
+            bool: True se o token foi aceito pelo Telegram, False caso contrário.
+        """
+        if not self._pipeline_ready():
+            return False
+        try:
+            self.bot_info = self.pipeline.call('getMe', {})
+            logger.info("Bot conectado: @%s", (self.bot_info or {}).get('username'))
+            return True
+        except Exception as e:
+            logger.error("Erro ao conectar o bot: %s", e)
+            return False
+    
+    def stop(self) -> bool:
+        """O pipeline pertence à aplicação e é parado por ela; nada a liberar aqui"""
+        return True
+    
+    def send_message(self, text: str, chat_id=None) -> bool:
+        """
+        Envia uma mensagem de texto e aguarda a confirmação.
+        
+        Args:
+            text: Texto da mensagem
+            chat_id: Chat de destino (padrão: grupo configurado)
+            
+        Returns:
+            bool: True se a mensagem foi enviada com sucesso, False caso contrário.
+        """
+        if not self._pipeline_ready():
+            return False
+        try:
+            self.pipeline.send_message(chat_id or self.group_id, text).result(timeout=self.pipeline.timeout)
+            return True
+        except Exception as e:
+            logger.error("Erro ao enviar mensagem: %s", e)
+            return False
+    
+    def send_promotional_post(self, post: Dict[str, Any], chat_id=None) -> bool:
+        """
+        Envia um post promocional e aguarda a confirmação.
+        
+        Args:
+            post: Post promocional
+            chat_id: Chat de destino (padrão: grupo configurado)
+            
+        Returns:
+            bool: True se o post foi enviado com sucesso, False caso contrário.
+        """
+        if not self._pipeline_ready():
+            return False
+        try:
+            self.pipeline.submit_post(chat_id or self.group_id, post).result(timeout=self.pipeline.timeout)
+            return True
+        except Exception as e:
+            logger.error("Erro ao enviar post promocional: %s", e)
+            return False
+    
+    def _pipeline_ready(self) -> bool:
+        if self.pipeline is None or not self.pipeline.is_running():
+            logger.error("Pipeline de envio não está em execução. Nenhuma mensagem será enviada.")
             return False
+        return True
@@ -0,0 +1,272 @@
+"""
+Importação e exportação em massa de posts promocionais (NDJSON ou CSV).
+
+Uso:
+    python bulk_io.py export --format ndjson > posts.ndjson
+    python bulk_io.py import posts.csv --format csv
+"""
+import argparse
+import codecs
+import csv
+import io
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple, IO
+
+from config import BULK_IMPORT_BATCH_SIZE, BULK_IMPORT_MAX_ERRORS
+from media_store import media_name
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+FORMATS = ('ndjson', 'csv')
+
+# Colunas exportadas (e aceitas na importação)
+POST_FIELDS = ('id', 'title', 'content', 'image_url', 'external_link', 'created_at')
+
+_MAX_FIELD_LENGTH = 10000
+
+
+class BulkImportError(ValueError):
+    """Linha inválida em um arquivo de importação"""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"Linha {line}: {message}")
+        self.line = line
+        self.message = message
+
+
+def _text_lines(stream: IO) -> Iterator[str]:
+    """Lê um arquivo (texto ou binário, UTF-8) linha a linha, sem carregá-lo inteiro"""
+    if isinstance(stream, io.TextIOBase):
+        yield from stream
+        return
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    while True:
+        chunk = stream.read(64 * 1024)
+        if not chunk:
+            break
+        pending += decoder.decode(chunk)
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending
+
+
+def iter_ndjson(stream: IO) -> Iterator[Tuple[int, Any]]:
+    """
+    Lê um arquivo NDJSON (um objeto JSON por linha) de forma incremental.
+
+    Yields:
+        Tuple[int, Any]: Número da linha e o objeto, ou a BulkImportError da linha.
+    """
+    for number, line in enumerate(_text_lines(stream), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, BulkImportError(number, f"JSON inválido ({e.msg})")
+
+
+def iter_csv(stream: IO) -> Iterator[Tuple[int, Any]]:
+    """
+    Lê um arquivo CSV com cabeçalho de forma incremental.
+
+    Yields:
+        Tuple[int, Any]: Número da linha e a linha como dicionário.
+    """
+    reader = csv.DictReader(_text_lines(stream))
+    for row in reader:
+        yield reader.line_num, row
+
+
+def validate_post(row: Any, line: int) -> Dict[str, Any]:
+    """
+    Valida e normaliza uma linha importada.
+
+    Aceita 'text' como sinônimo de 'content'. Sem id, o post recebe um id novo ao
+    ser gravado; sem created_at, recebe a data da importação.
+
+    Raises:
+        BulkImportError: Se a linha for inválida.
+    """
+    if isinstance(row, BulkImportError):
+        raise row
+    if not isinstance(row, dict):
+        raise BulkImportError(line, "esperado um objeto com os campos do post")
+
+    post = {}
+    for field in POST_FIELDS:
+        value = row.get(field)
+        if field == 'content' and not value:
+            value = row.get('text')
+        if value is None:
+            value = ''
+        if not isinstance(value, str):
+            raise BulkImportError(line, f"campo '{field}' deve ser texto")
+        value = value.strip()
+        if len(value) > _MAX_FIELD_LENGTH:
+            raise BulkImportError(line, f"campo '{field}' excede {_MAX_FIELD_LENGTH} caracteres")
+        post[field] = value
+
+    if not post['title'] and not post['content']:
+        raise BulkImportError(line, "título e conteúdo vazios")
+    if post['image_url'] and not post['image_url'].startswith(('http://', 'https://')) \
+            and not media_name(post['image_url']):
+        raise BulkImportError(line, "campo 'image_url' deve ser uma URL http(s) ou uma imagem do repositório (/media/...)")
+    if post['external_link'] and not post['external_link'].startswith(('http://', 'https://')):
+        raise BulkImportError(line, "campo 'external_link' deve ser uma URL http(s)")
+    if post['created_at']:
+        try:
+            datetime.fromisoformat(post['created_at'])
+        except ValueError:
+            raise BulkImportError(line, "created_at deve estar no formato ISO 8601")
+    if not post['id']:
+        del post['id']
+    if not post['created_at']:
+        del post['created_at']
+    return post
+
+
+def import_posts(data_manager, rows: Iterable[Tuple[int, Any]], batch_size: int = BULK_IMPORT_BATCH_SIZE,
+                 max_errors: int = BULK_IMPORT_MAX_ERRORS) -> Dict[str, Any]:
+    """
+    Importa posts em lotes: cada lote válido é gravado com uma única escrita.
+
+    Linhas inválidas são ignoradas e relatadas; a importação é interrompida depois
+    de max_errors erros.
+
+    Args:
+        data_manager: Instância do gerenciador de dados
+        rows: Linhas numeradas, de iter_ndjson ou iter_csv
+        batch_size: Número de posts por gravação
+        max_errors: Número de erros a partir do qual a importação é interrompida
+
+    Returns:
+        Dict[str, Any]: {"imported": n, "updated": n, "errors": [{"line", "error"}], "aborted": bool}
+    """
+    result = {"imported": 0, "updated": 0, "errors": [], "aborted": False}
+    batch: List[Dict[str, Any]] = []
+
+    def commit():
+        outcome = data_manager.import_promotional_posts(batch)
+        if outcome is False:
+            raise IOError("Erro ao gravar lote de posts importados. Verifique os logs.")
+        result["imported"] += outcome["added"]
+        result["updated"] += outcome["updated"]
+        batch.clear()
+
+    for line, row in rows:
+        try:
+            batch.append(validate_post(row, line))
+        except BulkImportError as e:
+            result["errors"].append({"line": e.line, "error": e.message})
+            if len(result["errors"]) >= max_errors:
+                result["aborted"] = True
+                break
+            continue
+        if len(batch) >= batch_size:
+            commit()
+
+    if batch:
+        commit()
+    logger.info("Importação de posts: %s novos, %s atualizados, %s erro(s)",
+                result['imported'], result['updated'], len(result['errors']))
+    return result
+
+
+def export_ndjson(posts: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Gera os posts em NDJSON, uma linha por vez"""
+    for post in posts:
+        yield json.dumps({field: post.get(field, '') for field in POST_FIELDS},
+                         ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def export_csv(posts: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """Gera os posts em CSV (com cabeçalho), uma linha por vez"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(POST_FIELDS)
+    for post in posts:
+        writer.writerow([post.get(field, '') for field in POST_FIELDS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def reader_for(file_format: str):
+    """Leitor incremental de um formato de importação"""
+    if file_format not in FORMATS:
+        raise ValueError(f"Formato desconhecido: {file_format} (use {' ou '.join(FORMATS)})")
+    return iter_ndjson if file_format == 'ndjson' else iter_csv
+
+
+def writer_for(file_format: str):
+    """Gerador de exportação de um formato"""
+    if file_format not in FORMATS:
+        raise ValueError(f"Formato desconhecido: {file_format} (use {' ou '.join(FORMATS)})")
+    return export_ndjson if file_format == 'ndjson' else export_csv
+
+
+def guess_format(filename: Optional[str], default: str = 'ndjson') -> str:
+    """Deduz o formato pela extensão do arquivo"""
+    if filename and filename.lower().endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importação e exportação de posts promocionais")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="Exporta todos os posts")
+    export_parser.add_argument('output', nargs='?', help="Arquivo de saída (padrão: saída padrão)")
+    export_parser.add_argument('--format', choices=FORMATS, help="Formato (padrão: pela extensão, ou ndjson)")
+
+    import_parser = subparsers.add_parser('import', help="Importa posts de um arquivo")
+    import_parser.add_argument('input', help="Arquivo de entrada ('-' para a entrada padrão)")
+    import_parser.add_argument('--format', choices=FORMATS, help="Formato (padrão: pela extensão, ou ndjson)")
+    import_parser.add_argument('--batch-size', type=int, default=BULK_IMPORT_BATCH_SIZE,
+                               help=f"Posts por gravação (padrão: {BULK_IMPORT_BATCH_SIZE})")
+
+    args = parser.parse_args(argv)
+    from data_manager import DataManager
+    data_manager = DataManager()
+
+    if args.command == 'export':
+        file_format = args.format or guess_format(args.output)
+        chunks = writer_for(file_format)(data_manager.iter_promotional_posts())
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8', newline='') as f:
+                f.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
+        return 0
+
+    file_format = args.format or guess_format(args.input)
+    if args.input == '-':
+        result = import_posts(data_manager, reader_for(file_format)(sys.stdin.buffer), args.batch_size)
+    else:
+        with open(args.input, 'rb') as f:
+            result = import_posts(data_manager, reader_for(file_format)(f), args.batch_size)
+
+    for error in result['errors']:
+        print(f"Linha {error['line']}: {error['error']}", file=sys.stderr)
+    print(f"{result['imported']} post(s) importado(s), {result['updated']} atualizado(s), "
+          f"{len(result['errors'])} erro(s){' (importação interrompida)' if result['aborted'] else ''}")
+    return 1 if result['aborted'] else 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import mmap
+import os
+import struct
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, Tuple, Iterable
+
+from config import CACHE_GENERATIONS_FILE, CACHE_STAT_INTERVAL
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Documentos com contador de geração próprio
+DOCUMENTS = ('bot_config', 'posts', 'welcome_config', 'stats', 'rotation')
+
+_SLOT = struct.Struct('<Q')
+_FILE_SIZE = 4096
+
+
+class CacheCoherence:
+    """
+    Coerência dos caches do DataManager entre processos (ex.: vários workers WSGI).
+
+    Cada documento tem um contador de geração em um arquivo mapeado em memória e
+    compartilhado por todos os processos. Quem grava um documento incrementa o
+    contador; quem lê compara o contador com o da sua cópia em cache, o que é só
+    uma leitura de memória, sem chamada ao sistema. Para detectar também edições
+    feitas fora do bot, o mtime/inode/tamanho do arquivo é conferido no máximo uma
+    vez a cada stat_interval segundos.
+
+    Um token identifica a versão de um documento em cache: (geração, carimbo do arquivo).
+    """
+
+    def __init__(self, path: str = CACHE_GENERATIONS_FILE, documents: Iterable[str] = DOCUMENTS,
+                 files: Optional[Dict[str, str]] = None, stat_interval: float = CACHE_STAT_INTERVAL):
+        """
+        Inicializa os contadores compartilhados.
+
+        Args:
+            path: Arquivo dos contadores de geração
+            documents: Nomes dos documentos (a ordem define o slot de cada um)
+            files: Arquivo de cada documento, para a verificação de mtime/inode (opcional)
+            stat_interval: Intervalo mínimo entre verificações de arquivo; negativo desativa
+        """
+        self.path = path
+        self.files = files or {}
+        self.stat_interval = stat_interval
+
+        self._slots = {name: index * _SLOT.size for index, name in enumerate(documents)}
+        self._checked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < _FILE_SIZE:
+                os.ftruncate(fd, _FILE_SIZE)
+            self._map = mmap.mmap(fd, _FILE_SIZE)
+        finally:
+            os.close(fd)
+
+    def generation(self, name: str) -> int:
+        """Lê o contador de geração de um documento"""
+        return _SLOT.unpack_from(self._map, self._slots[name])[0]
+
+    def token(self, name: str) -> Tuple[int, Optional[tuple]]:
+        """
+        Retorna o token da versão atual de um documento.
+
+        Deve ser obtido antes de ler o documento: uma gravação concorrente muda a
+        geração e o cache é recarregado na próxima consulta.
+        """
+        return self.generation(name), self._file_stamp(name)
+
+    def is_current(self, name: str, token: Optional[Tuple[int, Optional[tuple]]]) -> bool:
+        """
+        Verifica se a cópia em cache de um documento ainda é a versão atual.
+
+        Args:
+            name: Nome do documento
+            token: Token obtido quando o documento foi carregado (None = nunca carregado)
+
+        Returns:
+            bool: True se nenhum processo alterou o documento desde o token.
+        """
+        if token is None or self.generation(name) != token[0]:
+            return False
+
+        if name in self.files and self.stat_interval >= 0:
+            now = time.monotonic()
+            if now - self._checked.get(name, 0.0) >= self.stat_interval:
+                self._checked[name] = now
+                return self._file_stamp(name) == token[1]
+        return True
+
+    def commit(self, name: str, token: Optional[Tuple[int, Optional[tuple]]]) -> Optional[Tuple[int, Optional[tuple]]]:
+        """
+        Registra que este processo gravou um documento e avisa os demais.
+
+        Args:
+            name: Nome do documento
+            token: Token da versão que este processo tinha antes de gravar
+
+        Returns:
+            Optional[Tuple]: Novo token do cache, ou None se outro processo gravou o
+            documento no meio tempo (o cache será recarregado na próxima leitura).
+        """
+        offset = self._slots[name]
+        with self._lock, self._file_lock():
+            previous = _SLOT.unpack_from(self._map, offset)[0]
+            _SLOT.pack_into(self._map, offset, previous + 1)
+
+        if token is None or token[0] != previous:
+            return None
+        return previous + 1, self._file_stamp(name)
+
+    def _file_stamp(self, name: str) -> Optional[tuple]:
+        path = self.files.get(name)
+        if not path:
+            return None
+        try:
+            st = os.stat(path)
+            return st.st_ino, st.st_size, st.st_mtime_ns
+        except OSError:
+            return None
+
+    @contextmanager
+    def _file_lock(self):
+        """Lock exclusivo entre processos durante um incremento"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.path, 'rb') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -1,2 +1,127 @@
+import os
+
 # Configurações do aplicativo
 DEFAULT_POST_INTERVAL = 3  # Intervalo padrão em minutos para posts promocionais
+POSTS_PAGE_SIZE = 20  # Posts por página nas listagens do painel e da API
+POSTS_MAX_PAGE_SIZE = 100
+BULK_IMPORT_BATCH_SIZE = 500  # Posts gravados por escrita na importação em massa
+BULK_IMPORT_MAX_ERRORS = 100  # Linhas inválidas toleradas antes de interromper uma importação
+
+# Arquivos de dados
+DATA_DIR = 'data'
+BOT_CONFIG_FILE = os.path.join(DATA_DIR, 'bot_config.json')
+PROMOTIONAL_POSTS_FILE = os.path.join(DATA_DIR, 'promotional_posts.json')
+WELCOME_CONFIG_FILE = os.path.join(DATA_DIR, 'welcome_config.json')
+STATS_FILE = os.path.join(DATA_DIR, 'stats.json')
+LAST_SENT_POST_FILE = os.path.join(DATA_DIR, 'last_sent_post.json')
+STATS_LOG_FILE = os.path.join(DATA_DIR, 'stats.log')
+SEARCH_INDEX_FILE = os.path.join(DATA_DIR, 'promotional_posts.search.json')
+SEARCH_INDEX_SAVE_DELAY = 5  # Segundos após uma alteração até gravar o índice de busca
+MEDIA_CACHE_FILE = os.path.join(DATA_DIR, 'media_cache.json')
+
+# Imagens dos posts: o bot baixa a imagem uma vez (até MEDIA_MAX_BYTES, o limite de fotos
+# do Telegram), envia o arquivo e reutiliza o file_id devolvido nos envios seguintes
+MEDIA_MAX_BYTES = 10 * 1024 * 1024
+MEDIA_DOWNLOAD_TIMEOUT = 15
+
+# Imagens enviadas pelo painel: repositório endereçado pelo SHA-256 do conteúdo, tamanho
+# máximo (largura, altura) das prévias e validade (segundos) do cache HTTP dos arquivos
+MEDIA_STORE_DIR = os.path.join(DATA_DIR, 'media')
+MEDIA_PREVIEW_SIZE = (480, 480)
+MEDIA_HTTP_MAX_AGE = 365 * 24 * 3600
+
+# Mensagens dos posts: cada post é compilado na criação/edição no parse_mode abaixo
+# ('' = texto puro, 'HTML' ou 'MarkdownV2'; o texto é sempre escapado) e com ou sem
+# prévia do link externo
+POST_PARSE_MODE = os.environ.get('POST_PARSE_MODE', 'HTML')
+POST_LINK_PREVIEW = True
+
+# Log da aplicação: rotacionado ao atingir LOG_MAX_BYTES (os LOG_BACKUP_COUNT arquivos
+# anteriores ficam comprimidos em .gz); o índice de deslocamentos guarda a posição de
+# cada LOG_INDEX_STRIDE-ésima linha
+LOG_FILE = os.environ.get('LOG_FILE', 'app.log')
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_INDEX_STRIDE = 1000
+
+# Gravação do log: assíncrona, por uma fila de até LOG_QUEUE_SIZE registros (com a fila
+# cheia, os novos registros são descartados). LOG_FORMAT é o formato do arquivo de log:
+# 'json' (um objeto por linha, com campos como post_id, chat_id e latency_ms) ou 'text'
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+LOG_QUEUE_SIZE = 10000
+
+# Gravação atômica dos arquivos JSON: gravações dentro desta janela (segundos)
+# compartilham um único fsync
+JSON_WRITE_WINDOW = 0.005
+
+# Log de estatísticas: eventos pendentes/segundos até gravar e linhas até compactar
+STATS_FLUSH_SIZE = 50
+STATS_FLUSH_INTERVAL = 5
+STATS_COMPACT_LINES = 1000
+
+# Backend de armazenamento: 'json' (arquivos acima) ou 'sqlite'
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json')
+SQLITE_DB_FILE = os.environ.get('SQLITE_DB_FILE', os.path.join(DATA_DIR, 'bot.db'))
+
+# Agendador multi-grupo: threads de envio (número fixo, independente do número de grupos)
+GROUP_SEND_WORKERS = 4
+
+# Horários dos posts: 'anchored' (cada horário é o anterior previsto + intervalo, no relógio
+# monotônico, sem acumular a duração dos envios) ou 'completion' (intervalo contado a partir
+# do fim do envio anterior). Horários perdidos seguem SCHEDULE_CATCH_UP: 'skip' (descarta e
+# segue no próximo horário), 'burst' (envia os atrasados em seguida) ou 'spread' (distribui
+# os atrasados até o próximo horário); no máximo SCHEDULE_MAX_CATCH_UP são recuperados. O
+# atraso de cada disparo é guardado para os últimos SCHEDULE_DRIFT_HISTORY horários
+SCHEDULE_MODE = os.environ.get('SCHEDULE_MODE', 'anchored')
+SCHEDULE_CATCH_UP = os.environ.get('SCHEDULE_CATCH_UP', 'skip')
+SCHEDULE_MAX_CATCH_UP = 3
+SCHEDULE_DRIFT_HISTORY = 100
+
+# Calendário dos posts (bot_config['schedule']: horário ativo, dias da semana, expressões
+# cron e pesos por post). Horários sem fuso explícito usam SCHEDULE_TIMEZONE; os próximos
+# disparos são pré-calculados para SCHEDULE_HORIZON_DAYS dias e estendidos sob demanda
+SCHEDULE_TIMEZONE = os.environ.get('SCHEDULE_TIMEZONE', 'America/Sao_Paulo')
+SCHEDULE_HORIZON_DAYS = 7
+
+# Pipeline de envio (Bot API do Telegram); TELEGRAM_API_URL permite apontar para um servidor falso local
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+SEND_MAX_CONNECTIONS = 20
+SEND_TIMEOUT = 30
+
+# Limites de envio do Telegram: global (mensagens/segundo) e por chat (mensagens/minuto)
+RATE_LIMIT_GLOBAL_PER_SECOND = 30
+RATE_LIMIT_CHAT_PER_MINUTE = 20
+SEND_MAX_RETRIES = 5  # Tentativas após respostas 429 antes de desistir de uma mensagem
+
+# Fila de saída persistente: diretório dos segmentos, tamanho máximo de cada segmento
+# (bytes) e quantas chaves de mensagens já entregues são lembradas para deduplicação
+OUTBOX_DIR = os.path.join(DATA_DIR, 'outbox')
+OUTBOX_SEGMENT_SIZE = 1024 * 1024
+OUTBOX_DEDUP_KEYS = 10000
+OUTBOX_MAX_ATTEMPTS = 5  # Tentativas de envio por mensagem antes de descartá-la
+
+# Boas-vindas: entradas são agrupadas por até WELCOME_BATCH_WINDOW segundos (ou até
+# WELCOME_MAX_BATCH_SIZE membros) e saudadas em uma única mensagem
+WELCOME_BATCH_WINDOW = 5
+WELCOME_MAX_BATCH_SIZE = 50
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+# Recebimento de updates do Telegram: 'polling' (thread do bot, padrão) ou 'webhook' (o
+# Telegram envia os updates por POST para WEBHOOK_URL, que deve apontar para a rota
+# WEBHOOK_PATH do painel). WEBHOOK_SECRET é conferido no cabeçalho de cada POST; se vazio,
+# é derivado do token. Os updates são processados por UPDATE_WORKERS threads (em ordem
+# dentro de cada chat), com no máximo UPDATE_QUEUE_SIZE pendentes no total e
+# UPDATE_CHAT_QUEUE_DEPTH por chat; POLLING_TIMEOUT é a duração do long polling
+UPDATE_MODE = os.environ.get('UPDATE_MODE', 'polling')
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL', '')
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET', '')
+WEBHOOK_PATH = '/telegram/webhook'
+UPDATE_WORKERS = 4
+UPDATE_QUEUE_SIZE = 1000
+UPDATE_CHAT_QUEUE_DEPTH = 100
+POLLING_TIMEOUT = 25
+
+# Coerência de cache entre processos: contadores de geração compartilhados (mmap) e
+# intervalo mínimo (segundos) entre verificações de mtime/inode dos arquivos
+CACHE_GENERATIONS_FILE = os.path.join(DATA_DIR, '.cache_generations')
+CACHE_STAT_INTERVAL = 1.0
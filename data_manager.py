@@ -1,30 +1,122 @@
 import json
 import os
+import atexit
 import uuid
 import logging
+import threading
+import time
 from datetime import datetime
+from stats_log import StatsLog
+from rotation import RotationIndex, DEFAULT_SCOPE
+from post_index import PostIndex
+from search_index import SearchIndex
+from media_cache import MediaCache
+from media_store import MediaStore, media_name
+from payloads import attach_payload
+from welcome_template import compile_template, TemplateError
+from posting_schedule import compile_schedule, parse_weights, ScheduleError
+from cache_coherence import CacheCoherence
+from atomic_json import write_json
+from metrics import histogram, timed
 from config import (
     BOT_CONFIG_FILE,
     PROMOTIONAL_POSTS_FILE,
+    SEARCH_INDEX_FILE,
+    SEARCH_INDEX_SAVE_DELAY,
     WELCOME_CONFIG_FILE,
     STATS_FILE,
-    DEFAULT_POST_INTERVAL
+    STATS_LOG_FILE,
+    LAST_SENT_POST_FILE,
+    DEFAULT_POST_INTERVAL,
+    POSTS_PAGE_SIZE,
+    POSTS_MAX_PAGE_SIZE,
+    STORAGE_BACKEND,
+    WELCOME_BATCH_WINDOW,
+    WELCOME_MAX_BATCH_SIZE
 )
 
 # Diretório de dados
 DATA_DIR = 'data'
 
+# Duração das leituras e escritas (exposta em /metrics)
+OPERATION_LATENCY = histogram('data_manager_operation_seconds',
+                              'Duração das operações de leitura e escrita do DataManager', ('operation', 'kind'))
+
+
+def _timed(kind):
+    """Registra a duração de cada chamada do método em OPERATION_LATENCY ('read' ou 'write')"""
+    def decorator(func):
+        return timed(OPERATION_LATENCY.labels(operation=func.__name__, kind=kind))(func)
+    return decorator
+
+
 class DataManager:
-    def __init__(self):
-        """Inicializa o gerenciador de dados"""
+    def __init__(self, storage=None):
+        """
+        Inicializa o gerenciador de dados
+
+        Args:
+            storage: Backend de armazenamento opcional (ex.: SQLiteStorage). Se None,
+                usa o backend definido em STORAGE_BACKEND ('json' usa os arquivos JSON).
+        """
         # Inicializa cache para dados frequentemente acessados
         self._bot_config_cache = None
         self._posts_cache = None
         self._welcome_config_cache = None
+        self._welcome_template = None  # Mensagem de boas-vindas compilada
         self._stats_cache = None
+        self._schedule = None  # (calendário, intervalo, calendário compilado)
+        self._post_weights = None  # (calendário, pesos validados)
+        
+        # Índice de rotação sequencial (construído sob demanda)
+        self._rotation = None
+        self._rotation_state_doc = None
+        self._rotation_lock = threading.RLock()
+        
+        # Índice de listagem dos posts (ordenado por created_at, construído sob demanda)
+        self._post_index = None
+        self._post_index_lock = threading.Lock()
+        
+        # Índice de busca por texto (carregado do disco ou construído sob demanda)
+        self._search_index = None
+        self._search_lock = threading.Lock()
+        self._search_save_timer = None
+        self._search_save_registered = False
+        
+        # Callbacks notificados quando a configuração do bot muda
+        self._config_listeners = []
+        
+        # Seleciona o backend de armazenamento
+        if storage is None and STORAGE_BACKEND == 'sqlite':
+            from sqlite_storage import SQLiteStorage
+            storage = SQLiteStorage()
+            storage.migrate_from_json()
+        self._storage = storage
         
         # Garante que os arquivos necessários existam
-        self._ensure_data_files_exist()
+        if self._storage is None:
+            self._ensure_data_files_exist()
+        
+        # Coerência dos caches entre processos: cada gravação avisa os demais workers
+        files = {}
+        if self._storage is None:
+            files = {
+                'bot_config': BOT_CONFIG_FILE,
+                'posts': PROMOTIONAL_POSTS_FILE,
+                'welcome_config': WELCOME_CONFIG_FILE,
+                'stats': STATS_LOG_FILE,
+                'rotation': LAST_SENT_POST_FILE
+            }
+        self._coherence = CacheCoherence(files=files)
+        self._cache_tokens = {}
+        
+        # file_id do Telegram das imagens dos posts (compartilhado com o pipeline de envio)
+        self.media_cache = MediaCache()
+        # Imagens enviadas pelo painel (repositório local endereçado pelo conteúdo)
+        self.media_store = MediaStore()
+        
+        # No backend JSON, contadores são gravados em um log append-only
+        self._stats_log = StatsLog(on_flush=lambda: self._cache_written('stats')) if self._storage is None else None
     
     def _ensure_data_files_exist(self):
         """Garante que os arquivos de dados existam"""
@@ -32,9 +124,9 @@ class DataManager:
         try:
             if not os.path.exists(DATA_DIR):
                 os.makedirs(DATA_DIR, exist_ok=True)
-                logging.info(f"Diretório de dados criado: {DATA_DIR}")
+                logging.info("Diretório de dados criado: %s", DATA_DIR)
         except Exception as e:
-            logging.error(f"Erro ao criar diretório de dados: {str(e)}")
+            logging.error("Erro ao criar diretório de dados: %s", e)
             
         # Configuração do bot
         try:
@@ -44,23 +136,22 @@ class DataManager:
                     "token": "",
                     "group_id": "",
                     "active": False,
-                    "interval": DEFAULT_POST_INTERVAL
+                    "interval": DEFAULT_POST_INTERVAL,
+                    "groups": []
                 }
-                with open(BOT_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(default_config, f, indent=4, ensure_ascii=False)
-                logging.info(f"Arquivo de configuração do bot criado: {BOT_CONFIG_FILE}")
+                write_json(BOT_CONFIG_FILE, default_config)
+                logging.info("Arquivo de configuração do bot criado: %s", BOT_CONFIG_FILE)
         except Exception as e:
-            logging.error(f"Erro ao criar arquivo de configuração do bot: {str(e)}")
+            logging.error("Erro ao criar arquivo de configuração do bot: %s", e)
         
         # Posts promocionais
         try:
             if not os.path.exists(PROMOTIONAL_POSTS_FILE):
                 os.makedirs(os.path.dirname(PROMOTIONAL_POSTS_FILE), exist_ok=True)
-                with open(PROMOTIONAL_POSTS_FILE, 'w', encoding='utf-8') as f:
-                    json.dump([], f, indent=4, ensure_ascii=False)
-                logging.info(f"Arquivo de posts promocionais criado: {PROMOTIONAL_POSTS_FILE}")
+                write_json(PROMOTIONAL_POSTS_FILE, [])
+                logging.info("Arquivo de posts promocionais criado: %s", PROMOTIONAL_POSTS_FILE)
         except Exception as e:
-            logging.error(f"Erro ao criar arquivo de posts promocionais: {str(e)}")
+            logging.error("Erro ao criar arquivo de posts promocionais: %s", e)
         
         # Configuração de boas-vindas
         try:
@@ -68,13 +159,14 @@ class DataManager:
                 os.makedirs(os.path.dirname(WELCOME_CONFIG_FILE), exist_ok=True)
                 default_welcome = {
                     "message": "Olá {first_name}! Bem-vindo(a) ao grupo!",
-                    "enabled": True
+                    "enabled": True,
+                    "batch_window": WELCOME_BATCH_WINDOW,
+                    "max_batch_size": WELCOME_MAX_BATCH_SIZE
                 }
-                with open(WELCOME_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(default_welcome, f, indent=4, ensure_ascii=False)
-                logging.info(f"Arquivo de configuração de boas-vindas criado: {WELCOME_CONFIG_FILE}")
+                write_json(WELCOME_CONFIG_FILE, default_welcome)
+                logging.info("Arquivo de configuração de boas-vindas criado: %s", WELCOME_CONFIG_FILE)
         except Exception as e:
-            logging.error(f"Erro ao criar arquivo de configuração de boas-vindas: {str(e)}")
+            logging.error("Erro ao criar arquivo de configuração de boas-vindas: %s", e)
         
         # Estatísticas
         try:
@@ -85,20 +177,52 @@ class DataManager:
                     "promo_messages_sent": 0,
                     "last_restarted": datetime.now().isoformat()
                 }
-                with open(STATS_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(default_stats, f, indent=4, ensure_ascii=False)
-                logging.info(f"Arquivo de estatísticas criado: {STATS_FILE}")
+                write_json(STATS_FILE, default_stats)
+                logging.info("Arquivo de estatísticas criado: %s", STATS_FILE)
         except Exception as e:
-            logging.error(f"Erro ao criar arquivo de estatísticas: {str(e)}")
+            logging.error("Erro ao criar arquivo de estatísticas: %s", e)
+    
+    def _preserve_corrupted(self, path):
+        """Guarda uma cópia de um arquivo corrompido antes de recriá-lo"""
+        backup = f"{path}.corrupt-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        try:
+            os.replace(path, backup)
+            logging.warning("Arquivo corrompido preservado em: %s", backup)
+        except Exception as e:
+            logging.error("Erro ao preservar arquivo corrompido %s: %s", path, e)
     
     # Métodos para gerenciar configuração do bot
+    @_timed('read')
     def get_bot_config(self):
         """Retorna a configuração atual do bot"""
-        # Verifica se há dados no cache
-        if self._bot_config_cache is not None:
+        # Verifica se há dados no cache (e se outro processo não os alterou)
+        if self._bot_config_cache is not None and self._cache_valid('bot_config'):
             return self._bot_config_cache
-            
+
+        self._cache_loading('bot_config')
+        previous = self._bot_config_cache
+        if previous is not None:
+            # Alterada por outro processo: avisa os agendadores depois de recarregar
+            config = self._read_bot_config()
+            if config != previous:
+                logging.info("Configuração do bot alterada por outro processo")
+                self._notify_config_listeners()
+            return config
+        return self._read_bot_config()
+    
+    def _read_bot_config(self):
+        """Lê a configuração do bot do armazenamento e atualiza o cache"""
         try:
+            if self._storage is not None:
+                self._bot_config_cache = self._storage.get_document('bot_config') or {
+                    "token": "",
+                    "group_id": "",
+                    "active": False,
+                    "interval": DEFAULT_POST_INTERVAL,
+                    "groups": []
+                }
+                return self._bot_config_cache
+
             # Verifica se o arquivo existe
             if not os.path.exists(BOT_CONFIG_FILE):
                 self._ensure_data_files_exist()
@@ -109,49 +233,53 @@ class DataManager:
                     return self._bot_config_cache
                 except json.JSONDecodeError:
                     logging.error("Arquivo de configuração do bot corrompido. Criando um novo.")
+                    self._preserve_corrupted(BOT_CONFIG_FILE)
                     default_config = {
                         "token": "",
                         "group_id": "",
                         "active": False,
-                        "interval": DEFAULT_POST_INTERVAL
+                        "interval": DEFAULT_POST_INTERVAL,
+                        "groups": []
                     }
-                    with open(BOT_CONFIG_FILE, 'w', encoding='utf-8') as f_write:
-                        json.dump(default_config, f_write, indent=4, ensure_ascii=False)
+                    write_json(BOT_CONFIG_FILE, default_config)
                     self._bot_config_cache = default_config
                     return default_config
         except Exception as e:
-            logging.error(f"Erro ao ler configuração do bot: {str(e)}")
+            logging.error("Erro ao ler configuração do bot: %s", e)
             self._bot_config_cache = {
                 "token": "",
                 "group_id": "",
                 "active": False,
-                "interval": DEFAULT_POST_INTERVAL
+                "interval": DEFAULT_POST_INTERVAL,
+                "groups": []
             }
             return self._bot_config_cache
     
+    @_timed('write')
     def update_bot_config(self, token, group_id, interval=DEFAULT_POST_INTERVAL):
         """Atualiza a configuração do bot"""
         try:
-            # Verificar direitos de acesso ao diretório de dados
-            data_dir = os.path.dirname(BOT_CONFIG_FILE)
-            if not os.path.exists(data_dir):
-                try:
-                    os.makedirs(data_dir, exist_ok=True)
-                    logging.info(f"Diretório de dados criado: {data_dir}")
-                except PermissionError:
-                    logging.error(f"Sem permissão para criar diretório de dados: {data_dir}")
+            if self._storage is None:
+                # Verificar direitos de acesso ao diretório de dados
+                data_dir = os.path.dirname(BOT_CONFIG_FILE)
+                if not os.path.exists(data_dir):
+                    try:
+                        os.makedirs(data_dir, exist_ok=True)
+                        logging.info("Diretório de dados criado: %s", data_dir)
+                    except PermissionError:
+                        logging.error("Sem permissão para criar diretório de dados: %s", data_dir)
+                        return False
+                    except Exception as e:
+                        logging.error("Erro ao criar diretório de dados: %s", e)
+                        return False
+                elif not os.access(data_dir, os.W_OK):
+                    logging.error("Sem permissão de escrita no diretório de dados: %s", data_dir)
                     return False
-                except Exception as e:
-                    logging.error(f"Erro ao criar diretório de dados: {str(e)}")
-                    return False
-            elif not os.access(data_dir, os.W_OK):
-                logging.error(f"Sem permissão de escrita no diretório de dados: {data_dir}")
-                return False
             
-            # Verificar se o arquivo existe e pode ser escrito
-            if os.path.exists(BOT_CONFIG_FILE) and not os.access(BOT_CONFIG_FILE, os.W_OK):
-                logging.error(f"Sem permissão de escrita no arquivo: {BOT_CONFIG_FILE}")
-                return False
+                # Verificar se o arquivo existe e pode ser escrito
+                if os.path.exists(BOT_CONFIG_FILE) and not os.access(BOT_CONFIG_FILE, os.W_OK):
+                    logging.error("Sem permissão de escrita no arquivo: %s", BOT_CONFIG_FILE)
+                    return False
                 
             config = self.get_bot_config()
             
@@ -180,57 +308,63 @@ class DataManager:
                 # Testar se os dados podem ser serializados para JSON
                 json.dumps(config)
             except Exception as e:
-                logging.error(f"Dados inválidos para serialização JSON: {str(e)}")
-                return False
-            
-            # Salvar no arquivo com tratamento de erros aprimorado
-            try:
-                with open(BOT_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(config, f, indent=4, ensure_ascii=False)
-            except PermissionError:
-                logging.error(f"Sem permissão para escrever no arquivo: {BOT_CONFIG_FILE}")
-                return False
-            except IOError as e:
-                logging.error(f"Erro de I/O ao escrever no arquivo: {str(e)}")
-                return False
-                
-            # Verificar se o arquivo foi salvo corretamente
-            if not os.path.exists(BOT_CONFIG_FILE):
-                logging.error("Arquivo de configuração do bot não foi criado")
+                logging.error("Dados inválidos para serialização JSON: %s", e)
                 return False
             
+            if self._storage is not None:
+                self._storage.put_document('bot_config', config)
+            else:
+                # Salvar no arquivo com tratamento de erros aprimorado
+                try:
+                    write_json(BOT_CONFIG_FILE, config)
+                except PermissionError:
+                    logging.error("Sem permissão para escrever no arquivo: %s", BOT_CONFIG_FILE)
+                    return False
+                except IOError as e:
+                    logging.error("Erro de I/O ao escrever no arquivo: %s", e)
+                    return False
+
+                # Verificar se o arquivo foi salvo corretamente
+                if not os.path.exists(BOT_CONFIG_FILE):
+                    logging.error("Arquivo de configuração do bot não foi criado")
+                    return False
+
             # Atualiza o cache
             self._bot_config_cache = config
+            self._cache_written('bot_config')
+            self._notify_config_listeners()
                 
             logging.info("Configurações do bot atualizadas com sucesso")
             return True
         except Exception as e:
-            logging.error(f"Erro ao atualizar configuração do bot: {str(e)}")
+            logging.error("Erro ao atualizar configuração do bot: %s", e)
             return False
     
+    @_timed('write')
     def update_bot_status(self, active):
         """Atualiza o status de ativação do bot"""
         try:
-            # Verificar direitos de acesso ao diretório de dados
-            data_dir = os.path.dirname(BOT_CONFIG_FILE)
-            if not os.path.exists(data_dir):
-                try:
-                    os.makedirs(data_dir, exist_ok=True)
-                    logging.info(f"Diretório de dados criado: {data_dir}")
-                except PermissionError:
-                    logging.error(f"Sem permissão para criar diretório de dados: {data_dir}")
+            if self._storage is None:
+                # Verificar direitos de acesso ao diretório de dados
+                data_dir = os.path.dirname(BOT_CONFIG_FILE)
+                if not os.path.exists(data_dir):
+                    try:
+                        os.makedirs(data_dir, exist_ok=True)
+                        logging.info("Diretório de dados criado: %s", data_dir)
+                    except PermissionError:
+                        logging.error("Sem permissão para criar diretório de dados: %s", data_dir)
+                        return False
+                    except Exception as e:
+                        logging.error("Erro ao criar diretório de dados: %s", e)
+                        return False
+                elif not os.access(data_dir, os.W_OK):
+                    logging.error("Sem permissão de escrita no diretório de dados: %s", data_dir)
                     return False
-                except Exception as e:
-                    logging.error(f"Erro ao criar diretório de dados: {str(e)}")
-                    return False
-            elif not os.access(data_dir, os.W_OK):
-                logging.error(f"Sem permissão de escrita no diretório de dados: {data_dir}")
-                return False
             
-            # Verificar se o arquivo existe e pode ser escrito
-            if os.path.exists(BOT_CONFIG_FILE) and not os.access(BOT_CONFIG_FILE, os.W_OK):
-                logging.error(f"Sem permissão de escrita no arquivo: {BOT_CONFIG_FILE}")
-                return False
+                # Verificar se o arquivo existe e pode ser escrito
+                if os.path.exists(BOT_CONFIG_FILE) and not os.access(BOT_CONFIG_FILE, os.W_OK):
+                    logging.error("Sem permissão de escrita no arquivo: %s", BOT_CONFIG_FILE)
+                    return False
                 
             config = self.get_bot_config()
             
@@ -238,42 +372,321 @@ class DataManager:
             try:
                 config["active"] = bool(active)
             except Exception as e:
-                logging.error(f"Erro ao converter valor de status para booleano: {str(e)}")
+                logging.error("Erro ao converter valor de status para booleano: %s", e)
                 return False
             
-            # Salvar no arquivo com tratamento de erros aprimorado
-            try:
-                with open(BOT_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(config, f, indent=4, ensure_ascii=False)
-            except PermissionError:
-                logging.error(f"Sem permissão para escrever no arquivo: {BOT_CONFIG_FILE}")
+            if self._storage is not None:
+                self._storage.put_document('bot_config', config)
+            else:
+                # Salvar no arquivo com tratamento de erros aprimorado
+                try:
+                    write_json(BOT_CONFIG_FILE, config)
+                except PermissionError:
+                    logging.error("Sem permissão para escrever no arquivo: %s", BOT_CONFIG_FILE)
+                    return False
+                except IOError as e:
+                    logging.error("Erro de I/O ao escrever no arquivo: %s", e)
+                    return False
+
+                # Verificar se o arquivo foi salvo corretamente
+                if not os.path.exists(BOT_CONFIG_FILE):
+                    logging.error("Arquivo de configuração do bot não foi criado após atualização de status")
+                    return False
+
+            # Atualiza o cache    
+            self._bot_config_cache = config
+            self._cache_written('bot_config')
+            self._notify_config_listeners()
+            
+            logging.info("Status do bot atualizado para: %s", 'Ativo' if active else 'Inativo')    
+            return True
+        except Exception as e:
+            logging.error("Erro ao atualizar status do bot: %s", e)
+            return False
+    
+    def get_bot_status(self):
+        """Retorna se o bot está ativo"""
+        return bool(self.get_bot_config().get('active', False))
+    
+    def set_bot_status(self, active):
+        """Ativa ou desativa o bot"""
+        return self.update_bot_status(active)
+    
+    def get_interval(self):
+        """Retorna o intervalo entre posts, em minutos"""
+        return self.get_bot_config().get('interval', DEFAULT_POST_INTERVAL)
+    
+    def set_interval(self, interval):
+        """Atualiza o intervalo entre posts, mantendo token e grupo"""
+        config = self.get_bot_config()
+        return self.update_bot_config(config.get('token', ''), config.get('group_id', ''), interval)
+
+    @_timed('read')
+    def get_schedule(self):
+        """
+        Retorna o calendário de posts compilado (bot_config['schedule']).
+
+        A compilação é feita na primeira chamada e reaproveitada enquanto o calendário
+        e o intervalo não mudarem; os agendadores comparam o objeto retornado para
+        saber se os horários mudaram.
+
+        Returns:
+            CompiledSchedule: Calendário compilado, ou None se os posts seguem apenas o
+            intervalo (sem calendário, só com pesos, ou com um calendário inválido).
+        """
+        config = self.get_bot_config()
+        spec = config.get('schedule')
+        interval = config.get('interval', DEFAULT_POST_INTERVAL)
+        cached = self._schedule
+        if cached is not None and cached[0] == spec and cached[1] == interval:
+            return cached[2]
+
+        try:
+            compiled = compile_schedule(spec, interval)
+        except ScheduleError as e:
+            logging.error("Calendário de posts inválido, usando apenas o intervalo: %s", e)
+            compiled = None
+        self._schedule = (spec, interval, compiled)
+        return compiled
+    
+    def get_post_weights(self):
+        """
+        Retorna os pesos dos posts na rotação ({id: peso}; ausentes têm peso 1)
+        
+        Os pesos são validados uma vez por versão da configuração: enquanto o
+        calendário não muda, o mesmo dicionário é retornado (e a rotação não os relê).
+        """
+        spec = self.get_bot_config().get('schedule')
+        cached = self._post_weights
+        if cached is not None and cached[0] is spec:
+            return cached[1]
+        
+        try:
+            weights = parse_weights((spec or {}).get('weights'))
+        except ScheduleError as e:
+            logging.error("Pesos de posts inválidos, ignorando: %s", e)
+            weights = {}
+        self._post_weights = (spec, weights)
+        return weights
+    
+    @_timed('write')
+    def update_schedule(self, schedule):
+        """
+        Atualiza o calendário de posts (horário ativo, dias, cron e pesos)
+        
+        Args:
+            schedule: Calendário no formato de bot_config['schedule'], ou None para
+                voltar a postar apenas pelo intervalo
+        
+        Returns:
+            bool: True se o calendário foi salvo, False em caso de erro de gravação.
+        
+        Raises:
+            ScheduleError: Se o calendário for inválido (ou nunca disparar); nada é gravado.
+        """
+        try:
+            config = dict(self.get_bot_config())
+            
+            # Compilar uma vez; calendários inválidos (ou que nunca disparam) não são gravados
+            compiled = compile_schedule(schedule or None, config.get('interval', DEFAULT_POST_INTERVAL))
+            
+            if schedule:
+                config["schedule"] = schedule
+            else:
+                config.pop("schedule", None)
+            # Os agendadores notificados pela gravação recebem o calendário já compilado
+            self._schedule = (config.get("schedule"), config.get('interval', DEFAULT_POST_INTERVAL), compiled)
+            if not self._persist_bot_config(config):
                 return False
-            except IOError as e:
-                logging.error(f"Erro de I/O ao escrever no arquivo: {str(e)}")
+            
+            if compiled is not None:
+                logging.info("Calendário de posts atualizado: próximo post em %s", compiled.isoformat(compiled.next_after(time.time())))
+            else:
+                logging.info("Calendário de posts removido: posts seguem o intervalo")
+            return True
+        except ScheduleError:
+            raise
+        except Exception as e:
+            logging.error("Erro ao atualizar calendário de posts: %s", e)
+            return False
+
+    def get_telegram_token(self):
+        """Retorna o token do bot configurado"""
+        return self.get_bot_config().get('token', '')
+
+    def set_telegram_token(self, token):
+        """Atualiza o token do bot, mantendo grupo e intervalo"""
+        config = self.get_bot_config()
+        return self.update_bot_config(token, config.get('group_id', ''), config.get('interval', DEFAULT_POST_INTERVAL))
+
+    def get_group_id(self):
+        """Retorna o ID do grupo principal configurado"""
+        return self.get_bot_config().get('group_id', '')
+
+    def set_group_id(self, group_id):
+        """Atualiza o ID do grupo principal, mantendo token e intervalo"""
+        config = self.get_bot_config()
+        return self.update_bot_config(config.get('token', ''), group_id, config.get('interval', DEFAULT_POST_INTERVAL))
+
+    # Métodos para gerenciar os grupos de destino
+    @_timed('read')
+    def get_groups(self):
+        """
+        Retorna os grupos de destino, cada um com group_id, interval e active.
+        Sem a lista "groups", o group_id único da configuração vira o único grupo.
+        """
+        config = self.get_bot_config()
+        groups = config.get('groups') or []
+        if not groups and config.get('group_id'):
+            return [{
+                "group_id": config.get('group_id'),
+                "interval": config.get('interval', DEFAULT_POST_INTERVAL),
+                "active": config.get('active', False)
+            }]
+        return groups
+    
+    @_timed('write')
+    def save_group(self, group_id, interval=None, active=None):
+        """Adiciona ou atualiza um grupo de destino"""
+        try:
+            group_id = str(group_id or "").strip()
+            if not group_id:
+                logging.error("ID do grupo vazio")
                 return False
-                
-            # Verificar se o arquivo foi salvo corretamente
-            if not os.path.exists(BOT_CONFIG_FILE):
-                logging.error("Arquivo de configuração do bot não foi criado após atualização de status")
+            
+            groups = [dict(group) for group in self.get_groups()]
+            group = next((g for g in groups if g.get('group_id') == group_id), None)
+            if group is None:
+                group = {"group_id": group_id, "interval": DEFAULT_POST_INTERVAL, "active": True}
+                groups.append(group)
+            
+            if interval is not None:
+                try:
+                    interval = int(interval)
+                except (ValueError, TypeError):
+                    interval = 0
+                if interval < 1:
+                    logging.warning("Intervalo de post inválido, definindo para o valor padrão")
+                    interval = DEFAULT_POST_INTERVAL
+                group["interval"] = interval
+            if active is not None:
+                group["active"] = bool(active)
+            
+            config = dict(self.get_bot_config())
+            config["groups"] = groups
+            if not self._persist_bot_config(config):
                 return False
             
-            # Atualiza o cache    
-            self._bot_config_cache = config
+            logging.info("Grupo %s salvo (intervalo: %s min, ativo: %s)", group_id, group['interval'], group['active'])
+            return True
+        except Exception as e:
+            logging.error("Erro ao salvar grupo: %s", e)
+            return False
+    
+    @_timed('write')
+    def remove_group(self, group_id):
+        """Remove um grupo de destino"""
+        try:
+            groups = [dict(group) for group in self.get_groups()]
+            remaining = [g for g in groups if g.get('group_id') != group_id]
+            if len(remaining) == len(groups):
+                logging.warning("Tentativa de remover grupo não encontrado: %s", group_id)
+                return False
             
-            logging.info(f"Status do bot atualizado para: {'Ativo' if active else 'Inativo'}")    
+            config = dict(self.get_bot_config())
+            config["groups"] = remaining
+            if not self._persist_bot_config(config):
+                return False
+            
+            logging.info("Grupo removido: %s", group_id)
             return True
         except Exception as e:
-            logging.error(f"Erro ao atualizar status do bot: {str(e)}")
+            logging.error("Erro ao remover grupo: %s", e)
             return False
     
+    def _persist_bot_config(self, config):
+        """Grava a configuração do bot, atualiza o cache e notifica os callbacks"""
+        try:
+            if self._storage is not None:
+                self._storage.put_document('bot_config', config)
+            else:
+                os.makedirs(os.path.dirname(BOT_CONFIG_FILE), exist_ok=True)
+                write_json(BOT_CONFIG_FILE, config)
+        except Exception as e:
+            logging.error("Erro ao salvar configuração do bot: %s", e)
+            return False
+        
+        self._bot_config_cache = config
+        self._cache_written('bot_config')
+        self._notify_config_listeners()
+        return True
+    
+    def add_config_listener(self, callback):
+        """
+        Registra um callback chamado (sem argumentos) sempre que a configuração do bot muda
+        
+        Mudanças feitas por outro processo são percebidas na leitura seguinte da
+        configuração (get_bot_config confere a geração do cache), sem thread de verificação.
+        """
+        if callback not in self._config_listeners:
+            self._config_listeners.append(callback)
+    
+    def remove_config_listener(self, callback):
+        """Remove um callback registrado com add_config_listener"""
+        if callback in self._config_listeners:
+            self._config_listeners.remove(callback)
+    
+    def _notify_config_listeners(self):
+        """Notifica os callbacks registrados sobre uma mudança de configuração"""
+        for callback in list(self._config_listeners):
+            try:
+                callback()
+            except Exception as e:
+                logging.error("Erro ao notificar mudança de configuração: %s", e)
+    
+    # Coerência dos caches entre processos
+    def _cache_valid(self, name):
+        """Verifica (sem I/O no caso comum) se o cache de um documento ainda é atual"""
+        return self._coherence.is_current(name, self._cache_tokens.get(name))
+    
+    def _cache_loading(self, name):
+        """Registra a versão de um documento antes de lê-lo do disco"""
+        try:
+            self._cache_tokens[name] = self._coherence.token(name)
+        except Exception as e:
+            logging.error("Erro ao ler geração do cache '%s': %s", name, e)
+            self._cache_tokens[name] = None
+    
+    def _cache_written(self, name):
+        """Avisa os outros processos que este processo gravou um documento"""
+        try:
+            self._cache_tokens[name] = self._coherence.commit(name, self._cache_tokens.get(name))
+        except Exception as e:
+            logging.error("Erro ao atualizar geração do cache '%s': %s", name, e)
+            self._cache_tokens[name] = None
+    
     # Métodos para gerenciar posts promocionais
+    @_timed('read')
     def get_promotional_posts(self):
         """Retorna todos os posts promocionais"""
-        # Verifica se há dados no cache
-        if self._posts_cache is not None:
+        # Verifica se há dados no cache (e se outro processo não os alterou)
+        if self._posts_cache is not None and self._cache_valid('posts'):
             return self._posts_cache
-            
+
+        self._cache_loading('posts')
+        if self._posts_cache is not None:
+            # Posts alterados por outro processo: os índices são reconstruídos
+            with self._rotation_lock:
+                self._rotation = None
+            with self._post_index_lock:
+                self._post_index = None
+            with self._search_lock:
+                self._search_index = None
         try:
+            if self._storage is not None:
+                self._posts_cache = self._storage.get_posts()
+                return self._posts_cache
+
             # Verificar se o arquivo existe
             if not os.path.exists(PROMOTIONAL_POSTS_FILE):
                 self._ensure_data_files_exist()
@@ -286,16 +699,16 @@ class DataManager:
                     return self._posts_cache
                 except json.JSONDecodeError:
                     logging.error("Arquivo de posts promocionais corrompido. Criando um novo.")
-                    os.makedirs(os.path.dirname(PROMOTIONAL_POSTS_FILE), exist_ok=True)
-                    with open(PROMOTIONAL_POSTS_FILE, 'w', encoding='utf-8') as f_write:
-                        json.dump([], f_write, indent=4, ensure_ascii=False)
+                    self._preserve_corrupted(PROMOTIONAL_POSTS_FILE)
+                    write_json(PROMOTIONAL_POSTS_FILE, [])
                     self._posts_cache = []
                     return []
         except Exception as e:
-            logging.error(f"Erro ao ler posts promocionais: {str(e)}")
+            logging.error("Erro ao ler posts promocionais: %s", e)
             self._posts_cache = []
             return self._posts_cache
     
+    @_timed('read')
     def get_promotional_post(self, post_id):
         """Retorna um post promocional específico por ID"""
         try:
@@ -305,36 +718,40 @@ class DataManager:
                     return post
             return None
         except Exception as e:
-            logging.error(f"Erro ao buscar post promocional: {str(e)}")
+            logging.error("Erro ao buscar post promocional: %s", e)
             return None
     
+    @_timed('write')
     def add_promotional_post(self, title, content, image_url="", external_link=""):
         """Adiciona um novo post promocional"""
         try:
-            # Verificar direitos de acesso ao diretório de dados
-            data_dir = os.path.dirname(PROMOTIONAL_POSTS_FILE)
-            if not os.path.exists(data_dir):
-                try:
-                    os.makedirs(data_dir, exist_ok=True)
-                    logging.info(f"Diretório de dados criado: {data_dir}")
-                except PermissionError:
-                    logging.error(f"Sem permissão para criar diretório de dados: {data_dir}")
-                    return False
-                except Exception as e:
-                    logging.error(f"Erro ao criar diretório de dados: {str(e)}")
+            if self._storage is None:
+                # Verificar direitos de acesso ao diretório de dados
+                data_dir = os.path.dirname(PROMOTIONAL_POSTS_FILE)
+                if not os.path.exists(data_dir):
+                    try:
+                        os.makedirs(data_dir, exist_ok=True)
+                        logging.info("Diretório de dados criado: %s", data_dir)
+                    except PermissionError:
+                        logging.error("Sem permissão para criar diretório de dados: %s", data_dir)
+                        return False
+                    except Exception as e:
+                        logging.error("Erro ao criar diretório de dados: %s", e)
+                        return False
+                elif not os.access(data_dir, os.W_OK):
+                    logging.error("Sem permissão de escrita no diretório de dados: %s", data_dir)
                     return False
-            elif not os.access(data_dir, os.W_OK):
-                logging.error(f"Sem permissão de escrita no diretório de dados: {data_dir}")
-                return False
             
-            # Verificar se o arquivo existe e pode ser escrito
-            if os.path.exists(PROMOTIONAL_POSTS_FILE) and not os.access(PROMOTIONAL_POSTS_FILE, os.W_OK):
-                logging.error(f"Sem permissão de escrita no arquivo: {PROMOTIONAL_POSTS_FILE}")
-                return False
+                # Verificar se o arquivo existe e pode ser escrito
+                if os.path.exists(PROMOTIONAL_POSTS_FILE) and not os.access(PROMOTIONAL_POSTS_FILE, os.W_OK):
+                    logging.error("Sem permissão de escrita no arquivo: %s", PROMOTIONAL_POSTS_FILE)
+                    return False
             
             # Ler posts existentes ou criar um array vazio
             posts = []
-            if os.path.exists(PROMOTIONAL_POSTS_FILE):
+            if self._storage is not None:
+                posts = list(self.get_promotional_posts())
+            elif os.path.exists(PROMOTIONAL_POSTS_FILE):
                 try:
                     with open(PROMOTIONAL_POSTS_FILE, 'r', encoding='utf-8') as f:
                         try:
@@ -343,7 +760,7 @@ class DataManager:
                             logging.error("Arquivo de posts promocionais corrompido. Criando um novo.")
                             posts = []
                 except Exception as e:
-                    logging.error(f"Erro ao ler arquivo de posts existente: {str(e)}")
+                    logging.error("Erro ao ler arquivo de posts existente: %s", e)
                     posts = []
             
             # Garantir que as strings sejam tratadas corretamente
@@ -366,7 +783,7 @@ class DataManager:
                     "external_link": external_link
                 })
             except Exception as e:
-                logging.error(f"Dados inválidos para serialização JSON: {str(e)}")
+                logging.error("Dados inválidos para serialização JSON: %s", e)
                 return False
             
             # Criar post
@@ -378,63 +795,83 @@ class DataManager:
                 "external_link": external_link,
                 "created_at": datetime.now().isoformat()
             }
+            # Mensagem pronta para envio, compilada uma única vez
+            attach_payload(new_post)
             
             # Adicionar à lista
             posts.append(new_post)
             
-            # Salvar no arquivo com tratamento de erros aprimorado
-            try:
-                os.makedirs(os.path.dirname(PROMOTIONAL_POSTS_FILE), exist_ok=True)
-                with open(PROMOTIONAL_POSTS_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(posts, f, indent=4, ensure_ascii=False)
-            except PermissionError:
-                logging.error(f"Sem permissão para escrever no arquivo: {PROMOTIONAL_POSTS_FILE}")
-                return False
-            except IOError as e:
-                logging.error(f"Erro de I/O ao escrever no arquivo: {str(e)}")
-                return False
-            
-            # Verificar se o arquivo foi salvo
-            if not os.path.exists(PROMOTIONAL_POSTS_FILE):
-                logging.error("Arquivo de posts promocionais não foi criado")
-                return False
+            if self._storage is not None:
+                # Grava apenas a nova linha
+                self._storage.insert_post(new_post)
+            else:
+                # Salvar no arquivo com tratamento de erros aprimorado
+                try:
+                    os.makedirs(os.path.dirname(PROMOTIONAL_POSTS_FILE), exist_ok=True)
+                    write_json(PROMOTIONAL_POSTS_FILE, posts)
+                except PermissionError:
+                    logging.error("Sem permissão para escrever no arquivo: %s", PROMOTIONAL_POSTS_FILE)
+                    return False
+                except IOError as e:
+                    logging.error("Erro de I/O ao escrever no arquivo: %s", e)
+                    return False
+
+                # Verificar se o arquivo foi salvo
+                if not os.path.exists(PROMOTIONAL_POSTS_FILE):
+                    logging.error("Arquivo de posts promocionais não foi criado")
+                    return False
             
             # Atualiza o cache
             self._posts_cache = posts
+            self._cache_written('posts')
+            with self._rotation_lock:
+                if self._rotation is not None:
+                    self._rotation.add(new_post)
+            with self._post_index_lock:
+                if self._post_index is not None:
+                    self._post_index.add(new_post)
+            with self._search_lock:
+                if self._search_index is not None:
+                    self._search_index.add(new_post)
+            self._schedule_search_index_save()
                 
-            logging.info(f"Post promocional adicionado com sucesso: {title}")
+            logging.info("Post promocional adicionado com sucesso: %s", title, extra={'post_id': new_post['id']})
             return True
         except Exception as e:
-            logging.error(f"Erro inesperado ao adicionar post promocional: {str(e)}")
+            logging.error("Erro inesperado ao adicionar post promocional: %s", e)
             return False
     
+    @_timed('write')
     def update_promotional_post(self, post_id, title, content, image_url="", external_link=""):
         """Atualiza um post promocional existente"""
         try:
-            # Verificar direitos de acesso ao diretório de dados
-            data_dir = os.path.dirname(PROMOTIONAL_POSTS_FILE)
-            if not os.path.exists(data_dir):
-                try:
-                    os.makedirs(data_dir, exist_ok=True)
-                    logging.info(f"Diretório de dados criado: {data_dir}")
-                except PermissionError:
-                    logging.error(f"Sem permissão para criar diretório de dados: {data_dir}")
-                    return False
-                except Exception as e:
-                    logging.error(f"Erro ao criar diretório de dados: {str(e)}")
+            if self._storage is None:
+                # Verificar direitos de acesso ao diretório de dados
+                data_dir = os.path.dirname(PROMOTIONAL_POSTS_FILE)
+                if not os.path.exists(data_dir):
+                    try:
+                        os.makedirs(data_dir, exist_ok=True)
+                        logging.info("Diretório de dados criado: %s", data_dir)
+                    except PermissionError:
+                        logging.error("Sem permissão para criar diretório de dados: %s", data_dir)
+                        return False
+                    except Exception as e:
+                        logging.error("Erro ao criar diretório de dados: %s", e)
+                        return False
+                elif not os.access(data_dir, os.W_OK):
+                    logging.error("Sem permissão de escrita no diretório de dados: %s", data_dir)
                     return False
-            elif not os.access(data_dir, os.W_OK):
-                logging.error(f"Sem permissão de escrita no diretório de dados: {data_dir}")
-                return False
             
-            # Verificar se o arquivo existe e pode ser escrito
-            if os.path.exists(PROMOTIONAL_POSTS_FILE) and not os.access(PROMOTIONAL_POSTS_FILE, os.W_OK):
-                logging.error(f"Sem permissão de escrita no arquivo: {PROMOTIONAL_POSTS_FILE}")
-                return False
+                # Verificar se o arquivo existe e pode ser escrito
+                if os.path.exists(PROMOTIONAL_POSTS_FILE) and not os.access(PROMOTIONAL_POSTS_FILE, os.W_OK):
+                    logging.error("Sem permissão de escrita no arquivo: %s", PROMOTIONAL_POSTS_FILE)
+                    return False
             
             # Ler posts existentes
             posts = []
-            if os.path.exists(PROMOTIONAL_POSTS_FILE):
+            if self._storage is not None:
+                posts = self.get_promotional_posts()
+            elif os.path.exists(PROMOTIONAL_POSTS_FILE):
                 try:
                     with open(PROMOTIONAL_POSTS_FILE, 'r', encoding='utf-8') as f:
                         try:
@@ -443,7 +880,7 @@ class DataManager:
                             logging.error("Arquivo de posts promocionais corrompido. Não foi possível atualizar.")
                             return False
                 except Exception as e:
-                    logging.error(f"Erro ao ler arquivo de posts: {str(e)}")
+                    logging.error("Erro ao ler arquivo de posts: %s", e)
                     return False
             else:
                 logging.error("Arquivo de posts não encontrado.")
@@ -469,77 +906,201 @@ class DataManager:
                     "external_link": external_link
                 })
             except Exception as e:
-                logging.error(f"Dados inválidos para serialização JSON: {str(e)}")
+                logging.error("Dados inválidos para serialização JSON: %s", e)
                 return False
             
             # Buscar e atualizar o post
-            post_updated = False
+            updated_post = None
+            previous_image_url = ""
             for post in posts:
                 if post.get('id') == post_id:
+                    previous_image_url = post.get('image_url', '')
                     post['title'] = title
                     post['content'] = content
                     post['image_url'] = image_url
                     post['external_link'] = external_link
                     post['updated_at'] = datetime.now().isoformat()
-                    post_updated = True
+                    attach_payload(post)
+                    updated_post = post
                     break
             
-            if not post_updated:
-                logging.warning(f"Tentativa de atualizar post não encontrado com ID: {post_id}")
+            if updated_post is None:
+                logging.warning("Tentativa de atualizar post não encontrado com ID: %s", post_id)
                 return False
             
-            # Salvar no arquivo com tratamento de erros aprimorado
-            try:
-                with open(PROMOTIONAL_POSTS_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(posts, f, indent=4, ensure_ascii=False)
-            except PermissionError:
-                logging.error(f"Sem permissão para escrever no arquivo: {PROMOTIONAL_POSTS_FILE}")
-                return False
-            except IOError as e:
-                logging.error(f"Erro de I/O ao escrever no arquivo: {str(e)}")
-                return False
-            
-            # Verificar se o arquivo foi salvo corretamente
-            if not os.path.exists(PROMOTIONAL_POSTS_FILE):
-                logging.error("Arquivo de posts promocionais não foi criado após atualização")
-                return False
+            if self._storage is not None:
+                # Grava apenas a linha alterada
+                self._storage.update_post(updated_post)
+            else:
+                # Salvar no arquivo com tratamento de erros aprimorado
+                try:
+                    write_json(PROMOTIONAL_POSTS_FILE, posts)
+                except PermissionError:
+                    logging.error("Sem permissão para escrever no arquivo: %s", PROMOTIONAL_POSTS_FILE)
+                    return False
+                except IOError as e:
+                    logging.error("Erro de I/O ao escrever no arquivo: %s", e)
+                    return False
+
+                # Verificar se o arquivo foi salvo corretamente
+                if not os.path.exists(PROMOTIONAL_POSTS_FILE):
+                    logging.error("Arquivo de posts promocionais não foi criado após atualização")
+                    return False
             
             # Atualiza o cache
             self._posts_cache = posts
+            self._cache_written('posts')
+            with self._rotation_lock:
+                if self._rotation is not None:
+                    self._rotation.update(updated_post)
+            with self._post_index_lock:
+                if self._post_index is not None:
+                    self._post_index.update(updated_post)
+            with self._search_lock:
+                if self._search_index is not None:
+                    self._search_index.update(updated_post)
+            self._schedule_search_index_save()
+            if previous_image_url != image_url:
+                self._release_image(previous_image_url, posts)
             
-            logging.info(f"Post promocional atualizado com sucesso: {title}")    
+            logging.info("Post promocional atualizado com sucesso: %s", title, extra={'post_id': post_id})
             return True
         except Exception as e:
-            logging.error(f"Erro inesperado ao atualizar post promocional: {str(e)}")
+            logging.error("Erro inesperado ao atualizar post promocional: %s", e)
             return False
     
+    @_timed('write')
+    def import_promotional_posts(self, posts):
+        """
+        Grava um lote de posts com uma única escrita (importação em massa)
+        
+        Posts com id de um post existente atualizam esse post: os campos importados
+        substituem os atuais, os demais campos e o created_at original são mantidos.
+        Os outros recebem id novo (se não tiverem) e created_at da importação (se não tiverem).
+        
+        Args:
+            posts: Lista de posts já validados (campos title, content, image_url, external_link)
+        
+        Returns:
+            dict: {"added": n, "updated": n}, ou False em caso de erro.
+        """
+        try:
+            current = list(self.get_promotional_posts())
+            position = {post.get('id'): i for i, post in enumerate(current)}
+            now = datetime.now().isoformat()
+            
+            batch = []
+            replaced_image_urls = []
+            added = updated = 0
+            for post in posts:
+                post = dict(post)
+                post.setdefault('id', str(uuid.uuid4()))
+                if post['id'] in position:
+                    existing = current[position[post['id']]]
+                    if existing.get('image_url', '') != post.get('image_url', existing.get('image_url', '')):
+                        replaced_image_urls.append(existing.get('image_url', ''))
+                    # Atualização: mantém os campos que a importação não traz e a data de criação
+                    post = dict(existing, **post)
+                    post['created_at'] = existing.get('created_at') or post.get('created_at') or now
+                    post['updated_at'] = now
+                    attach_payload(post)
+                    current[position[post['id']]] = post
+                    updated += 1
+                else:
+                    post.setdefault('created_at', now)
+                    attach_payload(post)
+                    position[post['id']] = len(current)
+                    current.append(post)
+                    added += 1
+                batch.append(post)
+            
+            if not batch:
+                return {"added": 0, "updated": 0}
+            
+            if self._storage is not None:
+                self._storage.upsert_posts(batch)
+            else:
+                write_json(PROMOTIONAL_POSTS_FILE, current)
+            
+            # Atualiza o cache e os índices
+            self._posts_cache = current
+            self._cache_written('posts')
+            with self._rotation_lock:
+                if self._rotation is not None:
+                    for post in batch:
+                        self._rotation.add(post)
+            with self._post_index_lock:
+                if self._post_index is not None:
+                    for post in batch:
+                        self._post_index.add(post)
+            with self._search_lock:
+                if self._search_index is not None:
+                    for post in batch:
+                        self._search_index.add(post)
+            self._schedule_search_index_save()
+            for image_url in replaced_image_urls:
+                self._release_image(image_url, current)
+            
+            logging.info("Lote de posts importado: %s novos, %s atualizados", added, updated)
+            return {"added": added, "updated": updated}
+        except Exception as e:
+            logging.error("Erro ao importar lote de posts: %s", e)
+            return False
+    
+    def _release_image(self, image_url, posts):
+        """Descarta o file_id em cache (e o arquivo local) de uma imagem que nenhum post usa mais"""
+        if not image_url or any(post.get('image_url') == image_url for post in posts):
+            return
+        try:
+            if self.media_cache.invalidate(image_url):
+                logging.info("Imagem removida do cache de mídia: %s", image_url)
+            name = media_name(image_url)
+            if name and self.media_store.delete(name):
+                logging.info("Imagem removida do repositório de mídia: %s", name)
+        except Exception as e:
+            logging.error("Erro ao atualizar cache de mídia: %s", e)
+    
+    def iter_promotional_posts(self):
+        """Percorre os posts em ordem de criação (usado na exportação em massa)"""
+        index = self._get_post_index()
+        with self._post_index_lock:
+            post_ids = index.ids()
+        for post_id in post_ids:
+            post = index.get(post_id)
+            if post is not None:
+                yield post
+    
+    @_timed('write')
     def delete_promotional_post(self, post_id):
         """Exclui um post promocional"""
         try:
-            # Verificar direitos de acesso ao diretório de dados
-            data_dir = os.path.dirname(PROMOTIONAL_POSTS_FILE)
-            if not os.path.exists(data_dir):
-                try:
-                    os.makedirs(data_dir, exist_ok=True)
-                    logging.info(f"Diretório de dados criado: {data_dir}")
-                except PermissionError:
-                    logging.error(f"Sem permissão para criar diretório de dados: {data_dir}")
+            if self._storage is None:
+                # Verificar direitos de acesso ao diretório de dados
+                data_dir = os.path.dirname(PROMOTIONAL_POSTS_FILE)
+                if not os.path.exists(data_dir):
+                    try:
+                        os.makedirs(data_dir, exist_ok=True)
+                        logging.info("Diretório de dados criado: %s", data_dir)
+                    except PermissionError:
+                        logging.error("Sem permissão para criar diretório de dados: %s", data_dir)
+                        return False
+                    except Exception as e:
+                        logging.error("Erro ao criar diretório de dados: %s", e)
+                        return False
+                elif not os.access(data_dir, os.W_OK):
+                    logging.error("Sem permissão de escrita no diretório de dados: %s", data_dir)
                     return False
-                except Exception as e:
-                    logging.error(f"Erro ao criar diretório de dados: {str(e)}")
-                    return False
-            elif not os.access(data_dir, os.W_OK):
-                logging.error(f"Sem permissão de escrita no diretório de dados: {data_dir}")
-                return False
             
-            # Verificar se o arquivo existe e pode ser escrito
-            if os.path.exists(PROMOTIONAL_POSTS_FILE) and not os.access(PROMOTIONAL_POSTS_FILE, os.W_OK):
-                logging.error(f"Sem permissão de escrita no arquivo: {PROMOTIONAL_POSTS_FILE}")
-                return False
+                # Verificar se o arquivo existe e pode ser escrito
+                if os.path.exists(PROMOTIONAL_POSTS_FILE) and not os.access(PROMOTIONAL_POSTS_FILE, os.W_OK):
+                    logging.error("Sem permissão de escrita no arquivo: %s", PROMOTIONAL_POSTS_FILE)
+                    return False
             
             # Ler posts existentes
             posts = []
-            if os.path.exists(PROMOTIONAL_POSTS_FILE):
+            if self._storage is not None:
+                posts = self.get_promotional_posts()
+            elif os.path.exists(PROMOTIONAL_POSTS_FILE):
                 try:
                     with open(PROMOTIONAL_POSTS_FILE, 'r', encoding='utf-8') as f:
                         try:
@@ -548,7 +1109,7 @@ class DataManager:
                             logging.error("Arquivo JSON corrompido. Não foi possível excluir o post.")
                             return False
                 except Exception as e:
-                    logging.error(f"Erro ao ler arquivo de posts: {str(e)}")
+                    logging.error("Erro ao ler arquivo de posts: %s", e)
                     return False
             else:
                 logging.error("Arquivo de posts não encontrado.")
@@ -556,38 +1117,170 @@ class DataManager:
                 
             # Excluir o post
             initial_count = len(posts)
+            removed_image_urls = [post.get('image_url', '') for post in posts if post.get('id') == post_id]
             posts = [post for post in posts if post.get('id') != post_id]
             
             if len(posts) == initial_count:
-                logging.warning(f"Tentativa de excluir post não encontrado com ID: {post_id}")
+                logging.warning("Tentativa de excluir post não encontrado com ID: %s", post_id)
                 return False
             
-            # Salvar no arquivo com tratamento de erros aprimorado
-            try:
-                os.makedirs(os.path.dirname(PROMOTIONAL_POSTS_FILE), exist_ok=True)
-                with open(PROMOTIONAL_POSTS_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(posts, f, indent=4, ensure_ascii=False)
-            except PermissionError:
-                logging.error(f"Sem permissão para escrever no arquivo: {PROMOTIONAL_POSTS_FILE}")
-                return False
-            except IOError as e:
-                logging.error(f"Erro de I/O ao escrever no arquivo: {str(e)}")
-                return False
-            
-            # Verificar se o arquivo foi salvo corretamente
-            if not os.path.exists(PROMOTIONAL_POSTS_FILE):
-                logging.error("Arquivo de posts promocionais não foi criado após exclusão")
-                return False
+            if self._storage is not None:
+                # Remove apenas a linha excluída
+                self._storage.delete_post(post_id)
+            else:
+                # Salvar no arquivo com tratamento de erros aprimorado
+                try:
+                    os.makedirs(os.path.dirname(PROMOTIONAL_POSTS_FILE), exist_ok=True)
+                    write_json(PROMOTIONAL_POSTS_FILE, posts)
+                except PermissionError:
+                    logging.error("Sem permissão para escrever no arquivo: %s", PROMOTIONAL_POSTS_FILE)
+                    return False
+                except IOError as e:
+                    logging.error("Erro de I/O ao escrever no arquivo: %s", e)
+                    return False
+
+                # Verificar se o arquivo foi salvo corretamente
+                if not os.path.exists(PROMOTIONAL_POSTS_FILE):
+                    logging.error("Arquivo de posts promocionais não foi criado após exclusão")
+                    return False
             
             # Atualiza o cache
             self._posts_cache = posts
+            self._cache_written('posts')
+            with self._rotation_lock:
+                if self._rotation is not None:
+                    self._rotation.remove(post_id)
+            with self._post_index_lock:
+                if self._post_index is not None:
+                    self._post_index.remove(post_id)
+            with self._search_lock:
+                if self._search_index is not None:
+                    self._search_index.remove(post_id)
+            self._schedule_search_index_save()
+            for image_url in removed_image_urls:
+                self._release_image(image_url, posts)
             
-            logging.info(f"Post promocional excluído com sucesso: ID {post_id}")
+            logging.info("Post promocional excluído com sucesso: ID %s", post_id, extra={'post_id': post_id})
             return True
         except Exception as e:
-            logging.error(f"Erro inesperado ao excluir post promocional: {str(e)}")
+            logging.error("Erro inesperado ao excluir post promocional: %s", e)
             return False
     
+    @_timed('read')
+    def get_posts_page(self, cursor=None, limit=POSTS_PAGE_SIZE, text=None, has_image=None, has_link=None):
+        """
+        Retorna uma página de posts promocionais, do mais recente para o mais antigo
+        
+        Args:
+            cursor: Cursor retornado pela página anterior (None = primeira página)
+            limit: Número de posts por página (limitado a POSTS_MAX_PAGE_SIZE)
+            text: Filtra por texto no título ou conteúdo
+            has_image: Filtra posts com/sem imagem
+            has_link: Filtra posts com/sem link externo
+        
+        Returns:
+            dict: {"posts": [...], "next_cursor": str ou None, "total": total de posts}
+        
+        Raises:
+            ValueError: Se o cursor for inválido.
+        """
+        limit = max(1, min(int(limit), POSTS_MAX_PAGE_SIZE))
+        index = self._get_post_index()
+        with self._post_index_lock:
+            posts, next_cursor = index.page(cursor, limit, text=text, has_image=has_image, has_link=has_link)
+            total = len(index)
+        return {"posts": posts, "next_cursor": next_cursor, "total": total}
+    
+    @_timed('read')
+    def get_post_count(self):
+        """Retorna o número de posts promocionais"""
+        index = self._get_post_index()
+        with self._post_index_lock:
+            return len(index)
+    
+    def _get_post_index(self):
+        """Retorna o índice de listagem, construindo-o na primeira chamada"""
+        posts = self.get_promotional_posts()
+        with self._post_index_lock:
+            if self._post_index is None:
+                self._post_index = PostIndex(posts)
+            return self._post_index
+    
+    @_timed('read')
+    def search_posts(self, query, limit=POSTS_PAGE_SIZE):
+        """
+        Busca posts promocionais por texto (título/conteúdo), ignorando acentos e maiúsculas
+        
+        Args:
+            query: Texto da busca; o último termo também casa como prefixo
+            limit: Número máximo de posts retornados (limitado a POSTS_MAX_PAGE_SIZE)
+        
+        Returns:
+            dict: {"posts": [...], "total": total de posts encontrados}
+        """
+        limit = max(1, min(int(limit), POSTS_MAX_PAGE_SIZE))
+        index = self._get_search_index()
+        with self._search_lock:
+            post_ids, total = index.search(query, limit)
+        
+        post_index = self._get_post_index()
+        with self._post_index_lock:
+            posts = [post for post in map(post_index.get, post_ids) if post is not None]
+        return {"posts": posts, "total": total}
+    
+    def _get_search_index(self):
+        """Retorna o índice de busca, carregando-o do disco ou construindo-o na primeira chamada"""
+        posts = self.get_promotional_posts()
+        with self._search_lock:
+            if self._search_index is None:
+                index = None
+                if self._storage is None:
+                    index = SearchIndex.load(SEARCH_INDEX_FILE, self._posts_file_stamp())
+                if index is None:
+                    index = SearchIndex(posts)
+                    logging.info("Índice de busca construído com %s posts", len(index))
+                self._search_index = index
+            index = self._search_index
+        if index.dirty:
+            self._schedule_search_index_save()
+        return index
+    
+    def _schedule_search_index_save(self):
+        """Agenda a gravação do índice de busca, agrupando alterações próximas"""
+        if self._storage is not None:
+            return
+        with self._search_lock:
+            if self._search_save_timer is not None:
+                return
+            if self._search_index is None or not self._search_index.dirty:
+                return
+            self._search_save_timer = threading.Timer(SEARCH_INDEX_SAVE_DELAY, self.save_search_index)
+            self._search_save_timer.daemon = True
+            self._search_save_timer.start()
+            if not self._search_save_registered:
+                atexit.register(self.save_search_index)
+                self._search_save_registered = True
+    
+    def save_search_index(self):
+        """Grava o índice de busca junto do arquivo de posts (backend JSON)"""
+        with self._search_lock:
+            self._search_save_timer = None
+            index = self._search_index
+            if index is None or not index.dirty or self._storage is not None:
+                return
+            # Só grava se o índice corresponde ao arquivo atual de posts
+            if not self._cache_valid('posts'):
+                return
+            index.save(SEARCH_INDEX_FILE, self._posts_file_stamp())
+    
+    def _posts_file_stamp(self):
+        """Carimbo (tamanho, mtime) do arquivo de posts"""
+        try:
+            st = os.stat(PROMOTIONAL_POSTS_FILE)
+            return st.st_size, st.st_mtime_ns
+        except OSError:
+            return None
+    
     def get_random_promotional_post(self):
         """
         Função mantida por compatibilidade, mas agora retorna o próximo post
@@ -595,81 +1288,143 @@ class DataManager:
         """
         return self.get_next_sequential_post()
         
-    def get_next_sequential_post(self):
+    @_timed('write')
+    def get_next_sequential_post(self, scope=DEFAULT_SCOPE):
         """
         Retorna o próximo post promocional em ordem sequencial (do mais antigo ao mais recente)
         Após enviar todos os posts, reinicia o ciclo
         """
+        # As etapas não passam pelos métodos medidos: a escolha é registrada uma única vez
+        post = self._peek_next_sequential_post(scope)
+        if post is not None:
+            self._advance_rotation(post, scope)
+        return post
+    
+    @_timed('read')
+    def peek_next_sequential_post(self, scope=DEFAULT_SCOPE):
+        """
+        Retorna o próximo post da rotação sem avançá-la
+        
+        Quem grava o envio na fila de saída avança a rotação (advance_rotation) só
+        depois da gravação: uma queda entre as duas etapas repete o post em vez de pulá-lo.
+        """
+        return self._peek_next_sequential_post(scope)
+    
+    @_timed('write')
+    def advance_rotation(self, post, scope=DEFAULT_SCOPE):
+        """
+        Avança a rotação depois do envio de post (retornado por peek_next_sequential_post)
+        
+        Returns:
+            bool: True se a rotação avançou, False se outro envio já a avançou.
+        """
+        return self._advance_rotation(post, scope)
+    
+    def _peek_next_sequential_post(self, scope):
+        """Próximo post da rotação (sem registro de latência; ver peek_next_sequential_post)"""
         try:
-            posts = self.get_promotional_posts()
-            
-            if not posts:
-                return None
-                
-            # Ordenar os posts por data de criação (mais antigos primeiro)
-            sorted_posts = sorted(posts, key=lambda x: x.get('created_at', ''))
-            
-            # Ler o último ID enviado do arquivo de estado (se existir)
-            last_sent_post_id = None
-            stats_file = os.path.join(DATA_DIR, 'last_sent_post.json')
-            
-            try:
-                if os.path.exists(stats_file):
-                    with open(stats_file, 'r', encoding='utf-8') as f:
-                        try:
-                            data = json.load(f)
-                            last_sent_post_id = data.get('last_sent_post_id')
-                        except json.JSONDecodeError:
-                            logging.error("Arquivo de último post enviado corrompido.")
-                            last_sent_post_id = None
-                            os.remove(stats_file)  # Remove para permitir recriação
-            except Exception as e:
-                logging.error(f"Erro ao ler último post enviado: {str(e)}")
-                last_sent_post_id = None
-            
-            # Se não houver post anterior ou for o último, começar do início
-            next_post = sorted_posts[0]
-            next_index = 0
-            
-            # Se tiver um ID de último post enviado, encontrar o próximo
-            if last_sent_post_id:
-                found = False
-                for i, post in enumerate(sorted_posts):
-                    if post.get('id') == last_sent_post_id:
-                        # Pega o próximo post (ou volta para o início se for o último)
-                        next_index = (i + 1) % len(sorted_posts)
-                        next_post = sorted_posts[next_index]
-                        found = True
-                        break
-                
-                # Se o post anterior não for encontrado (talvez tenha sido excluído), 
-                # começa do início
-                if not found:
-                    next_post = sorted_posts[0]
-                    next_index = 0
-            
-            # Salvar o ID do post que será enviado como o último
-            try:
-                os.makedirs(os.path.dirname(stats_file), exist_ok=True)
-                with open(stats_file, 'w', encoding='utf-8') as f:
-                    json.dump({'last_sent_post_id': next_post.get('id')}, f, indent=4, ensure_ascii=False)
-            except Exception as e:
-                logging.error(f"Erro ao salvar último post enviado: {str(e)}")
-            
-            logging.info(f"Enviando post sequencial {next_index+1}/{len(sorted_posts)}: {next_post.get('title', 'unknown')}")
-            return next_post
+            weights = self.get_post_weights()
+            with self._rotation_lock:
+                rotation = self._get_rotation_index()
+                rotation.set_weights(weights)
+                result = rotation.peek(scope)
+            return result[1] if result is not None else None
         except Exception as e:
-            logging.error(f"Erro ao obter próximo post sequencial: {str(e)}")
+            logging.error("Erro ao obter próximo post sequencial: %s", e)
             return None
     
+    def _advance_rotation(self, post, scope):
+        """Avança a rotação (sem registro de latência; ver advance_rotation)"""
+        try:
+            with self._rotation_lock:
+                rotation = self._get_rotation_index()
+                position = rotation.position(post.get('id'))
+                if not rotation.advance(post.get('id'), scope):
+                    return False
+            logging.info("Enviando post sequencial %s/%s: %s", position+1, len(rotation), post.get('title', 'unknown'),
+                         extra={'post_id': post.get('id')})
+            return True
+        except Exception as e:
+            logging.error("Erro ao avançar rotação de posts: %s", e)
+            return False
+    
+    def _get_rotation_index(self):
+        """Retorna o índice de rotação, construindo-o na primeira chamada"""
+        if self._rotation is not None and not self._cache_valid('rotation'):
+            # Outro processo avançou a rotação: os cursores são restaurados do estado salvo
+            self._rotation = None
+            self._rotation_state_doc = None
+        if self._rotation is not None and not self._cache_valid('posts'):
+            self._rotation = None
+        if self._rotation is None:
+            self._cache_loading('rotation')
+            rotation = RotationIndex(self._load_rotation_state, self._save_rotation_state)
+            rotation.build(self.get_promotional_posts())
+            self._rotation = rotation
+        return self._rotation
+    
+    def _load_rotation_state(self, scope=DEFAULT_SCOPE):
+        """Lê o estado persistido de um cursor de rotação"""
+        if self._storage is not None:
+            return self._storage.get_rotation_state(scope)
+        
+        doc = self._get_rotation_state_doc()
+        if scope == DEFAULT_SCOPE:
+            return doc
+        return doc.get('scopes', {}).get(scope)
+    
+    def _save_rotation_state(self, state, scope=DEFAULT_SCOPE):
+        """Persiste o estado de um cursor de rotação"""
+        if self._storage is not None:
+            self._storage.set_rotation_state(state, scope)
+            self._cache_written('rotation')
+            return
+        
+        doc = self._get_rotation_state_doc()
+        if scope == DEFAULT_SCOPE:
+            doc.update(state)
+        else:
+            doc.setdefault('scopes', {})[scope] = state
+        
+        os.makedirs(os.path.dirname(LAST_SENT_POST_FILE), exist_ok=True)
+        write_json(LAST_SENT_POST_FILE, doc)
+        self._cache_written('rotation')
+    
+    def _get_rotation_state_doc(self):
+        """Carrega (uma vez) o arquivo de estado da rotação no backend JSON"""
+        if self._rotation_state_doc is None:
+            self._rotation_state_doc = {}
+            try:
+                if os.path.exists(LAST_SENT_POST_FILE):
+                    with open(LAST_SENT_POST_FILE, 'r', encoding='utf-8') as f:
+                        self._rotation_state_doc = json.load(f)
+            except json.JSONDecodeError:
+                logging.error("Arquivo de último post enviado corrompido.")
+            except Exception as e:
+                logging.error("Erro ao ler último post enviado: %s", e)
+        return self._rotation_state_doc
+    
     # Métodos para gerenciar configuração de boas-vindas
+    @_timed('read')
     def get_welcome_config(self):
         """Retorna a configuração de boas-vindas"""
-        # Verifica se há dados no cache
-        if self._welcome_config_cache is not None:
+        # Verifica se há dados no cache (e se outro processo não os alterou)
+        if self._welcome_config_cache is not None and self._cache_valid('welcome_config'):
             return self._welcome_config_cache
-            
+
+        self._cache_loading('welcome_config')
+        self._welcome_template = None
         try:
+            if self._storage is not None:
+                self._welcome_config_cache = self._storage.get_document('welcome_config') or {
+                    "message": "Olá {first_name}! Bem-vindo(a) ao grupo!",
+                    "enabled": True,
+                    "batch_window": WELCOME_BATCH_WINDOW,
+                    "max_batch_size": WELCOME_MAX_BATCH_SIZE
+                }
+                return self._welcome_config_cache
+
+
             # Verificar se o arquivo existe
             if not os.path.exists(WELCOME_CONFIG_FILE):
                 self._ensure_data_files_exist()
@@ -680,121 +1435,177 @@ class DataManager:
                     return self._welcome_config_cache
                 except json.JSONDecodeError:
                     logging.error("Arquivo de configuração de boas-vindas corrompido. Criando um novo.")
+                    self._preserve_corrupted(WELCOME_CONFIG_FILE)
                     default_welcome = {
                         "message": "Olá {first_name}! Bem-vindo(a) ao grupo!",
-                        "enabled": True
+                        "enabled": True,
+                        "batch_window": WELCOME_BATCH_WINDOW,
+                        "max_batch_size": WELCOME_MAX_BATCH_SIZE
                     }
-                    with open(WELCOME_CONFIG_FILE, 'w', encoding='utf-8') as f_write:
-                        json.dump(default_welcome, f_write, indent=4, ensure_ascii=False)
+                    write_json(WELCOME_CONFIG_FILE, default_welcome)
                     self._welcome_config_cache = default_welcome
                     return default_welcome
         except Exception as e:
-            logging.error(f"Erro ao ler configuração de boas-vindas: {str(e)}")
+            logging.error("Erro ao ler configuração de boas-vindas: %s", e)
             self._welcome_config_cache = {
                 "message": "Olá {first_name}! Bem-vindo(a) ao grupo!",
-                "enabled": True
+                "enabled": True,
+                "batch_window": WELCOME_BATCH_WINDOW,
+                "max_batch_size": WELCOME_MAX_BATCH_SIZE
             }
             return self._welcome_config_cache
     
-    def update_welcome_config(self, message, enabled=True):
-        """Atualiza a configuração de boas-vindas"""
+    @_timed('read')
+    def get_welcome_template(self):
+        """
+        Retorna a mensagem de boas-vindas compilada.
+
+        A compilação é feita na primeira chamada e reaproveitada até a configuração
+        mudar; cada entrada de membro só preenche os campos do modelo.
+        """
+        template = self._welcome_template
+        if template is not None and self._cache_valid('welcome_config'):
+            return template
+
+        message = self.get_welcome_config().get("message", "")
         try:
-            # Verificar direitos de acesso ao diretório de dados
-            data_dir = os.path.dirname(WELCOME_CONFIG_FILE)
-            if not os.path.exists(data_dir):
-                try:
-                    os.makedirs(data_dir, exist_ok=True)
-                    logging.info(f"Diretório de dados criado: {data_dir}")
-                except PermissionError:
-                    logging.error(f"Sem permissão para criar diretório de dados: {data_dir}")
-                    return False
-                except Exception as e:
-                    logging.error(f"Erro ao criar diretório de dados: {str(e)}")
+            template = compile_template(message)
+        except TemplateError as e:
+            logging.error("Mensagem de boas-vindas inválida, usando o texto sem campos: %s", e)
+            template = compile_template(message.replace('{', '{{').replace('}', '}}'))
+        self._welcome_template = template
+        return template
+    
+    @_timed('write')
+    def update_welcome_config(self, message, enabled=True, batch_window=None, max_batch_size=None):
+        """
+        Atualiza a configuração de boas-vindas
+
+        batch_window (segundos) e max_batch_size controlam o agrupamento de entradas
+        em uma única mensagem; se None, os valores atuais são mantidos.
+        """
+        try:
+            if self._storage is None:
+                # Verificar direitos de acesso ao diretório de dados
+                data_dir = os.path.dirname(WELCOME_CONFIG_FILE)
+                if not os.path.exists(data_dir):
+                    try:
+                        os.makedirs(data_dir, exist_ok=True)
+                        logging.info("Diretório de dados criado: %s", data_dir)
+                    except PermissionError:
+                        logging.error("Sem permissão para criar diretório de dados: %s", data_dir)
+                        return False
+                    except Exception as e:
+                        logging.error("Erro ao criar diretório de dados: %s", e)
+                        return False
+                elif not os.access(data_dir, os.W_OK):
+                    logging.error("Sem permissão de escrita no diretório de dados: %s", data_dir)
                     return False
-            elif not os.access(data_dir, os.W_OK):
-                logging.error(f"Sem permissão de escrita no diretório de dados: {data_dir}")
-                return False
             
-            # Verificar se o arquivo existe e pode ser escrito
-            if os.path.exists(WELCOME_CONFIG_FILE) and not os.access(WELCOME_CONFIG_FILE, os.W_OK):
-                logging.error(f"Sem permissão de escrita no arquivo: {WELCOME_CONFIG_FILE}")
-                return False
+                # Verificar se o arquivo existe e pode ser escrito
+                if os.path.exists(WELCOME_CONFIG_FILE) and not os.access(WELCOME_CONFIG_FILE, os.W_OK):
+                    logging.error("Sem permissão de escrita no arquivo: %s", WELCOME_CONFIG_FILE)
+                    return False
             
             # Garantir que a mensagem é uma string
             if message is None:
                 message = ""
+            
+            # Compilar o modelo uma única vez; erros de sintaxe impedem a gravação
+            try:
+                template = compile_template(message)
+            except TemplateError as e:
+                logging.error("Mensagem de boas-vindas inválida: %s", e)
+                return False
                 
+            # Manter os parâmetros de agrupamento atuais quando não informados
+            current = self.get_welcome_config()
+            if batch_window is None:
+                batch_window = current.get("batch_window", WELCOME_BATCH_WINDOW)
+            if max_batch_size is None:
+                max_batch_size = current.get("max_batch_size", WELCOME_MAX_BATCH_SIZE)
+            
             # Verificar validade do conteúdo para JSON
             try:
                 # Testar se os dados podem ser serializados para JSON
                 json.dumps({
                     "message": message,
-                    "enabled": bool(enabled)
+                    "enabled": bool(enabled),
+                    "batch_window": float(batch_window),
+                    "max_batch_size": int(max_batch_size)
                 })
             except Exception as e:
-                logging.error(f"Dados inválidos para serialização JSON: {str(e)}")
+                logging.error("Dados inválidos para serialização JSON: %s", e)
                 return False
                 
             welcome_config = {
                 "message": message,
-                "enabled": bool(enabled)
+                "enabled": bool(enabled),
+                "batch_window": float(batch_window),
+                "max_batch_size": max(1, int(max_batch_size))
             }
             
-            # Salvar no arquivo com tratamento de erros aprimorado
-            try:
-                os.makedirs(os.path.dirname(WELCOME_CONFIG_FILE), exist_ok=True)
-                with open(WELCOME_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(welcome_config, f, indent=4, ensure_ascii=False)
-            except PermissionError:
-                logging.error(f"Sem permissão para escrever no arquivo: {WELCOME_CONFIG_FILE}")
-                return False
-            except IOError as e:
-                logging.error(f"Erro de I/O ao escrever no arquivo: {str(e)}")
-                return False
-                
-            # Verificar se o arquivo foi salvo corretamente
-            if not os.path.exists(WELCOME_CONFIG_FILE):
-                logging.error("Arquivo de configuração de boas-vindas não foi criado")
-                return False
+            if self._storage is not None:
+                self._storage.put_document('welcome_config', welcome_config)
+            else:
+                # Salvar no arquivo com tratamento de erros aprimorado
+                try:
+                    os.makedirs(os.path.dirname(WELCOME_CONFIG_FILE), exist_ok=True)
+                    write_json(WELCOME_CONFIG_FILE, welcome_config)
+                except PermissionError:
+                    logging.error("Sem permissão para escrever no arquivo: %s", WELCOME_CONFIG_FILE)
+                    return False
+                except IOError as e:
+                    logging.error("Erro de I/O ao escrever no arquivo: %s", e)
+                    return False
+
+                # Verificar se o arquivo foi salvo corretamente
+                if not os.path.exists(WELCOME_CONFIG_FILE):
+                    logging.error("Arquivo de configuração de boas-vindas não foi criado")
+                    return False
             
             # Atualiza o cache
             self._welcome_config_cache = welcome_config
+            self._welcome_template = template
+            self._cache_written('welcome_config')
             
             logging.info("Configuração de boas-vindas atualizada com sucesso")    
             return True
         except Exception as e:
-            logging.error(f"Erro ao atualizar configuração de boas-vindas: {str(e)}")
+            logging.error("Erro ao atualizar configuração de boas-vindas: %s", e)
             return False
     
     # Métodos para gerenciar estatísticas
+    @_timed('read')
     def get_stats(self):
         """Retorna as estatísticas do bot"""
-        # Verifica se há dados no cache
-        if self._stats_cache is not None:
+        # Verifica se há dados no cache (e se outro processo não os alterou)
+        if self._stats_cache is not None and self._cache_valid('stats'):
             return self._stats_cache
-            
+
+        self._cache_loading('stats')
+        if self._stats_cache is not None and self._stats_log is not None:
+            self._stats_log.invalidate()
         try:
+            if self._storage is not None:
+                stats = {
+                    "welcome_messages_sent": 0,
+                    "promo_messages_sent": 0,
+                    "last_restarted": None
+                }
+                stats.update(self._storage.get_stats())
+                self._stats_cache = stats
+                return self._stats_cache
+
             # Verificar se o arquivo existe
             if not os.path.exists(STATS_FILE):
                 self._ensure_data_files_exist()
-                
-            with open(STATS_FILE, 'r', encoding='utf-8') as f:
-                try:
-                    self._stats_cache = json.load(f)
-                    return self._stats_cache
-                except json.JSONDecodeError:
-                    logging.error("Arquivo de estatísticas corrompido. Criando um novo.")
-                    default_stats = {
-                        "welcome_messages_sent": 0,
-                        "promo_messages_sent": 0,
-                        "last_restarted": datetime.now().isoformat()
-                    }
-                    with open(STATS_FILE, 'w', encoding='utf-8') as f_write:
-                        json.dump(default_stats, f_write, indent=4, ensure_ascii=False)
-                    self._stats_cache = default_stats
-                    return default_stats
+            
+            # Snapshot + eventos do log ainda não compactados
+            self._stats_cache = self._stats_log.load()
+            return self._stats_cache
         except Exception as e:
-            logging.error(f"Erro ao ler estatísticas: {str(e)}")
+            logging.error("Erro ao ler estatísticas: %s", e)
             self._stats_cache = {
                 "welcome_messages_sent": 0,
                 "promo_messages_sent": 0,
@@ -802,28 +1613,33 @@ class DataManager:
             }
             return self._stats_cache
     
-    def increment_welcome_messages_stat(self):
-        """Incrementa o contador de mensagens de boas-vindas enviadas"""
+    @_timed('write')
+    def increment_welcome_messages_stat(self, amount=1):
+        """Incrementa o contador de boas-vindas enviadas (amount = membros recebidos no lote)"""
         try:
             stats = self.get_stats()
-            stats["welcome_messages_sent"] = stats.get("welcome_messages_sent", 0) + 1
+            stats["welcome_messages_sent"] = stats.get("welcome_messages_sent", 0) + amount
             
             try:
-                os.makedirs(os.path.dirname(STATS_FILE), exist_ok=True)
-                with open(STATS_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(stats, f, indent=4, ensure_ascii=False)
+                if self._storage is not None:
+                    self._storage.increment_stat("welcome_messages_sent", amount)
+                else:
+                    self._stats_log.increment("welcome_messages_sent", amount)
             except Exception as e:
-                logging.error(f"Erro ao salvar estatísticas de boas-vindas: {str(e)}")
+                logging.error("Erro ao salvar estatísticas de boas-vindas: %s", e)
                 return False
             
             # Atualiza o cache    
             self._stats_cache = stats
+            if self._storage is not None:
+                self._cache_written('stats')
                 
             return True
         except Exception as e:
-            logging.error(f"Erro ao incrementar estatística de boas-vindas: {str(e)}")
+            logging.error("Erro ao incrementar estatística de boas-vindas: %s", e)
             return False
     
+    @_timed('write')
     def increment_promo_messages_stat(self):
         """Incrementa o contador de mensagens promocionais enviadas"""
         try:
@@ -831,21 +1647,25 @@ class DataManager:
             stats["promo_messages_sent"] = stats.get("promo_messages_sent", 0) + 1
             
             try:
-                os.makedirs(os.path.dirname(STATS_FILE), exist_ok=True)
-                with open(STATS_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(stats, f, indent=4, ensure_ascii=False)
+                if self._storage is not None:
+                    self._storage.increment_stat("promo_messages_sent")
+                else:
+                    self._stats_log.increment("promo_messages_sent")
             except Exception as e:
-                logging.error(f"Erro ao salvar estatísticas de mensagens promocionais: {str(e)}")
+                logging.error("Erro ao salvar estatísticas de mensagens promocionais: %s", e)
                 return False
             
             # Atualiza o cache    
             self._stats_cache = stats
+            if self._storage is not None:
+                self._cache_written('stats')
                 
             return True
         except Exception as e:
-            logging.error(f"Erro ao incrementar estatística de mensagens promocionais: {str(e)}")
+            logging.error("Erro ao incrementar estatística de mensagens promocionais: %s", e)
             return False
     
+    @_timed('write')
     def update_restart_time(self):
         """Atualiza o horário do último reinício do bot"""
         try:
@@ -853,18 +1673,21 @@ class DataManager:
             stats["last_restarted"] = datetime.now().isoformat()
             
             try:
-                os.makedirs(os.path.dirname(STATS_FILE), exist_ok=True)
-                with open(STATS_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(stats, f, indent=4, ensure_ascii=False)
+                if self._storage is not None:
+                    self._storage.set_stat("last_restarted", stats["last_restarted"])
+                else:
+                    self._stats_log.set("last_restarted", stats["last_restarted"])
             except Exception as e:
-                logging.error(f"Erro ao salvar horário de reinício: {str(e)}")
+                logging.error("Erro ao salvar horário de reinício: %s", e)
                 return False
             
             # Atualiza o cache    
             self._stats_cache = stats
+            if self._storage is not None:
+                self._cache_written('stats')
             
             logging.info("Horário de reinício do bot atualizado")    
             return True
         except Exception as e:
-            logging.error(f"Erro ao atualizar horário de reinício: {str(e)}")
+            logging.error("Erro ao atualizar horário de reinício: %s", e)
             return False
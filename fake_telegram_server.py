@@ -0,0 +1,283 @@
+"""
+Servidor falso da Bot API do Telegram para testes locais.
+
+Responde aos métodos usados pelo bot, registra todas as chamadas recebidas e pode
+simular erros 429 (Too Many Requests). Também serve arquivos estáticos (para simular
+as imagens dos posts) e só aceita file_id que ele mesmo emitiu. Updates publicados
+com push_update() são entregues pelo getUpdates ou, com um webhook registrado
+(setWebhook), por POST para a URL do webhook com o cabeçalho de segredo. Aponte
+TELEGRAM_API_URL para a URL do servidor para exercitar o pipeline de envio e o
+recebimento de updates sem acessar o Telegram.
+
+Uso:
+    python fake_telegram_server.py [porta]
+"""
+import itertools
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class FakeTelegramServer:
+    """Servidor HTTP local que imita a Bot API do Telegram"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0):
+        """
+        Inicializa o servidor falso.
+
+        Args:
+            host: Endereço de escuta
+            port: Porta de escuta (0 escolhe uma porta livre)
+            latency: Atraso artificial por requisição, em segundos
+        """
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+        self._message_ids = itertools.count(1)
+        self._rate_limited = 0
+        self._retry_after = 1
+        self._files = {}
+        self._file_ids = set()
+        self._update_ids = itertools.count(1)
+        self._updates = []
+        self._webhook = None
+        self.webhook_responses = []
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                server._handle(self)
+
+            def do_GET(self):
+                if self.path.startswith('/bot'):
+                    server._handle(self)
+                elif self.path in server._files:
+                    server._serve_file(self)
+                else:
+                    self.send_error(404)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Inicia o servidor em uma thread"""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="FakeTelegramServer")
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Para o servidor"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def rate_limit(self, count: int, retry_after: float = 1):
+        """Faz as próximas `count` chamadas de envio falharem com 429"""
+        with self._lock:
+            self._rate_limited = count
+            self._retry_after = retry_after
+
+    def serve_file(self, path: str, content: bytes):
+        """Publica um arquivo em GET <url><path> (ex.: imagem de um post)"""
+        with self._lock:
+            self._files[path] = content
+
+    def expire_file_ids(self):
+        """Invalida todos os file_id emitidos até agora"""
+        with self._lock:
+            self._file_ids.clear()
+
+    def push_update(self, update):
+        """
+        Publica um update (recebe update_id automaticamente).
+
+        Com webhook registrado, o update é enviado na hora por POST para a URL do
+        webhook e o status HTTP da resposta é guardado em webhook_responses; senão,
+        fica disponível para o getUpdates.
+        """
+        with self._lock:
+            update = dict(update, update_id=next(self._update_ids))
+            webhook = self._webhook
+            if webhook is None:
+                self._updates.append(update)
+                return update
+        self._deliver(webhook, update)
+        return update
+
+    def _deliver(self, webhook, update):
+        """Entrega um update ao webhook, como o Telegram faria"""
+        headers = {'Content-Type': 'application/json'}
+        if webhook.get('secret_token'):
+            headers['X-Telegram-Bot-Api-Secret-Token'] = webhook['secret_token']
+        request = urllib.request.Request(webhook['url'], data=json.dumps(update).encode('utf-8'),
+                                         headers=headers, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        with self._lock:
+            self.webhook_responses.append(status)
+            # O Telegram reenvia updates que não receberam resposta 2xx
+            if status >= 300:
+                self._updates.append(update)
+
+    def calls_for(self, method: str):
+        """Retorna as chamadas registradas para um método"""
+        with self._lock:
+            return [call for call in self.calls if call['method'] == method]
+
+    def _handle(self, request: BaseHTTPRequestHandler):
+        """Processa uma requisição /bot<token>/<método>"""
+        parts = request.path.split('?', 1)
+        method = parts[0].rstrip('/').rsplit('/', 1)[-1]
+        params = dict(parse_qsl(parts[1])) if len(parts) > 1 else {}
+        params.update(self._read_body(request))
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            self.calls.append({'method': method, 'params': params, 'time': time.time(),
+                               'client': request.client_address})
+            limited = method.startswith('send') and self._rate_limited > 0
+            if limited:
+                self._rate_limited -= 1
+                retry_after = self._retry_after
+
+        photo = params.get('photo', '') if method == 'sendPhoto' else ''
+        if method == 'getUpdates' and self._webhook is not None:
+            self._reply(request, 409, {
+                'ok': False,
+                'error_code': 409,
+                'description': "Conflict: can't use getUpdates method while webhook is active"
+            })
+        elif not limited and photo.startswith('fake-file-') and photo not in self._file_ids:
+            self._reply(request, 400, {
+                'ok': False,
+                'error_code': 400,
+                'description': "Bad Request: wrong file identifier/HTTP URL specified"
+            })
+        elif limited:
+            self._reply(request, 429, {
+                'ok': False,
+                'error_code': 429,
+                'description': f"Too Many Requests: retry after {retry_after}",
+                'parameters': {'retry_after': retry_after}
+            })
+        else:
+            self._reply(request, 200, {'ok': True, 'result': self._result_for(method, params)})
+
+    def _result_for(self, method: str, params):
+        """Monta o campo 'result' de uma resposta bem-sucedida"""
+        if method.startswith('send'):
+            message = {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': params.get('chat_id')}
+            }
+            if method == 'sendPhoto':
+                message['caption'] = params.get('caption', '')
+                photo = params.get('photo', '')
+                file_id = photo if photo.startswith('fake-file-') else f"fake-file-{message['message_id']}"
+                with self._lock:
+                    self._file_ids.add(file_id)
+                message['photo'] = [{'file_id': file_id, 'width': 1, 'height': 1}]
+            else:
+                message['text'] = params.get('text', '')
+            return message
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'FakeBot', 'username': 'fake_bot'}
+        if method == 'getUpdates':
+            return self._pending_updates(params)
+        if method == 'setWebhook':
+            with self._lock:
+                self._webhook = {'url': params.get('url'), 'secret_token': params.get('secret_token')}
+        if method == 'deleteWebhook':
+            with self._lock:
+                self._webhook = None
+        return True
+
+    def _pending_updates(self, params):
+        """Updates a partir do offset (os anteriores são confirmados); o long polling dura no máximo 1 s"""
+        offset = int(params.get('offset') or 0)
+        deadline = time.time() + min(float(params.get('timeout') or 0), 1.0)
+        while True:
+            with self._lock:
+                self._updates = [update for update in self._updates if update['update_id'] >= offset]
+                if self._updates or time.time() >= deadline:
+                    return list(self._updates)
+            time.sleep(0.05)
+
+    def _read_body(self, request: BaseHTTPRequestHandler):
+        """Lê o corpo JSON, form-urlencoded ou multipart"""
+        length = int(request.headers.get('Content-Length') or 0)
+        content_type = request.headers.get('Content-Type', '')
+        body = request.rfile.read(length) if length else b''
+        if content_type.startswith('multipart/form-data'):
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode('utf-8') + body
+            )
+            fields = {}
+            for part in message.iter_parts():
+                name = part.get_param('name', header='content-disposition')
+                filename = part.get_filename()
+                fields[name] = f"<file {filename}>" if filename else part.get_content().strip()
+            return fields
+
+        if not body:
+            return {}
+        if content_type.startswith('application/json'):
+            return json.loads(body)
+        return dict(parse_qsl(body.decode('utf-8')))
+
+    def _serve_file(self, request: BaseHTTPRequestHandler):
+        """Responde um GET de arquivo publicado com serve_file()"""
+        with self._lock:
+            content = self._files[request.path]
+            self.calls.append({'method': 'GET', 'params': {'path': request.path}, 'time': time.time()})
+        request.send_response(200)
+        request.send_header('Content-Type', 'application/octet-stream')
+        request.send_header('Content-Length', str(len(content)))
+        request.end_headers()
+        request.wfile.write(content)
+
+    def _reply(self, request: BaseHTTPRequestHandler, status: int, payload):
+        """Envia uma resposta JSON"""
+        body = json.dumps(payload).encode('utf-8')
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.DEBUG)
+    fake = FakeTelegramServer(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8081)
+    print(f"Servidor falso da Bot API em {fake.url}")
+    fake.httpd.serve_forever()
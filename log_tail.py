@@ -0,0 +1,362 @@
+import os
+import gzip
+import json
+import time
+import shutil
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+
+from atomic_json import write_json
+from config import LOG_FILE, LOG_INDEX_STRIDE
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+_BLOCK_SIZE = 64 * 1024
+_INDEX_VERSION = 1
+
+
+class CompressingRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler que comprime os arquivos rotacionados (app.log.1.gz, ...).
+
+    Ao atingir maxBytes, o log atual é renomeado e comprimido com gzip; os arquivos
+    mais antigos que backupCount são descartados.
+    """
+
+    def __init__(self, filename: str, maxBytes: int = 0, backupCount: int = 0, encoding: str = 'utf-8', **kwargs):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding, **kwargs)
+        self.namer = self._gzip_name
+        self.rotator = self._gzip_rotate
+
+    @staticmethod
+    def _gzip_name(name: str) -> str:
+        return name + '.gz'
+
+    @staticmethod
+    def _gzip_rotate(source: str, dest: str):
+        with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+
+def parse_line(line: str) -> Optional[Tuple[str, str]]:
+    """
+    Extrai (logger, nível) de uma linha de log em JSON (structured_log.JsonFormatter)
+    ou no formato '%(asctime)s - %(name)s - %(levelname)s - ...'.
+
+    Returns:
+        Optional[Tuple[str, str]]: None para linhas de continuação (ex.: tracebacks).
+    """
+    if line.startswith('{'):
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        if isinstance(entry, dict) and entry.get('level') in LEVELS:
+            return str(entry.get('logger', '')), entry['level']
+        return None
+    parts = line.split(' - ', 3)
+    if len(parts) < 4 or parts[2] not in LEVELS:
+        return None
+    return parts[1], parts[2]
+
+
+def line_matches(header: Optional[Tuple[str, str]], level: Optional[str] = None,
+                 logger_name: Optional[str] = None) -> bool:
+    """
+    Verifica se um registro passa pelos filtros.
+
+    Args:
+        header: (logger, nível) do registro, de parse_line
+        level: Nível mínimo (ex.: 'WARNING' também mostra ERROR e CRITICAL)
+        logger_name: Logger (ou prefixo, ex.: 'send_pipeline')
+    """
+    if not level and not logger_name:
+        return True
+    if header is None:
+        return False
+    name, line_level = header
+    if level and LEVELS.index(line_level) < LEVELS.index(level):
+        return False
+    if logger_name and name != logger_name and not name.startswith(logger_name + '.'):
+        return False
+    return True
+
+
+class LogTail:
+    """
+    Leitura eficiente do arquivo de log, sem carregá-lo inteiro na memória.
+
+    tail() lê o arquivo de trás para frente em blocos, até juntar as últimas
+    linhas pedidas (com filtros de nível e logger): o custo depende do número de
+    linhas exibidas, não do tamanho do arquivo. Linhas de continuação (tracebacks)
+    acompanham o registro a que pertencem.
+
+    Um índice de deslocamentos (a posição de cada LOG_INDEX_STRIDE-ésima linha, o
+    total de linhas e a contagem por nível) é salvo ao lado do log e atualizado de
+    forma incremental, lendo só o trecho novo do arquivo. Com ele, page() abre uma
+    página a partir do número da linha sem percorrer o arquivo desde o início.
+    follow() acompanha o arquivo em tempo real, inclusive através das rotações.
+    """
+
+    def __init__(self, path: str = LOG_FILE, index_path: Optional[str] = None,
+                 stride: int = LOG_INDEX_STRIDE):
+        """
+        Inicializa o leitor.
+
+        Args:
+            path: Arquivo de log
+            index_path: Arquivo do índice de deslocamentos (padrão: <path>.idx.json)
+            stride: Intervalo, em linhas, entre as posições guardadas no índice
+        """
+        self.path = path
+        self.index_path = index_path or f"{path}.idx.json"
+        self.stride = stride
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Any]] = None
+
+    def tail(self, count: int = 50, level: Optional[str] = None,
+             logger_name: Optional[str] = None, before: Optional[int] = None) -> Tuple[List[str], int]:
+        """
+        Retorna as últimas linhas do log que passam pelos filtros.
+
+        Args:
+            count: Número máximo de registros
+            level: Nível mínimo
+            logger_name: Logger (ou prefixo)
+            before: Lê apenas antes desta posição (para carregar registros mais antigos)
+
+        Returns:
+            Tuple[List[str], int]: Linhas (da mais antiga para a mais recente) e a posição
+            do início da primeira linha retornada (use em before para a página anterior).
+        """
+        if not os.path.exists(self.path):
+            return [], 0
+
+        records: List[List[str]] = []
+        pending: List[str] = []  # Linhas de continuação do registro sendo montado
+        with open(self.path, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            end = size if before is None else max(0, min(before, size))
+            start = end
+            for line_start, raw in self._reverse_lines(f, end):
+                line = raw.decode('utf-8', errors='replace')
+                header = parse_line(line)
+                if header is None and line_start > 0:
+                    pending.append(line)
+                    continue
+                if line_matches(header, level, logger_name):
+                    records.append([line] + pending[::-1])
+                    start = line_start
+                    if len(records) >= count:
+                        break
+                pending = []
+            else:
+                # Chegou ao início do arquivo
+                start = 0
+
+        lines = [line for record in reversed(records) for line in record]
+        return lines, start
+
+    def page(self, first_line: int, count: int = 100) -> List[str]:
+        """
+        Retorna `count` linhas a partir do número de linha `first_line` (0 = primeira).
+
+        Usa o índice para começar a leitura na posição guardada mais próxima.
+        """
+        index = self.index()
+        if index['inode'] is None:
+            return []
+        checkpoints = index['checkpoints']
+        slot = min(first_line // self.stride, len(checkpoints) - 1) if checkpoints else -1
+        line_number, offset = checkpoints[slot] if slot >= 0 else (0, 0)
+
+        lines = []
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for raw in f:
+                if line_number >= first_line:
+                    lines.append(raw.decode('utf-8', errors='replace').rstrip('\n'))
+                    if len(lines) >= count:
+                        break
+                line_number += 1
+        return lines
+
+    def stats(self) -> Dict[str, Any]:
+        """Total de linhas, contagem por nível e tamanho do log (pelo índice)"""
+        index = self.index()
+        return {'lines': index['lines'], 'levels': dict(index['levels']), 'size': index['offset']}
+
+    def index(self) -> Dict[str, Any]:
+        """
+        Retorna o índice de deslocamentos, atualizado com as linhas novas do log.
+
+        O índice é descartado e refeito se o log foi rotacionado (inode diferente ou
+        arquivo menor que o trecho já indexado).
+        """
+        with self._lock:
+            index = self._index or self._load_index()
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._index = self._empty_index(None)
+                return self._index
+
+            if index is None or index['inode'] != stat.st_ino or index['offset'] > stat.st_size:
+                index = self._empty_index(stat.st_ino)
+            if index['offset'] < stat.st_size:
+                self._extend_index(index)
+                try:
+                    write_json(self.index_path, index)
+                except Exception as e:
+                    logger.warning("Erro ao salvar índice do log: %s", e)
+            self._index = index
+            return index
+
+    def follow(self, offset: Optional[int] = None, level: Optional[str] = None,
+               logger_name: Optional[str] = None, poll_interval: float = 1.0,
+               heartbeat: float = 15.0) -> Iterator[Optional[Tuple[int, str]]]:
+        """
+        Acompanha o log em tempo real.
+
+        Args:
+            offset: Posição a partir da qual ler (padrão: fim atual do arquivo)
+            level: Nível mínimo
+            logger_name: Logger (ou prefixo)
+            poll_interval: Intervalo (segundos) entre verificações do arquivo
+            heartbeat: Intervalo máximo (segundos) sem produzir nada
+
+        Yields:
+            Optional[Tuple[int, str]]: (posição após a linha, linha) a cada linha nova que
+            passa pelos filtros, ou None periodicamente (para manter a conexão viva).
+        """
+        f = None
+        inode = None
+        position = 0
+        buffer = b''
+        # Linhas de continuação (tracebacks) seguem o filtro do último cabeçalho
+        keep = not level and not logger_name
+        last_yield = time.monotonic()
+        try:
+            while True:
+                if f is None and os.path.exists(self.path):
+                    f = open(self.path, 'rb')
+                    inode = os.fstat(f.fileno()).st_ino
+                    size = f.seek(0, os.SEEK_END)
+                    position = f.seek(min(offset, size) if offset is not None else size)
+                    buffer = b''
+
+                produced = False
+                if f is not None:
+                    chunk = f.read(_BLOCK_SIZE)
+                    if chunk:
+                        produced = True
+                        buffer += chunk
+                        *complete, buffer = buffer.split(b'\n')
+                        for raw in complete:
+                            position += len(raw) + 1
+                            line = raw.rstrip(b'\r').decode('utf-8', errors='replace')
+                            if not line.strip():
+                                continue
+                            header = parse_line(line)
+                            if header is not None:
+                                keep = line_matches(header, level, logger_name)
+                            if keep:
+                                last_yield = time.monotonic()
+                                yield position, line
+                    elif self._rotated(f, inode):
+                        # Log rotacionado: continua no arquivo novo, desde o início
+                        f.close()
+                        f = None
+                        offset = 0
+                        produced = True
+
+                if not produced:
+                    if time.monotonic() - last_yield >= heartbeat:
+                        last_yield = time.monotonic()
+                        yield None
+                    time.sleep(poll_interval)
+        finally:
+            if f is not None:
+                f.close()
+
+    def _rotated(self, f, inode) -> bool:
+        """Verifica se o arquivo aberto deixou de ser o log (renomeado ou removido na rotação)"""
+        # O arquivo novo pode reaproveitar o inode do antigo, já removido
+        if os.fstat(f.fileno()).st_nlink == 0:
+            return True
+        try:
+            return os.stat(self.path).st_ino != inode
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _reverse_lines(f, end: int) -> Iterator[Tuple[int, bytes]]:
+        """Percorre as linhas de um arquivo de trás para frente, a partir de `end`"""
+        position = end
+        remainder = b''
+        while position > 0:
+            size = min(_BLOCK_SIZE, position)
+            position -= size
+            f.seek(position)
+            block = f.read(size) + remainder
+            lines = block.split(b'\n')
+            remainder = lines.pop(0)
+            # Posição de início de cada linha completa do bloco
+            line_end = position + len(block)
+            for raw in reversed(lines):
+                line_start = line_end - len(raw)
+                line_end = line_start - 1
+                if raw.strip():
+                    yield line_start, raw.rstrip(b'\r')
+        if remainder.strip():
+            yield 0, remainder.rstrip(b'\r')
+
+    def _load_index(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') != _INDEX_VERSION or index.get('stride') != self.stride:
+                return None
+            return index
+        except Exception as e:
+            logger.warning("Erro ao carregar índice do log: %s", e)
+            return None
+
+    def _empty_index(self, inode) -> Dict[str, Any]:
+        return {
+            'version': _INDEX_VERSION,
+            'stride': self.stride,
+            'inode': inode,
+            'offset': 0,
+            'lines': 0,
+            'levels': {},
+            'checkpoints': []
+        }
+
+    def _extend_index(self, index: Dict[str, Any]):
+        """Indexa as linhas completas escritas depois de index['offset']"""
+        levels = index['levels']
+        with open(self.path, 'rb') as f:
+            f.seek(index['offset'])
+            offset = index['offset']
+            lines = index['lines']
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break  # Linha ainda sendo escrita: fica para a próxima atualização
+                if lines % self.stride == 0:
+                    index['checkpoints'].append([lines, offset])
+                header = parse_line(raw.decode('utf-8', errors='replace'))
+                if header is not None:
+                    levels[header[1]] = levels.get(header[1], 0) + 1
+                offset += len(raw)
+                lines += 1
+        index['offset'] = offset
+        index['lines'] = lines
@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Optional, Dict, Any
+
+from atomic_json import write_json
+from config import MEDIA_CACHE_FILE
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+def photo_file_id(message: Dict[str, Any]) -> Optional[str]:
+    """Extrai o file_id da maior resolução de uma mensagem de foto do Telegram"""
+    photos = (message or {}).get('photo') or []
+    if not photos:
+        return None
+    return photos[-1].get('file_id')
+
+
+def is_file_id_error(description: str) -> bool:
+    """Verifica se um erro da Bot API indica file_id inválido ou expirado"""
+    description = (description or '').lower()
+    return 'file identifier' in description or 'file_id' in description or 'wrong remote file' in description
+
+
+class MediaCache:
+    """
+    Cache dos file_id do Telegram para as imagens dos posts promocionais.
+
+    Depois do primeiro envio de uma imagem, o Telegram devolve um file_id que pode
+    ser reutilizado em qualquer envio seguinte, sem que o Telegram busque a URL de
+    novo. As entradas são indexadas pela URL e pelo hash SHA-256 do conteúdo: URLs
+    diferentes para a mesma imagem compartilham o file_id.
+
+    O cache é mantido em memória e gravado no disco (de forma atômica) a cada
+    alteração.
+    """
+
+    def __init__(self, path: str = MEDIA_CACHE_FILE):
+        """
+        Inicializa o cache, carregando as entradas salvas.
+
+        Args:
+            path: Arquivo do cache
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_url: Dict[str, Dict[str, Any]] = {}
+        self._by_hash: Dict[str, str] = {}
+        self._load()
+
+    def get(self, url: str) -> Optional[str]:
+        """Retorna o file_id em cache de uma URL, ou None"""
+        with self._lock:
+            entry = self._by_url.get(url)
+            return entry['file_id'] if entry else None
+
+    def get_by_hash(self, content_hash: str) -> Optional[str]:
+        """Retorna o file_id de uma imagem já enviada com o mesmo conteúdo, ou None"""
+        with self._lock:
+            return self._by_hash.get(content_hash)
+
+    def put(self, url: str, file_id: str, content_hash: Optional[str] = None):
+        """
+        Registra o file_id de uma imagem.
+
+        Args:
+            url: URL da imagem no post
+            file_id: file_id devolvido pelo Telegram
+            content_hash: SHA-256 do conteúdo, se a imagem foi baixada pelo bot
+        """
+        with self._lock:
+            self._by_url[url] = {'file_id': file_id, 'sha256': content_hash, 'cached_at': time.time()}
+            if content_hash:
+                self._by_hash[content_hash] = file_id
+            self._save_locked()
+
+    def invalidate(self, url: str) -> bool:
+        """
+        Descarta o file_id de uma URL (ex.: a URL do post mudou ou o file_id expirou).
+
+        Returns:
+            bool: True se havia uma entrada para a URL.
+        """
+        with self._lock:
+            entry = self._by_url.pop(url, None)
+            if entry is None:
+                return False
+            content_hash = entry.get('sha256')
+            if content_hash and self._by_hash.get(content_hash) == entry['file_id']:
+                del self._by_hash[content_hash]
+            self._save_locked()
+            return True
+
+    def invalidate_file_id(self, file_id: str):
+        """Descarta todas as entradas de um file_id rejeitado pelo Telegram"""
+        with self._lock:
+            urls = [url for url, entry in self._by_url.items() if entry['file_id'] == file_id]
+            for url in urls:
+                del self._by_url[url]
+            for content_hash in [h for h, cached in self._by_hash.items() if cached == file_id]:
+                del self._by_hash[content_hash]
+            if urls:
+                self._save_locked()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._by_url)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._by_url = {url: entry for url, entry in data.get('urls', {}).items() if entry.get('file_id')}
+            self._by_hash = {
+                entry['sha256']: entry['file_id'] for entry in self._by_url.values() if entry.get('sha256')
+            }
+        except Exception as e:
+            logger.error("Erro ao carregar cache de mídia: %s", e)
+
+    def _save_locked(self):
+        try:
+            write_json(self.path, {'urls': self._by_url})
+        except Exception as e:
+            logger.error("Erro ao salvar cache de mídia: %s", e)
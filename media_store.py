@@ -0,0 +1,200 @@
+import os
+import re
+import uuid
+import hashlib
+import logging
+from typing import Optional, IO
+
+from config import MEDIA_STORE_DIR, MEDIA_MAX_BYTES, MEDIA_PREVIEW_SIZE
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Prefixo das URLs locais das imagens do repositório (servidas pelo painel)
+MEDIA_URL_PREFIX = '/media/'
+MEDIA_PREVIEW_URL_PREFIX = '/media/preview/'
+
+ALLOWED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+_NAME_RE = re.compile(r'^([0-9a-f]{64})(\.(?:jpg|jpeg|png|gif|webp))$')
+_CHUNK_SIZE = 64 * 1024
+
+
+def media_name(image_url: str) -> Optional[str]:
+    """Nome do arquivo ('<sha256>.<ext>') de uma URL local do repositório, ou None"""
+    if not image_url or not image_url.startswith(MEDIA_URL_PREFIX):
+        return None
+    name = image_url[len(MEDIA_URL_PREFIX):]
+    return name if _NAME_RE.match(name) else None
+
+
+def media_url(name: str) -> str:
+    """URL local de uma imagem do repositório"""
+    return MEDIA_URL_PREFIX + name
+
+
+def preview_url(image_url: str) -> str:
+    """URL da prévia de uma imagem (URLs externas são devolvidas sem alteração)"""
+    name = media_name(image_url)
+    return MEDIA_PREVIEW_URL_PREFIX + name if name else image_url
+
+
+def content_hash(name: str) -> str:
+    """SHA-256 do conteúdo de uma imagem do repositório"""
+    return _NAME_RE.match(name).group(1)
+
+
+class MediaStore:
+    """
+    Repositório local das imagens enviadas pelo painel, endereçado pelo conteúdo.
+
+    Cada arquivo é gravado com o hash SHA-256 do conteúdo como nome, em subdiretórios
+    pelos quatro primeiros caracteres do hash (ab/cd/abcd...ef.jpg), para que nenhum
+    diretório acumule milhares de arquivos. A mesma imagem enviada para vários posts
+    é gravada uma única vez.
+
+    Ao gravar uma imagem, uma prévia reduzida (JPEG de até MEDIA_PREVIEW_SIZE) é
+    gerada uma única vez ao lado do original; sem o Pillow instalado, a prévia é o
+    próprio original. Como o conteúdo de um nome nunca muda, os arquivos podem ser
+    servidos com cache de longa duração.
+    """
+
+    def __init__(self, root: str = MEDIA_STORE_DIR, max_bytes: int = MEDIA_MAX_BYTES,
+                 preview_size: tuple = MEDIA_PREVIEW_SIZE):
+        """
+        Inicializa o repositório.
+
+        Args:
+            root: Diretório do repositório
+            max_bytes: Tamanho máximo de uma imagem
+            preview_size: Largura e altura máximas das prévias
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.preview_size = tuple(preview_size)
+
+    def save(self, stream: IO[bytes], filename: str = '') -> str:
+        """
+        Grava uma imagem lida de um arquivo (em partes, sem carregá-la inteira).
+
+        Args:
+            stream: Arquivo binário com a imagem
+            filename: Nome original, usado para obter a extensão
+
+        Returns:
+            str: Nome da imagem no repositório ('<sha256>.<ext>').
+
+        Raises:
+            ValueError: Se a extensão não for de imagem, o arquivo estiver vazio ou
+                        exceder o tamanho máximo.
+        """
+        extension = os.path.splitext(filename or '')[1].lower() or '.jpg'
+        if extension not in ALLOWED_EXTENSIONS:
+            raise ValueError(f"Formato de imagem não suportado: {extension} "
+                             f"(use {', '.join(ALLOWED_EXTENSIONS)})")
+
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = os.path.join(self.root, f".upload-{os.getpid()}-{uuid.uuid4().hex}.tmp")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, 'wb') as f:
+                while True:
+                    chunk = stream.read(_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ValueError(f"Imagem excede o limite de {self.max_bytes} bytes")
+                    digest.update(chunk)
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            if size == 0:
+                raise ValueError("Arquivo de imagem vazio")
+
+            name = digest.hexdigest() + extension
+            path = self._path(name)
+            if os.path.exists(path):
+                # Mesmo conteúdo já gravado (por outro post ou outro envio)
+                os.remove(tmp_path)
+                logger.info("Imagem já existente no repositório de mídia: %s", name)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+                logger.info("Imagem gravada no repositório de mídia: %s (%s bytes)", name, size)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        self._make_preview(name)
+        return name
+
+    def path(self, name: str) -> Optional[str]:
+        """Caminho do arquivo de uma imagem, ou None se o nome for inválido ou não existir"""
+        if not _NAME_RE.match(name or ''):
+            return None
+        path = self._path(name)
+        return path if os.path.exists(path) else None
+
+    def preview_path(self, name: str) -> Optional[str]:
+        """Caminho da prévia de uma imagem (o original, se não houver prévia)"""
+        if not _NAME_RE.match(name or ''):
+            return None
+        preview = self._preview_path(name)
+        if os.path.exists(preview):
+            return preview
+        return self.path(name)
+
+    def delete(self, name: str) -> bool:
+        """
+        Remove uma imagem e sua prévia.
+
+        Returns:
+            bool: True se a imagem existia.
+        """
+        path = self.path(name)
+        if path is None:
+            return False
+        for file_path in (path, self._preview_path(name)):
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
+        return True
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name[:2], name[2:4], name)
+
+    def _preview_path(self, name: str) -> str:
+        return os.path.join(self.root, name[:2], name[2:4], content_hash(name) + '.preview.jpg')
+
+    def _make_preview(self, name: str):
+        """Gera a prévia reduzida de uma imagem, se ainda não existir"""
+        if Image is None:
+            return
+        preview = self._preview_path(name)
+        if os.path.exists(preview):
+            return
+        tmp_path = f"{preview}.{os.getpid()}.tmp"
+        try:
+            with Image.open(self._path(name)) as image:
+                image.thumbnail(self.preview_size)
+                if image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                image.save(tmp_path, 'JPEG', quality=80, optimize=True)
+            os.replace(tmp_path, preview)
+        except Exception as e:
+            logger.warning("Erro ao gerar prévia da imagem %s: %s", name, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
@@ -0,0 +1,375 @@
+import time
+import math
+import bisect
+import threading
+from functools import wraps
+from typing import Optional, Dict, List, Tuple, Callable, Sequence
+
+# Tipo de conteúdo do formato de exposição em texto do Prometheus
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Limites (segundos) dos buckets padrão dos histogramas de latência
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Acima deste número de fatias, as das threads encerradas são consolidadas
+_FOLD_THRESHOLD = 64
+
+
+class _Shards:
+    """
+    Valores por thread: cada thread só escreve na própria fatia, sem lock.
+
+    O lock é usado apenas quando uma thread escreve pela primeira vez e na leitura
+    (soma das fatias). Fatias de threads encerradas são somadas em `_retired` e
+    descartadas, para que servidores que criam uma thread por requisição não
+    acumulem fatias.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, List[float]]] = []
+        self._retired = [0.0] * size
+
+    def get(self) -> List[float]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = [0.0] * self._size
+            with self._lock:
+                if len(self._shards) >= _FOLD_THRESHOLD:
+                    self._fold()
+                self._shards.append((threading.current_thread(), values))
+            self._local.values = values
+            return values
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            self._fold()
+            totals = list(self._retired)
+            for _, values in self._shards:
+                for i, value in enumerate(values):
+                    totals[i] += value
+        return totals
+
+    def _fold(self):
+        """Soma as fatias das threads encerradas em _retired (com o lock adquirido)"""
+        alive = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                alive.append((thread, values))
+            else:
+                for i, value in enumerate(values):
+                    self._retired[i] += value
+        self._shards = alive
+
+
+class CounterChild:
+    """Contador monotônico de uma combinação de rótulos"""
+
+    def __init__(self):
+        self._shards = _Shards(1)
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1):
+        """Incrementa o contador (amount >= 0)"""
+        self._shards.get()[0] += amount
+
+    def set_function(self, function: Callable[[], float]):
+        """Lê o valor de uma função a cada coleta (ex.: um contador mantido por outro objeto)"""
+        self._function = function
+
+    def value(self) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._shards.totals()[0]
+
+
+class GaugeChild:
+    """Valor que sobe e desce (ex.: profundidade de uma fila)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self._value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """Lê o valor de uma função a cada coleta (ex.: len() de uma fila)"""
+        self._function = function
+
+    def value(self) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._value
+
+
+class HistogramChild:
+    """Histograma com buckets fixos de uma combinação de rótulos"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self._buckets = buckets
+        # Contagens por bucket (a última posição é +Inf) seguidas da soma dos valores
+        self._shards = _Shards(len(buckets) + 2)
+
+    def observe(self, value: float):
+        values = self._shards.get()
+        values[bisect.bisect_left(self._buckets, value)] += 1
+        values[-1] += value
+
+    def time(self) -> '_Timer':
+        """Context manager que registra a duração do bloco"""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        """Contagens cumulativas por bucket (incluindo +Inf), soma e total"""
+        totals = self._shards.totals()
+        cumulative = []
+        running = 0.0
+        for count in totals[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, totals[-1], running
+
+
+class _Timer:
+    def __init__(self, child: HistogramChild):
+        self._child = child
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class Metric:
+    """
+    Família de métricas com nome, descrição e rótulos.
+
+    labels() devolve (e guarda) o valor de uma combinação de rótulos. Métricas sem
+    rótulos repassam inc/set/observe/... diretamente ao seu único valor.
+    """
+
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values, **labels):
+        """Valor da métrica para uma combinação de rótulos (por posição ou nome)"""
+        if labels:
+            values = tuple(str(labels[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(value) for value in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: esperados os rótulos {self.labelnames}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._new_child()
+        return child
+
+    def children(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return list(self._children.items())
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """Amostras (nome, rótulos, valor) no momento da coleta"""
+        return [(self.name, dict(zip(self.labelnames, values)), child.value())
+                for values, child in self.children()]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def _new_child(self):
+        return CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self._default.set_function(function)
+
+    def value(self) -> float:
+        return self._default.value()
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def _new_child(self):
+        return GaugeChild()
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._default.dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self._default.set_function(function)
+
+    def value(self) -> float:
+        return self._default.value()
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self) -> _Timer:
+        return self._default.time()
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        return self._default.snapshot()
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        samples = []
+        bounds = [_format_value(bound) for bound in self.buckets] + ['+Inf']
+        for values, child in self.children():
+            labels = dict(zip(self.labelnames, values))
+            cumulative, total, count = child.snapshot()
+            for bound, bucket_count in zip(bounds, cumulative):
+                samples.append((f"{self.name}_bucket", dict(labels, le=bound), bucket_count))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class Registry:
+    """Conjunto de métricas do processo, exposto em /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+
+    def get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs) -> Metric:
+        """
+        Retorna a métrica com este nome, criando-a na primeira chamada.
+
+        Raises:
+            ValueError: Se já existir uma métrica com o mesmo nome e outro tipo ou rótulos.
+        """
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Métrica {name} já registrada com outro tipo ou rótulos")
+            return metric
+
+    def render(self) -> str:
+        """Todas as métricas no formato de exposição em texto do Prometheus"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    rendered = ','.join(f'{key}="{_escape_label(val)}"' for key, val in labels.items())
+                    lines.append(f"{name}{{{rendered}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{name} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    """Contador do registro global"""
+    return REGISTRY.get_or_create(Counter, name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    """Medidor do registro global"""
+    return REGISTRY.get_or_create(Gauge, name, documentation, labelnames)
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    """Histograma do registro global"""
+    return REGISTRY.get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+# Profundidade das filas internas (send_pipeline, updates, outbox, log), compartilhada pelos módulos
+QUEUE_DEPTH = gauge('queue_depth', 'Itens aguardando processamento nas filas internas', ('queue',))
+
+
+def timed(child):
+    """Decorador que registra a duração de cada chamada em um histograma (ou valor de histograma)"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def render() -> str:
+    """Métricas do registro global no formato de exposição em texto"""
+    return REGISTRY.render()
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if math.isnan(value):
+        return 'NaN'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _escape_help(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n')
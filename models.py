@@ -13,16 +13,25 @@ class PromotionalPost:
         self.created_at = created_at
 
 class WelcomeConfig:
-    def __init__(self, message, enabled=True):
+    def __init__(self, message, enabled=True, batch_window=5, max_batch_size=50):
         self.message = message
         self.enabled = enabled
+        self.batch_window = batch_window  # Segundos em que as entradas são agrupadas
+        self.max_batch_size = max_batch_size  # Membros por lote antes de enviar imediatamente
+
+class GroupTarget:
+    def __init__(self, group_id, interval=10, active=True):
+        self.group_id = group_id
+        self.interval = interval
+        self.active = active
 
 class BotConfig:
-    def __init__(self, token, group_id, active=False, interval=10):
+    def __init__(self, token, group_id, active=False, interval=10, groups=None):
         self.token = token
         self.group_id = group_id
         self.active = active
         self.interval = interval
+        self.groups = groups or []  # Lista de GroupTarget; vazia = apenas group_id
 
 class Stats:
     def __init__(self, welcome_messages_sent=0, promo_messages_sent=0, last_restarted=None):
@@ -0,0 +1,450 @@
+import json
+import os
+import uuid
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Callable
+
+from config import OUTBOX_DIR, OUTBOX_SEGMENT_SIZE, OUTBOX_DEDUP_KEYS, OUTBOX_MAX_ATTEMPTS
+from metrics import QUEUE_DEPTH
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+def post_key(chat_id, post: Dict[str, Any]) -> str:
+    """
+    Chave de deduplicação de um post agendado: o mesmo post para o mesmo chat no
+    mesmo minuto é enviado uma única vez, mesmo que dois agendadores disparem juntos.
+    """
+    return f"post:{chat_id}:{post.get('id')}:{int(time.time() // 60)}"
+
+
+class Outbox:
+    """
+    Fila de saída persistente em log segmentado (append-only) com confirmações.
+
+    Cada mensagem é gravada (com fsync) como um registro 'put' antes de ser enviada
+    e recebe um registro 'ack' quando o envio é confirmado. Na abertura, os segmentos
+    são relidos em ordem e tudo que não foi confirmado volta como pendente, o que dá
+    entrega pelo menos uma vez. Um segmento é apagado quando todas as mensagens
+    gravadas nele e nos anteriores foram confirmadas. Mensagens com a mesma chave de deduplicação
+    (pendentes ou entregues recentemente) são ignoradas. O registro 'put' guarda também o
+    tipo de estatística da mensagem, para que um reenvio após a reinicialização ainda a conte.
+    """
+
+    def __init__(self, directory: str = OUTBOX_DIR, segment_size: int = OUTBOX_SEGMENT_SIZE,
+                 dedup_keys: int = OUTBOX_DEDUP_KEYS):
+        """
+        Inicializa a fila e reexecuta os segmentos existentes.
+
+        Args:
+            directory: Diretório dos segmentos
+            segment_size: Tamanho (bytes) a partir do qual um novo segmento é iniciado
+            dedup_keys: Quantidade de chaves já entregues lembradas para deduplicação
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.dedup_keys = dedup_keys
+
+        self._lock = threading.Lock()
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pending_keys: Dict[str, str] = {}
+        self._delivered_keys: "OrderedDict[str, None]" = OrderedDict()
+        self._segment_pending: Dict[int, int] = {}
+        self._segment = 0
+        self._file = None
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._replay()
+        self._open_segment(self._segment + 1)
+        self._collect_segments()
+        QUEUE_DEPTH.labels(queue='outbox').set_function(self.__len__)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def put(self, chat_id, payload: Dict[str, Any], key: Optional[str] = None,
+            stat: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Grava uma mensagem na fila.
+
+        Args:
+            chat_id: ID do chat de destino
+            payload: Conteúdo da mensagem (ex.: {'post': {...}} ou {'text': '...'})
+            key: Chave de deduplicação opcional
+            stat: Tipo de estatística contado quando o envio for confirmado (ex.: 'promo')
+
+        Returns:
+            Optional[Dict[str, Any]]: O item gravado, ou None se a chave já foi vista.
+        """
+        with self._lock:
+            if key is not None and (key in self._pending_keys or key in self._delivered_keys):
+                logger.debug("Mensagem duplicada ignorada na fila de saída: %s", key)
+                return None
+
+            item = {
+                'op': 'put',
+                'id': str(uuid.uuid4()),
+                'key': key,
+                'chat_id': chat_id,
+                'payload': payload,
+                'stat': stat,
+                'created_at': datetime.now().isoformat()
+            }
+            self._append(item, sync=True)
+            item['segment'] = self._segment
+            self._add_pending(item)
+            return item
+
+    def ack(self, item_id: str) -> bool:
+        """
+        Confirma a entrega de uma mensagem.
+
+        O registro de confirmação não usa fsync: se ele se perder numa queda, a
+        mensagem é apenas reenviada (entrega pelo menos uma vez).
+
+        Returns:
+            bool: True se a mensagem estava pendente.
+        """
+        with self._lock:
+            item = self._pending.get(item_id)
+            if item is None:
+                return False
+            self._append({'op': 'ack', 'id': item_id}, sync=False)
+            self._remove_pending(item)
+            return True
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Retorna as mensagens ainda não confirmadas, na ordem em que foram gravadas"""
+        with self._lock:
+            return list(self._pending.values())
+
+    def close(self):
+        """Grava os dados pendentes e fecha o segmento atual"""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"segment-{number:06d}.log")
+
+    def _segment_numbers(self) -> List[int]:
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith('segment-') and name.endswith('.log'):
+                try:
+                    numbers.append(int(name[len('segment-'):-len('.log')]))
+                except ValueError:
+                    continue
+        return sorted(numbers)
+
+    def _replay(self):
+        """Reconstrói as mensagens pendentes a partir dos segmentos"""
+        for number in self._segment_numbers():
+            self._segment = number
+            self._segment_pending.setdefault(number, 0)
+            try:
+                with open(self._segment_path(number), 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except json.JSONDecodeError:
+                            # Linha parcial de uma gravação interrompida
+                            continue
+                        if record.get('op') == 'put':
+                            record['segment'] = number
+                            self._add_pending(record)
+                        elif record.get('op') == 'ack':
+                            item = self._pending.get(record.get('id'))
+                            if item is not None:
+                                self._remove_pending(item)
+            except Exception as e:
+                logger.error("Erro ao ler segmento %s da fila de saída: %s", number, e)
+
+        if self._pending:
+            logger.info("Fila de saída: %s mensagem(ns) pendente(s) recuperada(s)", len(self._pending))
+
+    def _open_segment(self, number: int):
+        """Abre um novo segmento para gravação (com o lock adquirido, exceto na abertura)"""
+        if self._file is not None:
+            self._file.close()
+        self._segment = number
+        self._segment_pending.setdefault(number, 0)
+        self._file = open(self._segment_path(number), 'a', encoding='utf-8')
+
+    def _append(self, record: Dict[str, Any], sync: bool):
+        """Grava um registro no segmento atual (com o lock adquirido)"""
+        if self._file is None:
+            raise RuntimeError("Fila de saída fechada")
+        if self._file.tell() >= self.segment_size:
+            self._open_segment(self._segment + 1)
+            self._collect_segments()
+
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+    def _add_pending(self, item: Dict[str, Any]):
+        self._pending[item['id']] = item
+        if item.get('key') is not None:
+            self._pending_keys[item['key']] = item['id']
+        self._segment_pending[item['segment']] = self._segment_pending.get(item['segment'], 0) + 1
+
+    def _remove_pending(self, item: Dict[str, Any]):
+        del self._pending[item['id']]
+        key = item.get('key')
+        if key is not None:
+            self._pending_keys.pop(key, None)
+            self._delivered_keys[key] = None
+            while len(self._delivered_keys) > self.dedup_keys:
+                self._delivered_keys.popitem(last=False)
+
+        self._segment_pending[item['segment']] -= 1
+        if self._file is not None:
+            self._collect_segments()
+
+    def _collect_segments(self):
+        """
+        Remove os segmentos mais antigos que não têm mais mensagens pendentes.
+
+        A remoção é sempre a partir do início do log: uma confirmação fica em um
+        segmento igual ou posterior ao da mensagem, então apagar apenas o prefixo
+        nunca faz uma mensagem já confirmada voltar como pendente.
+        """
+        for number in sorted(self._segment_pending):
+            if number == self._segment or self._segment_pending[number] > 0:
+                break
+            self._delete_segment(number)
+
+    def _delete_segment(self, number: int):
+        try:
+            os.remove(self._segment_path(number))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error("Erro ao remover segmento %s da fila de saída: %s", number, e)
+        self._segment_pending.pop(number, None)
+
+
+class OutboxSender:
+    """
+    Envio de mensagens através da fila de saída.
+
+    Fica entre os agendadores e o manipulador do bot: cada mensagem é gravada na
+    fila antes do envio e confirmada quando o envio termina com sucesso. Usa o
+    SendPipeline quando disponível e o manipulador do bot como alternativa. Na
+    inicialização (e antes de cada novo envio) as mensagens pendentes são reenviadas.
+    """
+
+    def __init__(self, outbox: Outbox, bot_handler=None, pipeline=None,
+                 max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+                 stats: Optional[Dict[str, Callable[[], None]]] = None):
+        """
+        Inicializa o remetente.
+
+        Args:
+            outbox: Fila de saída persistente
+            bot_handler: Manipulador do bot (envio síncrono)
+            pipeline: SendPipeline opcional (envio assíncrono)
+            max_attempts: Tentativas por mensagem (nesta execução) antes de descartá-la
+            stats: Callbacks por tipo de estatística (ex.: {'promo': ...}), chamados na
+                   confirmação das mensagens pendentes de execuções anteriores, que
+                   não têm mais o seu on_sent
+        """
+        self.outbox = outbox
+        self.bot_handler = bot_handler
+        self.pipeline = pipeline
+        self.max_attempts = max_attempts
+        self.stats = stats or {}
+
+        self._lock = threading.Condition()
+        self._in_flight = set()
+        self._attempts: Dict[str, int] = {}
+        self._callbacks: Dict[str, Callable[[], None]] = {}
+
+    def start(self) -> int:
+        """
+        Reenvia as mensagens pendentes de execuções anteriores.
+
+        Returns:
+            int: Quantidade de mensagens reenviadas com sucesso (ou entregues ao pipeline).
+        """
+        return self.replay()
+
+    def stop(self, timeout: float = 5) -> bool:
+        """
+        Aguarda os envios em andamento serem concluídos (e confirmados na fila).
+
+        Deve ser chamado antes de parar o pipeline e de fechar a fila de saída.
+
+        Returns:
+            bool: True se nenhum envio ficou em andamento dentro do timeout.
+        """
+        with self._lock:
+            if not self._lock.wait_for(lambda: not self._in_flight, timeout):
+                logger.warning("%s envio(s) da fila de saída ainda em andamento", len(self._in_flight))
+                return False
+        return True
+
+    def send_post(self, chat_id, post: Dict[str, Any], key: Optional[str] = None,
+                  on_sent: Optional[Callable[[], None]] = None,
+                  on_queued: Optional[Callable[[], None]] = None,
+                  stat: Optional[str] = None) -> bool:
+        """
+        Enfileira e envia um post promocional.
+
+        Args:
+            chat_id: ID do chat de destino
+            post: Post promocional
+            key: Chave de deduplicação opcional
+            on_sent: Callback chamado uma vez quando o envio for confirmado
+            on_queued: Callback chamado quando o post está gravado na fila (ou já estava,
+                       com a mesma chave), antes do envio; ex.: avançar a rotação
+            stat: Tipo de estatística gravado com o post (ver stats no construtor)
+
+        Returns:
+            bool: True se o post foi enviado (ou entregue ao pipeline), ou era duplicado.
+        """
+        return self._send(chat_id, {'post': post}, key, on_sent, on_queued, stat)
+
+    def send_message(self, chat_id, text: str, key: Optional[str] = None,
+                     on_sent: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Enfileira e envia uma mensagem de texto.
+
+        Args:
+            chat_id: ID do chat de destino
+            text: Texto da mensagem
+            key: Chave de deduplicação opcional
+            on_sent: Callback chamado uma vez quando o envio for confirmado
+
+        Returns:
+            bool: True se a mensagem foi enviada (ou entregue ao pipeline), ou era duplicada.
+        """
+        return self._send(chat_id, {'text': text}, key, on_sent)
+
+    def replay(self) -> int:
+        """Reenvia as mensagens pendentes que não estão em andamento"""
+        delivered = 0
+        for item in self.outbox.pending():
+            with self._lock:
+                if item['id'] in self._in_flight:
+                    continue
+                # Gravada por uma execução anterior: a estatística vem do tipo salvo no item
+                stat_callback = self.stats.get(item.get('stat'))
+                if stat_callback is not None:
+                    self._callbacks.setdefault(item['id'], stat_callback)
+            if self._deliver(item):
+                delivered += 1
+        return delivered
+
+    def _send(self, chat_id, payload: Dict[str, Any], key: Optional[str],
+              on_sent: Optional[Callable[[], None]],
+              on_queued: Optional[Callable[[], None]] = None,
+              stat: Optional[str] = None) -> bool:
+        try:
+            # Mensagens que falharam antes saem primeiro, preservando a ordem
+            if len(self.outbox):
+                self.replay()
+
+            item = self.outbox.put(chat_id, payload, key=key, stat=stat)
+        except Exception as e:
+            logger.error("Erro ao gravar mensagem na fila de saída: %s", e)
+            return False
+        if on_queued is not None:
+            try:
+                on_queued()
+            except Exception as e:
+                logger.error("Erro no callback de gravação na fila de saída: %s", e)
+        if item is None:
+            return True
+
+        if on_sent is None:
+            on_sent = self.stats.get(stat)
+        if on_sent is not None:
+            with self._lock:
+                self._callbacks[item['id']] = on_sent
+        return self._deliver(item)
+
+    def _deliver(self, item: Dict[str, Any]) -> bool:
+        """Envia um item da fila; a confirmação acontece quando o envio for concluído"""
+        item_id = item['id']
+        chat_id = item['chat_id']
+        payload = item['payload']
+
+        with self._lock:
+            self._in_flight.add(item_id)
+
+        try:
+            if self.pipeline is not None and self.pipeline.is_running():
+                if 'post' in payload:
+                    future = self.pipeline.submit_post(chat_id, payload['post'])
+                else:
+                    future = self.pipeline.send_message(chat_id, payload.get('text', ''))
+                future.add_done_callback(
+                    lambda done: self._complete(item_id, done.exception() is None)
+                )
+                return True
+
+            if self.bot_handler is None:
+                self._complete(item_id, False)
+                return False
+
+            if 'post' in payload:
+                success = self.bot_handler.send_promotional_post(payload['post'], chat_id=chat_id)
+            else:
+                success = self.bot_handler.send_message(payload.get('text', ''), chat_id=chat_id)
+            self._complete(item_id, bool(success))
+            return bool(success)
+        except Exception as e:
+            logger.error("Erro ao enviar mensagem %s da fila de saída: %s", item_id, e)
+            self._complete(item_id, False)
+            return False
+
+    def _complete(self, item_id: str, success: bool):
+        """Confirma (ou mantém pendente) um item após a tentativa de envio"""
+        try:
+            self._finish(item_id, success)
+        finally:
+            # O item só deixa de estar em andamento depois de confirmado: stop() não
+            # deixa a fila ser fechada entre o envio e a confirmação
+            with self._lock:
+                self._in_flight.discard(item_id)
+                self._lock.notify_all()
+
+    def _finish(self, item_id: str, success: bool):
+        """Confirma o item na fila e chama o callback, ou o mantém pendente para outra tentativa"""
+        with self._lock:
+            attempts = self._attempts.get(item_id, 0) + 1
+            if success or attempts >= self.max_attempts:
+                self._attempts.pop(item_id, None)
+                # Descartada, a mensagem não chama o callback, mas ele também sai da tabela
+                callback = self._callbacks.pop(item_id, None)
+                if not success:
+                    callback = None
+            else:
+                self._attempts[item_id] = attempts
+
+        if not success:
+            if attempts < self.max_attempts:
+                logger.warning("Mensagem %s continua pendente na fila de saída", item_id)
+                return
+            logger.error("Mensagem %s descartada da fila de saída após %s tentativas", item_id, attempts)
+
+        try:
+            self.outbox.ack(item_id)
+        except Exception as e:
+            logger.error("Erro ao confirmar mensagem %s na fila de saída: %s", item_id, e)
+        if callback is not None:
+            try:
+                callback()
+            except Exception as e:
+                logger.error("Erro no callback de envio da mensagem %s: %s", item_id, e)
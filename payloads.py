@@ -0,0 +1,137 @@
+import html
+import logging
+from typing import Optional, Dict, Any
+
+from config import POST_PARSE_MODE, POST_LINK_PREVIEW
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Limites da Bot API (caracteres visíveis, contados em unidades UTF-16)
+CAPTION_LIMIT = 1024
+MESSAGE_LIMIT = 4096
+
+PARSE_MODES = ('', 'HTML', 'MarkdownV2')
+
+_PAYLOAD_VERSION = 1
+_ELLIPSIS = '…'
+_MARKDOWN_V2_SPECIAL = set('_*[]()~`>#+-=|{}.!\\')
+
+
+def escape(text: str, parse_mode: str) -> str:
+    """Escapa um texto para ser exibido literalmente no parse_mode informado"""
+    if parse_mode == 'HTML':
+        return html.escape(text, quote=False)
+    if parse_mode == 'MarkdownV2':
+        return ''.join('\\' + char if char in _MARKDOWN_V2_SPECIAL else char for char in text)
+    return text
+
+
+def _utf16_len(text: str) -> int:
+    return len(text.encode('utf-16-le')) // 2
+
+
+def truncate(text: str, limit: int) -> str:
+    """Corta um texto para caber em `limit` unidades UTF-16, terminando com reticências"""
+    if _utf16_len(text) <= limit:
+        return text
+    budget = limit - 1
+    used = 0
+    for end, char in enumerate(text):
+        used += 2 if ord(char) > 0xFFFF else 1
+        if used > budget:
+            return text[:end].rstrip() + _ELLIPSIS
+    return text
+
+
+def render_post(post: Dict[str, Any], parse_mode: str = POST_PARSE_MODE,
+                link_preview: bool = POST_LINK_PREVIEW) -> Dict[str, Any]:
+    """
+    Compila um post promocional na mensagem pronta para envio.
+
+    O texto (text ou content) é cortado para o limite da legenda (foto) ou da
+    mensagem, já descontando o link externo anexado ao final, e então escapado para
+    o parse_mode. Em mensagens de texto, a prévia do link externo é ativada ou
+    desativada conforme link_preview.
+
+    Args:
+        post: Post promocional
+        parse_mode: '', 'HTML' ou 'MarkdownV2'
+        link_preview: Exibir a prévia do link externo
+
+    Returns:
+        Dict[str, Any]: {"method": "sendPhoto" ou "sendMessage", "params": {...}, ...}
+        (params sem chat_id).
+
+    Raises:
+        ValueError: Se o parse_mode for desconhecido.
+    """
+    if parse_mode not in PARSE_MODES:
+        raise ValueError(f"parse_mode desconhecido: {parse_mode} (use {', '.join(repr(m) for m in PARSE_MODES)})")
+
+    text = post.get('text') or post.get('content', '') or ''
+    external_link = post.get('external_link', '') or ''
+    image_url = post.get('image_url', '') or ''
+
+    limit = CAPTION_LIMIT if image_url else MESSAGE_LIMIT
+    suffix = f"\n\n{external_link}" if external_link else ''
+    if suffix and _utf16_len(suffix) >= limit:
+        suffix = ''
+    body = truncate(text, limit - _utf16_len(suffix))
+    rendered = escape(body + suffix, parse_mode)
+
+    params: Dict[str, Any] = {}
+    if image_url:
+        method = 'sendPhoto'
+        params['photo'] = image_url
+        params['caption'] = rendered
+    else:
+        method = 'sendMessage'
+        params['text'] = rendered
+        if external_link and link_preview:
+            params['link_preview_options'] = {'url': external_link}
+        else:
+            params['link_preview_options'] = {'is_disabled': True}
+    if parse_mode:
+        params['parse_mode'] = parse_mode
+
+    return {
+        'version': _PAYLOAD_VERSION,
+        'parse_mode': parse_mode,
+        'link_preview': link_preview,
+        'method': method,
+        'params': params
+    }
+
+
+def is_current(payload: Optional[Dict[str, Any]], post: Dict[str, Any],
+               parse_mode: str = POST_PARSE_MODE, link_preview: bool = POST_LINK_PREVIEW) -> bool:
+    """Verifica se um payload salvo ainda corresponde à configuração e à imagem do post"""
+    return bool(payload) \
+        and payload.get('version') == _PAYLOAD_VERSION \
+        and payload.get('parse_mode') == parse_mode \
+        and payload.get('link_preview') == link_preview \
+        and payload.get('params', {}).get('photo', '') == (post.get('image_url', '') or '')
+
+
+def attach_payload(post: Dict[str, Any]) -> Dict[str, Any]:
+    """Compila e guarda o payload no próprio post (na criação ou edição); retorna o post"""
+    try:
+        post['payload'] = render_post(post)
+    except Exception as e:
+        logger.error("Erro ao compilar mensagem do post %s: %s", post.get('id'), e)
+        post.pop('payload', None)
+    return post
+
+
+def payload_for(post: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Payload pronto para envio de um post.
+
+    Usa o payload guardado no post; posts antigos (sem payload) ou compilados com
+    outra configuração são compilados na hora.
+    """
+    payload = post.get('payload')
+    if is_current(payload, post):
+        return payload
+    return render_post(post)
@@ -0,0 +1,157 @@
+import json
+import base64
+import bisect
+import logging
+from typing import Optional, List, Dict, Any, Tuple
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(key: Tuple[str, str]) -> str:
+    """Codifica a chave (created_at, id) do último post de uma página em um cursor opaco"""
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decodifica um cursor gerado por encode_cursor.
+
+    Raises:
+        ValueError: Se o cursor for inválido.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, post_id = json.loads(raw.decode('utf-8'))
+        return str(created_at), str(post_id)
+    except Exception:
+        raise ValueError(f"Cursor inválido: {cursor!r}")
+
+
+class PostIndex:
+    """
+    Índice dos posts promocionais ordenado por created_at (mais recente primeiro).
+
+    As chaves (created_at, id) ficam em uma lista ordenada mantida por add/update/
+    remove, sem reordenar a lista inteira. Uma página é lida a partir da posição do
+    cursor, que guarda a chave do último post entregue: o custo de uma página depende
+    do tamanho da página, não do catálogo, e a paginação continua correta mesmo se
+    posts forem incluídos ou excluídos entre duas requisições.
+
+    Os filtros (texto, com imagem, com link) usam campos pré-calculados de cada post.
+    """
+
+    def __init__(self, posts: Optional[List[Dict[str, Any]]] = None):
+        """
+        Inicializa o índice.
+
+        Args:
+            posts: Posts para a carga inicial (opcional)
+        """
+        self._keys: List[Tuple[str, str]] = []
+        self._key_by_id: Dict[str, Tuple[str, str]] = {}
+        self._posts: Dict[str, Dict[str, Any]] = {}
+        self._text: Dict[str, str] = {}
+        if posts:
+            self.build(posts)
+
+    def build(self, posts: List[Dict[str, Any]]):
+        """Reconstrói o índice a partir da lista de posts"""
+        self._keys = []
+        self._key_by_id = {}
+        self._posts = {}
+        self._text = {}
+        for post in posts:
+            if post.get('id') and post['id'] not in self._posts:
+                self._store(post)
+                self._keys.append(self._key_by_id[post['id']])
+        self._keys.sort()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def get(self, post_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna um post indexado pelo ID"""
+        return self._posts.get(post_id)
+
+    def ids(self) -> List[str]:
+        """IDs de todos os posts, do mais antigo para o mais recente"""
+        return [post_id for _, post_id in self._keys]
+
+    def add(self, post: Dict[str, Any]):
+        """Insere um post na posição correspondente ao seu created_at"""
+        post_id = post.get('id')
+        if not post_id:
+            return
+        if post_id in self._posts:
+            self.update(post)
+            return
+        self._store(post)
+        bisect.insort(self._keys, self._key_by_id[post_id])
+
+    def update(self, post: Dict[str, Any]):
+        """Atualiza um post, reposicionando-o se o created_at mudou"""
+        post_id = post.get('id')
+        if post_id not in self._posts:
+            self.add(post)
+            return
+        self.remove(post_id)
+        self.add(post)
+
+    def remove(self, post_id: str):
+        """Remove um post do índice"""
+        key = self._key_by_id.pop(post_id, None)
+        if key is None:
+            return
+        del self._keys[bisect.bisect_left(self._keys, key)]
+        del self._posts[post_id]
+        del self._text[post_id]
+
+    def page(self, cursor: Optional[str] = None, limit: int = 20, text: Optional[str] = None,
+             has_image: Optional[bool] = None, has_link: Optional[bool] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Retorna uma página de posts, do mais recente para o mais antigo.
+
+        Args:
+            cursor: Cursor retornado pela página anterior (None = primeira página)
+            limit: Número máximo de posts na página
+            text: Filtra posts cujo título ou conteúdo contenha o texto (sem diferenciar maiúsculas)
+            has_image: Filtra posts com (True) ou sem (False) imagem
+            has_link: Filtra posts com (True) ou sem (False) link externo
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: Posts da página e cursor da próxima
+            página (None se esta for a última).
+
+        Raises:
+            ValueError: Se o cursor for inválido.
+        """
+        position = len(self._keys)
+        if cursor:
+            position = bisect.bisect_left(self._keys, decode_cursor(cursor))
+        needle = text.casefold() if text else None
+
+        posts = []
+        while position > 0 and len(posts) < limit:
+            position -= 1
+            post_id = self._keys[position][1]
+            post = self._posts[post_id]
+            if has_image is not None and bool(post.get('image_url')) != has_image:
+                continue
+            if has_link is not None and bool(post.get('external_link')) != has_link:
+                continue
+            if needle and needle not in self._text[post_id]:
+                continue
+            posts.append(post)
+
+        next_cursor = None
+        if posts and position > 0:
+            next_cursor = encode_cursor(self._key_by_id[posts[-1]['id']])
+        return posts, next_cursor
+
+    def _store(self, post: Dict[str, Any]):
+        post_id = post['id']
+        self._key_by_id[post_id] = (str(post.get('created_at', '')), post_id)
+        self._posts[post_id] = post
+        self._text[post_id] = f"{post.get('title', '')}\n{post.get('content', '')}".casefold()
@@ -0,0 +1,535 @@
+import math
+import time
+import bisect
+import logging
+import threading
+from datetime import datetime, date, timedelta, timezone
+from typing import Optional, Dict, Any, List, Tuple, FrozenSet, Callable
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:
+    ZoneInfo = None
+    ZoneInfoNotFoundError = KeyError
+
+from config import SCHEDULE_TIMEZONE, SCHEDULE_HORIZON_DAYS
+from tick_schedule import TickSchedule
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Campos aceitos em bot_config['schedule']
+SCHEDULE_KEYS = ('timezone', 'interval', 'active_hours', 'days', 'cron', 'weights')
+
+# Dias da semana aceitos em 'days' (segunda = 0, como datetime.weekday())
+DAY_NAMES = {
+    'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6,
+    'seg': 0, 'ter': 1, 'qua': 2, 'qui': 3, 'sex': 4, 'sab': 5, 'sáb': 5, 'dom': 6
+}
+
+# Atalhos de expressões cron
+CRON_MACROS = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *',
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *'
+}
+
+_CRON_MONTHS = {name: i + 1 for i, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'))}
+_CRON_WEEKDAYS = {name: i for i, name in enumerate(('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'))}
+
+# (mínimo, máximo, nomes) de cada campo: minuto, hora, dia do mês, mês, dia da semana
+_CRON_FIELDS = ((0, 59, None), (0, 23, None), (1, 31, None), (1, 12, _CRON_MONTHS), (0, 7, _CRON_WEEKDAYS))
+
+# Peso máximo de um post (quantas vezes ele aparece em cada ciclo da rotação)
+MAX_WEIGHT = 100
+
+# Sem nenhum disparo dentro deste prazo, o calendário é considerado vazio (cobre 29 de fevereiro)
+_SEARCH_LIMIT = (4 * 365 + 2) * 86400.0
+
+
+class ScheduleError(ValueError):
+    """Calendário de posts inválido"""
+
+
+class CronExpression:
+    """
+    Expressão cron de 5 campos: minuto, hora, dia do mês, mês e dia da semana.
+
+    Aceita *, listas (1,15), faixas (9-18), passos (*/15, 8-20/2), nomes de meses
+    e dias (jan, mon) e os atalhos @hourly, @daily, @weekly, @monthly e @yearly.
+    Como no cron, quando dia do mês e dia da semana são ambos restritos, basta um
+    deles coincidir.
+    """
+
+    def __init__(self, source: str):
+        """
+        Analisa uma expressão.
+
+        Raises:
+            ScheduleError: Se a expressão for inválida.
+        """
+        self.source = source
+        text = str(source).strip().lower()
+        fields = CRON_MACROS.get(text, text).split()
+        if len(fields) != 5:
+            raise ScheduleError(f"Expressão cron deve ter 5 campos: {source!r}")
+
+        minutes, hours, days, months, weekdays = (
+            _parse_cron_field(field, low, high, names, source)
+            for field, (low, high, names) in zip(fields, _CRON_FIELDS)
+        )
+        self.days = days
+        self.months = months
+        # Domingo é 0 ou 7 no cron; convertido para a numeração de datetime.weekday()
+        self.weekdays = frozenset((day - 1) % 7 for day in weekdays)
+        self.times: List[Tuple[int, int]] = [(hour, minute) for hour in sorted(hours) for minute in sorted(minutes)]
+        self._days_restricted = not fields[2].startswith('*')
+        self._weekdays_restricted = not fields[4].startswith('*')
+
+    def matches_date(self, day: date) -> bool:
+        """Se a expressão dispara em algum horário desta data"""
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        in_weekdays = day.weekday() in self.weekdays
+        if self._days_restricted and self._weekdays_restricted:
+            return in_days or in_weekdays
+        if self._days_restricted:
+            return in_days
+        if self._weekdays_restricted:
+            return in_weekdays
+        return True
+
+
+class CompiledSchedule:
+    """
+    Calendário de posts compilado em uma tabela ordenada de horários de disparo.
+
+    Formato de bot_config['schedule'] (todos os campos são opcionais):
+        timezone      fuso dos horários (padrão: SCHEDULE_TIMEZONE)
+        interval      minutos entre posts dentro das janelas (padrão: interval do bot)
+        active_hours  janelas [["08:00", "12:00"], "14:00-22:00"]; uma janela que
+                      termina antes de começar atravessa a meia-noite e pertence ao
+                      dia em que começa
+        days          dias da semana ["mon-fri", "sab"] (nomes em inglês ou português,
+                      ou números com segunda = 0)
+        cron          expressões cron (no fuso do calendário); substituem o intervalo,
+                      e active_hours/days, se informados, filtram os disparos
+        weights       pesos por post {id: n} usados pela rotação (0 = nunca enviar)
+
+    Sem cron, os posts saem a cada `interval` minutos a partir do início de cada
+    janela (ou da meia-noite, sem janelas). Horários locais inexistentes (início do
+    horário de verão) são pulados nos disparos cron e deslocados para depois da
+    mudança nos limites das janelas; horários repetidos disparam uma única vez.
+
+    As regras são avaliadas apenas ao compilar e ao estender a tabela (em blocos de
+    SCHEDULE_HORIZON_DAYS dias): o próximo disparo é uma busca binária nos horários
+    já calculados, O(log n), em vez de reavaliar janelas, dias e cron a cada disparo.
+    """
+
+    def __init__(self, spec: Dict[str, Any], default_interval: Optional[float] = None,
+                 horizon_days: float = SCHEDULE_HORIZON_DAYS, now: Optional[float] = None):
+        """
+        Compila um calendário.
+
+        Args:
+            spec: Calendário no formato de bot_config['schedule']
+            default_interval: Intervalo (minutos) usado se o calendário não definir o seu
+            horizon_days: Dias pré-calculados a cada extensão da tabela
+            now: Horário (epoch) a partir do qual os disparos são calculados; padrão: agora
+
+        Raises:
+            ScheduleError: Se o calendário for inválido ou nunca disparar.
+        """
+        unknown = sorted(set(spec) - set(SCHEDULE_KEYS))
+        if unknown:
+            raise ScheduleError(f"Campos desconhecidos no calendário: {', '.join(unknown)}")
+
+        self.spec = spec
+        self.timezone = spec.get('timezone') or SCHEDULE_TIMEZONE
+        self.tz = _load_timezone(self.timezone)
+        self.windows = [_parse_window(window) for window in _as_list(spec.get('active_hours'))]
+        self.days: Optional[FrozenSet[int]] = _parse_days(spec.get('days'))
+        self.cron = [CronExpression(expression) for expression in _as_list(spec.get('cron'))]
+        self.weights = parse_weights(spec.get('weights'))
+
+        # Intervalo em segundos (None quando os disparos vêm do cron)
+        self.interval: Optional[float] = None
+        if not self.cron:
+            try:
+                minutes = float(spec.get('interval', default_interval))
+            except (TypeError, ValueError):
+                raise ScheduleError(f"Intervalo inválido: {spec.get('interval', default_interval)!r}")
+            if not minutes > 0:
+                raise ScheduleError("O intervalo deve ser maior que zero")
+            self.interval = minutes * 60
+
+        self._horizon = horizon_days * 86400
+        self._lock = threading.Lock()
+        self._times: List[float] = []
+        now = time.time() if now is None else now
+        self._end = now  # A tabela cobre os horários até aqui (exclusivo)
+        with self._lock:
+            self._extend(now + self._horizon)
+            if self._find(now, 0) is None:
+                raise ScheduleError("O calendário não tem nenhum horário de post")
+
+    def __len__(self) -> int:
+        """Horários atualmente na tabela"""
+        return len(self._times)
+
+    def next_after(self, t: float) -> Optional[float]:
+        """Primeiro disparo depois de t (epoch), ou None se não houver"""
+        with self._lock:
+            return self._find(t, 0)
+
+    def advance(self, slot: float, count: int) -> Optional[float]:
+        """Disparo `count` posições depois de `slot` (um horário da tabela), ou None se não houver"""
+        with self._lock:
+            return self._find(slot, count, bisect.bisect_left)
+
+    def count_between(self, start: float, end: float) -> int:
+        """Número de disparos em [start, end]"""
+        if end < start:
+            return 0
+        with self._lock:
+            while self._end <= end:
+                self._extend(self._end + self._horizon)
+            return bisect.bisect_right(self._times, end) - bisect.bisect_left(self._times, start)
+
+    def upcoming(self, count: int = 10, after: Optional[float] = None) -> List[str]:
+        """Próximos disparos, como data/hora ISO no fuso do calendário"""
+        result = []
+        t = time.time() if after is None else after
+        for _ in range(count):
+            t = self.next_after(t)
+            if t is None:
+                break
+            result.append(self.isoformat(t))
+        return result
+
+    def isoformat(self, t: float) -> str:
+        """Data/hora ISO de um horário (epoch) no fuso do calendário"""
+        return datetime.fromtimestamp(t, self.tz).isoformat(timespec='seconds')
+
+    def evaluate(self, start: float, end: float) -> List[float]:
+        """
+        Avalia as regras e retorna os disparos em [start, end), em ordem.
+
+        Usado para preencher a tabela; a cada disparo, o agendador consulta a tabela
+        em vez de chamar este método.
+        """
+        first_day = datetime.fromtimestamp(start, self.tz).date() - timedelta(days=1)  # Janelas da véspera
+        last_day = datetime.fromtimestamp(end, self.tz).date()
+        fires = set()
+        day = first_day
+        while day <= last_day:
+            if self.cron:
+                for expression in self.cron:
+                    if not expression.matches_date(day):
+                        continue
+                    for hour, minute in expression.times:
+                        t = _local_epoch(day, hour * 60 + minute, self.tz, strict=True)
+                        if t is not None and start <= t < end and self._allowed(t):
+                            fires.add(t)
+            elif self.days is None or day.weekday() in self.days:
+                for window_start, window_end in self.windows or [(0, 0)]:
+                    t = _local_epoch(day, window_start, self.tz)
+                    stop = min(end, _local_epoch(day if window_end > window_start else day + timedelta(days=1),
+                                                 window_end, self.tz))
+                    if t < start:
+                        t += math.ceil((start - t) / self.interval) * self.interval
+                    while t < stop:
+                        fires.add(t)
+                        t += self.interval
+            day += timedelta(days=1)
+        return sorted(fires)
+
+    def _find(self, t: float, offset: int, search: Callable = bisect.bisect_right) -> Optional[float]:
+        """Busca na tabela (com o lock adquirido), estendendo-a até o prazo de busca"""
+        while True:
+            index = search(self._times, t) + offset
+            if index < len(self._times):
+                return self._times[index]
+            if self._end - t > _SEARCH_LIMIT:
+                return None
+            self._extend(self._end + self._horizon)
+
+    def _extend(self, until: float):
+        """Calcula os disparos de _end até `until` e descarta os já antigos (com o lock adquirido)"""
+        self._times.extend(self.evaluate(self._end, until))
+        self._end = until
+        cut = bisect.bisect_left(self._times, until - 4 * self._horizon)
+        if cut:
+            del self._times[:cut]
+
+    def _allowed(self, t: float) -> bool:
+        """Se um disparo cron cai dentro das janelas e dos dias permitidos"""
+        if not self.windows and self.days is None:
+            return True
+        local = datetime.fromtimestamp(t, self.tz)
+        minute = local.hour * 60 + local.minute
+        weekday = local.weekday()
+        if not self.windows:
+            return weekday in self.days
+        for window_start, window_end in self.windows:
+            if window_start < window_end:
+                if window_start <= minute < window_end and self._day_allowed(weekday):
+                    return True
+            # Janela que atravessa a meia-noite: o fim pertence ao dia em que ela começou
+            elif (minute >= window_start and self._day_allowed(weekday)) or \
+                    (minute < window_end and self._day_allowed((weekday - 1) % 7)):
+                return True
+        return False
+
+    def _day_allowed(self, weekday: int) -> bool:
+        return self.days is None or weekday in self.days
+
+
+class CalendarTicks(TickSchedule):
+    """
+    Horários de post vindos de um CompiledSchedule, no relógio de parede.
+
+    O próximo horário previsto é uma busca binária na tabela do calendário; atraso,
+    horários perdidos e política de recuperação funcionam como em TickSchedule. O modo
+    é sempre 'anchored': os horários são os do calendário, não contados a partir do
+    fim do envio anterior.
+    """
+
+    def __init__(self, calendar: CompiledSchedule, name: str = 'scheduler',
+                 clock: Callable[[], float] = time.time, **kwargs):
+        """
+        Inicializa os horários a partir do próximo disparo do calendário.
+
+        Args:
+            calendar: Calendário compilado
+            name: Nome do agendador (rótulo das métricas)
+            clock: Relógio de parede (epoch)
+            **kwargs: catch_up, max_catch_up e history, como em TickSchedule
+        """
+        self.calendar = calendar
+        self._clock = clock
+        now = clock()
+        first_due = calendar.next_after(now)
+        super().__init__(calendar.interval or 0, first_due if first_due is not None else now + _SEARCH_LIMIT,
+                         name=name, mode='anchored', **kwargs)
+
+    def set_interval(self, interval: float):
+        """O intervalo faz parte do calendário: mudanças chegam com um novo calendário"""
+
+    def stats(self, now: Optional[float] = None) -> Dict[str, Any]:
+        stats = super().stats(now)
+        stats['timezone'] = self.calendar.timezone
+        stats['next_at'] = self.calendar.isoformat(self.next_intended)
+        return stats
+
+    def _slot_time(self, now: float) -> float:
+        return self._clock()
+
+    def _advance(self, slot: float, count: int) -> float:
+        following = self.calendar.advance(slot, count)
+        # Sem disparos dentro do prazo de busca: confere de novo bem mais tarde
+        return following if following is not None else slot + _SEARCH_LIMIT
+
+    def _due_count(self, current: float) -> int:
+        return self.calendar.count_between(self._next, current)
+
+
+def has_calendar(spec: Optional[Dict[str, Any]]) -> bool:
+    """Se o calendário tem regras de horário (janelas, dias ou cron), além de pesos"""
+    return bool(spec) and any(spec.get(key) for key in ('active_hours', 'days', 'cron'))
+
+
+def compile_schedule(spec: Optional[Dict[str, Any]], default_interval: Optional[float] = None) -> Optional[CompiledSchedule]:
+    """
+    Valida e compila um calendário de posts.
+
+    Args:
+        spec: Calendário no formato de bot_config['schedule'] (ou None)
+        default_interval: Intervalo (minutos) do bot, usado se o calendário não definir o seu
+
+    Returns:
+        Optional[CompiledSchedule]: Calendário compilado, ou None se não houver regras de
+        horário (os posts seguem apenas o intervalo).
+
+    Raises:
+        ScheduleError: Se o calendário for inválido.
+    """
+    if spec is None:
+        return None
+    if not isinstance(spec, dict):
+        raise ScheduleError("O calendário deve ser um objeto")
+    if not has_calendar(spec):
+        unknown = sorted(set(spec) - set(SCHEDULE_KEYS))
+        if unknown:
+            raise ScheduleError(f"Campos desconhecidos no calendário: {', '.join(unknown)}")
+        parse_weights(spec.get('weights'))
+        return None
+    return CompiledSchedule(spec, default_interval)
+
+
+def parse_weights(weights: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Valida os pesos por post.
+
+    Raises:
+        ScheduleError: Se algum peso não for um inteiro entre 0 e MAX_WEIGHT.
+    """
+    if not weights:
+        return {}
+    if not isinstance(weights, dict):
+        raise ScheduleError("'weights' deve ser um objeto {id do post: peso}")
+    result = {}
+    for post_id, weight in weights.items():
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight != int(weight):
+            raise ScheduleError(f"Peso inválido para o post {post_id}: {weight!r}")
+        if not 0 <= weight <= MAX_WEIGHT:
+            raise ScheduleError(f"Peso do post {post_id} deve estar entre 0 e {MAX_WEIGHT}")
+        result[str(post_id)] = int(weight)
+    return result
+
+
+def ticks_for(current: Optional[TickSchedule], calendar: Optional[CompiledSchedule], interval: float,
+              first_due: float, name: str) -> TickSchedule:
+    """
+    Horários de um agendador conforme a configuração atual.
+
+    Reaproveita os horários atuais quando possível (mesmo calendário, ou apenas troca
+    de intervalo, mantendo a âncora) e cria novos quando o calendário muda.
+
+    Args:
+        current: Horários atuais do agendador (ou None)
+        calendar: Calendário compilado (DataManager.get_schedule()) ou None
+        interval: Intervalo entre posts, em segundos (usado sem calendário)
+        first_due: Primeiro horário previsto (relógio do agendador) se novos horários por
+            intervalo forem criados
+        name: Nome do agendador
+    """
+    if calendar is not None:
+        if isinstance(current, CalendarTicks) and current.calendar is calendar:
+            return current
+        logger.info("Agendador %s seguindo o calendário de posts (fuso %s)", name, calendar.timezone)
+        return CalendarTicks(calendar, name=name)
+    if current is None or isinstance(current, CalendarTicks):
+        return TickSchedule(interval, first_due, name=name)
+    current.set_interval(interval)
+    return current
+
+
+def _load_timezone(name: str):
+    if name.upper() == 'UTC':
+        return timezone.utc
+    if ZoneInfo is None:
+        raise ScheduleError(f"Fuso horário {name} indisponível: módulo zoneinfo ausente (use UTC)")
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ScheduleError(f"Fuso horário desconhecido: {name}")
+
+
+def _local_epoch(day: date, minutes: int, tz, strict: bool = False) -> Optional[float]:
+    """
+    Epoch de um horário local (minutos desde a meia-noite, 1440 = meia-noite seguinte).
+
+    Horários repetidos usam a primeira ocorrência. Horários inexistentes retornam None
+    com strict=True; sem strict, caem depois da mudança de horário.
+    """
+    if minutes >= 1440:
+        day += timedelta(days=1)
+        minutes -= 1440
+    naive = datetime(day.year, day.month, day.day, minutes // 60, minutes % 60)
+    aware = naive.replace(tzinfo=tz)
+    if strict and aware.astimezone(timezone.utc).astimezone(tz).replace(tzinfo=None) != naive:
+        return None
+    return aware.timestamp()
+
+
+def _as_list(value) -> List[Any]:
+    if not value:
+        return []
+    if isinstance(value, (str, tuple)):
+        return [value]
+    if not isinstance(value, list):
+        raise ScheduleError(f"Esperada uma lista: {value!r}")
+    return value
+
+
+def _parse_time(text) -> int:
+    """'HH:MM' em minutos desde a meia-noite ('24:00' = 1440)"""
+    try:
+        hours, minutes = str(text).strip().split(':')
+        hours, minutes = int(hours), int(minutes)
+    except ValueError:
+        raise ScheduleError(f"Horário inválido (use HH:MM): {text!r}")
+    value = hours * 60 + minutes
+    if not 0 <= minutes < 60 or not 0 <= value <= 1440:
+        raise ScheduleError(f"Horário inválido (use HH:MM): {text!r}")
+    return value
+
+
+def _parse_window(window) -> Tuple[int, int]:
+    """Janela ["HH:MM", "HH:MM"] ou "HH:MM-HH:MM" em (início, fim) em minutos"""
+    if isinstance(window, str):
+        window = window.split('-')
+    if not isinstance(window, (list, tuple)) or len(window) != 2:
+        raise ScheduleError(f"Janela inválida (use [\"HH:MM\", \"HH:MM\"]): {window!r}")
+    start, end = (_parse_time(value) for value in window)
+    return start % 1440, end
+
+
+def _parse_day(value) -> int:
+    if isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= 6:
+        return value
+    day = DAY_NAMES.get(str(value).strip().lower()[:3]) if isinstance(value, str) else None
+    if day is None:
+        raise ScheduleError(f"Dia da semana inválido: {value!r}")
+    return day
+
+
+def _parse_days(days) -> Optional[FrozenSet[int]]:
+    """Dias da semana (nomes, números ou faixas 'mon-fri') em um conjunto; None = todos"""
+    result = set()
+    for value in _as_list(days):
+        if isinstance(value, str) and '-' in value:
+            first, last = (_parse_day(part) for part in value.split('-', 1))
+            result.update((first + i) % 7 for i in range((last - first) % 7 + 1))
+        else:
+            result.add(_parse_day(value))
+    return frozenset(result) if result else None
+
+
+def _parse_cron_number(text: str, names: Optional[Dict[str, int]], source: str) -> int:
+    if names and text in names:
+        return names[text]
+    try:
+        return int(text)
+    except ValueError:
+        raise ScheduleError(f"Valor inválido na expressão cron {source!r}: {text!r}")
+
+
+def _parse_cron_field(field: str, low: int, high: int, names: Optional[Dict[str, int]], source: str) -> FrozenSet[int]:
+    values = set()
+    for part in field.split(','):
+        step = 1
+        stepped = '/' in part
+        if stepped:
+            part, step_text = part.split('/', 1)
+            step = _parse_cron_number(step_text, None, source)
+            if step < 1:
+                raise ScheduleError(f"Passo inválido na expressão cron {source!r}: {step_text!r}")
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (_parse_cron_number(value, names, source) for value in part.split('-', 1))
+        else:
+            start = _parse_cron_number(part, names, source)
+            end = high if stepped else start
+        if not low <= start <= end <= high:
+            raise ScheduleError(f"Valor fora da faixa {low}-{high} na expressão cron {source!r}: {part!r}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
@@ -0,0 +1,235 @@
+import math
+import logging
+import threading
+import time
+from typing import Dict, Callable
+
+from config import RATE_LIMIT_GLOBAL_PER_SECOND, RATE_LIMIT_CHAT_PER_MINUTE
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class SimulatedClock:
+    """
+    Relógio determinístico para testes e benchmarks do limitador.
+
+    O tempo só avança quando sleep() ou advance() são chamados, de modo que uma
+    simulação de milhares de envios roda instantaneamente e sempre com o mesmo resultado.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        """Avança o relógio"""
+        if seconds > 0:
+            self.now += seconds
+
+    sleep = advance
+
+
+class TokenBucket:
+    """
+    Balde de tokens que aceita reservas futuras.
+
+    Em vez de guardar a contagem de tokens, o balde guarda o instante teórico em que
+    ele estará cheio de novo (forma equivalente ao GCRA). Com isso, reservar um token
+    quando o balde está vazio não falha: a reserva devolve o instante em que o token
+    estará disponível, e as reservas seguintes ficam enfileiradas depois dela.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Inicializa o balde.
+
+        Args:
+            rate: Tokens repostos por segundo
+            capacity: Tamanho da rajada (tokens disponíveis com o balde cheio)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._interval = 1.0 / rate
+        self._tolerance = (capacity - 1) * self._interval
+        self._full_at = 0.0
+
+    def available_at(self, at: float) -> float:
+        """Retorna o primeiro instante, a partir de `at`, em que há um token disponível"""
+        return max(at, self._full_at - self._tolerance)
+
+    def consume(self, at: float):
+        """Consome um token no instante `at` (que deve vir de available_at)"""
+        self._full_at = max(self._full_at, at) + self._interval
+
+    def block_until(self, until: float):
+        """Impede novos envios antes de `until` (usado com o retry_after de um 429)"""
+        self._full_at = max(self._full_at, until + self._tolerance)
+
+    def is_full(self, at: float) -> bool:
+        """Verifica se o balde já se recompôs totalmente em `at`"""
+        return self._full_at <= at
+
+
+class SlotCalendar:
+    """
+    Agenda de envios globais dividida em fatias de 1/rate segundos.
+
+    Cada fatia aceita até `capacity` envios. Uma reserva ocupa a primeira fatia com
+    vaga a partir do instante pedido, sem consumir as fatias anteriores: um chat com
+    fila longa reserva fatias no futuro e deixa livres as de agora para os outros
+    chats. As fatias cheias apontam para a seguinte (com compressão de caminho), de
+    modo que achar uma vaga não percorre a fila inteira.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Inicializa a agenda.
+
+        Args:
+            rate: Fatias por segundo
+            capacity: Envios por fatia
+        """
+        self.rate = rate
+        self.capacity = max(1, int(capacity))
+        self._counts: Dict[int, int] = {}
+        self._next: Dict[int, int] = {}  # Fatia cheia -> fatia seguinte com possível vaga
+        self._blocked_until = 0.0
+
+    def reserve(self, at: float) -> float:
+        """Reserva um envio na primeira fatia com vaga a partir de `at` e retorna o instante do envio"""
+        at = max(at, self._blocked_until)
+        slot = self._find(math.floor(at * self.rate))
+        count = self._counts.get(slot, 0) + 1
+        self._counts[slot] = count
+        if count >= self.capacity:
+            self._next[slot] = slot + 1
+        return max(at, slot / self.rate)
+
+    def block_until(self, until: float):
+        """Impede novos envios antes de `until` (usado com o retry_after de um 429 global)"""
+        self._blocked_until = max(self._blocked_until, until)
+
+    def prune(self, now: float):
+        """Descarta as fatias que já passaram"""
+        current = math.floor(now * self.rate)
+        self._counts = {slot: count for slot, count in self._counts.items() if slot >= current}
+        self._next = {slot: following for slot, following in self._next.items() if slot >= current}
+
+    def _find(self, slot: int) -> int:
+        """Primeira fatia com vaga a partir de `slot`"""
+        path = []
+        while slot in self._next:
+            path.append(slot)
+            slot = self._next[slot]
+        for visited in path:
+            self._next[visited] = slot
+        return slot
+
+
+class RateLimiter:
+    """
+    Limitador de envios com um balde global e um balde por chat.
+
+    reserve() devolve quanto tempo o chamador deve esperar antes de enviar; as
+    mensagens nunca são descartadas, apenas atrasadas na ordem em que foram reservadas.
+    O limite global é uma agenda de fatias (SlotCalendar): o envio ocupa a vaga global
+    do instante em que o chat estará liberado, de modo que a fila de um chat não
+    atrasa os demais.
+    Um 429 com retry_after bloqueia o chat (ou todos os envios, se for global) até o
+    prazo indicado pelo Telegram.
+
+    Com capacidade c e taxa r, uma janela de W segundos vê no máximo c * (r * W + 1)
+    envios; por isso as rajadas padrão são de uma mensagem, o que mantém qualquer
+    janela dentro dos limites do Telegram.
+    """
+
+    # Quantidade de reservas entre limpezas dos baldes de chats ociosos
+    PRUNE_EVERY = 1000
+
+    def __init__(self, global_rate: float = RATE_LIMIT_GLOBAL_PER_SECOND,
+                 chat_rate: float = RATE_LIMIT_CHAT_PER_MINUTE / 60.0,
+                 global_burst: float = 1, chat_burst: float = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o limitador.
+
+        Args:
+            global_rate: Mensagens por segundo somando todos os chats
+            chat_rate: Mensagens por segundo em um mesmo chat
+            global_burst: Rajada global, em mensagens
+            chat_burst: Rajada por chat, em mensagens
+            clock: Relógio monotônico (use SimulatedClock em testes e benchmarks)
+        """
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.global_burst = global_burst
+        self.chat_burst = chat_burst
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._global = SlotCalendar(self.global_rate, self.global_burst)
+        self._chats: Dict[str, TokenBucket] = {}
+        self._reservations = 0
+
+    def reserve(self, chat_id=None) -> float:
+        """
+        Reserva um envio para um chat.
+
+        Args:
+            chat_id: ID do chat de destino (None para chamadas sem chat, que só usam o balde global)
+
+        Returns:
+            float: Segundos a esperar antes de enviar (0 se puder enviar imediatamente).
+        """
+        with self._lock:
+            now = self.clock()
+            at = now
+            chat_bucket = None
+            if chat_id is not None:
+                chat_bucket = self._chat_bucket(chat_id)
+                at = chat_bucket.available_at(at)
+            # A vaga global é reservada no instante em que o chat estará liberado
+            at = self._global.reserve(at)
+
+            if chat_bucket is not None:
+                chat_bucket.consume(at)
+
+            self._reservations += 1
+            if self._reservations % self.PRUNE_EVERY == 0:
+                self._prune(now)
+
+            return at - now
+
+    def penalize(self, chat_id=None, retry_after: float = 1.0):
+        """
+        Aplica o retry_after de uma resposta 429.
+
+        Args:
+            chat_id: Chat que recebeu o 429; None bloqueia todos os envios
+            retry_after: Segundos informados pelo Telegram
+        """
+        with self._lock:
+            until = self.clock() + retry_after
+            if chat_id is None:
+                self._global.block_until(until)
+            else:
+                self._chat_bucket(chat_id).block_until(until)
+        target = chat_id if chat_id is not None else 'todos os chats'
+        logger.warning("Limite de envio do Telegram atingido para %s; aguardando %ss", target, retry_after)
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        """Retorna (criando se necessário) o balde de um chat (com o lock adquirido)"""
+        key = str(chat_id)
+        bucket = self._chats.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[key] = bucket
+        return bucket
+
+    def _prune(self, now: float):
+        """Descarta baldes de chats que já se recompuseram e fatias globais passadas (com o lock adquirido)"""
+        self._global.prune(now)
+        self._chats = {key: bucket for key, bucket in self._chats.items() if not bucket.is_full(now)}
@@ -0,0 +1,344 @@
+import bisect
+import logging
+from typing import Optional, List, Dict, Any, Callable, Tuple
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCOPE = 'default'
+
+
+class RotationIndex:
+    """
+    Índice ordenado de posts (por created_at) com cursores de rotação persistentes.
+
+    A ordem é mantida incrementalmente por add/update/remove, e cada cursor guarda a
+    posição do próximo post a enviar. Escolher o próximo post é O(1): não há
+    ordenação nem busca linear, apenas a leitura da posição e a gravação do novo
+    estado. Exclusões antes do cursor ajustam a posição para que a rotação continue
+    de onde parou.
+
+    Com pesos (set_weights), cada ciclo tem tantas rodadas quanto o maior peso: a
+    rodada r percorre, na ordem normal, os posts com peso maior que r. Um post de
+    peso 3 sai três vezes por ciclo, espaçado pelos demais; peso 0 o exclui. Cada
+    rodada acima da primeira tem a lista ordenada (pelas chaves de ordenação) dos
+    posts que participam dela, mantida por set_weights, add e remove; na escolha,
+    basta uma busca binária nessa lista.
+    """
+
+    def __init__(self, load_state: Callable[[str], Optional[Dict[str, Any]]],
+                 save_state: Callable[[Dict[str, Any], str], None]):
+        """
+        Inicializa o índice de rotação.
+
+        Args:
+            load_state: Função que retorna o estado persistido de um escopo (ou None)
+            save_state: Função que persiste o estado de um escopo
+        """
+        self._load_state = load_state
+        self._save_state = save_state
+        self._keys: List[Tuple[str, int]] = []
+        self._ids: List[str] = []
+        self._key_by_id: Dict[str, Tuple[str, int]] = {}
+        self._posts: Dict[str, Dict[str, Any]] = {}
+        self._cursors: Dict[str, int] = {}
+        self._seq = 0
+        self._weights: Dict[str, int] = {}  # Apenas pesos diferentes de 1
+        self._weights_source: Optional[Dict[str, int]] = None
+        self._round_keys: List[List[Tuple[str, int]]] = []  # [r - 1]: chaves dos posts com peso > r
+        self._excluded = 0  # Posts do índice com peso 0
+        self._round_by_scope: Dict[str, int] = {}
+
+    def build(self, posts: List[Dict[str, Any]]):
+        """Reconstrói o índice a partir da lista de posts (usado apenas na carga)"""
+        entries = []
+        for post in posts:
+            post_id = post.get('id')
+            if not post_id:
+                continue
+            self._seq += 1
+            entries.append(((post.get('created_at', ''), self._seq), post_id, post))
+        entries.sort(key=lambda entry: entry[0])
+
+        self._keys = [key for key, _, _ in entries]
+        self._ids = [post_id for _, post_id, _ in entries]
+        self._key_by_id = {post_id: key for key, post_id, _ in entries}
+        self._posts = {post_id: post for _, post_id, post in entries}
+        self._cursors = {}
+        self._round_by_scope = {}
+        self._rebuild_rounds()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, post: Dict[str, Any]):
+        """Insere um post na posição correspondente ao seu created_at"""
+        post_id = post.get('id')
+        if not post_id:
+            return
+        if post_id in self._key_by_id:
+            self.update(post)
+            return
+
+        self._seq += 1
+        key = (post.get('created_at', ''), self._seq)
+        index = bisect.bisect_right(self._keys, key)
+        self._keys.insert(index, key)
+        self._ids.insert(index, post_id)
+        self._key_by_id[post_id] = key
+        self._posts[post_id] = post
+        self._add_to_rounds(post_id, key)
+
+        # Posts inseridos antes do cursor deslocam a posição
+        for scope, position in self._cursors.items():
+            if index < position:
+                self._cursors[scope] = position + 1
+
+    def update(self, post: Dict[str, Any]):
+        """Atualiza a referência de um post, reposicionando-o se o created_at mudou"""
+        post_id = post.get('id')
+        key = self._key_by_id.get(post_id)
+        if key is None:
+            self.add(post)
+            return
+        if key[0] != post.get('created_at', ''):
+            self.remove(post_id)
+            self.add(post)
+            return
+        self._posts[post_id] = post
+
+    def remove(self, post_id: str):
+        """Remove um post do índice"""
+        key = self._key_by_id.pop(post_id, None)
+        if key is None:
+            return
+
+        index = bisect.bisect_left(self._keys, key)
+        del self._keys[index]
+        del self._ids[index]
+        del self._posts[post_id]
+        self._remove_from_rounds(post_id, key)
+
+        # Exclusões antes do cursor puxam a posição para trás
+        for scope, position in self._cursors.items():
+            if index < position:
+                self._cursors[scope] = position - 1
+
+    def set_weights(self, weights: Dict[str, int]):
+        """
+        Define os pesos dos posts na rotação (posts fora do dicionário têm peso 1).
+
+        Chamar de novo com o mesmo objeto não custa nada: o dicionário só é
+        percorrido quando os pesos são trocados.
+
+        Args:
+            weights: Peso por id de post (0 = nunca enviar)
+        """
+        if weights is self._weights_source:
+            return
+        self._weights_source = weights
+        self._weights = {post_id: weight for post_id, weight in (weights or {}).items() if weight != 1}
+        self._rebuild_rounds()
+
+    def position(self, post_id: str) -> Optional[int]:
+        """Retorna a posição de um post na ordem de rotação"""
+        key = self._key_by_id.get(post_id)
+        if key is None:
+            return None
+        return bisect.bisect_left(self._keys, key)
+
+    def next(self, scope: str = DEFAULT_SCOPE) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        Avança o cursor de um escopo e retorna o próximo post.
+
+        Args:
+            scope: Nome do cursor (permite rotações independentes)
+
+        Returns:
+            Optional[Tuple[int, Dict[str, Any]]]: Posição e post escolhido, ou None se não houver posts.
+        """
+        choice = self._pick(scope)
+        if choice is None:
+            return None
+        self._apply(scope, choice)
+        return choice[0], self._posts[self._ids[choice[0]]]
+
+    def peek(self, scope: str = DEFAULT_SCOPE) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """
+        Retorna o próximo post de um escopo sem avançar o cursor.
+
+        Usado por quem precisa gravar o envio (fila de saída) antes de avançar a
+        rotação: se o processo cair entre as duas etapas, o post é escolhido de novo.
+
+        Returns:
+            Optional[Tuple[int, Dict[str, Any]]]: Posição e post, ou None se não houver posts.
+        """
+        choice = self._pick(scope)
+        if choice is None:
+            return None
+        return choice[0], self._posts[self._ids[choice[0]]]
+
+    def advance(self, post_id: str, scope: str = DEFAULT_SCOPE) -> bool:
+        """
+        Avança o cursor de um escopo, se o próximo post ainda for post_id.
+
+        Args:
+            post_id: Post retornado por peek()
+            scope: Nome do cursor
+
+        Returns:
+            bool: True se o cursor avançou, False se outro envio já o avançou.
+        """
+        choice = self._pick(scope)
+        if choice is None or self._ids[choice[0]] != post_id:
+            return False
+        self._apply(scope, choice)
+        return True
+
+    def _pick(self, scope: str) -> Optional[Tuple[int, int, Optional[int]]]:
+        """Calcula o próximo post sem alterar o estado: (posição, próximo cursor, rodada)"""
+        total = len(self._ids)
+        if not total:
+            return None
+
+        if scope not in self._cursors:
+            self._cursors[scope] = self._restore_cursor(scope)
+
+        if self._weights:
+            return self._pick_weighted(scope, total)
+
+        index = self._cursors[scope] % total
+        return index, (index + 1) % total, None
+
+    def _pick_weighted(self, scope: str, total: int) -> Optional[Tuple[int, int, Optional[int]]]:
+        """Próximo post com pesos: o primeiro da rodada atual a partir do cursor"""
+        rounds = self._round_count()
+        if not rounds:
+            return None
+
+        current = self._round_by_scope.get(scope, 0) % rounds
+        index = self._first_eligible(current, self._cursors[scope] % total)
+        if index is None:
+            # Fim da rodada: a próxima começa do início da ordem
+            current = (current + 1) % rounds
+            index = self._first_eligible(current, 0)
+
+        # Posição seguinte; no fim da rodada, já aponta para o início da próxima
+        if self._first_eligible(current, index + 1) is not None:
+            return index, index + 1, current
+        return index, 0, (current + 1) % rounds
+
+    def _round_count(self) -> int:
+        """Rodadas por ciclo: o maior peso entre os posts do índice"""
+        if self._round_keys:
+            return len(self._round_keys) + 1
+        # Sem pesos maiores que 1: uma rodada, se algum post não tiver peso 0
+        return 1 if self._excluded < len(self._ids) else 0
+
+    def _first_eligible(self, current: int, start: int) -> Optional[int]:
+        """Primeira posição a partir de start com peso maior que a rodada"""
+        if current == 0:
+            # Na primeira rodada só os posts de peso 0 ficam de fora
+            for index in range(start, len(self._ids)):
+                if self._weights.get(self._ids[index], 1) > 0:
+                    return index
+            return None
+
+        # Nas demais, apenas os posts com peso maior que a rodada participam
+        if current > len(self._round_keys) or start >= len(self._keys):
+            return None
+        keys = self._round_keys[current - 1]
+        k = bisect.bisect_left(keys, self._keys[start])
+        return bisect.bisect_left(self._keys, keys[k]) if k < len(keys) else None
+
+    def _rebuild_rounds(self):
+        """Reconstrói as listas por rodada (na carga e quando os pesos são trocados)"""
+        self._round_keys = []
+        self._excluded = 0
+        for post_id, weight in self._weights.items():
+            key = self._key_by_id.get(post_id)
+            if key is None:
+                continue
+            if weight <= 0:
+                self._excluded += 1
+            for current in range(1, weight):
+                if len(self._round_keys) < current:
+                    self._round_keys.append([])
+                self._round_keys[current - 1].append(key)
+        for keys in self._round_keys:
+            keys.sort()
+
+    def _add_to_rounds(self, post_id: str, key: Tuple[str, int]):
+        """Inclui um post novo nas listas das rodadas de que ele participa"""
+        weight = self._weights.get(post_id, 1)
+        if weight <= 0:
+            self._excluded += 1
+        for current in range(1, weight):
+            if len(self._round_keys) < current:
+                self._round_keys.append([])
+            bisect.insort(self._round_keys[current - 1], key)
+
+    def _remove_from_rounds(self, post_id: str, key: Tuple[str, int]):
+        """Retira um post excluído das listas das rodadas"""
+        weight = self._weights.get(post_id, 1)
+        if weight <= 0:
+            self._excluded -= 1
+        for current in range(1, weight):
+            keys = self._round_keys[current - 1]
+            del keys[bisect.bisect_left(keys, key)]
+        # As últimas rodadas podem ter ficado vazias
+        while self._round_keys and not self._round_keys[-1]:
+            self._round_keys.pop()
+
+    def _apply(self, scope: str, choice: Tuple[int, int, Optional[int]]):
+        """Move o cursor para depois do post escolhido e persiste o novo estado"""
+        index, cursor, current = choice
+        self._cursors[scope] = cursor
+        state = {
+            'last_sent_post_id': self._ids[index],
+            'next_post_id': self._ids[cursor],
+            'position': cursor
+        }
+        if current is not None:
+            self._round_by_scope[scope] = current
+            state['round'] = current
+
+        try:
+            self._save_state(state, scope)
+        except Exception as e:
+            logger.error("Erro ao salvar cursor de rotação: %s", e)
+
+    def _restore_cursor(self, scope: str) -> int:
+        """Recupera a posição persistida de um cursor, validando-a contra o último post enviado"""
+        try:
+            state = self._load_state(scope) or {}
+        except Exception as e:
+            logger.error("Erro ao ler cursor de rotação: %s", e)
+            state = {}
+
+        total = len(self._ids)
+        if isinstance(state.get('round'), int):
+            self._round_by_scope[scope] = state['round']
+        last_sent_post_id = state.get('last_sent_post_id')
+        position = state.get('position')
+
+        if isinstance(position, int) and last_sent_post_id:
+            # Caso comum: nada mudou desde a última gravação
+            if self._ids[(position - 1) % total] == last_sent_post_id:
+                return position % total
+
+        # Posts foram incluídos/excluídos enquanto o processo estava parado
+        next_index = self.position(state.get('next_post_id'))
+        if next_index is not None:
+            return next_index
+
+        if last_sent_post_id:
+            last_index = self.position(last_sent_post_id)
+            if last_index is not None:
+                return (last_index + 1) % total
+
+        if isinstance(position, int):
+            # O último post foi excluído: continua da mesma posição
+            return position % total
+
+        return 0
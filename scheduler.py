@@ -1,16 +1,38 @@
 import logging
 import threading
-import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from config import DEFAULT_POST_INTERVAL, GROUP_SEND_WORKERS
+from outbox import post_key
+from posting_schedule import ticks_for
+from rotation import DEFAULT_SCOPE
+from tick_schedule import TickSchedule
+from timer_engine import TimerEngine, TimingWheel
 
 class PostScheduler:
-    def __init__(self, bot_handler, data_manager):
-        """Inicializa o agendador de posts"""
+    def __init__(self, bot_handler, data_manager, engine=None, pipeline=None, outbox=None):
+        """
+        Inicializa o agendador de posts
+
+        Args:
+            bot_handler: Instância do manipulador do bot
+            data_manager: Instância do gerenciador de dados
+            engine: TimerEngine compartilhado opcional; se None, o agendador cria o seu
+            pipeline: SendPipeline opcional para envios assíncronos
+            outbox: OutboxSender opcional (fila de saída persistente)
+        """
         self.bot_handler = bot_handler
         self.data_manager = data_manager
+        self.pipeline = pipeline
+        self.outbox = outbox
         self.running = False
         self.thread = None
         
+        self.engine = engine
+        self._owns_engine = engine is None
+        self._job_key = f"post-{id(self)}"
+        self._schedule = None  # Horários dos posts (TickSchedule, ou CalendarTicks com calendário)
+        
         # Configuração de logging
         self.logger = logging.getLogger("PostScheduler")
     
@@ -22,14 +44,19 @@ class PostScheduler:
         
         try:
             self.running = True
-            self.thread = threading.Thread(target=self._scheduler_loop)
-            self.thread.daemon = True  # Thread será encerrada quando o programa principal terminar
-            self.thread.start()
+            if self._owns_engine:
+                self.engine = TimerEngine("PostScheduler")
+            self.engine.start()
+            self.thread = self.engine.thread
+            
+            self._schedule = None
+            self.data_manager.add_config_listener(self._reschedule)
+            self._reschedule()
             
             self.logger.info("Agendador iniciado com sucesso")
             return True
         except Exception as e:
-            self.logger.error(f"Erro ao iniciar agendador: {str(e)}")
+            self.logger.error("Erro ao iniciar agendador: %s", e)
             self.running = False
             return False
     
@@ -42,16 +69,15 @@ class PostScheduler:
         try:
             self.logger.info("Parando agendador de posts...")
             
-            # Marca como inativo para que o loop principal do agendador termine
+            # Marca como inativo e deixa de reagir a mudanças de configuração
             self.running = False
+            self.data_manager.remove_config_listener(self._reschedule)
+            self.engine.cancel(self._job_key)
             
-            # Aguarda a thread terminar com timeout
-            if self.thread and self.thread.is_alive():
+            # Para a thread do motor (apenas se ela pertence a este agendador)
+            if self._owns_engine:
                 self.logger.debug("Aguardando a thread do agendador terminar...")
-                self.thread.join(timeout=5)
-                
-                # Verifica se a thread terminou no tempo esperado
-                if self.thread.is_alive():
+                if not self.engine.stop(timeout=5):
                     self.logger.warning("A thread do agendador não terminou dentro do timeout, mas será abandonada")
             
             # Limpa as referências para ajudar o garbage collector
@@ -60,7 +86,7 @@ class PostScheduler:
             self.logger.info("Agendador parado com sucesso")
             return True
         except Exception as e:
-            self.logger.error(f"Erro ao parar agendador: {str(e)}")
+            self.logger.error("Erro ao parar agendador: %s", e)
             # Garante que fique marcado como inativo mesmo com erro
             self.running = False
             return False
@@ -69,63 +95,302 @@ class PostScheduler:
         """Verifica se o agendador está em execução"""
         return self.running and self.thread and self.thread.is_alive()
     
-    def _scheduler_loop(self):
-        """Loop principal do agendador"""
-        last_post_time = datetime.now()
+    def drift_stats(self):
+        """Atraso dos posts em relação aos horários previstos (ver TickSchedule.stats)"""
+        if self._schedule is None:
+            return None
+        return self._schedule.stats(self.engine.clock())
+    
+    def _reschedule(self):
+        """Agenda o próximo post no próximo horário previsto (calendário ou intervalo atual)"""
+        if not self.running:
+            return
         
-        while self.running:
-            try:
-                # Obtém o intervalo atual
-                config = self.data_manager.get_bot_config()
-                interval_minutes = config.get('interval', 10)
-                
-                # Converte para segundos
-                interval_seconds = interval_minutes * 60
-                
-                # Verifica se já passou o tempo necessário desde o último post
-                current_time = datetime.now()
-                elapsed_seconds = (current_time - last_post_time).total_seconds()
-                
-                # Calcula quanto tempo falta para o próximo post
-                time_to_next_post = max(0, interval_seconds - elapsed_seconds)
-                
-                if time_to_next_post <= 0:
-                    # Hora de enviar um novo post
-                    self.logger.info(f"Enviando post programado (intervalo: {interval_minutes} minutos)")
-                    self._send_random_post()
-                    last_post_time = datetime.now()  # Usa o tempo atual após o envio para maior precisão
-                    
-                    # Recalcula o tempo para o próximo post
-                    time_to_next_post = interval_seconds
-                
-                # Dorme pelo tempo exato necessário, mas verifica a cada 15 segundos para 
-                # responder mais rapidamente às mudanças de configuração
-                sleep_time = min(15, time_to_next_post)
-                self.logger.debug(f"Próximo post em {time_to_next_post/60:.1f} minutos. Dormindo por {sleep_time} segundos.")
-                time.sleep(sleep_time)
-            except Exception as e:
-                self.logger.error(f"Erro no loop do agendador: {str(e)}")
-                time.sleep(30)  # Em caso de erro, espera um pouco antes de tentar novamente
+        config = self.data_manager.get_bot_config()
+        interval_seconds = config.get('interval', 10) * 60
+        
+        # Sem calendário, o primeiro post sai após um intervalo completo, como antes
+        now = self.engine.clock()
+        self._schedule = ticks_for(self._schedule, self.data_manager.get_schedule(), interval_seconds,
+                                   now + interval_seconds, "PostScheduler")
+        
+        due = self._schedule.due(now)
+        self.engine.schedule_at(self._job_key, due, self._on_post_due)
+        self.logger.debug("Próximo post em %.1f minutos.", max(0, due - self.engine.clock())/60)
+    
+    def _on_post_due(self, retry=False):
+        """Executado pelo motor quando chega a hora do próximo post"""
+        try:
+            # Hora de enviar um novo post (uma nova tentativa não consome outro horário)
+            if not retry:
+                drift = self._schedule.fired(self.engine.clock())
+                self.logger.debug("Atraso do post em relação ao horário previsto: %.3f s", drift)
+            interval_minutes = self.data_manager.get_bot_config().get('interval', 10)
+            self.logger.info("Enviando post programado (intervalo: %s minutos)", interval_minutes)
+            self._send_random_post()
+            self._schedule.completed(self.engine.clock())
+        except Exception as e:
+            self.logger.error("Erro no agendador: %s", e)
+            # Em caso de erro, espera um pouco antes de tentar novamente
+            self.engine.schedule(self._job_key, 30, lambda: self._on_post_due(retry=True))
+            return
+        
+        self._reschedule()
     
     def _send_random_post(self):
         """Envia o próximo post sequencial para o grupo (nome mantido por compatibilidade)"""
         try:
             # Obtém o próximo post sequencial
-            post = self.data_manager.get_next_sequential_post()
+            post = self.data_manager.peek_next_sequential_post()
             
             if not post:
                 self.logger.warning("Não há posts promocionais para enviar")
                 return False
             
+            # Fila de saída: o post fica pendente até o envio ser confirmado, e a
+            # rotação só avança depois que ele está gravado na fila
+            if self.outbox is not None:
+                group_id = self.data_manager.get_group_id()
+                return self.outbox.send_post(group_id, post, key=post_key(group_id, post),
+                                             on_sent=self.data_manager.increment_promo_messages_stat,
+                                             on_queued=lambda: self.data_manager.advance_rotation(post),
+                                             stat='promo')
+            
+            self.data_manager.advance_rotation(post)
+            
+            # Envio assíncrono: o pipeline registra o resultado quando terminar
+            if self.pipeline is not None and self.pipeline.is_running():
+                self.pipeline.submit_post(self.data_manager.get_group_id(), post,
+                                          on_sent=lambda _: self.data_manager.increment_promo_messages_stat())
+                return True
+            
             # Envia o post
             success = self.bot_handler.send_promotional_post(post)
             
             if success:
-                self.logger.info(f"Post promocional sequencial enviado com sucesso: {post['title']}")
+                self.logger.info("Post promocional sequencial enviado com sucesso: %s", post['title'])
             else:
-                self.logger.error(f"Falha ao enviar post promocional: {post['title']}")
+                self.logger.error("Falha ao enviar post promocional: %s", post['title'])
                 
             return success
         except Exception as e:
-            self.logger.error(f"Erro ao enviar post sequencial: {str(e)}")
+            self.logger.error("Erro ao enviar post sequencial: %s", e)
+            return False
+
+
+class GroupScheduler:
+    def __init__(self, bot_handler, data_manager, wheel=None, max_workers=GROUP_SEND_WORKERS,
+                 pipeline=None, outbox=None, exclude_primary=False):
+        """
+        Inicializa o agendador multi-grupo
+
+        Um único TimingWheel dispara os posts de todos os grupos e um pool fixo de
+        threads faz os envios, de forma que o número de threads não cresce com o
+        número de grupos. Cada grupo tem intervalo, status e cursor de rotação próprios.
+
+        Args:
+            bot_handler: Instância do manipulador do bot
+            data_manager: Instância do gerenciador de dados
+            wheel: TimingWheel compartilhado opcional; se None, o agendador cria o seu
+            max_workers: Número de threads de envio
+            pipeline: SendPipeline opcional; se informado, os envios não ocupam as
+                      threads do pool durante a requisição HTTP
+            outbox: OutboxSender opcional (fila de saída persistente)
+            exclude_primary: Se True, o grupo da configuração original fica a cargo do
+                             agendador principal e não é agendado aqui
+        """
+        self.bot_handler = bot_handler
+        self.data_manager = data_manager
+        self.pipeline = pipeline
+        self.outbox = outbox
+        self.max_workers = max_workers
+        self.exclude_primary = exclude_primary
+        self.running = False
+        
+        self.wheel = wheel
+        self._owns_wheel = wheel is None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._intervals = {}  # group_id -> intervalo agendado (minutos)
+        self._schedules = {}  # group_id -> horários dos posts (TickSchedule, relógio da roda)
+        self._in_flight = set()
+        
+        # Configuração de logging
+        self.logger = logging.getLogger("GroupScheduler")
+    
+    def start(self):
+        """Inicia o agendador"""
+        if self.running:
+            self.logger.warning("Tentativa de iniciar agendador que já está ativo")
+            return True
+        
+        try:
+            self.running = True
+            if self._owns_wheel:
+                self.wheel = TimingWheel("GroupScheduler")
+            self.wheel.start()
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="GroupSender")
+            
+            self.data_manager.add_config_listener(self._sync_groups)
+            self._sync_groups()
+            
+            self.logger.info("Agendador multi-grupo iniciado com %s grupo(s) ativo(s)", len(self._intervals))
+            return True
+        except Exception as e:
+            self.logger.error("Erro ao iniciar agendador multi-grupo: %s", e)
+            self.running = False
             return False
+    
+    def stop(self):
+        """Para o agendador"""
+        if not self.running:
+            self.logger.debug("Tentativa de parar agendador que já está inativo")
+            return False
+        
+        try:
+            self.logger.info("Parando agendador multi-grupo...")
+            self.running = False
+            self.data_manager.remove_config_listener(self._sync_groups)
+            
+            with self._lock:
+                for group_id in list(self._intervals):
+                    self.wheel.cancel(self._job_key(group_id))
+                self._intervals = {}
+            
+            if self._owns_wheel:
+                self.wheel.stop(timeout=5)
+            if self._executor:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            
+            self.logger.info("Agendador multi-grupo parado com sucesso")
+            return True
+        except Exception as e:
+            self.logger.error("Erro ao parar agendador multi-grupo: %s", e)
+            self.running = False
+            return False
+    
+    def is_running(self):
+        """Verifica se o agendador está em execução"""
+        return self.running and self.wheel is not None and self.wheel.is_running()
+    
+    def scheduled_groups(self):
+        """Retorna os grupos agendados e o intervalo (minutos) de cada um"""
+        with self._lock:
+            return dict(self._intervals)
+    
+    def drift_stats(self):
+        """Atraso dos posts de cada grupo em relação aos horários previstos (ver TickSchedule.stats)"""
+        with self._lock:
+            schedules = dict(self._schedules)
+        now = self.wheel.clock()
+        return {group_id: schedule.stats(now) for group_id, schedule in schedules.items()}
+    
+    def _job_key(self, group_id):
+        return f"group:{group_id}"
+    
+    def _rotation_scope(self, group_id):
+        """O grupo da configuração original mantém o cursor de rotação padrão"""
+        if group_id == self.data_manager.get_bot_config().get('group_id'):
+            return DEFAULT_SCOPE
+        return f"group:{group_id}"
+    
+    def _sync_groups(self):
+        """Sincroniza os jobs da roda com os grupos e status atuais"""
+        if not self.running:
+            return
+        
+        bot_active = self.data_manager.get_bot_status()
+        primary = str(self.data_manager.get_bot_config().get('group_id') or '') if self.exclude_primary else None
+        groups = {
+            str(group.get('group_id')): group
+            for group in self.data_manager.get_groups()
+            if group.get('group_id') and str(group.get('group_id')) != primary
+        }
+        
+        with self._lock:
+            # Grupos removidos ou desativados
+            for group_id in list(self._intervals):
+                group = groups.get(group_id)
+                if not bot_active or group is None or not group.get('active', True):
+                    self.wheel.cancel(self._job_key(group_id))
+                    del self._intervals[group_id]
+                    # Ao ser reativado, o grupo recomeça com um intervalo completo
+                    self._schedules.pop(group_id, None)
+            
+            if not bot_active:
+                return
+            
+            # Grupos novos ou com intervalo alterado
+            now = self.wheel.clock()
+            for group_id, group in groups.items():
+                if not group.get('active', True):
+                    continue
+                interval = max(1, int(group.get('interval') or DEFAULT_POST_INTERVAL))
+                if self._intervals.get(group_id) == interval:
+                    continue
+                
+                self._intervals[group_id] = interval
+                schedule = self._schedules.get(group_id)
+                if schedule is None:
+                    # O primeiro post de cada grupo sai após um intervalo completo
+                    self._schedules[group_id] = TickSchedule(interval * 60, now + interval * 60,
+                                                             name="GroupScheduler")
+                else:
+                    schedule.set_interval(interval * 60)
+                if group_id not in self._in_flight:
+                    self._schedule_group(group_id)
+    
+    def _schedule_group(self, group_id):
+        """Agenda o próximo post de um grupo (com o lock adquirido)"""
+        schedule = self._schedules.get(group_id)
+        if group_id not in self._intervals or schedule is None:
+            return
+        due = schedule.due(self.wheel.clock())
+        self.wheel.schedule_at(self._job_key(group_id), due, lambda: self._on_group_due(group_id))
+    
+    def _on_group_due(self, group_id):
+        """Executado pela roda: repassa o envio para o pool de threads"""
+        with self._lock:
+            if not self.running or group_id not in self._intervals or group_id in self._in_flight:
+                return
+            self._in_flight.add(group_id)
+        self._executor.submit(self._send_to_group, group_id)
+    
+    def _send_to_group(self, group_id):
+        """Envia o próximo post da rotação do grupo e agenda o seguinte"""
+        with self._lock:
+            schedule = self._schedules.get(group_id)
+        if schedule is not None:
+            schedule.fired(self.wheel.clock())
+        try:
+            scope = self._rotation_scope(group_id)
+            post = self.data_manager.peek_next_sequential_post(scope)
+            if not post:
+                self.logger.warning("Não há posts promocionais para enviar ao grupo %s", group_id)
+            elif self.outbox is not None:
+                # A rotação só avança depois que o post está gravado na fila de saída
+                self.outbox.send_post(group_id, post, key=post_key(group_id, post),
+                                      on_sent=self.data_manager.increment_promo_messages_stat,
+                                      on_queued=lambda: self.data_manager.advance_rotation(post, scope),
+                                      stat='promo')
+            elif not self.data_manager.advance_rotation(post, scope):
+                self.logger.debug("Rotação do grupo %s já avançada por outro envio", group_id)
+            elif self.pipeline is not None and self.pipeline.is_running():
+                self.pipeline.submit_post(group_id, post,
+                                          on_sent=lambda _: self.data_manager.increment_promo_messages_stat())
+            elif self.bot_handler.send_promotional_post(post, chat_id=group_id):
+                self.logger.info("Post promocional enviado ao grupo %s: %s", group_id, post.get('title', ''),
+                                 extra={'post_id': post.get('id'), 'chat_id': group_id})
+            else:
+                self.logger.error("Falha ao enviar post promocional ao grupo %s: %s", group_id, post.get('title', ''))
+        except Exception as e:
+            self.logger.error("Erro ao enviar post ao grupo %s: %s", group_id, e)
+        finally:
+            with self._lock:
+                self._in_flight.discard(group_id)
+                if schedule is not None:
+                    schedule.completed(self.wheel.clock())
+                if self.running:
+                    self._schedule_group(group_id)
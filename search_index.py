@@ -0,0 +1,271 @@
+import os
+import re
+import json
+import bisect
+import heapq
+import logging
+import unicodedata
+from typing import Optional, List, Dict, Any, Set, Tuple
+
+from atomic_json import write_json
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Campos dos posts indexados
+SEARCH_FIELDS = ('title', 'content', 'text')
+
+_INDEX_VERSION = 1
+_WORD_RE = re.compile(r"\w+")
+# Máximo de termos do vocabulário que um prefixo pode expandir (evita uniões enormes em
+# prefixos curtos como "a"; os termos além do limite são ignorados)
+_PREFIX_MAX_TERMS = 100
+
+
+def fold(text: str) -> str:
+    """Remove acentos e normaliza maiúsculas ('Promoção' -> 'promocao')"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    """Divide um texto em termos normalizados"""
+    return _WORD_RE.findall(fold(text))
+
+
+def post_terms(post: Dict[str, Any]) -> Set[str]:
+    """Termos indexados de um post (título, conteúdo e texto)"""
+    terms = set()
+    for field in SEARCH_FIELDS:
+        value = post.get(field)
+        if value:
+            terms.update(tokenize(str(value)))
+    return terms
+
+
+class SearchIndex:
+    """
+    Índice invertido dos posts promocionais para busca por texto.
+
+    Cada termo (sem acentos, em minúsculas) aponta para o conjunto de posts que o
+    contêm. Uma busca exige todos os termos da consulta; o último termo também casa
+    como prefixo ("promo" encontra "promoção"), usando o vocabulário ordenado. Os
+    resultados vêm do mais recente para o mais antigo: buscas muito abrangentes
+    percorrem a lista de posts ordenada por created_at até encher a página, em vez
+    de ordenar todos os resultados.
+
+    O índice é atualizado a cada inclusão, edição ou exclusão de post e pode ser
+    salvo em disco junto do arquivo de posts, com o carimbo (tamanho, mtime) do
+    arquivo que ele representa: na inicialização ele é carregado sem reprocessar os
+    textos, ou reconstruído se o arquivo de posts mudou desde que foi salvo.
+    """
+
+    def __init__(self, posts: Optional[List[Dict[str, Any]]] = None):
+        """
+        Inicializa o índice.
+
+        Args:
+            posts: Posts para a carga inicial (opcional)
+        """
+        # Cada post recebe um número interno; as listas invertidas guardam números
+        self._number: Dict[str, int] = {}
+        self._sort_keys: List[Optional[Tuple[str, str]]] = []
+        self._keys: List[Tuple[str, str]] = []
+        self._postings: Dict[str, Set[int]] = {}
+        self._vocabulary: List[str] = []
+        # Termos de cada post, para remoções; após uma carga do disco é montado sob demanda
+        self._terms: Optional[Dict[int, List[str]]] = {}
+        self.dirty = False
+        if posts:
+            self.build(posts)
+
+    def build(self, posts: List[Dict[str, Any]]):
+        """Reconstrói o índice a partir da lista de posts"""
+        self._number = {}
+        self._sort_keys = []
+        self._postings = {}
+        self._terms = {}
+        for post in posts:
+            post_id = post.get('id')
+            if not post_id or post_id in self._number:
+                continue
+            number = self._number[post_id] = len(self._sort_keys)
+            self._sort_keys.append((str(post.get('created_at', '')), post_id))
+            terms = sorted(post_terms(post))
+            self._terms[number] = terms
+            for term in terms:
+                numbers = self._postings.get(term)
+                if numbers is None:
+                    numbers = self._postings[term] = set()
+                numbers.add(number)
+        self._vocabulary = sorted(self._postings)
+        self._keys = sorted(self._sort_keys)
+        self.dirty = True
+
+    def __len__(self) -> int:
+        return len(self._number)
+
+    def add(self, post: Dict[str, Any]):
+        """Indexa um post (ou reindexa, se já estiver no índice)"""
+        post_id = post.get('id')
+        if not post_id:
+            return
+        if post_id in self._number:
+            self.remove(post_id)
+
+        key = (str(post.get('created_at', '')), post_id)
+        number = self._number[post_id] = len(self._sort_keys)
+        self._sort_keys.append(key)
+        bisect.insort(self._keys, key)
+
+        terms = sorted(post_terms(post))
+        if self._terms is not None:
+            self._terms[number] = terms
+        for term in terms:
+            numbers = self._postings.get(term)
+            if numbers is None:
+                numbers = self._postings[term] = set()
+                bisect.insort(self._vocabulary, term)
+            numbers.add(number)
+        self.dirty = True
+
+    def update(self, post: Dict[str, Any]):
+        """Reindexa um post editado"""
+        self.add(post)
+
+    def remove(self, post_id: str):
+        """Remove um post do índice"""
+        if post_id not in self._number:
+            return
+        terms = self._post_terms().pop(self._number[post_id], ())
+        number = self._number.pop(post_id)
+        key = self._sort_keys[number]
+        self._sort_keys[number] = None
+        del self._keys[bisect.bisect_left(self._keys, key)]
+        for term in terms:
+            numbers = self._postings[term]
+            numbers.discard(number)
+            if not numbers:
+                del self._postings[term]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, term)]
+        self.dirty = True
+
+    def search(self, query: str, limit: int = 20) -> Tuple[List[str], int]:
+        """
+        Busca posts que contenham todos os termos da consulta.
+
+        Args:
+            query: Texto da busca (acentos e maiúsculas são ignorados)
+            limit: Número máximo de IDs retornados
+
+        Returns:
+            Tuple[List[str], int]: IDs dos posts encontrados (mais recentes primeiro) e o
+            total de posts encontrados.
+        """
+        terms = tokenize(query or '')
+        if not terms:
+            return [], 0
+
+        # Termos completos; o último termo também vale como prefixo
+        candidates: List[Set[int]] = [self._postings.get(term, set()) for term in terms[:-1]]
+        candidates.append(self._prefix_matches(terms[-1]))
+        candidates.sort(key=len)
+        matches = candidates[0].intersection(*candidates[1:]) if len(candidates) > 1 else candidates[0]
+
+        total = len(matches)
+        if total * total > limit * len(self._keys):
+            # Muitos resultados: percorre os posts do mais recente até encher a página
+            ranked = []
+            number = self._number
+            for _, post_id in reversed(self._keys):
+                if number[post_id] in matches:
+                    ranked.append(post_id)
+                    if len(ranked) >= limit:
+                        break
+            return ranked, total
+
+        best = heapq.nlargest(limit, matches, key=self._sort_keys.__getitem__)
+        return [self._sort_keys[number][1] for number in best], total
+
+    def save(self, path: str, stamp: Optional[tuple]) -> bool:
+        """
+        Salva o índice em disco.
+
+        Args:
+            path: Arquivo do índice
+            stamp: Carimbo do arquivo de posts que o índice representa
+
+        Returns:
+            bool: True se o índice foi salvo com sucesso, False caso contrário.
+        """
+        try:
+            # Renumera os posts na ordem de created_at, descartando números de posts excluídos
+            renumber = {self._number[post_id]: i for i, (_, post_id) in enumerate(self._keys)}
+            write_json(path, {
+                'version': _INDEX_VERSION,
+                'posts_stamp': list(stamp) if stamp else None,
+                'posts': [[post_id, created_at] for created_at, post_id in self._keys],
+                'postings': {term: [renumber[number] for number in numbers]
+                             for term, numbers in self._postings.items()}
+            })
+            self.dirty = False
+            return True
+        except Exception as e:
+            logger.error("Erro ao salvar índice de busca: %s", e)
+            return False
+
+    @classmethod
+    def load(cls, path: str, stamp: Optional[tuple]) -> Optional['SearchIndex']:
+        """
+        Carrega um índice salvo, se ele ainda corresponder ao arquivo de posts.
+
+        Args:
+            path: Arquivo do índice
+            stamp: Carimbo atual do arquivo de posts
+
+        Returns:
+            Optional[SearchIndex]: O índice, ou None se não existir, estiver corrompido
+            ou desatualizado.
+        """
+        if not stamp or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != _INDEX_VERSION or data.get('posts_stamp') != list(stamp):
+                logger.info("Índice de busca desatualizado; será reconstruído")
+                return None
+
+            index = cls()
+            index._sort_keys = [(created_at, post_id) for post_id, created_at in data['posts']]
+            index._keys = list(index._sort_keys)
+            index._number = {post_id: number for number, (post_id, _) in enumerate(data['posts'])}
+            index._postings = {term: set(numbers) for term, numbers in data['postings'].items()}
+            index._vocabulary = sorted(index._postings)
+            index._terms = None
+            return index
+        except Exception as e:
+            logger.error("Erro ao carregar índice de busca: %s", e)
+            return None
+
+    def _post_terms(self) -> Dict[int, List[str]]:
+        """Termos de cada post (montados a partir das listas invertidas após uma carga)"""
+        if self._terms is None:
+            terms: Dict[int, List[str]] = {number: [] for number in self._number.values()}
+            for term in self._vocabulary:
+                for number in self._postings[term]:
+                    terms[number].append(term)
+            self._terms = terms
+        return self._terms
+
+    def _prefix_matches(self, prefix: str) -> Set[int]:
+        """União dos posts dos termos (até _PREFIX_MAX_TERMS) que começam com o prefixo"""
+        vocabulary = self._vocabulary
+        start = bisect.bisect_left(vocabulary, prefix)
+        end = min(bisect.bisect_left(vocabulary, prefix + '\U0010ffff', start), start + _PREFIX_MAX_TERMS)
+        if end - start == 1:
+            return self._postings[vocabulary[start]]
+        matches: Set[int] = set()
+        for term in vocabulary[start:end]:
+            matches |= self._postings[term]
+        return matches
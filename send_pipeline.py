@@ -0,0 +1,436 @@
+import io
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import time
+import threading
+from concurrent.futures import Future
+from typing import Optional, Dict, Any, Callable
+
+from urllib.parse import urlparse
+
+from config import (
+    TELEGRAM_API_URL,
+    SEND_MAX_CONNECTIONS,
+    SEND_TIMEOUT,
+    SEND_MAX_RETRIES,
+    MEDIA_MAX_BYTES,
+    MEDIA_DOWNLOAD_TIMEOUT
+)
+from rate_limiter import RateLimiter
+from payloads import payload_for
+from media_cache import MediaCache, photo_file_id, is_file_id_error
+from media_store import MediaStore, media_name, content_hash as media_content_hash
+from metrics import counter, histogram, QUEUE_DEPTH
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Métricas (expostas em /metrics)
+SEND_LATENCY = histogram('telegram_send_seconds',
+                         'Duração dos envios, da solicitação à resposta (inclui a espera do limitador e novas tentativas)',
+                         ('method',))
+API_LATENCY = histogram('telegram_api_request_seconds', 'Duração das requisições HTTP à Bot API', ('method',))
+RATE_LIMITED = counter('telegram_rate_limited_total', 'Respostas 429 (Too Many Requests) da Bot API', ('method',))
+PENDING = QUEUE_DEPTH.labels(queue='send_pipeline')
+
+
+class TelegramAPIError(Exception):
+    """Erro retornado pela Bot API do Telegram (ok = false)"""
+
+    def __init__(self, description: str, error_code: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(description)
+        self.description = description
+        self.error_code = error_code
+        self.retry_after = retry_after
+
+
+class SendPipeline:
+    """
+    Pipeline assíncrono de envio para a Bot API do Telegram.
+
+    Um event loop asyncio roda em uma thread própria com uma única sessão HTTP
+    (conexões keep-alive reaproveitadas), permitindo vários envios simultâneos sem
+    bloquear quem os solicita. submit() pode ser chamado de qualquer thread
+    (agendadores, rotas Flask) e retorna um concurrent.futures.Future.
+
+    Os métodos send* passam por um RateLimiter: cada envio aguarda sua vez (sem
+    ocupar conexão) e respostas 429 bloqueiam o chat pelo retry_after informado e
+    recolocam a mensagem na fila, em vez de descartá-la.
+
+    Com um MediaCache, a imagem de um post é baixada e enviada uma única vez; os
+    envios seguintes usam o file_id devolvido pelo Telegram. Imagens do MediaStore
+    local (URLs /media/...) são enviadas lendo o arquivo em partes, sem baixá-las.
+    """
+
+    def __init__(self, token: str, base_url: str = TELEGRAM_API_URL,
+                 max_connections: int = SEND_MAX_CONNECTIONS, timeout: float = SEND_TIMEOUT,
+                 limiter: Optional[RateLimiter] = None, max_retries: int = SEND_MAX_RETRIES,
+                 media_cache: Optional[MediaCache] = None, media_store: Optional[MediaStore] = None):
+        """
+        Inicializa o pipeline de envio.
+
+        Args:
+            token: Token do bot
+            base_url: URL base da Bot API (ex.: servidor falso local em testes)
+            max_connections: Máximo de conexões/envios simultâneos
+            timeout: Timeout total de cada requisição, em segundos
+            limiter: Limitador de envios; se None, usa os limites padrão do Telegram
+            max_retries: Tentativas extras após respostas 429
+            media_cache: Cache de file_id das imagens dos posts (opcional)
+            media_store: Repositório local das imagens enviadas pelo painel (opcional)
+        """
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.media_cache = media_cache
+        self.media_store = media_store
+        self.running = False
+        self.thread = None
+
+        self._loop = None
+        self._session = None
+        self._semaphore = None
+
+    def start(self) -> bool:
+        """
+        Inicia o event loop e abre a sessão HTTP.
+
+        Returns:
+            bool: True se o pipeline foi iniciado com sucesso, False caso contrário.
+        """
+        if self.running:
+            return True
+        if aiohttp is None:
+            logger.error("Módulo aiohttp não instalado. O pipeline de envio não será iniciado.")
+            return False
+
+        try:
+            self._loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self.thread = threading.Thread(target=self._run_loop, args=(ready,), name="SendPipeline")
+            self.thread.daemon = True
+            self.thread.start()
+            ready.wait(timeout=5)
+
+            asyncio.run_coroutine_threadsafe(self._open_session(), self._loop).result(timeout=10)
+            self.running = True
+            logger.info("Pipeline de envio iniciado")
+            return True
+        except Exception as e:
+            logger.error("Erro ao iniciar pipeline de envio: %s", e)
+            self._shutdown_loop()
+            return False
+
+    def stop(self) -> bool:
+        """
+        Fecha a sessão HTTP e encerra o event loop.
+
+        Returns:
+            bool: True se o pipeline foi parado com sucesso, False caso contrário.
+        """
+        if not self.running:
+            return True
+
+        self.running = False
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_session(), self._loop).result(timeout=5)
+        except Exception as e:
+            logger.error("Erro ao fechar sessão do pipeline de envio: %s", e)
+        self._shutdown_loop()
+        logger.info("Pipeline de envio parado")
+        return True
+
+    def is_running(self) -> bool:
+        """Verifica se o pipeline está em execução"""
+        return self.running and self.thread is not None and self.thread.is_alive()
+
+    def submit(self, method: str, params: Dict[str, Any], files: Optional[Dict[str, Any]] = None) -> Future:
+        """
+        Agenda uma chamada à Bot API. Pode ser chamado de qualquer thread.
+
+        Args:
+            method: Método da Bot API (ex.: 'sendMessage')
+            params: Parâmetros da chamada
+            files: Arquivos a enviar em multipart, por nome do campo (objetos de arquivo)
+
+        Returns:
+            Future: Resolve com o campo 'result' da resposta, ou falha com TelegramAPIError.
+        """
+        return self._schedule(self._request(method, params, files))
+
+    def call(self, method: str, params: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        """Versão bloqueante de submit(), para quem precisa do resultado imediatamente"""
+        return self.submit(method, params).result(timeout=timeout or self.timeout)
+
+    def send_message(self, chat_id, text: str, **kwargs) -> Future:
+        """Agenda um sendMessage"""
+        return self.submit('sendMessage', dict(chat_id=chat_id, text=text, **kwargs))
+
+    def send_photo(self, chat_id, photo, caption: str = "", **kwargs) -> Future:
+        """Agenda um sendPhoto (photo pode ser URL, file_id ou objeto de arquivo)"""
+        params = dict(chat_id=chat_id, caption=caption, **kwargs)
+        if hasattr(photo, 'read'):
+            return self.submit('sendPhoto', params, files={'photo': photo})
+        params['photo'] = photo
+        return self.submit('sendPhoto', params)
+
+    def submit_post(self, chat_id, post: Dict[str, Any],
+                    on_sent: Optional[Callable[[Any], None]] = None) -> Future:
+        """
+        Agenda o envio de um post promocional com a mensagem compilada do post
+        (payloads.render_post): foto com legenda se houver imagem, caso contrário
+        apenas texto, com o link externo anexado.
+
+        Args:
+            chat_id: ID do chat de destino
+            post: Post promocional
+            on_sent: Callback opcional chamado (na thread do pipeline) com o resultado
+                     quando o envio for concluído com sucesso
+
+        Returns:
+            Future: Resolve com a mensagem enviada, ou falha com TelegramAPIError.
+        """
+        # Mensagem já compilada na criação/edição do post (ver payloads.py)
+        payload = payload_for(post)
+        params = dict(payload['params'], chat_id=chat_id)
+        if payload['method'] == 'sendPhoto' and self.media_cache is not None:
+            future = self._schedule(self._send_cached_photo(params))
+        else:
+            future = self.submit(payload['method'], params)
+
+        title = post.get('title', '')
+        started = time.monotonic()
+
+        def _done(done: Future):
+            fields = {'post_id': post.get('id'), 'chat_id': chat_id,
+                      'latency_ms': round((time.monotonic() - started) * 1000, 1)}
+            try:
+                result = done.result()
+            except Exception as e:
+                logger.error("Falha ao enviar post promocional '%s' para %s: %s", title, chat_id, e, extra=fields)
+                return
+            logger.info("Post promocional enviado para %s: %s", chat_id, title, extra=fields)
+            if on_sent is not None:
+                try:
+                    on_sent(result)
+                except Exception as e:
+                    logger.error("Erro no callback de envio: %s", e)
+
+        future.add_done_callback(_done)
+        return future
+
+    def _schedule(self, coro) -> Future:
+        """Executa uma corrotina no event loop do pipeline"""
+        if not self.running:
+            coro.close()
+            future = Future()
+            future.set_exception(RuntimeError("Pipeline de envio não está em execução"))
+            return future
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        PENDING.inc()
+        future.add_done_callback(lambda _: PENDING.dec())
+        return future
+
+    def _run_loop(self, ready: threading.Event):
+        """Executa o event loop na thread do pipeline"""
+        asyncio.set_event_loop(self._loop)
+        ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    def _shutdown_loop(self):
+        """Para o event loop e aguarda a thread terminar"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=5)
+        self.thread = None
+        self._loop = None
+
+    async def _open_session(self):
+        """Cria a sessão HTTP com pool de conexões keep-alive"""
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        self._semaphore = asyncio.Semaphore(self.max_connections)
+
+    async def _close_session(self):
+        """Fecha a sessão HTTP"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method: str, params: Dict[str, Any], files: Optional[Dict[str, Any]] = None) -> Any:
+        """Executa uma chamada à Bot API, respeitando os limites de envio, e retorna o campo 'result'"""
+        if not method.startswith('send'):
+            return await self._post(method, params, files)
+
+        chat_id = params.get('chat_id')
+        attempt = 0
+        started = time.perf_counter()
+        try:
+            while True:
+                delay = self.limiter.reserve(chat_id)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                try:
+                    return await self._post(method, params, files)
+                except TelegramAPIError as e:
+                    if e.retry_after is None or attempt >= self.max_retries:
+                        raise
+                    attempt += 1
+                    self.limiter.penalize(chat_id, e.retry_after)
+                    for fileobj in (files or {}).values():
+                        if hasattr(fileobj, 'seek'):
+                            fileobj.seek(0)
+        finally:
+            SEND_LATENCY.labels(method=method).observe(time.perf_counter() - started)
+
+    async def _send_cached_photo(self, params: Dict[str, Any]) -> Any:
+        """
+        Envia a imagem de um post reutilizando o file_id em cache.
+
+        Sem file_id em cache, a imagem é baixada pelo bot: se o mesmo conteúdo (hash
+        SHA-256) já foi enviado, o file_id dele é reaproveitado; senão o arquivo é
+        enviado e o file_id devolvido é guardado. Se o download falhar, o Telegram
+        recebe a URL, como antes, e o file_id da resposta também é guardado.
+        """
+        loop = asyncio.get_running_loop()
+        cache = self.media_cache
+        params = dict(params)
+        url = params.pop('photo')
+
+        file_id = cache.get(url)
+        if file_id:
+            result = await self._send_file_id(params, file_id)
+            if result is not None:
+                return result
+
+        name = media_name(url) if self.media_store is not None else None
+        if name is not None:
+            return await self._send_stored_photo(params, url, name)
+
+        content = await self._download(url)
+        content_hash = None
+        if content is None:
+            result = await self._request('sendPhoto', dict(params, photo=url))
+        else:
+            content_hash = hashlib.sha256(content).hexdigest()
+            file_id = cache.get_by_hash(content_hash)
+            result = await self._send_file_id(params, file_id) if file_id else None
+            if result is None:
+                photo = io.BytesIO(content)
+                photo.name = os.path.basename(urlparse(url).path) or 'photo.jpg'
+                result = await self._request('sendPhoto', params, files={'photo': photo})
+
+        file_id = photo_file_id(result)
+        if file_id:
+            # A gravação do cache em disco não deve bloquear o event loop
+            await loop.run_in_executor(None, cache.put, url, file_id, content_hash)
+        return result
+
+    async def _send_stored_photo(self, params: Dict[str, Any], url: str, name: str) -> Any:
+        """Envia uma imagem do repositório local, lendo o arquivo em partes"""
+        loop = asyncio.get_running_loop()
+        content_hash = media_content_hash(name)
+        file_id = self.media_cache.get_by_hash(content_hash)
+        result = await self._send_file_id(params, file_id) if file_id else None
+        if result is None:
+            path = self.media_store.path(name)
+            if path is None:
+                raise FileNotFoundError(f"Imagem não encontrada no repositório de mídia: {name}")
+            # Abrir (e fechar) o arquivo fora do event loop; o aiohttp já lê o conteúdo em um executor
+            photo = await loop.run_in_executor(None, open, path, 'rb')
+            try:
+                result = await self._request('sendPhoto', params, files={'photo': photo})
+            finally:
+                await loop.run_in_executor(None, photo.close)
+
+        file_id = photo_file_id(result)
+        if file_id:
+            await loop.run_in_executor(None, self.media_cache.put, url, file_id, content_hash)
+        return result
+
+    async def _send_file_id(self, params: Dict[str, Any], file_id: str) -> Any:
+        """Envia uma foto por file_id; retorna None (e limpa o cache) se o file_id for recusado"""
+        try:
+            return await self._request('sendPhoto', dict(params, photo=file_id))
+        except TelegramAPIError as e:
+            if not is_file_id_error(e.description):
+                raise
+            logger.warning("file_id recusado pelo Telegram, a imagem será reenviada: %s", e.description)
+            await asyncio.get_running_loop().run_in_executor(None, self.media_cache.invalidate_file_id, file_id)
+            return None
+
+    async def _download(self, url: str) -> Optional[bytes]:
+        """Baixa uma imagem (até MEDIA_MAX_BYTES); retorna None se falhar"""
+        try:
+            async with self._semaphore:
+                timeout = aiohttp.ClientTimeout(total=MEDIA_DOWNLOAD_TIMEOUT)
+                async with self._session.get(url, timeout=timeout) as response:
+                    if response.status != 200:
+                        logger.warning("Falha ao baixar imagem %s: HTTP %s", url, response.status)
+                        return None
+                    if (response.content_length or 0) > MEDIA_MAX_BYTES:
+                        logger.warning("Imagem %s excede %s bytes", url, MEDIA_MAX_BYTES)
+                        return None
+                    content = bytearray()
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        content.extend(chunk)
+                        if len(content) > MEDIA_MAX_BYTES:
+                            logger.warning("Imagem %s excede %s bytes", url, MEDIA_MAX_BYTES)
+                            return None
+                    return bytes(content)
+        except Exception as e:
+            logger.warning("Falha ao baixar imagem %s: %s", url, e)
+            return None
+
+    async def _post(self, method: str, params: Dict[str, Any], files: Optional[Dict[str, Any]] = None) -> Any:
+        """Faz a requisição HTTP à Bot API e retorna o campo 'result'"""
+        url = f"{self.base_url}/bot{self.token}/{method}"
+
+        async with self._semaphore:
+            started = time.perf_counter()
+            if files:
+                form = aiohttp.FormData()
+                for name, value in params.items():
+                    if isinstance(value, (dict, list)):
+                        form.add_field(name, json.dumps(value))
+                    elif value is not None:
+                        form.add_field(name, str(value))
+                for name, fileobj in files.items():
+                    form.add_field(name, fileobj, filename=os.path.basename(str(getattr(fileobj, 'name', name))))
+                response_ctx = self._session.post(url, data=form)
+            else:
+                response_ctx = self._session.post(url, json=params)
+
+            async with response_ctx as response:
+                data = await response.json(content_type=None)
+            API_LATENCY.labels(method=method).observe(time.perf_counter() - started)
+
+        if not data.get('ok'):
+            parameters = data.get('parameters') or {}
+            if data.get('error_code', response.status) == 429:
+                RATE_LIMITED.labels(method=method).inc()
+            raise TelegramAPIError(
+                data.get('description', f"HTTP {response.status}"),
+                error_code=data.get('error_code', response.status),
+                retry_after=parameters.get('retry_after')
+            )
+        return data.get('result')
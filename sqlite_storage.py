@@ -0,0 +1,291 @@
+import json
+import os
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+
+from config import (
+    BOT_CONFIG_FILE,
+    PROMOTIONAL_POSTS_FILE,
+    WELCOME_CONFIG_FILE,
+    STATS_FILE,
+    LAST_SENT_POST_FILE,
+    SQLITE_DB_FILE
+)
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS posts (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_posts_created_at ON posts (created_at);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value
+);
+CREATE TABLE IF NOT EXISTS rotation_state (
+    scope TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class SQLiteStorage:
+    """
+    Backend de armazenamento em SQLite (modo WAL) para o DataManager.
+
+    Cada post é uma linha indexada por id e created_at, de forma que inserir,
+    atualizar ou excluir um post custa uma única escrita de linha, independente
+    do tamanho do catálogo. O modo WAL permite que leituras do painel ocorram
+    em paralelo com as escritas do agendador.
+    """
+
+    def __init__(self, db_path: str = SQLITE_DB_FILE):
+        """
+        Inicializa o backend SQLite.
+
+        Args:
+            db_path: Caminho do arquivo de banco de dados
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Retorna a conexão da thread atual, criando-a se necessário"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        """Retorna um gerenciador de contexto que executa um bloco em uma transação"""
+        return _Transaction(self._connection())
+
+    def close(self):
+        """Fecha a conexão da thread atual"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # Documentos (configuração do bot e de boas-vindas)
+    def get_document(self, name: str) -> Optional[Dict[str, Any]]:
+        """Retorna um documento JSON pelo nome, ou None se não existir"""
+        row = self._connection().execute(
+            "SELECT data FROM documents WHERE name = ?", (name,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_document(self, name: str, data: Dict[str, Any]):
+        """Grava (ou substitui) um documento JSON"""
+        self._connection().execute(
+            "INSERT OR REPLACE INTO documents (name, data) VALUES (?, ?)",
+            (name, json.dumps(data, ensure_ascii=False))
+        )
+
+    # Posts promocionais
+    def get_posts(self) -> List[Dict[str, Any]]:
+        """Retorna todos os posts em ordem de criação"""
+        rows = self._connection().execute(
+            "SELECT data FROM posts ORDER BY created_at, rowid"
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_post(self, post_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna um post pelo id, ou None se não existir"""
+        row = self._connection().execute(
+            "SELECT data FROM posts WHERE id = ?", (post_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def insert_post(self, post: Dict[str, Any]):
+        """Insere um novo post"""
+        self._connection().execute(
+            "INSERT INTO posts (id, created_at, data) VALUES (?, ?, ?)",
+            (post['id'], post.get('created_at', ''), json.dumps(post, ensure_ascii=False))
+        )
+
+    def upsert_posts(self, posts: List[Dict[str, Any]]):
+        """Insere ou substitui vários posts em uma única transação"""
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO posts (id, created_at, data) VALUES (?, ?, ?)",
+                [(post['id'], post.get('created_at', ''), json.dumps(post, ensure_ascii=False)) for post in posts]
+            )
+
+    def update_post(self, post: Dict[str, Any]) -> bool:
+        """Atualiza um post existente. Retorna False se o post não existir"""
+        cursor = self._connection().execute(
+            "UPDATE posts SET created_at = ?, data = ? WHERE id = ?",
+            (post.get('created_at', ''), json.dumps(post, ensure_ascii=False), post['id'])
+        )
+        return cursor.rowcount > 0
+
+    def delete_post(self, post_id: str) -> bool:
+        """Exclui um post. Retorna False se o post não existir"""
+        cursor = self._connection().execute("DELETE FROM posts WHERE id = ?", (post_id,))
+        return cursor.rowcount > 0
+
+    # Estatísticas
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna todas as estatísticas como um dicionário"""
+        rows = self._connection().execute("SELECT name, value FROM stats").fetchall()
+        return {name: value for name, value in rows}
+
+    def set_stat(self, name: str, value: Any):
+        """Define o valor de uma estatística"""
+        self._connection().execute(
+            "INSERT OR REPLACE INTO stats (name, value) VALUES (?, ?)", (name, value)
+        )
+
+    def increment_stat(self, name: str, amount: int = 1):
+        """Incrementa um contador de estatística"""
+        self._connection().execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = COALESCE(value, 0) + excluded.value",
+            (name, amount)
+        )
+
+    # Estado da rotação de posts
+    def get_rotation_state(self, scope: str = 'default') -> Optional[Dict[str, Any]]:
+        """Retorna o estado de rotação de posts de um escopo"""
+        row = self._connection().execute(
+            "SELECT data FROM rotation_state WHERE scope = ?", (scope,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_rotation_state(self, state: Dict[str, Any], scope: str = 'default'):
+        """Grava o estado de rotação de posts de um escopo (atualização da linha, a cada post enviado)"""
+        conn = self._connection()
+        data = json.dumps(state, ensure_ascii=False)
+        # Caso comum: a linha já existe e é apenas atualizada no lugar
+        if conn.execute("UPDATE rotation_state SET data = ? WHERE scope = ?", (data, scope)).rowcount == 0:
+            conn.execute("INSERT OR REPLACE INTO rotation_state (scope, data) VALUES (?, ?)", (scope, data))
+
+    # Migração
+    def is_migrated(self) -> bool:
+        """Verifica se os arquivos JSON já foram migrados para este banco"""
+        row = self._connection().execute(
+            "SELECT value FROM meta WHERE key = 'migrated_from_json'"
+        ).fetchone()
+        return row is not None
+
+    def migrate_from_json(self) -> bool:
+        """
+        Importa os arquivos JSON existentes para o banco, uma única vez.
+
+        Returns:
+            bool: True se a migração foi executada, False se já havia sido feita.
+        """
+        if self.is_migrated():
+            return False
+
+        bot_config = _read_json(BOT_CONFIG_FILE, None)
+        posts = _read_json(PROMOTIONAL_POSTS_FILE, [])
+        welcome_config = _read_json(WELCOME_CONFIG_FILE, None)
+        stats = _read_json(STATS_FILE, {})
+        last_sent = _read_json(LAST_SENT_POST_FILE, None)
+
+        with self._transaction() as conn:
+            if isinstance(bot_config, dict):
+                conn.execute(
+                    "INSERT OR REPLACE INTO documents (name, data) VALUES ('bot_config', ?)",
+                    (json.dumps(bot_config, ensure_ascii=False),)
+                )
+            if isinstance(welcome_config, dict):
+                conn.execute(
+                    "INSERT OR REPLACE INTO documents (name, data) VALUES ('welcome_config', ?)",
+                    (json.dumps(welcome_config, ensure_ascii=False),)
+                )
+            if isinstance(posts, list):
+                conn.executemany(
+                    "INSERT OR REPLACE INTO posts (id, created_at, data) VALUES (?, ?, ?)",
+                    [
+                        (post['id'], post.get('created_at', ''), json.dumps(post, ensure_ascii=False))
+                        for post in posts
+                        if isinstance(post, dict) and post.get('id')
+                    ]
+                )
+            if isinstance(stats, dict):
+                conn.executemany(
+                    "INSERT OR REPLACE INTO stats (name, value) VALUES (?, ?)",
+                    list(stats.items())
+                )
+            if isinstance(last_sent, dict):
+                conn.execute(
+                    "INSERT OR REPLACE INTO rotation_state (scope, data) VALUES ('default', ?)",
+                    (json.dumps(last_sent, ensure_ascii=False),)
+                )
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+                (datetime.now().isoformat(),)
+            )
+
+        logger.info("Dados JSON migrados para o SQLite: %s posts", len(posts) if isinstance(posts, list) else 0)
+        return True
+
+
+class _Transaction:
+    """Gerenciador de contexto para BEGIN/COMMIT/ROLLBACK explícitos"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
+
+
+def _read_json(path: str, default: Any) -> Any:
+    """Lê um arquivo JSON, retornando o valor padrão se não existir ou estiver corrompido"""
+    try:
+        if not os.path.exists(path):
+            return default
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logger.error("Erro ao ler %s durante a migração: %s", path, e)
+        return default
+
+
+if __name__ == "__main__":
+    # Migração manual: python sqlite_storage.py [caminho_do_banco]
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    storage = SQLiteStorage(sys.argv[1] if len(sys.argv) > 1 else SQLITE_DB_FILE)
+    if storage.migrate_from_json():
+        print(f"Migração concluída: {storage.db_path}")
+    else:
+        print(f"O banco {storage.db_path} já havia sido migrado")
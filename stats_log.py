@@ -0,0 +1,279 @@
+import json
+import os
+import atexit
+import logging
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Callable
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from atomic_json import write_json
+from config import STATS_FILE, STATS_LOG_FILE, STATS_FLUSH_SIZE, STATS_FLUSH_INTERVAL, STATS_COMPACT_LINES
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class StatsLog:
+    """
+    Contadores de estatísticas persistidos como log de eventos append-only.
+
+    Incrementos são acumulados em memória e gravados em lote, como uma linha JSON
+    por flush, quando atingem flush_size eventos ou flush_interval segundos. O log é
+    compactado periodicamente em um snapshot (STATS_FILE). Cada linha carrega um
+    número de sequência e o snapshot guarda o último aplicado, de forma que uma
+    queda entre a gravação do snapshot e o truncamento do log não conta eventos
+    em dobro.
+
+    Vários processos podem compartilhar os mesmos arquivos: gravações e
+    compactações acontecem sob um lock de arquivo, e se o log mudou desde a última
+    leitura deste processo ele é relido antes de gravar.
+    """
+
+    def __init__(self, snapshot_file: str = STATS_FILE, log_file: str = STATS_LOG_FILE,
+                 flush_size: int = STATS_FLUSH_SIZE, flush_interval: float = STATS_FLUSH_INTERVAL,
+                 compact_lines: int = STATS_COMPACT_LINES,
+                 on_flush: Optional[Callable[[], None]] = None):
+        """
+        Inicializa o log de estatísticas.
+
+        Args:
+            snapshot_file: Arquivo JSON com o estado compactado
+            log_file: Arquivo de log append-only (uma linha JSON por lote)
+            flush_size: Número de eventos pendentes que dispara uma gravação
+            flush_interval: Tempo máximo (segundos) que um evento fica só em memória
+            compact_lines: Número de linhas no log que dispara a compactação
+            on_flush: Callback chamado após cada gravação (ex.: avisar outros processos)
+        """
+        self.snapshot_file = snapshot_file
+        self.log_file = log_file
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.compact_lines = compact_lines
+        self.on_flush = on_flush
+
+        self._lock = threading.Lock()
+        self._pending_incr: Dict[str, int] = {}
+        self._pending_set: Dict[str, Any] = {}
+        self._pending_count = 0
+        self._timer: Optional[threading.Timer] = None
+        self._seq = 0
+        self._log_lines = 0
+        self._state: Optional[Dict[str, Any]] = None
+        self._stamp: Optional[tuple] = None
+
+        atexit.register(self.flush)
+
+    def load(self) -> Dict[str, Any]:
+        """
+        Reconstrói as estatísticas a partir do snapshot e do final do log.
+
+        Returns:
+            Dict[str, Any]: Estatísticas atuais, incluindo eventos ainda pendentes.
+        """
+        with self._lock:
+            if self._state is None:
+                self._state = self._replay()
+            state = dict(self._state)
+            for name, amount in self._pending_incr.items():
+                state[name] = state.get(name, 0) + amount
+            state.update(self._pending_set)
+            return state
+
+    def invalidate(self):
+        """Descarta o estado em memória; a próxima leitura relê snapshot e log"""
+        with self._lock:
+            self._state = None
+
+    def increment(self, name: str, amount: int = 1):
+        """Registra um incremento de contador"""
+        with self._lock:
+            self._pending_incr[name] = self._pending_incr.get(name, 0) + amount
+            self._record_pending()
+
+    def set(self, name: str, value: Any):
+        """Registra a atribuição de um valor (ex.: horário de reinício)"""
+        with self._lock:
+            self._pending_set[name] = value
+            self._record_pending()
+
+    def flush(self):
+        """Grava os eventos pendentes no log"""
+        with self._lock:
+            self._flush_locked()
+
+    def compact(self):
+        """Compacta o log em um novo snapshot"""
+        with self._lock, self._file_lock():
+            self._sync_locked()
+            self._write_locked()
+            self._compact_locked()
+
+    def _record_pending(self):
+        """Contabiliza um evento pendente e agenda/dispara a gravação"""
+        self._pending_count += 1
+        if self._pending_count >= self.flush_size:
+            self._flush_locked()
+        elif self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_locked(self):
+        """Grava os eventos pendentes como uma única linha do log (com o lock adquirido)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if not self._pending_count:
+            return
+
+        with self._file_lock():
+            self._sync_locked()
+            if not self._write_locked():
+                return
+            if self._log_lines >= self.compact_lines:
+                self._compact_locked()
+
+        if self.on_flush is not None:
+            try:
+                self.on_flush()
+            except Exception as e:
+                logger.error("Erro no callback de gravação de estatísticas: %s", e)
+
+    def _sync_locked(self):
+        """Relê snapshot e log se outro processo os alterou (com os locks adquiridos)"""
+        if self._state is None or self._current_stamp() != self._stamp:
+            self._state = self._replay()
+
+    def _write_locked(self) -> bool:
+        """Acrescenta os eventos pendentes ao log (com os locks adquiridos)"""
+        if not self._pending_count:
+            return True
+
+        self._seq += 1
+        event = {"seq": self._seq, "ts": datetime.now().isoformat()}
+        if self._pending_incr:
+            event["incr"] = self._pending_incr
+        if self._pending_set:
+            event["set"] = self._pending_set
+
+        try:
+            os.makedirs(os.path.dirname(self.log_file) or '.', exist_ok=True)
+            with open(self.log_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event, ensure_ascii=False, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        except Exception as e:
+            self._seq -= 1
+            logger.error("Erro ao gravar log de estatísticas: %s", e)
+            return False
+
+        _apply_event(self._state, event)
+        self._pending_incr = {}
+        self._pending_set = {}
+        self._pending_count = 0
+        self._log_lines += 1
+        self._stamp = self._current_stamp()
+        return True
+
+    @contextmanager
+    def _file_lock(self):
+        """Lock exclusivo entre processos sobre os arquivos de estatísticas"""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.log_file) or '.', exist_ok=True)
+        with open(self.log_file + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _current_stamp(self) -> tuple:
+        """Identifica a versão atual do snapshot e do log (inode, tamanho, mtime)"""
+        stamp = []
+        for path in (self.snapshot_file, self.log_file):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _compact_locked(self):
+        """Grava o snapshot e trunca o log (com o lock adquirido)"""
+        if self._state is None:
+            return
+
+        snapshot = dict(self._state)
+        snapshot["_seq"] = self._seq
+        try:
+            write_json(self.snapshot_file, snapshot)
+
+            # A partir daqui todas as linhas do log já estão no snapshot
+            with open(self.log_file, 'w', encoding='utf-8'):
+                pass
+            self._log_lines = 0
+            self._stamp = self._current_stamp()
+            logger.debug("Log de estatísticas compactado (seq %s)", self._seq)
+        except Exception as e:
+            logger.error("Erro ao compactar estatísticas: %s", e)
+
+    def _replay(self) -> Dict[str, Any]:
+        """Lê o snapshot e aplica as linhas do log posteriores a ele"""
+        # Versão lida antes do conteúdo: uma alteração durante a leitura força nova releitura
+        stamp = self._current_stamp()
+        state = {
+            "welcome_messages_sent": 0,
+            "promo_messages_sent": 0,
+            "last_restarted": datetime.now().isoformat()
+        }
+        snapshot_seq = 0
+        try:
+            if os.path.exists(self.snapshot_file):
+                with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                snapshot_seq = snapshot.pop("_seq", 0)
+                state.update(snapshot)
+        except json.JSONDecodeError:
+            logger.error("Snapshot de estatísticas corrompido. Reconstruindo a partir do log.")
+        except Exception as e:
+            logger.error("Erro ao ler snapshot de estatísticas: %s", e)
+
+        self._seq = snapshot_seq
+        self._log_lines = 0
+        try:
+            if os.path.exists(self.log_file):
+                with open(self.log_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            event = json.loads(line)
+                        except json.JSONDecodeError:
+                            # Linha parcial de uma gravação interrompida
+                            logger.warning("Linha inválida ignorada no log de estatísticas")
+                            continue
+                        self._log_lines += 1
+                        if event.get("seq", 0) <= snapshot_seq:
+                            continue
+                        _apply_event(state, event)
+                        self._seq = max(self._seq, event.get("seq", 0))
+        except Exception as e:
+            logger.error("Erro ao ler log de estatísticas: %s", e)
+
+        self._stamp = stamp
+        return state
+
+
+def _apply_event(state: Dict[str, Any], event: Dict[str, Any]):
+    """Aplica um evento do log sobre o estado"""
+    for name, amount in event.get("incr", {}).items():
+        state[name] = state.get(name, 0) + amount
+    state.update(event.get("set", {}))
+
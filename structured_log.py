@@ -0,0 +1,164 @@
+import copy
+import json
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from config import LOG_FILE, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_FORMAT, LOG_QUEUE_SIZE
+from log_tail import CompressingRotatingFileHandler
+from metrics import counter, QUEUE_DEPTH
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Atributos padrão de um LogRecord: o que sobrar são os campos passados em extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# Handler instalado por setup_logging (um por processo)
+_handler: Optional['DroppingQueueHandler'] = None
+_setup_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formata cada registro como um objeto JSON em uma única linha.
+
+    Campos: ts, level, logger, msg e os campos estruturados passados em extra=
+    (ex.: post_id, chat_id, latency_ms); tracebacks vão no campo exc.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).astimezone().isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler com fila limitada que descarta registros quando ela está cheia.
+
+    A thread que registra a mensagem só resolve o texto (msg % args) e o traceback e
+    coloca o registro na fila: a formatação (JSON, data) e a gravação em disco ficam
+    com a thread do QueueListener. Se o disco ficar lento e a fila encher, os novos
+    registros são descartados em vez de bloquear o chamador; o total descartado fica
+    em `dropped` e é informado no log assim que a fila voltar a ter espaço.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.listener: Optional[QueueListener] = None
+        self._unreported = 0
+        self._drop_lock = threading.Lock()
+        self._exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Os argumentos podem mudar depois do retorno: o texto é resolvido aqui
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+                self._unreported += 1
+            return
+
+        if self._unreported:
+            with self._drop_lock:
+                count, self._unreported = self._unreported, 0
+            if count:
+                notice = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                                           f"{count} registro(s) de log descartado(s): fila cheia", None, None)
+                notice.dropped = count
+                try:
+                    self.queue.put_nowait(notice)
+                except queue.Full:
+                    with self._drop_lock:
+                        self._unreported += count
+
+
+def setup_logging(level: int = logging.INFO, log_file: str = LOG_FILE, log_format: str = LOG_FORMAT,
+                  queue_size: int = LOG_QUEUE_SIZE) -> DroppingQueueHandler:
+    """
+    Configura o logging da aplicação com gravação assíncrona.
+
+    O logger raiz recebe apenas um DroppingQueueHandler; uma thread (QueueListener)
+    grava os registros no console (texto) e no arquivo de log rotacionado (JSON, ou
+    texto com log_format='text'). Chamadas repetidas reaproveitam a configuração.
+
+    Args:
+        level: Nível mínimo dos registros
+        log_file: Arquivo de log
+        log_format: 'json' ou 'text' (formato do arquivo)
+        queue_size: Máximo de registros aguardando gravação
+
+    Returns:
+        DroppingQueueHandler: Handler instalado (contador `dropped` e `listener`).
+    """
+    global _handler
+    with _setup_lock:
+        if _handler is not None:
+            return _handler
+
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(TEXT_FORMAT))
+        file_handler = CompressingRotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES,
+                                                      backupCount=LOG_BACKUP_COUNT)
+        file_handler.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT))
+
+        handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        handler.listener = QueueListener(handler.queue, console, file_handler, respect_handler_level=True)
+        handler.listener.start()
+        atexit.register(stop_logging)
+
+        QUEUE_DEPTH.labels(queue='log').set_function(handler.queue.qsize)
+        counter('log_records_dropped_total', 'Registros de log descartados por fila cheia').set_function(
+            lambda: handler.dropped)
+
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.addHandler(handler)
+        _handler = handler
+        return handler
+
+
+def stop_logging():
+    """Grava os registros pendentes na fila e para a thread de gravação (chamada na saída)"""
+    global _handler
+    with _setup_lock:
+        handler, _handler = _handler, None
+    if handler is None:
+        return
+    logging.getLogger().removeHandler(handler)
+    handler.listener.stop()
+    for target in handler.listener.handlers:
+        target.close()
+
+
+def dropped_records() -> int:
+    """Total de registros descartados por fila cheia desde o início do processo"""
+    return _handler.dropped if _handler is not None else 0
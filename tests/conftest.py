@@ -0,0 +1,50 @@
+import os
+import socket
+import sys
+
+import pytest
+
+# Os módulos do bot ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# Nenhum teste acessa o Telegram: a URL padrão da Bot API (lida por config.py na
+# importação) aponta para a porta do servidor falso usado pelo painel em test_app.py
+FAKE_TELEGRAM_PORT = _free_port()
+os.environ['TELEGRAM_API_URL'] = f'http://127.0.0.1:{FAKE_TELEGRAM_PORT}'
+
+
+@pytest.fixture
+def data_manager(tmp_path, monkeypatch):
+    """DataManager com os arquivos de dados em um diretório temporário"""
+    monkeypatch.chdir(tmp_path)
+    from data_manager import DataManager
+    manager = DataManager()
+    yield manager
+    # Grava os contadores pendentes ainda no diretório temporário
+    if manager._stats_log is not None:
+        manager._stats_log.flush()
+
+
+@pytest.fixture
+def make_posts():
+    """Gera posts com created_at crescente"""
+    def make(count):
+        return [{'title': f'Post {i}', 'content': f'Conteúdo {i}', 'image_url': '', 'external_link': '',
+                 'created_at': f'2024-01-01T00:00:{i:02d}'} for i in range(count)]
+    return make
+
+
+@pytest.fixture
+def fake_telegram():
+    """Servidor falso da Bot API em uma porta livre"""
+    from fake_telegram_server import FakeTelegramServer
+    server = FakeTelegramServer().start()
+    yield server
+    server.stop()
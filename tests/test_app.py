@@ -0,0 +1,228 @@
+import atexit
+import importlib
+import os
+import sys
+import time
+
+import pytest
+
+from conftest import FAKE_TELEGRAM_PORT
+
+pytest.importorskip('flask')
+pytest.importorskip('aiohttp')
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture(scope='module')
+def fake_api():
+    """Servidor falso na porta para a qual TELEGRAM_API_URL aponta (ver conftest.py)"""
+    from fake_telegram_server import FakeTelegramServer
+    server = FakeTelegramServer(port=FAKE_TELEGRAM_PORT).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope='module')
+def app_module(fake_api, tmp_path_factory):
+    """Importa o painel com token e grupo configurados: o bot inicia contra o servidor falso"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('app'))
+    env = {'TELEGRAM_TOKEN': 'test-token', 'GROUP_ID': '-100'}
+    saved = {name: os.environ.get(name) for name in env}
+    os.environ.update(env)
+    sys.modules.pop('app', None)
+    try:
+        module = importlib.import_module('app')
+        yield module
+        module.cleanup()
+        atexit.unregister(module.cleanup)
+    finally:
+        from structured_log import stop_logging
+        stop_logging()
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def test_startup_wires_pipeline_outbox_and_receiver(app_module, fake_api):
+    from updates import UpdatePoller
+
+    assert app_module.pipeline is not None and app_module.pipeline.is_running()
+    assert app_module.bot_handler.pipeline is app_module.pipeline
+    assert app_module.outbox is not None
+    assert app_module.welcome_batcher.running
+    assert app_module.group_scheduler.is_running()
+    assert isinstance(app_module.update_receiver, UpdatePoller)
+    assert fake_api.calls_for('deleteWebhook')
+
+    # Um membro novo chega pelo polling e é saudado pelo agrupador via fila de saída
+    app_module.data_manager.update_welcome_config('Bem-vindo, {first_name}!', batch_window=0)
+    fake_api.push_update({'message': {'chat': {'id': -100, 'title': 'Grupo'},
+                                      'new_chat_members': [{'id': 7, 'first_name': 'Ana'}]}})
+    assert _wait_for(lambda: any('Ana' in call['params'].get('text', '')
+                                 for call in fake_api.calls_for('sendMessage')))
+
+
+def test_metrics(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+    lines = response.get_data(as_text=True).splitlines()
+    assert '# TYPE bot_messages_sent_total counter' in lines
+    assert any(line.startswith('bot_messages_sent_total{kind="promo"} ') for line in lines)
+    # Toda amostra pertence a uma família declarada com # TYPE
+    families = {line.split()[2] for line in lines if line.startswith('# TYPE ')}
+    for line in lines:
+        if not line.startswith('#'):
+            name = line.split('{', 1)[0].split(' ', 1)[0]
+            assert name in families or name.rsplit('_', 1)[0] in families
+
+
+def test_api_posts(client, app_module):
+    app_module.data_manager.import_promotional_posts([{'title': 'Post A', 'content': 'Texto'}])
+    response = client.get('/api/posts?limit=5')
+    assert response.status_code == 200
+    assert any(post['title'] == 'Post A' for post in response.get_json()['posts'])
+    assert client.get('/api/posts?limit=abc').status_code == 400
+
+
+def test_api_schedule(client, monkeypatch):
+    import data_manager as data_manager_module
+    compiled = []
+    compile_schedule = data_manager_module.compile_schedule
+    monkeypatch.setattr(data_manager_module, 'compile_schedule',
+                        lambda *args: compiled.append(args) or compile_schedule(*args))
+
+    response = client.post('/api/schedule', json={'cron': ['0 9 * * *'], 'timezone': 'UTC'})
+    assert response.status_code == 200
+    # O calendário é compilado uma única vez por requisição
+    assert len(compiled) == 1
+    body = response.get_json()
+    assert body['schedule']['cron'] == ['0 9 * * *']
+    assert body['upcoming'] and body['upcoming'][0].endswith('09:00:00+00:00')
+
+    assert client.post('/api/schedule', json={'cron': ['bad']}).status_code == 400
+    assert client.get('/api/schedule').get_json()['schedule']['cron'] == ['0 9 * * *']
+
+    assert client.post('/api/schedule', json=None).status_code == 200
+
+
+def test_webhook_route(client, app_module, monkeypatch):
+    from config import WEBHOOK_PATH
+    from updates import SECRET_HEADER, UpdateHandler, WebhookReceiver
+
+    # No modo polling a rota não aceita updates
+    assert client.post(WEBHOOK_PATH, json={'update_id': 1}).status_code == 404
+
+    handled = []
+    handler = UpdateHandler()
+    handler.handle = handled.append
+    receiver = WebhookReceiver(handler, 'segredo')
+    receiver.start()
+    monkeypatch.setattr(app_module, 'update_receiver', receiver)
+    try:
+        assert client.post(WEBHOOK_PATH, json={'update_id': 1}).status_code == 403
+        assert client.post(WEBHOOK_PATH, json={'update_id': 1},
+                           headers={SECRET_HEADER: 'errado'}).status_code == 403
+        for _ in range(2):
+            response = client.post(WEBHOOK_PATH, json={'update_id': 1}, headers={SECRET_HEADER: 'segredo'})
+            assert response.status_code == 200
+        assert client.post(WEBHOOK_PATH, data='x', headers={SECRET_HEADER: 'segredo'}).status_code == 400
+    finally:
+        receiver.stop()
+    # O update reenviado é processado uma única vez
+    assert handled == [{'update_id': 1}]
+
+
+def test_log_stream(client, app_module):
+    import logging
+    logging.getLogger('app').warning("linha de teste do stream")
+
+    response = client.get('/api/logs/stream', buffered=False)
+    try:
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        chunks = iter(response.response)
+        assert next(chunks).startswith(b'retry:')
+        assert next(chunks).startswith((b'id:', b': keep-alive'))
+    finally:
+        response.close()
+
+
+def test_promo_upload_goes_to_media_store(client, app_module):
+    import io
+    from media_store import media_name
+
+    data_manager = app_module.data_manager
+    response = client.post('/promo', content_type='multipart/form-data', data={
+        'action': 'create', 'title': 'Com imagem', 'content': 'Texto do post', 'image_url': '',
+        'image_file': (io.BytesIO(b'conteudo da imagem'), 'foto.png')})
+    assert response.status_code == 302
+
+    post = next(post for post in data_manager.get_promotional_posts() if post['title'] == 'Com imagem')
+    name = media_name(post['image_url'])
+    assert name and name.endswith('.png')
+    with open(data_manager.media_store.path(name), 'rb') as f:
+        assert f.read() == b'conteudo da imagem'
+
+    # Editar com uma nova imagem troca a URL; sem arquivo, a URL do formulário é mantida
+    client.post('/promo', content_type='multipart/form-data', data={
+        'action': 'edit', 'post_id': post['id'], 'title': 'Com imagem', 'content': 'Novo texto',
+        'image_url': post['image_url'], 'image_file': (io.BytesIO(b'outra imagem'), 'foto.jpg')})
+    edited = data_manager.get_promotional_post(post['id'])
+    assert edited['content'] == 'Novo texto'
+    assert media_name(edited['image_url']).endswith('.jpg')
+
+    client.post('/promo', data={'action': 'delete', 'post_id': post['id']})
+    assert data_manager.get_promotional_post(post['id']) is None
+
+
+def test_promo_page(client, app_module):
+    app_module.data_manager.import_promotional_posts([{'title': 'Post da página', 'content': 'Texto'}])
+    for url in ('/promo', '/promo?q=pagina', '/promo?cursor=invalido'):
+        response = client.get(url)
+        assert response.status_code == 200
+        assert '<title>Posts Promocionais</title>' in response.get_data(as_text=True)
+
+
+def test_api_groups(client, app_module):
+    response = client.post('/api/groups', json={'group_id': '-200', 'interval': 3})
+    assert response.status_code == 200
+    assert {'group_id': '-200', 'interval': 3, 'active': True} in response.get_json()['groups']
+    # O grupo principal continua com o agendador principal
+    assert '-100' not in response.get_json()['scheduled']
+    assert client.post('/api/groups', json={'interval': 3}).status_code == 400
+
+    assert client.delete('/api/groups/-200').status_code == 200
+    assert all(group['group_id'] != '-200' for group in client.get('/api/groups').get_json()['groups'])
+    assert client.delete('/api/groups/-200').status_code == 404
+
+
+def test_credential_restart_drains_old_outbox(client, app_module):
+    old_pipeline, old_outbox, old_batcher = app_module.pipeline, app_module.outbox, app_module.welcome_batcher
+    response = client.post('/bot_config', data={'action': 'update_credentials',
+                                                'token': 'outro-token', 'group_id': '-100'})
+    assert response.status_code == 302
+
+    assert not old_batcher.running
+    assert not old_pipeline.is_running()
+    assert old_outbox.outbox._file is None
+    assert app_module.outbox is not old_outbox and app_module.outbox.stats
+    assert app_module.pipeline.is_running() and app_module.pipeline is not old_pipeline
+    assert app_module.welcome_batcher.running and app_module.group_scheduler.is_running()
@@ -0,0 +1,58 @@
+import json
+import os
+import threading
+
+import pytest
+
+from atomic_json import AtomicJSONWriter
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_writes_within_the_window_share_one_commit(tmp_path, monkeypatch):
+    writer = AtomicJSONWriter(window=0.2)
+    commits = []
+    commit = writer._commit
+    monkeypatch.setattr(writer, '_commit', lambda batch: commits.append(dict(batch.files)) or commit(batch))
+
+    start = threading.Barrier(4)
+
+    def write(name, value):
+        start.wait()
+        writer.write(str(tmp_path / name), {'value': value})
+
+    threads = [threading.Thread(target=write, args=(name, value))
+               for name, value in (('a.json', 1), ('b.json', 2), ('c.json', 3), ('d.json', 4))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(commits) == 1 and len(commits[0]) == 4
+    assert [_read(tmp_path / name)['value'] for name in ('a.json', 'b.json', 'c.json', 'd.json')] == [1, 2, 3, 4]
+    # Nenhum arquivo temporário fica para trás
+    assert sorted(os.listdir(tmp_path)) == ['a.json', 'b.json', 'c.json', 'd.json']
+
+
+def test_failed_write_keeps_the_original(tmp_path, monkeypatch):
+    writer = AtomicJSONWriter(window=0)
+    path = str(tmp_path / 'config.json')
+    writer.write(path, {'versão': 1})
+
+    def fail(src, dst):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(os, 'replace', fail)
+    with pytest.raises(OSError):
+        writer.write(path, {'versão': 2})
+    monkeypatch.undo()
+
+    assert _read(path) == {'versão': 1}
+    assert os.listdir(tmp_path) == ['config.json']
+
+    with pytest.raises(TypeError):
+        writer.write(path, {'valor': object()})
+    assert _read(path) == {'versão': 1}
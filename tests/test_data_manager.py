@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+from data_manager import DataManager
+
+
+def test_config_change_from_other_process_is_seen_on_read(data_manager):
+    data_manager.update_bot_config('token', '123', 10)
+    changes = []
+    threads = threading.active_count()
+    data_manager.add_config_listener(lambda: changes.append(data_manager.get_interval()))
+    # Nenhuma thread de verificação é criada
+    assert threading.active_count() == threads
+
+    other = DataManager()
+    other.update_bot_config('token', '123', 25)
+
+    assert data_manager.get_bot_config()['interval'] == 25
+    assert changes == [25]
+
+
+def test_import_update_keeps_created_at_and_other_fields(data_manager, make_posts):
+    data_manager.import_promotional_posts(make_posts(3))
+    original = data_manager.get_promotional_posts()[1]
+    data_manager.import_promotional_posts([dict(original, views=7)])
+
+    result = data_manager.import_promotional_posts([{'id': original['id'], 'title': 'Novo título'}])
+    assert result == {'added': 0, 'updated': 1}
+
+    post = next(post for post in data_manager.get_promotional_posts() if post['id'] == original['id'])
+    assert post['title'] == 'Novo título'
+    assert post['content'] == original['content']
+    assert post['views'] == 7
+    assert post['created_at'] == original['created_at']
+    # A posição na rotação (por created_at) não muda
+    assert [post['title'] for post in data_manager.iter_promotional_posts()] == ['Post 0', 'Novo título', 'Post 2']
+
+
+def test_invalid_schedule_raises_and_is_not_saved(data_manager):
+    from posting_schedule import ScheduleError
+
+    data_manager.update_bot_config('token', '123', 10)
+    with pytest.raises(ScheduleError):
+        data_manager.update_schedule({'cron': ['bad']})
+    assert 'schedule' not in data_manager.get_bot_config()
+
+
+def test_sequential_pick_is_timed_once(data_manager, make_posts):
+    from data_manager import OPERATION_LATENCY
+    data_manager.import_promotional_posts(make_posts(2))
+    operations = (('get_next_sequential_post', 'write'), ('peek_next_sequential_post', 'read'),
+                  ('advance_rotation', 'write'))
+
+    def counts():
+        return [OPERATION_LATENCY.labels(operation=name, kind=kind).snapshot()[2] for name, kind in operations]
+
+    before = counts()
+    assert data_manager.get_next_sequential_post()['title'] == 'Post 0'
+    # Só a chamada externa é registrada, não as etapas de consulta e avanço
+    assert [after - start for after, start in zip(counts(), before)] == [1, 0, 0]
@@ -0,0 +1,95 @@
+import gzip
+import logging
+
+import log_tail
+from log_tail import CompressingRotatingFileHandler, LogTail, parse_line
+
+
+def _line(i, level='INFO', name='bot'):
+    return f"2024-01-01 00:00:{i:02d},000 - {name} - {level} - Mensagem {i}"
+
+
+def _write(path, lines):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(''.join(line + '\n' for line in lines))
+
+
+def test_tail_reads_backwards_with_filters_and_tracebacks(tmp_path, monkeypatch):
+    # Blocos pequenos para que as linhas atravessem as fronteiras dos blocos
+    monkeypatch.setattr(log_tail, '_BLOCK_SIZE', 16)
+    path = str(tmp_path / 'app.log')
+    _write(path, [_line(0), _line(1, 'ERROR', 'send_pipeline'), 'Traceback (most recent call last):',
+                  '  ValueError: falhou', _line(2), _line(3, 'WARNING', 'send_pipeline.limiter'), _line(4)])
+    tail = LogTail(path)
+
+    lines, start = tail.tail(2)
+    assert lines == [_line(3, 'WARNING', 'send_pipeline.limiter'), _line(4)]
+    older, start = tail.tail(2, before=start)
+    assert older == [_line(1, 'ERROR', 'send_pipeline'), 'Traceback (most recent call last):',
+                     '  ValueError: falhou', _line(2)]
+    assert tail.tail(10, before=start) == ([_line(0)], 0)
+
+    lines, _ = tail.tail(10, level='WARNING', logger_name='send_pipeline')
+    assert lines == [_line(1, 'ERROR', 'send_pipeline'), 'Traceback (most recent call last):',
+                     '  ValueError: falhou', _line(3, 'WARNING', 'send_pipeline.limiter')]
+    assert tail.tail(10, logger_name='send') == ([], 0)
+    assert LogTail(str(tmp_path / 'nenhum.log')).tail() == ([], 0)
+
+
+def test_parse_line_accepts_json_records():
+    assert parse_line('{"level": "ERROR", "logger": "outbox", "message": "x"}') == ('outbox', 'ERROR')
+    assert parse_line('{"sem nível": 1}') is None
+    assert parse_line('  continuação') is None
+
+
+def test_index_pages_and_is_rebuilt_after_rotation(tmp_path):
+    path = str(tmp_path / 'app.log')
+    _write(path, [_line(i, 'ERROR' if i % 5 == 0 else 'INFO') for i in range(23)])
+    tail = LogTail(path, stride=4)
+    assert tail.page(9, 3) == [_line(9), _line(10, 'ERROR'), _line(11)]
+    assert tail.stats()['lines'] == 23
+    assert tail.stats()['levels'] == {'ERROR': 5, 'INFO': 18}
+
+    # O índice salvo é reaproveitado e estendido só com as linhas novas
+    _write(path, [_line(23)])
+    reopened = LogTail(path, stride=4)
+    assert reopened._load_index()['lines'] == 23
+    assert reopened.page(22, 5) == [_line(22), _line(23)]
+
+    handler = CompressingRotatingFileHandler(path, maxBytes=1, backupCount=2)
+    handler.doRollover()
+    handler.close()
+    with gzip.open(path + '.1.gz', 'rt', encoding='utf-8') as f:
+        assert f.read().splitlines()[-1] == _line(23)
+    _write(path, [_line(30)])
+    assert reopened.stats()['lines'] == 1
+    assert reopened.page(0) == [_line(30)]
+
+
+def test_follow_continues_across_a_rotation(tmp_path):
+    path = str(tmp_path / 'app.log')
+    handler = CompressingRotatingFileHandler(path, maxBytes=10 ** 6, backupCount=2)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    test_logger = logging.getLogger('test_log_tail.follow')
+    test_logger.propagate = False
+    test_logger.setLevel(logging.INFO)
+    test_logger.addHandler(handler)
+    try:
+        test_logger.info('antes')
+        follow = LogTail(path).follow(offset=0, level='WARNING', poll_interval=0.01, heartbeat=60)
+        test_logger.warning('aviso 1')
+        position, line = next(follow)
+        assert line.endswith(' - WARNING - aviso 1')
+        assert position == len(open(path, 'rb').read())
+
+        test_logger.warning('aviso 2')
+        handler.doRollover()
+        test_logger.info('depois')
+        test_logger.error('erro no arquivo novo')
+
+        assert next(follow)[1].endswith(' - WARNING - aviso 2')
+        assert next(follow)[1].endswith(' - ERROR - erro no arquivo novo')
+        follow.close()
+    finally:
+        test_logger.removeHandler(handler)
+        handler.close()
@@ -0,0 +1,64 @@
+import pytest
+
+from media_cache import MediaCache, is_file_id_error, photo_file_id
+from rate_limiter import RateLimiter
+
+
+def test_entries_are_shared_by_hash_and_persisted(tmp_path):
+    path = str(tmp_path / 'media_cache.json')
+    cache = MediaCache(path)
+    cache.put('https://a.example/x.jpg', 'file-1', 'hash-1')
+    cache.put('https://a.example/y.jpg', 'file-2')
+    assert cache.get('https://a.example/x.jpg') == 'file-1'
+    assert cache.get_by_hash('hash-1') == 'file-1'
+
+    reloaded = MediaCache(path)
+    assert len(reloaded) == 2
+    assert reloaded.get_by_hash('hash-1') == 'file-1'
+
+    assert reloaded.invalidate('https://a.example/x.jpg')
+    assert not reloaded.invalidate('https://a.example/x.jpg')
+    assert reloaded.get_by_hash('hash-1') is None
+    reloaded.invalidate_file_id('file-2')
+    assert len(MediaCache(path)) == 0
+
+
+def test_helpers():
+    message = {'photo': [{'file_id': 'pequena'}, {'file_id': 'grande'}]}
+    assert photo_file_id(message) == 'grande'
+    assert photo_file_id({'text': 'sem foto'}) is None
+    assert is_file_id_error("Bad Request: wrong file identifier/HTTP URL specified")
+    assert not is_file_id_error("Bad Request: chat not found")
+
+
+def test_pipeline_uploads_each_image_once(tmp_path, fake_telegram):
+    pytest.importorskip('aiohttp')
+    from send_pipeline import SendPipeline
+
+    fake_telegram.serve_file('/img/a.jpg', b'imagem')
+    fake_telegram.serve_file('/img/copia.jpg', b'imagem')
+    cache = MediaCache(str(tmp_path / 'media_cache.json'))
+    pipeline = SendPipeline('test-token', base_url=fake_telegram.url, timeout=10, media_cache=cache,
+                            limiter=RateLimiter(global_rate=1000, chat_rate=1000))
+    assert pipeline.start()
+    try:
+        post = {'id': 'p1', 'title': 'Com foto', 'content': 'Legenda', 'image_url': f'{fake_telegram.url}/img/a.jpg'}
+        copy = dict(post, id='p2', image_url=f'{fake_telegram.url}/img/copia.jpg')
+        for sent in (post, post, copy):
+            pipeline.submit_post(42, sent).result(timeout=10)
+
+        photos = [call['params']['photo'] for call in fake_telegram.calls_for('sendPhoto')]
+        file_id = cache.get(post['image_url'])
+        # Upload na primeira vez; depois o file_id, inclusive para a mesma imagem em outra URL
+        assert photos == ['<file a.jpg>', file_id, file_id]
+        assert cache.get(copy['image_url']) == file_id
+        assert len(fake_telegram.calls_for('GET')) == 2
+
+        # file_id expirado: a imagem é enviada de novo e o cache, atualizado
+        fake_telegram.expire_file_ids()
+        pipeline.submit_post(42, post).result(timeout=10)
+        photos = [call['params']['photo'] for call in fake_telegram.calls_for('sendPhoto')]
+        assert photos[3:] == [file_id, '<file a.jpg>']
+        assert cache.get(post['image_url']) not in (None, file_id)
+    finally:
+        pipeline.stop()
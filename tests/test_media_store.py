@@ -0,0 +1,54 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+import media_store
+from media_store import MediaStore, content_hash, media_name, media_url, preview_url
+
+
+def test_same_content_is_stored_once(tmp_path):
+    store = MediaStore(str(tmp_path / 'media'), max_bytes=1024)
+    name = store.save(io.BytesIO(b'imagem'), 'foto.PNG')
+    digest = hashlib.sha256(b'imagem').hexdigest()
+    assert name == digest + '.png'
+    assert content_hash(name) == digest
+    assert store.path(name) == os.path.join(str(tmp_path / 'media'), digest[:2], digest[2:4], name)
+
+    assert store.save(io.BytesIO(b'imagem'), 'outra.png') == name
+    files = [f for _, _, names in os.walk(tmp_path / 'media') for f in names]
+    assert files.count(name) == 1
+    assert not [f for f in files if f.endswith('.tmp')]
+
+    # URLs locais e prévia
+    url = media_url(name)
+    assert media_name(url) == name
+    assert media_name('https://example.com/foto.png') is None
+    assert preview_url(url) == '/media/preview/' + name
+    assert preview_url('https://example.com/foto.png') == 'https://example.com/foto.png'
+
+    assert store.delete(name)
+    assert store.path(name) is None
+    assert not store.delete(name)
+
+
+def test_preview_falls_back_to_the_original(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_store, 'Image', None)
+    store = MediaStore(str(tmp_path / 'media'))
+    name = store.save(io.BytesIO(b'sem pillow'), 'foto.jpg')
+    assert store.preview_path(name) == store.path(name)
+    assert store.preview_path('../../etc/passwd') is None
+
+
+@pytest.mark.parametrize('content, filename', [
+    (b'x' * 11, 'grande.jpg'),
+    (b'', 'vazia.jpg'),
+    (b'texto', 'script.svg'),
+])
+def test_invalid_uploads_are_rejected_without_leftovers(tmp_path, content, filename):
+    root = tmp_path / 'media'
+    store = MediaStore(str(root), max_bytes=10)
+    with pytest.raises(ValueError):
+        store.save(io.BytesIO(content), filename)
+    assert not root.exists() or not [f for _, _, names in os.walk(root) for f in names]
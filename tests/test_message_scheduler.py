@@ -0,0 +1,34 @@
+import threading
+
+from bot_handler import MessageScheduler
+
+
+class FakeBot:
+    def __init__(self, expected):
+        self.sent = []
+        self.done = threading.Event()
+        self.expected = expected
+
+    def send_promotional_post(self, post):
+        self.sent.append(post['title'])
+        if len(self.sent) >= self.expected:
+            self.done.set()
+        return True
+
+
+def test_scheduler_sends_posts_in_rotation(data_manager, make_posts):
+    data_manager.update_bot_config('token', '123', 10)
+    data_manager.update_bot_status(True)
+    data_manager.import_promotional_posts(make_posts(3))
+
+    bot = FakeBot(expected=1)
+    scheduler = MessageScheduler(bot, data_manager)
+    assert scheduler.start()
+    try:
+        # O primeiro post sai logo ao iniciar
+        assert bot.done.wait(5)
+    finally:
+        scheduler.stop()
+
+    assert bot.sent[0] == 'Post 0'
+    assert data_manager.get_stats().get('promo_messages_sent', 0) >= 1
@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from metrics import Counter, Gauge, Histogram, Registry, timed
+
+
+def test_exposition_format():
+    registry = Registry()
+    sent = registry.get_or_create(Counter, 'sent_total', 'Mensagens\nenviadas', ('kind',))
+    sent.labels('promo').inc()
+    sent.labels(kind='promo').inc(2)
+    sent.labels('a"b\\c\nd').inc()
+    depth = registry.get_or_create(Gauge, 'depth', 'Fila')
+    depth.set_function(lambda: 2.5)
+    latency = registry.get_or_create(Histogram, 'latency_seconds', 'Latência', buckets=(0.5, 0.1))
+    for value in (0.05, 0.1, 0.3, 7):
+        latency.observe(value)
+
+    assert registry.render() == '\n'.join([
+        '# HELP depth Fila',
+        '# TYPE depth gauge',
+        'depth 2.5',
+        '# HELP latency_seconds Latência',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="0.5"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        'latency_seconds_sum 7.45',
+        'latency_seconds_count 4',
+        '# HELP sent_total Mensagens\\nenviadas',
+        '# TYPE sent_total counter',
+        'sent_total{kind="promo"} 3',
+        'sent_total{kind="a\\"b\\\\c\\nd"} 1',
+    ]) + '\n'
+
+
+def test_registry_returns_the_same_metric_and_rejects_conflicts():
+    registry = Registry()
+    first = registry.get_or_create(Counter, 'calls_total', 'Chamadas', ('method',))
+    assert registry.get_or_create(Counter, 'calls_total', 'Chamadas', ('method',)) is first
+    with pytest.raises(ValueError):
+        registry.get_or_create(Gauge, 'calls_total', 'Chamadas', ('method',))
+    with pytest.raises(ValueError):
+        first.labels('a', 'b')
+
+
+def test_counts_from_many_threads_are_summed():
+    registry = Registry()
+    total = registry.get_or_create(Counter, 'events_total', 'Eventos')
+    latency = registry.get_or_create(Histogram, 'work_seconds', 'Trabalho')
+    work = timed(latency)(lambda: None)
+
+    def run():
+        for _ in range(1000):
+            total.inc()
+            work()
+
+    # Mais threads que o limite de fatias: as das threads encerradas são consolidadas
+    for _ in range(10):
+        threads = [threading.Thread(target=run) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert total.value() == 100000
+    assert latency.snapshot()[2] == 100000
+    assert len(total._default._shards._shards) <= 64
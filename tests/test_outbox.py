@@ -0,0 +1,90 @@
+import threading
+from concurrent.futures import Future
+
+from outbox import Outbox, OutboxSender, post_key
+
+
+class FakeBot:
+    def __init__(self, success=True):
+        self.success = success
+        self.sent = []
+
+    def send_promotional_post(self, post, chat_id=None):
+        self.sent.append(post['id'])
+        return self.success
+
+
+def test_rotation_advances_only_after_post_is_queued(data_manager, make_posts, tmp_path):
+    data_manager.import_promotional_posts(make_posts(3))
+    outbox = Outbox(str(tmp_path / 'outbox'))
+    sender = OutboxSender(outbox, FakeBot(success=False))
+
+    post = data_manager.peek_next_sequential_post()
+    queued = []
+
+    def on_queued():
+        # O post já está gravado quando a rotação avança
+        queued.append([item['payload']['post']['id'] for item in outbox.pending()])
+        data_manager.advance_rotation(post)
+
+    sender.send_post('-100', post, key=post_key('-100', post), on_queued=on_queued)
+    assert queued == [[post['id']]]
+    assert data_manager.peek_next_sequential_post()['id'] != post['id']
+    outbox.close()
+
+
+def test_dropped_message_releases_its_callback(tmp_path):
+    outbox = Outbox(str(tmp_path / 'outbox'))
+    sender = OutboxSender(outbox, FakeBot(success=False), max_attempts=2)
+    sent = []
+
+    sender.send_post('-100', {'id': 'p1', 'title': 'Post'}, on_sent=lambda: sent.append(1))
+    sender.replay()
+
+    assert len(outbox) == 0
+    assert sender._callbacks == {}
+    assert sent == []
+    outbox.close()
+
+
+def test_replayed_post_still_counts_its_stat(tmp_path):
+    outbox = Outbox(str(tmp_path / 'outbox'))
+    sender = OutboxSender(outbox, FakeBot(success=False), max_attempts=10)
+    sender.send_post('-100', {'id': 'p1', 'title': 'Post'}, on_sent=lambda: None, stat='promo')
+    outbox.close()
+
+    # Nova execução: o on_sent se perdeu, mas o tipo de estatística ficou gravado no item
+    counted = []
+    outbox = Outbox(str(tmp_path / 'outbox'))
+    sender = OutboxSender(outbox, FakeBot(), stats={'promo': lambda: counted.append('promo')})
+    assert sender.start() == 1
+    assert counted == ['promo']
+    assert len(outbox) == 0
+    outbox.close()
+
+
+class FakePipeline:
+    def __init__(self):
+        self.futures = []
+
+    def is_running(self):
+        return True
+
+    def submit_post(self, chat_id, post):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+
+def test_stop_waits_for_sends_in_flight(tmp_path):
+    outbox = Outbox(str(tmp_path / 'outbox'))
+    pipeline = FakePipeline()
+    sender = OutboxSender(outbox, pipeline=pipeline)
+    sender.send_post('-100', {'id': 'p1', 'title': 'Post'})
+
+    assert not sender.stop(timeout=0.05)
+    threading.Timer(0.1, pipeline.futures[0].set_result, args=({},)).start()
+    assert sender.stop(timeout=5)
+    # A confirmação já foi gravada: a fila pode ser fechada
+    assert len(outbox) == 0
+    outbox.close()
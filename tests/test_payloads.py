@@ -0,0 +1,78 @@
+import html
+
+import pytest
+
+from payloads import (CAPTION_LIMIT, MESSAGE_LIMIT, attach_payload, escape, is_current, payload_for,
+                      render_post, truncate)
+
+
+def _units(text):
+    return len(text.encode('utf-16-le')) // 2
+
+
+def test_truncate_counts_utf16_units():
+    assert truncate('a' * MESSAGE_LIMIT, MESSAGE_LIMIT) == 'a' * MESSAGE_LIMIT
+    cut = truncate('a' * (MESSAGE_LIMIT + 1), MESSAGE_LIMIT)
+    assert _units(cut) == MESSAGE_LIMIT and cut.endswith('…')
+
+    # Emojis fora do BMP ocupam duas unidades e nunca são partidos ao meio
+    assert truncate('😀' * 2048, MESSAGE_LIMIT) == '😀' * 2048
+    cut = truncate('😀' * 2049, MESSAGE_LIMIT)
+    assert cut == '😀' * 2047 + '…'
+    assert _units(cut) == MESSAGE_LIMIT - 1
+    # Espaços antes das reticências são removidos
+    assert truncate('abc def', 5) == 'abc…'
+
+
+def test_caption_leaves_room_for_the_link():
+    link = 'https://example.com/oferta'
+    post = {'content': 'x' * 2000, 'image_url': 'https://example.com/a.jpg', 'external_link': link}
+    payload = render_post(post, parse_mode='')
+    caption = payload['params']['caption']
+    assert payload['method'] == 'sendPhoto'
+    assert _units(caption) == CAPTION_LIMIT
+    assert caption.endswith('…\n\n' + link)
+
+    # Um link que sozinho estoura o limite é omitido
+    huge = render_post(dict(post, external_link='https://e.com/' + 'l' * CAPTION_LIMIT), parse_mode='')
+    assert _units(huge['params']['caption']) == CAPTION_LIMIT
+    assert 'https://e.com/' not in huge['params']['caption']
+
+
+@pytest.mark.parametrize('parse_mode', ['HTML', 'MarkdownV2'])
+def test_escaping_is_applied_after_truncation(parse_mode):
+    text = '<b>&' + '_*' * MESSAGE_LIMIT
+    payload = render_post({'content': text}, parse_mode=parse_mode, link_preview=False)
+    sent = payload['params']['text']
+    assert payload['params']['parse_mode'] == parse_mode
+    assert payload['params']['link_preview_options'] == {'is_disabled': True}
+    if parse_mode == 'HTML':
+        assert sent.startswith('&lt;b&gt;&amp;_*')
+        visible = html.unescape(sent)
+    else:
+        assert sent.startswith('<b\\>&\\_\\*')
+        visible = sent.replace('\\', '')
+    # O limite vale para o texto visível, não para os escapes
+    assert visible == truncate(text, MESSAGE_LIMIT)
+    assert _units(visible) == MESSAGE_LIMIT
+    assert escape('a.b', 'MarkdownV2') == 'a\\.b'
+
+
+def test_link_preview_and_unknown_parse_mode():
+    post = {'content': 'Oferta', 'external_link': 'https://example.com'}
+    params = render_post(post, parse_mode='', link_preview=True)['params']
+    assert params['text'] == 'Oferta\n\nhttps://example.com'
+    assert params['link_preview_options'] == {'url': 'https://example.com'}
+    assert 'parse_mode' not in params
+    with pytest.raises(ValueError):
+        render_post(post, parse_mode='Markdown')
+
+
+def test_stored_payload_is_reused_until_the_image_changes():
+    post = attach_payload({'id': 'p1', 'content': 'Oferta', 'image_url': 'https://example.com/a.jpg'})
+    assert is_current(post['payload'], post)
+    assert payload_for(post) is post['payload']
+
+    post['image_url'] = 'https://example.com/b.jpg'
+    assert not is_current(post['payload'], post)
+    assert payload_for(post)['params']['photo'] == 'https://example.com/b.jpg'
@@ -0,0 +1,73 @@
+import pytest
+
+from post_index import PostIndex, decode_cursor, encode_cursor
+
+
+def _post(i, **fields):
+    post = {'id': f'p{i:02d}', 'title': f'Post {i}', 'content': f'Conteúdo {i}',
+            'image_url': '', 'external_link': '', 'created_at': f'2024-01-01T00:00:{i:02d}'}
+    post.update(fields)
+    return post
+
+
+def _titles(posts):
+    return [post['title'] for post in posts]
+
+
+def _all_pages(index, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        posts, cursor = index.page(cursor, limit, **filters)
+        pages.append(_titles(posts))
+        if cursor is None:
+            return pages
+
+
+def test_pages_walk_newest_first_without_gaps():
+    index = PostIndex([_post(i) for i in range(7)])
+    assert _all_pages(index, 3) == [['Post 6', 'Post 5', 'Post 4'],
+                                    ['Post 3', 'Post 2', 'Post 1'],
+                                    ['Post 0']]
+    # Uma página que termina exatamente no último post não devolve cursor
+    assert _all_pages(PostIndex([_post(i) for i in range(6)]), 3)[-1] == ['Post 2', 'Post 1', 'Post 0']
+
+
+def test_cursor_survives_inserts_and_deletes_between_requests():
+    index = PostIndex([_post(i) for i in range(6)])
+    first, cursor = index.page(None, 2)
+    assert _titles(first) == ['Post 5', 'Post 4']
+
+    # Um post novo e a exclusão do último entregue não deslocam a próxima página
+    index.add(_post(9))
+    index.remove('p04')
+    posts, cursor = index.page(cursor, 2)
+    assert _titles(posts) == ['Post 3', 'Post 2']
+
+    # Reposicionar um post pelo created_at
+    index.update(_post(1, created_at='2024-01-01T00:00:59'))
+    assert _titles(index.page(None, 2)[0]) == ['Post 1', 'Post 9']
+    assert _titles(index.page(cursor, 5)[0]) == ['Post 0']
+
+
+def test_filters_skip_posts_but_keep_the_page_full():
+    index = PostIndex([_post(0, image_url='a.jpg'), _post(1, title='Promoção ÚNICA'),
+                       _post(2, external_link='https://example.com', image_url='b.jpg'),
+                       _post(3), _post(4, image_url='c.jpg')])
+    assert _all_pages(index, 2, has_image=True) == [['Post 4', 'Post 2'], ['Post 0']]
+    assert _all_pages(index, 2, has_image=True, has_link=False) == [['Post 4', 'Post 0']]
+    assert _titles(index.page(None, 5, text='única')[0]) == ['Promoção ÚNICA']
+
+
+def test_cursor_round_trip_and_invalid_cursor():
+    key = ('2024-01-01T00:00:00', 'ç/ã+=')
+    assert decode_cursor(encode_cursor(key)) == key
+    with pytest.raises(ValueError):
+        PostIndex([_post(0)]).page('não-é-cursor')
+
+
+def test_data_manager_page_limits(data_manager, make_posts):
+    data_manager.import_promotional_posts(make_posts(3))
+    page = data_manager.get_posts_page(limit=0)
+    assert page['total'] == 3
+    assert _titles(page['posts']) == ['Post 2']
+    assert _titles(data_manager.get_posts_page(page['next_cursor'], limit=10)['posts']) == ['Post 1', 'Post 0']
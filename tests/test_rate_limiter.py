@@ -0,0 +1,54 @@
+from rate_limiter import RateLimiter, SimulatedClock
+
+
+def _max_in_window(times, window):
+    times = sorted(times)
+    best = first = 0
+    for last, at in enumerate(times):
+        while at - times[first] >= window - 1e-9:
+            first += 1
+        best = max(best, last - first + 1)
+    return best
+
+
+def test_backlogged_chat_does_not_delay_other_chats():
+    limiter = RateLimiter(global_rate=30, chat_rate=20 / 60.0, clock=SimulatedClock())
+
+    delays = [limiter.reserve('A') for _ in range(10)]
+    assert delays == [i * 3.0 for i in range(10)]
+
+    # B só espera a vaga global seguinte, não a fila de A
+    assert limiter.reserve('B') < 0.1
+    assert limiter.reserve('C') < 0.1
+
+
+def test_chat_limit_is_respected():
+    limiter = RateLimiter(global_rate=30, chat_rate=20 / 60.0, clock=SimulatedClock())
+    sends = [limiter.reserve('A') for _ in range(50)]
+    assert _max_in_window(sends, 60.0) <= 20
+
+
+def test_global_limit_is_respected_with_backlogs():
+    limiter = RateLimiter(global_rate=30, chat_rate=20 / 60.0, clock=SimulatedClock())
+    sends = []
+    # Chats com filas de tamanhos diferentes, reservadas chat a chat (não intercaladas)
+    for chat in range(200):
+        for _ in range(1 + chat % 7):
+            sends.append(limiter.reserve(chat))
+    assert _max_in_window(sends, 1.0) <= 31
+
+
+def test_global_penalty_blocks_every_chat():
+    clock = SimulatedClock()
+    limiter = RateLimiter(clock=clock)
+    limiter.penalize(None, retry_after=5)
+    assert limiter.reserve('A') >= 5
+    assert limiter.reserve('B') >= 5
+
+
+def test_chat_penalty_blocks_only_that_chat():
+    clock = SimulatedClock()
+    limiter = RateLimiter(clock=clock)
+    limiter.penalize('A', retry_after=10)
+    assert limiter.reserve('A') >= 10
+    assert limiter.reserve('B') < 0.1
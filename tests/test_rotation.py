@@ -0,0 +1,80 @@
+from rotation import RotationIndex
+
+
+def _posts(count):
+    return [{'id': f'p{i}', 'created_at': f'2024-01-01T00:00:{i:02d}'} for i in range(count)]
+
+
+def _index(posts, saved=None):
+    saved = {} if saved is None else saved
+    rotation = RotationIndex(lambda scope: saved.get(scope), lambda state, scope: saved.__setitem__(scope, state))
+    rotation.build(posts)
+    return rotation, saved
+
+
+def test_peek_does_not_advance():
+    rotation, saved = _index(_posts(3))
+    assert rotation.peek()[1]['id'] == 'p0'
+    assert rotation.peek()[1]['id'] == 'p0'
+    assert saved == {}
+
+    assert rotation.advance('p0')
+    assert rotation.peek()[1]['id'] == 'p1'
+    assert saved['default']['last_sent_post_id'] == 'p0'
+
+
+def test_advance_is_ignored_when_cursor_already_moved():
+    rotation, _ = _index(_posts(3))
+    assert rotation.advance('p0')
+    # Segundo envio do mesmo post (ex.: dois agendadores): a rotação não pula p1
+    assert not rotation.advance('p0')
+    assert rotation.next()[1]['id'] == 'p1'
+
+
+def test_unadvanced_post_is_picked_again_after_restart():
+    posts = _posts(3)
+    rotation, saved = _index(posts)
+    rotation.next()
+    assert rotation.peek()[1]['id'] == 'p1'
+    # Queda antes de advance(): o novo processo escolhe p1 de novo
+    restarted, _ = _index(posts, saved)
+    assert restarted.peek()[1]['id'] == 'p1'
+
+
+def test_weighted_peek_matches_next():
+    rotation, _ = _index(_posts(4))
+    rotation.set_weights({'p1': 3, 'p2': 0})
+    picked = []
+    for _ in range(10):
+        post_id = rotation.peek()[1]['id']
+        assert rotation.advance(post_id)
+        picked.append(post_id)
+    assert picked == ['p0', 'p1', 'p3', 'p1', 'p1', 'p0', 'p1', 'p3', 'p1', 'p1']
+
+
+def _cycle(rotation, count):
+    picked = []
+    for _ in range(count):
+        picked.append(rotation.next()[1]['id'])
+    return picked
+
+
+def test_weighted_rounds_follow_add_and_remove():
+    posts = _posts(5)
+    weights = {'p1': 3, 'p3': 2, 'p4': 0}
+    rotation, _ = _index(posts[:3])
+    rotation.set_weights(weights)
+    rotation.add(posts[3])
+    rotation.add(posts[4])
+    assert _cycle(rotation, 7) == ['p0', 'p1', 'p2', 'p3', 'p1', 'p3', 'p1']
+
+    # Sem p1, o ciclo tem só duas rodadas
+    rotation.remove('p1')
+    fresh, _ = _index([post for post in posts if post['id'] != 'p1'])
+    fresh.set_weights(weights)
+    assert _cycle(rotation, 8) == _cycle(fresh, 8) == ['p0', 'p2', 'p3', 'p3'] * 2
+
+    # Só posts de peso 0: nada a enviar
+    for post_id in ('p0', 'p2', 'p3'):
+        rotation.remove(post_id)
+    assert rotation.peek() is None
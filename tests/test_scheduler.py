@@ -0,0 +1,92 @@
+import threading
+import time
+
+from scheduler import GroupScheduler
+from timer_engine import TimingWheel
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send_promotional_post(self, post, chat_id=None):
+        with self.lock:
+            self.sent.append((chat_id, post['title']))
+        return True
+
+    def titles(self, chat_id):
+        with self.lock:
+            return [title for sent_to, title in self.sent if sent_to == chat_id]
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_groups_post_at_their_own_intervals(data_manager, make_posts):
+    data_manager.update_bot_config('token', '-100', 10)
+    data_manager.update_bot_status(True)
+    data_manager.import_promotional_posts(make_posts(3))
+    assert data_manager.save_group('-200', interval=2)
+    assert data_manager.save_group('-300', interval=5)
+
+    clock = FakeClock()
+    wheel = TimingWheel("TestWheel", tick=1, clock=clock)
+    bot = FakeBot()
+    scheduler = GroupScheduler(bot, data_manager, wheel=wheel, max_workers=2, exclude_primary=True)
+    assert scheduler.start()
+    try:
+        # O grupo principal fica com o agendador principal
+        assert scheduler.scheduled_groups() == {'-200': 2, '-300': 5}
+
+        for minute in range(1, 11):
+            clock.now += 60
+            # Acorda a thread da roda para que ela veja o novo horário
+            with wheel._cond:
+                wheel._cond.notify_all()
+            expected = minute // 2 + minute // 5
+            assert _wait_for(lambda: len(bot.sent) == expected and not scheduler._in_flight and all(
+                (wheel.next_due(f"group:{group_id}") or 0) > clock.now for group_id in ('-200', '-300')))
+    finally:
+        scheduler.stop()
+        wheel.stop()
+
+    # Cada grupo percorre a rotação com o seu próprio cursor
+    assert bot.titles('-200') == ['Post 0', 'Post 1', 'Post 2', 'Post 0', 'Post 1']
+    assert bot.titles('-300') == ['Post 0', 'Post 1']
+    assert bot.titles('-100') == []
+
+
+def test_removed_or_paused_group_is_unscheduled(data_manager):
+    data_manager.update_bot_config('token', '-100', 10)
+    data_manager.update_bot_status(True)
+    data_manager.save_group('-200', interval=2)
+
+    wheel = TimingWheel("TestWheel", tick=1, clock=FakeClock())
+    scheduler = GroupScheduler(FakeBot(), data_manager, wheel=wheel, exclude_primary=True)
+    assert scheduler.start()
+    try:
+        assert scheduler.scheduled_groups() == {'-200': 2}
+        # Mudanças de configuração chegam pelo listener do DataManager
+        data_manager.save_group('-200', interval=4)
+        assert scheduler.scheduled_groups() == {'-200': 4}
+        data_manager.remove_group('-200')
+        assert scheduler.scheduled_groups() == {}
+        assert wheel.next_due('group:-200') is None
+    finally:
+        scheduler.stop()
+        wheel.stop()
@@ -0,0 +1,83 @@
+from data_manager import DataManager
+from search_index import SearchIndex, fold
+
+
+def _post(post_id, title, content='', created_at='2024-01-01T00:00:00'):
+    return {'id': post_id, 'title': title, 'content': content, 'created_at': created_at}
+
+
+def _index():
+    return SearchIndex([
+        _post('a', 'Promoção de Verão', 'Camisetas com desconto', '2024-01-01T00:00:01'),
+        _post('b', 'PROMOÇÕES', 'Tênis e camisetas', '2024-01-01T00:00:02'),
+        _post('c', 'Frete grátis', 'Só hoje', '2024-01-01T00:00:03'),
+    ])
+
+
+def test_accents_and_case_are_ignored():
+    assert fold('Promoção ÁGUA') == 'promocao agua'
+    index = _index()
+    assert index.search('promocao') == (['a'], 1)
+    assert index.search('GRATIS') == (['c'], 1)
+    assert index.search('tenis camisetas') == (['b'], 1)
+
+
+def test_last_term_matches_as_prefix():
+    index = _index()
+    # Resultados do mais recente para o mais antigo
+    assert index.search('promo') == (['b', 'a'], 2)
+    assert index.search('promo', limit=1) == (['b'], 2)
+    # Só o último termo vale como prefixo
+    assert index.search('camis desconto') == ([], 0)
+    assert index.search('desconto camis') == (['a'], 1)
+    assert index.search('   ') == ([], 0)
+
+
+def test_add_update_and_remove_keep_the_vocabulary():
+    index = _index()
+    index.update(_post('a', 'Liquidação', created_at='2024-01-01T00:00:01'))
+    assert index.search('verao') == ([], 0)
+    assert index.search('liquida') == (['a'], 1)
+
+    index.remove('b')
+    assert index.search('promo') == ([], 0)
+    assert 'promocoes' not in index._vocabulary
+
+    index.add(_post('d', 'Promoção relâmpago', created_at='2024-01-01T00:00:09'))
+    assert index.search('relampago') == (['d'], 1)
+
+
+def test_saved_index_is_loaded_only_for_the_same_posts_file(tmp_path):
+    path = str(tmp_path / 'search_index.json')
+    index = _index()
+    index.remove('c')
+    assert index.save(path, (100, 1))
+    assert not index.dirty
+
+    loaded = SearchIndex.load(path, (100, 1))
+    assert loaded.search('promo') == (['b', 'a'], 2)
+    # Remoções depois da carga usam os termos montados a partir das listas invertidas
+    loaded.remove('a')
+    assert loaded.search('verao') == ([], 0)
+
+    assert SearchIndex.load(path, (100, 2)) is None
+    assert SearchIndex.load(path, None) is None
+    (tmp_path / 'search_index.json').write_text('{corrompido', encoding='utf-8')
+    assert SearchIndex.load(path, (100, 1)) is None
+
+
+def test_data_manager_rebuilds_a_stale_index(data_manager, make_posts):
+    data_manager.import_promotional_posts(make_posts(2))
+    assert data_manager.search_posts('post')['total'] == 2
+    data_manager.save_search_index()
+
+    # Outro processo altera o arquivo de posts depois que o índice foi salvo
+    other = DataManager()
+    assert other.search_posts('post')['total'] == 2
+    assert other._search_index._terms is None
+    assert other.add_promotional_post('Promoção nova', 'Conteúdo')
+
+    reopened = DataManager()
+    result = reopened.search_posts('promocao')
+    assert [post['title'] for post in result['posts']] == ['Promoção nova']
+    assert reopened.search_posts('post')['total'] == 2
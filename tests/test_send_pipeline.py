@@ -0,0 +1,61 @@
+import io
+
+import pytest
+
+from rate_limiter import RateLimiter
+
+pytest.importorskip('aiohttp')
+
+
+@pytest.fixture
+def pipeline(fake_telegram):
+    from send_pipeline import SendPipeline
+    pipeline = SendPipeline('test-token', base_url=fake_telegram.url, timeout=10,
+                            limiter=RateLimiter(global_rate=1000, chat_rate=1000))
+    assert pipeline.start()
+    yield pipeline
+    pipeline.stop()
+
+
+def test_send_message(pipeline, fake_telegram):
+    message = pipeline.send_message(42, 'Olá').result(timeout=10)
+    assert message['text'] == 'Olá'
+    assert [call['params'] for call in fake_telegram.calls_for('sendMessage')] == [{'chat_id': 42, 'text': 'Olá'}]
+
+
+def test_send_photo_by_url_and_upload(pipeline, fake_telegram):
+    by_url = pipeline.send_photo(42, 'https://example.com/a.jpg', caption='Legenda').result(timeout=10)
+    assert by_url['caption'] == 'Legenda'
+    assert by_url['photo'][0]['file_id'].startswith('fake-file-')
+
+    upload = io.BytesIO(b'imagem')
+    upload.name = 'a.jpg'
+    pipeline.send_photo(42, upload).result(timeout=10)
+
+    calls = fake_telegram.calls_for('sendPhoto')
+    assert calls[0]['params']['photo'] == 'https://example.com/a.jpg'
+    assert calls[1]['params']['photo'] == '<file a.jpg>'
+
+
+def test_rate_limited_send_is_retried_after_retry_after(pipeline, fake_telegram):
+    fake_telegram.rate_limit(1, retry_after=1)
+    message = pipeline.send_message(42, 'Depois do 429').result(timeout=10)
+    assert message['text'] == 'Depois do 429'
+
+    first, second = fake_telegram.calls_for('sendMessage')
+    assert second['time'] - first['time'] >= 0.9
+
+
+def test_connections_are_reused(pipeline, fake_telegram):
+    for i in range(10):
+        pipeline.send_message(i, 'Mensagem').result(timeout=10)
+    # Envios em sequência usam a mesma conexão keep-alive
+    assert len({call['client'] for call in fake_telegram.calls_for('sendMessage')}) == 1
+
+    futures = [pipeline.send_message(i, 'Em paralelo') for i in range(50)]
+    for future in futures:
+        future.result(timeout=10)
+
+    # Envios simultâneos abrem no máximo max_connections conexões
+    clients = {call['client'] for call in fake_telegram.calls_for('sendMessage')}
+    assert len(clients) <= pipeline.max_connections
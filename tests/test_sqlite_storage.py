@@ -0,0 +1,66 @@
+import json
+import os
+
+from data_manager import DataManager
+from sqlite_storage import SQLiteStorage
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+def test_migration_imports_json_files_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _write('data/bot_config.json', {'token': 't', 'group_id': '-100', 'active': True, 'interval': 7})
+    _write('data/promotional_posts.json', [
+        {'id': 'b', 'title': 'Segundo', 'created_at': '2024-01-02T00:00:00'},
+        {'id': 'a', 'title': 'Primeiro', 'created_at': '2024-01-01T00:00:00'},
+        {'title': 'Sem id'}
+    ])
+    _write('data/welcome_config.json', {'message': 'Olá, {first_name}!', 'enabled': True})
+    _write('data/stats.json', {'welcome_messages_sent': 3, 'promo_messages_sent': 5})
+    _write('data/last_sent_post.json', {'last_sent_post_id': 'a', 'position': 1})
+
+    storage = SQLiteStorage(str(tmp_path / 'bot.db'))
+    assert storage.migrate_from_json()
+    # Os arquivos JSON só são lidos na primeira vez
+    _write('data/stats.json', {'promo_messages_sent': 99})
+    assert not storage.migrate_from_json()
+
+    assert storage.get_document('bot_config')['interval'] == 7
+    assert storage.get_document('welcome_config')['message'] == 'Olá, {first_name}!'
+    assert [post['title'] for post in storage.get_posts()] == ['Primeiro', 'Segundo']
+    assert storage.get_stats() == {'welcome_messages_sent': 3, 'promo_messages_sent': 5}
+    assert storage.get_rotation_state() == {'last_sent_post_id': 'a', 'position': 1}
+    storage.close()
+
+
+def test_data_manager_round_trip(tmp_path, monkeypatch, make_posts):
+    monkeypatch.chdir(tmp_path)
+    db_path = str(tmp_path / 'bot.db')
+    manager = DataManager(storage=SQLiteStorage(db_path))
+
+    assert manager.add_promotional_post('Título', 'Conteúdo', external_link='https://example.com')
+    post = manager.get_promotional_posts()[0]
+    assert manager.update_promotional_post(post['id'], 'Novo título', 'Novo conteúdo')
+    manager.import_promotional_posts(make_posts(2))
+    manager.increment_promo_messages_stat()
+    manager.increment_welcome_messages_stat(3)
+    assert manager.update_bot_config('token', '-100', 15)
+    first = manager.get_next_sequential_post()
+
+    # Um novo processo lê do mesmo banco
+    reopened = DataManager(storage=SQLiteStorage(db_path))
+    assert reopened.get_promotional_post(post['id'])['title'] == 'Novo título'
+    assert reopened.get_post_count() == 3
+    assert reopened.get_bot_config()['interval'] == 15
+    stats = reopened.get_stats()
+    assert (stats['promo_messages_sent'], stats['welcome_messages_sent']) == (1, 3)
+    # O cursor de rotação continua depois do último post enviado
+    assert reopened.peek_next_sequential_post()['id'] != first['id']
+
+    assert reopened.delete_promotional_post(post['id'])
+    assert reopened.get_promotional_post(post['id']) is None
+    assert not reopened.delete_promotional_post(post['id'])
@@ -0,0 +1,72 @@
+import json
+
+from stats_log import StatsLog
+
+
+def _stats_log(tmp_path, **kwargs):
+    options = dict(flush_size=100, flush_interval=60, compact_lines=100)
+    options.update(kwargs)
+    return StatsLog(str(tmp_path / 'stats.json'), str(tmp_path / 'stats.log'), **options)
+
+
+def _log_lines(tmp_path):
+    return (tmp_path / 'stats.log').read_text(encoding='utf-8').splitlines()
+
+
+def test_increments_are_written_in_batches_and_replayed(tmp_path):
+    stats = _stats_log(tmp_path, flush_size=3)
+    stats.increment('promo_messages_sent')
+    stats.increment('promo_messages_sent')
+    # Ainda só em memória, mas já visível na leitura
+    assert not (tmp_path / 'stats.log').exists()
+    assert stats.load()['promo_messages_sent'] == 2
+
+    stats.increment('welcome_messages_sent', 5)
+    assert len(_log_lines(tmp_path)) == 1
+    stats.set('last_restarted', '2024-01-01T00:00:00')
+    stats.flush()
+
+    replayed = _stats_log(tmp_path).load()
+    assert replayed['promo_messages_sent'] == 2
+    assert replayed['welcome_messages_sent'] == 5
+    assert replayed['last_restarted'] == '2024-01-01T00:00:00'
+
+
+def test_compaction_writes_snapshot_and_truncates_log(tmp_path):
+    stats = _stats_log(tmp_path, flush_size=1, compact_lines=3)
+    for _ in range(3):
+        stats.increment('promo_messages_sent')
+
+    assert _log_lines(tmp_path) == []
+    snapshot = json.loads((tmp_path / 'stats.json').read_text(encoding='utf-8'))
+    assert snapshot['promo_messages_sent'] == 3
+    assert snapshot['_seq'] == 3
+
+    stats.increment('promo_messages_sent')
+    assert _stats_log(tmp_path).load()['promo_messages_sent'] == 4
+
+
+def test_events_already_in_snapshot_are_not_counted_twice(tmp_path):
+    stats = _stats_log(tmp_path, flush_size=1)
+    stats.increment('promo_messages_sent')
+    stats.increment('promo_messages_sent')
+    lines = _log_lines(tmp_path)
+
+    stats.compact()
+    # Queda entre a gravação do snapshot e o truncamento: o log antigo continua lá,
+    # com uma linha parcial no final
+    (tmp_path / 'stats.log').write_text('\n'.join(lines) + '\n{"seq": 3, "in', encoding='utf-8')
+
+    assert _stats_log(tmp_path).load()['promo_messages_sent'] == 2
+
+
+def test_processes_sharing_the_files_see_each_other(tmp_path):
+    first = _stats_log(tmp_path, flush_size=1)
+    second = _stats_log(tmp_path, flush_size=1)
+    first.increment('promo_messages_sent')
+    second.increment('promo_messages_sent')
+    first.increment('promo_messages_sent')
+
+    second.invalidate()
+    assert second.load()['promo_messages_sent'] == 3
+    assert _stats_log(tmp_path).load()['promo_messages_sent'] == 3
@@ -0,0 +1,79 @@
+import pytest
+
+from tick_schedule import DRIFT, MISSED, TickSchedule
+
+
+def _fire_pending(schedule, now):
+    """Dispara enquanto due() pedir um disparo imediato; devolve os horários dos disparos"""
+    fired = []
+    while True:
+        at = schedule.due(now)
+        if at > now:
+            return fired, at
+        schedule.fired(now)
+        fired.append(now)
+
+
+def test_anchored_mode_does_not_accumulate_drift():
+    schedule = TickSchedule(10, 10, name='test-anchored', mode='anchored')
+    for now in (10.3, 20.1, 30.4):
+        assert schedule.due(now) == now
+        schedule.fired(now)
+        schedule.completed(now + 1)
+    assert schedule.next_intended == 40
+    assert schedule.due(31.4) == 40
+    stats = schedule.stats(now=31.4)
+    assert (stats['ticks'], stats['max_drift'], stats['next_in']) == (3, 0.4, 8.6)
+    assert DRIFT.labels(scheduler='test-anchored').snapshot()[2] == 3
+
+
+def test_completion_mode_counts_from_the_end_of_the_send():
+    schedule = TickSchedule(10, 10, name='test-completion', mode='completion')
+    schedule.fired(10.3)
+    schedule.completed(11.3)
+    assert schedule.due(11.3) == pytest.approx(21.3)
+
+
+def test_skip_drops_every_missed_tick():
+    schedule = TickSchedule(10, 10, name='test-skip', catch_up='skip', max_catch_up=2)
+    fired, next_at = _fire_pending(schedule, 55)
+    assert fired == [55] and next_at == 60
+    assert (schedule.skipped, schedule.caught_up) == (4, 0)
+    assert schedule.stats()['last_drift'] == 5
+    assert MISSED.labels(scheduler='test-skip', action='skipped').value() == 4
+
+
+def test_burst_fires_up_to_max_catch_up_at_once():
+    schedule = TickSchedule(10, 10, name='test-burst', catch_up='burst', max_catch_up=2)
+    fired, next_at = _fire_pending(schedule, 55)
+    # Os horários 10 e 20 são descartados; 30 e 40 são recuperados junto com o 50
+    assert fired == [55, 55, 55] and next_at == 60
+    assert (schedule.skipped, schedule.caught_up) == (2, 2)
+    assert [record['drift'] for record in schedule.stats()['recent']] == [25, 15, 5]
+
+
+def test_spread_distributes_missed_ticks_until_the_next_one():
+    schedule = TickSchedule(10, 10, name='test-spread', catch_up='spread', max_catch_up=2)
+    assert schedule.due(55) == 56.25
+    times = []
+    now = 55
+    while True:
+        now = schedule.due(now)
+        if now >= 60:
+            break
+        schedule.fired(now)
+        times.append(now)
+    assert times == [56.25, 57.5, 58.75]
+    assert now == 60
+    assert (schedule.skipped, schedule.caught_up) == (2, 2)
+
+
+def test_interval_change_keeps_the_anchor_and_bad_options_are_rejected():
+    schedule = TickSchedule(10, 10, name='test-interval')
+    schedule.fired(10)
+    schedule.set_interval(30)
+    assert schedule.next_intended == 40
+    with pytest.raises(ValueError):
+        TickSchedule(10, 10, mode='cron')
+    with pytest.raises(ValueError):
+        TickSchedule(10, 10, catch_up='all')
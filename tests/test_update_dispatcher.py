@@ -0,0 +1,84 @@
+import random
+import threading
+import time
+
+from update_dispatcher import UpdateDispatcher
+
+
+def _update(update_id, chat_id):
+    return {'update_id': update_id, 'message': {'chat': {'id': chat_id}}}
+
+
+def test_updates_of_a_chat_keep_their_order():
+    handled = {}
+    lock = threading.Lock()
+
+    def handler(update):
+        time.sleep(random.random() / 1000)
+        with lock:
+            handled.setdefault(update['message']['chat']['id'], []).append(update['update_id'])
+
+    dispatcher = UpdateDispatcher(handler, workers=8, max_pending=10000, max_chat_depth=10000)
+    assert dispatcher.start()
+    sent = {}
+    for update_id in range(500):
+        chat_id = update_id % 7
+        sent.setdefault(chat_id, []).append(update_id)
+        assert dispatcher.submit(_update(update_id, chat_id))
+    dispatcher.stop()
+
+    assert handled == sent
+
+
+def test_busy_chat_does_not_block_other_chats():
+    release = threading.Event()
+    handled = []
+
+    def handler(update):
+        if update['message']['chat']['id'] == 1:
+            release.wait(5)
+        handled.append(update['update_id'])
+
+    dispatcher = UpdateDispatcher(handler, workers=2, max_pending=100, max_chat_depth=100)
+    dispatcher.start()
+    try:
+        for update_id in range(5):
+            dispatcher.submit(_update(update_id, 1))
+        dispatcher.submit(_update(100, 2))
+        for _ in range(100):
+            if 100 in handled:
+                break
+            time.sleep(0.02)
+        assert 100 in handled
+    finally:
+        release.set()
+        dispatcher.stop()
+
+
+def test_backpressure_per_chat_and_in_total():
+    release = threading.Event()
+    dispatcher = UpdateDispatcher(lambda update: release.wait(5), workers=2, max_pending=4, max_chat_depth=2)
+    dispatcher.start()
+    try:
+        assert dispatcher.submit(_update(1, 1))
+        assert dispatcher.submit(_update(2, 1))
+        # Fila do chat 1 cheia; outros chats ainda cabem
+        assert not dispatcher.submit(_update(3, 1))
+        assert dispatcher.submit(_update(4, 2))
+        assert dispatcher.submit(_update(5, 3))
+        # Total pendente no limite
+        assert not dispatcher.submit(_update(6, 4))
+        assert dispatcher.pending == 4
+
+        # Com timeout, submit espera a fila andar
+        threading.Timer(0.2, release.set).start()
+        assert dispatcher.submit(_update(7, 1), timeout=5)
+    finally:
+        release.set()
+        dispatcher.stop()
+    assert dispatcher.pending == 0
+
+
+def test_stopped_dispatcher_rejects_updates():
+    dispatcher = UpdateDispatcher(lambda update: None)
+    assert not dispatcher.submit(_update(1, 1))
@@ -0,0 +1,28 @@
+from outbox import Outbox, OutboxSender
+from welcome_batcher import WelcomeBatcher
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, text, chat_id=None):
+        self.sent.append((chat_id, text))
+        return True
+
+
+def test_member_who_rejoins_is_welcomed_again(data_manager, tmp_path):
+    data_manager.update_welcome_config('Bem-vindo, {first_name}!', batch_window=0)
+    bot = FakeBot()
+    outbox = Outbox(str(tmp_path / 'outbox'))
+    batcher = WelcomeBatcher(data_manager, OutboxSender(outbox, bot))
+
+    member = {'id': 7, 'first_name': 'Ana'}
+    assert batcher.add_member(-100, member)
+    # Sai e entra de novo: novo lote, com a mesma composição do anterior
+    assert batcher.add_member(-100, member)
+    outbox.close()
+
+    assert bot.sent == [(-100, 'Bem-vindo, Ana!')] * 2
+    data_manager._stats_log.flush()
+    assert data_manager.get_stats()['welcome_messages_sent'] == 2
@@ -0,0 +1,34 @@
+import pytest
+
+from welcome_template import TemplateError, compile_template
+
+
+def test_fields_conditionals_and_literal_braces():
+    template = compile_template("Olá {first_name}{if username} ({username}){end}! "
+                               "{if not group_title}Bem-vindo!{else}Bem-vindo ao {group_title}!{end} {{chaves}}")
+    assert template({'first_name': 'Ana', 'username': '@ana', 'group_title': 'Grupo'}) == \
+        "Olá Ana (@ana)! Bem-vindo ao Grupo! {chaves}"
+    assert template({'first_name': 'Bia'}) == "Olá Bia! Bem-vindo! {chaves}"
+    assert template.uses('first_name') == 1
+    assert template.uses('member_count') == 0
+
+
+def test_text_is_never_evaluated():
+    source = "'+str(1)+' \\n \"{desconhecido}\" {first_name}"
+    assert compile_template(source)({'first_name': 'Ana'}) == "'+str(1)+' \\n \"{desconhecido}\" Ana"
+
+
+@pytest.mark.parametrize('source', ["{if username}sem fim", "{end}", "{else}"])
+def test_unbalanced_sections_are_rejected(source):
+    with pytest.raises(TemplateError):
+        compile_template(source)
+
+
+def test_template_is_compiled_once_per_config(data_manager):
+    data_manager.update_welcome_config('Olá, {first_name}!')
+    template = data_manager.get_welcome_template()
+    assert data_manager.get_welcome_template() is template
+    assert template({'first_name': 'Ana'}) == 'Olá, Ana!'
+
+    data_manager.update_welcome_config('Oi, {mention}!')
+    assert data_manager.get_welcome_template()({'mention': '@ana'}) == 'Oi, @ana!'
@@ -0,0 +1,210 @@
+import logging
+import threading
+import statistics
+from collections import deque
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+from config import SCHEDULE_MODE, SCHEDULE_CATCH_UP, SCHEDULE_MAX_CATCH_UP, SCHEDULE_DRIFT_HISTORY
+from metrics import counter, histogram
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+SCHEDULE_MODES = ('anchored', 'completion')
+CATCH_UP_POLICIES = ('skip', 'burst', 'spread')
+
+# Atraso de cada disparo e horários perdidos (expostos em /metrics)
+DRIFT = histogram('scheduler_drift_seconds', 'Horário real menos horário previsto de cada post agendado',
+                  ('scheduler',), buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0))
+MISSED = counter('scheduler_missed_ticks_total',
+                 'Horários de post perdidos: descartados (skipped) ou recuperados (caught_up)', ('scheduler', 'action'))
+
+
+class TickSchedule:
+    """
+    Horários de um post periódico no relógio monotônico, com registro do atraso.
+
+    No modo 'anchored', cada horário previsto é o anterior previsto + intervalo: a
+    duração dos envios e a imprecisão do temporizador não se acumulam, e o atraso
+    (drift) de cada disparo fica limitado ao atraso daquele disparo. No modo
+    'completion' (comportamento antigo), o próximo horário é contado a partir do
+    fim do envio.
+
+    Quando o agendador fica para trás (envio lento, processo suspenso, bot com
+    falhas), vários horários previstos já passaram. O mais recente é disparado na
+    hora; os anteriores seguem a política de recuperação: 'skip' os descarta,
+    'burst' os dispara em seguida e 'spread' os distribui até o próximo horário
+    previsto. No máximo max_catch_up horários são recuperados; os demais são
+    descartados.
+
+    Uso pelo agendador: due(agora) dá o horário do próximo disparo; no disparo,
+    fired(agora) registra o atraso e avança para o horário seguinte; ao fim do
+    envio, completed(agora). Novas tentativas de um envio que falhou não chamam
+    fired() e, portanto, não consomem horários.
+    """
+
+    def __init__(self, interval: float, first_due: float, name: str = 'scheduler', mode: str = SCHEDULE_MODE,
+                 catch_up: str = SCHEDULE_CATCH_UP, max_catch_up: int = SCHEDULE_MAX_CATCH_UP,
+                 history: int = SCHEDULE_DRIFT_HISTORY):
+        """
+        Inicializa os horários.
+
+        Args:
+            interval: Intervalo entre posts, em segundos
+            first_due: Horário previsto do primeiro post (relógio monotônico do agendador)
+            name: Nome do agendador (rótulo das métricas)
+            mode: 'anchored' ou 'completion'
+            catch_up: 'skip', 'burst' ou 'spread'
+            max_catch_up: Máximo de horários perdidos recuperados de uma vez
+            history: Quantos disparos recentes são guardados para inspeção
+
+        Raises:
+            ValueError: Se o modo ou a política de recuperação for desconhecido.
+        """
+        if mode not in SCHEDULE_MODES:
+            raise ValueError(f"Modo de agendamento desconhecido: {mode} (use {', '.join(SCHEDULE_MODES)})")
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"Política de recuperação desconhecida: {catch_up} (use {', '.join(CATCH_UP_POLICIES)})")
+
+        self.interval = float(interval)
+        self.name = name
+        self.mode = mode
+        self.catch_up = catch_up
+        self.max_catch_up = max_catch_up
+        self.ticks = 0
+        self.skipped = 0
+        self.caught_up = 0
+
+        self._lock = threading.Lock()
+        self._next = first_due  # Próximo horário previsto ainda não disparado
+        self._spread_until: Optional[float] = None
+        self._records = deque(maxlen=history)
+        self._drift = DRIFT.labels(scheduler=name)
+        self._skipped_metric = MISSED.labels(scheduler=name, action='skipped')
+        self._caught_up_metric = MISSED.labels(scheduler=name, action='caught_up')
+
+    @property
+    def next_intended(self) -> float:
+        """Próximo horário previsto (antes de aplicar a política de recuperação)"""
+        return self._next
+
+    def set_interval(self, interval: float):
+        """Troca o intervalo mantendo a âncora: o próximo horário passa a ser o último previsto + novo intervalo"""
+        interval = float(interval)
+        with self._lock:
+            if interval != self.interval:
+                self._next += interval - self.interval
+                self.interval = interval
+
+    def due(self, now: float) -> float:
+        """
+        Horário do próximo disparo, aplicando a política de recuperação.
+
+        Args:
+            now: Horário atual no relógio do agendador
+
+        Returns:
+            float: Horário em que o temporizador deve disparar (now, se já passou).
+        """
+        with self._lock:
+            current = self._slot_time(now)
+            if self._next > current:
+                self._spread_until = None
+                return now + (self._next - current)
+
+            # Horários previstos já vencidos: o mais recente sai agora, os anteriores foram perdidos
+            late = self._due_count(current)
+            missed = late - 1
+            limit = 0 if self.catch_up == 'skip' else self.max_catch_up
+            if missed > limit:
+                dropped = missed - limit
+                self._next = self._advance(self._next, dropped)
+                self.skipped += dropped
+                self._skipped_metric.inc(dropped)
+                late -= dropped
+                logger.warning("Agendador %s: %s horário(s) perdido(s) descartado(s)", self.name, dropped)
+
+            if self.catch_up == 'spread' and (late > 1 or self._spread_until is not None):
+                # Distribui os disparos pendentes até o próximo horário previsto no futuro
+                if self._spread_until is None:
+                    self._spread_until = self._advance(self._next, late)
+                return now + (self._spread_until - current) / (late + 1)
+            return now
+
+    def fired(self, now: float) -> float:
+        """
+        Registra o disparo do horário previsto atual e avança para o seguinte.
+
+        Returns:
+            float: Atraso do disparo (segundos).
+        """
+        with self._lock:
+            current = self._slot_time(now)
+            intended = self._next
+            drift = current - intended
+            self._next = self._advance(intended, 1)
+            self.ticks += 1
+            # Disparo de recuperação: o horário seguinte também já tinha passado
+            caught_up = self._next <= current
+            if caught_up:
+                self.caught_up += 1
+                self._caught_up_metric.inc()
+            self._records.append({
+                'at': datetime.now().isoformat(timespec='seconds'),
+                'drift': round(drift, 3),
+                'caught_up': caught_up
+            })
+        self._drift.observe(drift)
+        return drift
+
+    def completed(self, now: float):
+        """Fim do envio: no modo 'completion', o próximo horário passa a contar a partir de agora"""
+        if self.mode == 'completion':
+            with self._lock:
+                self._next = now + self.interval
+
+    def stats(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Resumo do atraso dos disparos recentes.
+
+        Returns:
+            Dict[str, Any]: Totais, atraso (último, médio e máximo), jitter (desvio padrão
+            do atraso) e os disparos recentes.
+        """
+        with self._lock:
+            records = list(self._records)
+            next_intended = self._next
+        drifts = [record['drift'] for record in records]
+        if now is not None:
+            now = self._slot_time(now)
+        return {
+            'name': self.name,
+            'mode': self.mode,
+            'catch_up': self.catch_up,
+            'interval': self.interval,
+            'ticks': self.ticks,
+            'skipped': self.skipped,
+            'caught_up': self.caught_up,
+            'last_drift': drifts[-1] if drifts else None,
+            'mean_drift': round(statistics.fmean(drifts), 3) if drifts else None,
+            'max_drift': max(drifts) if drifts else None,
+            'jitter': round(statistics.pstdev(drifts), 3) if len(drifts) > 1 else None,
+            'next_in': round(next_intended - now, 3) if now is not None else None,
+            'recent': records[-20:]
+        }
+
+    # Sequência de horários previstos: intervalo fixo, no relógio do agendador. Subclasses
+    # (ex.: posting_schedule.CalendarTicks) trocam a sequência e o relógio.
+
+    def _slot_time(self, now: float) -> float:
+        """Converte um horário do relógio do agendador para o relógio dos horários previstos"""
+        return now
+
+    def _advance(self, slot: float, count: int) -> float:
+        """Horário previsto `count` posições depois de `slot`"""
+        return slot + count * self.interval
+
+    def _due_count(self, current: float) -> int:
+        """Quantos horários previstos, a partir do próximo, já venceram até `current`"""
+        return int((current - self._next) // self.interval) + 1
@@ -0,0 +1,352 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Optional, Dict, List, Callable, Tuple
+
+from metrics import histogram
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Atraso de execução dos jobs: horário real menos o horário de vencimento (exposto em /metrics)
+LAG = histogram('scheduler_lag_seconds', 'Atraso entre o vencimento de um job agendado e sua execução', ('timer',))
+
+
+class TimerEngine:
+    """
+    Motor de temporizadores baseado em heap e variável de condição.
+
+    A thread do motor dorme exatamente até o próximo job vencer e é acordada
+    imediatamente quando um job é agendado, reagendado ou cancelado. Cada job tem
+    uma chave: reagendar a mesma chave substitui o job anterior (as entradas antigas
+    do heap são descartadas de forma preguiçosa). Os callbacks executam fora do lock,
+    na thread do motor, e podem reagendar a si mesmos.
+    """
+
+    def __init__(self, name: str = "TimerEngine", clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa o motor de temporizadores.
+
+        Args:
+            name: Nome da thread do motor
+            clock: Relógio monotônico usado para os horários de vencimento
+        """
+        self.name = name
+        self.clock = clock
+        self.thread = None
+        self.running = False
+
+        self._cond = threading.Condition()
+        self._heap = []
+        self._jobs: Dict[str, Tuple[float, int, Callable[[], None]]] = {}
+        self._seq = itertools.count()
+
+    def start(self) -> bool:
+        """
+        Inicia a thread do motor.
+
+        Returns:
+            bool: True se o motor está em execução.
+        """
+        with self._cond:
+            if self.running:
+                return True
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name=self.name)
+            self.thread.daemon = True
+            self.thread.start()
+        return True
+
+    def stop(self, timeout: float = 5) -> bool:
+        """
+        Para a thread do motor. Jobs pendentes são descartados.
+
+        Returns:
+            bool: True se a thread terminou dentro do timeout.
+        """
+        with self._cond:
+            self.running = False
+            self._heap = []
+            self._jobs = {}
+            self._cond.notify_all()
+
+        thread = self.thread
+        if thread and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+            if thread.is_alive():
+                logger.warning("A thread do motor %s não terminou dentro do timeout", self.name)
+                return False
+        self.thread = None
+        return True
+
+    def is_running(self) -> bool:
+        """Verifica se o motor está em execução"""
+        return self.running and self.thread is not None and self.thread.is_alive()
+
+    def schedule_at(self, key: str, due: float, callback: Callable[[], None]):
+        """
+        Agenda (ou reagenda) um job para um horário do relógio do motor.
+
+        Args:
+            key: Identificador do job; substitui um job existente com a mesma chave
+            due: Horário de vencimento, no relógio do motor
+            callback: Função executada quando o job vencer
+        """
+        with self._cond:
+            seq = next(self._seq)
+            self._jobs[key] = (due, seq, callback)
+            heapq.heappush(self._heap, (due, seq, key))
+            self._cond.notify()
+
+    def schedule(self, key: str, delay: float, callback: Callable[[], None]):
+        """Agenda (ou reagenda) um job para daqui a delay segundos"""
+        self.schedule_at(key, self.clock() + max(0.0, delay), callback)
+
+    def cancel(self, key: str) -> bool:
+        """
+        Cancela um job.
+
+        Returns:
+            bool: True se havia um job agendado com a chave.
+        """
+        with self._cond:
+            removed = self._jobs.pop(key, None) is not None
+            if removed:
+                self._cond.notify()
+            return removed
+
+    def next_due(self, key: str) -> Optional[float]:
+        """Retorna o horário de vencimento de um job, ou None se não estiver agendado"""
+        with self._cond:
+            job = self._jobs.get(key)
+            return job[0] if job else None
+
+    def _run(self):
+        """Loop da thread do motor"""
+        logger.debug("Motor de temporizadores %s iniciado", self.name)
+        while True:
+            with self._cond:
+                callback = None
+                while self.running:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+
+                    due, seq, key = self._heap[0]
+                    job = self._jobs.get(key)
+                    if job is None or job[1] != seq:
+                        # Entrada substituída ou cancelada
+                        heapq.heappop(self._heap)
+                        continue
+
+                    delay = due - self.clock()
+                    if delay > 0:
+                        self._cond.wait(delay)
+                        continue
+
+                    heapq.heappop(self._heap)
+                    del self._jobs[key]
+                    callback = job[2]
+                    break
+
+                if callback is None:
+                    logger.debug("Motor de temporizadores %s parado", self.name)
+                    return
+
+            LAG.labels(timer=self.name).observe(max(0.0, self.clock() - due))
+            try:
+                callback()
+            except Exception as e:
+                logger.error("Erro ao executar job '%s' do motor %s: %s", key, self.name, e)
+
+
+class TimingWheel:
+    """
+    Roda de temporização (hashed timing wheel) para muitos jobs periódicos.
+
+    Cada job fica no slot (vencimento // tick) % slots, e agendar ou cancelar é O(1)
+    independente do número de jobs. Uma única thread avança a roda: ela procura o
+    próximo slot ocupado e dorme até ele, sendo acordada quando um job é agendado ou
+    cancelado. Pensada para centenas de grupos com intervalos em minutos, onde uma
+    resolução de um tick (1 s por padrão) é suficiente.
+    """
+
+    def __init__(self, name: str = "TimingWheel", tick: float = 1.0, slots: int = 512,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Inicializa a roda de temporização.
+
+        Args:
+            name: Nome da thread da roda
+            tick: Resolução da roda, em segundos
+            slots: Número de slots (uma volta completa cobre tick * slots segundos)
+            clock: Relógio monotônico usado para os horários de vencimento
+        """
+        self.name = name
+        self.tick = tick
+        self.clock = clock
+        self.thread = None
+        self.running = False
+
+        self._cond = threading.Condition()
+        self._slots = [dict() for _ in range(slots)]
+        self._slot_by_key: Dict[str, int] = {}
+        self._last_tick = int(clock() // tick)
+
+    def __len__(self) -> int:
+        return len(self._slot_by_key)
+
+    def start(self) -> bool:
+        """
+        Inicia a thread da roda.
+
+        Returns:
+            bool: True se a roda está em execução.
+        """
+        with self._cond:
+            if self.running:
+                return True
+            self.running = True
+            self._last_tick = int(self.clock() // self.tick)
+            self.thread = threading.Thread(target=self._run, name=self.name)
+            self.thread.daemon = True
+            self.thread.start()
+        return True
+
+    def stop(self, timeout: float = 5) -> bool:
+        """
+        Para a thread da roda. Jobs pendentes são descartados.
+
+        Returns:
+            bool: True se a thread terminou dentro do timeout.
+        """
+        with self._cond:
+            self.running = False
+            for slot in self._slots:
+                slot.clear()
+            self._slot_by_key = {}
+            self._cond.notify_all()
+
+        thread = self.thread
+        if thread and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+            if thread.is_alive():
+                logger.warning("A thread da roda %s não terminou dentro do timeout", self.name)
+                return False
+        self.thread = None
+        return True
+
+    def is_running(self) -> bool:
+        """Verifica se a roda está em execução"""
+        return self.running and self.thread is not None and self.thread.is_alive()
+
+    def schedule_at(self, key: str, due: float, callback: Callable[[], None]):
+        """
+        Agenda (ou reagenda) um job para um horário do relógio da roda.
+
+        Args:
+            key: Identificador do job; substitui um job existente com a mesma chave
+            due: Horário de vencimento, no relógio da roda
+            callback: Função executada quando o job vencer
+        """
+        with self._cond:
+            due_tick = max(int(-(-due // self.tick)), self._last_tick + 1)
+            slot = due_tick % len(self._slots)
+            old_slot = self._slot_by_key.get(key)
+            if old_slot is not None:
+                self._slots[old_slot].pop(key, None)
+            self._slots[slot][key] = (due_tick, due, callback)
+            self._slot_by_key[key] = slot
+            self._cond.notify()
+
+    def schedule(self, key: str, delay: float, callback: Callable[[], None]):
+        """Agenda (ou reagenda) um job para daqui a delay segundos"""
+        self.schedule_at(key, self.clock() + max(0.0, delay), callback)
+
+    def cancel(self, key: str) -> bool:
+        """
+        Cancela um job.
+
+        Returns:
+            bool: True se havia um job agendado com a chave.
+        """
+        with self._cond:
+            slot = self._slot_by_key.pop(key, None)
+            if slot is None:
+                return False
+            self._slots[slot].pop(key, None)
+            self._cond.notify()
+            return True
+
+    def next_due(self, key: str) -> Optional[float]:
+        """Retorna o horário de vencimento de um job, ou None se não estiver agendado"""
+        with self._cond:
+            slot = self._slot_by_key.get(key)
+            if slot is None:
+                return None
+            return self._slots[slot][key][1]
+
+    def _next_occupied_tick(self) -> Optional[int]:
+        """Retorna o tick do próximo job dentro de uma volta da roda (com o lock adquirido)"""
+        if not self._slot_by_key:
+            return None
+        total = len(self._slots)
+        earliest = None
+        for offset in range(1, total + 1):
+            tick = self._last_tick + offset
+            for due_tick, _, _ in self._slots[tick % total].values():
+                if due_tick == tick:
+                    return tick
+                if earliest is None or due_tick < earliest:
+                    earliest = due_tick
+        # Todos os jobs estão a mais de uma volta: dorme até o mais próximo
+        return earliest
+
+    def _collect_due(self, now_tick: int) -> List[Tuple[str, float, Callable[[], None]]]:
+        """Remove e retorna os jobs vencidos até now_tick (com o lock adquirido)"""
+        total = len(self._slots)
+        first = self._last_tick + 1
+        ticks = range(first, now_tick + 1) if now_tick - first < total else range(first, first + total)
+        due_jobs = []
+        for tick in ticks:
+            slot = self._slots[tick % total]
+            for key, (due_tick, due, callback) in list(slot.items()):
+                if due_tick <= now_tick:
+                    del slot[key]
+                    del self._slot_by_key[key]
+                    due_jobs.append((key, due, callback))
+        self._last_tick = now_tick
+        return due_jobs
+
+    def _run(self):
+        """Loop da thread da roda"""
+        logger.debug("Roda de temporização %s iniciada", self.name)
+        while True:
+            with self._cond:
+                due_jobs = []
+                while self.running:
+                    now_tick = int(self.clock() // self.tick)
+                    if now_tick > self._last_tick:
+                        due_jobs = self._collect_due(now_tick)
+                        if due_jobs:
+                            break
+
+                    next_tick = self._next_occupied_tick()
+                    if next_tick is None:
+                        self._cond.wait()
+                    else:
+                        self._cond.wait(max(0.0, next_tick * self.tick - self.clock()))
+
+                if not self.running:
+                    logger.debug("Roda de temporização %s parada", self.name)
+                    return
+
+            lag = LAG.labels(timer=self.name)
+            for key, due, callback in due_jobs:
+                lag.observe(max(0.0, self.clock() - due))
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error("Erro ao executar job '%s' da roda %s: %s", key, self.name, e)
@@ -0,0 +1,174 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable, Deque
+
+from config import UPDATE_WORKERS, UPDATE_QUEUE_SIZE, UPDATE_CHAT_QUEUE_DEPTH
+from metrics import QUEUE_DEPTH
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+def update_chat_id(update: Dict[str, Any]):
+    """Chat de um update (mensagem, mensagem editada, post de canal, callback ou membro)"""
+    for field in ('message', 'edited_message', 'channel_post', 'edited_channel_post',
+                  'my_chat_member', 'chat_member', 'chat_join_request'):
+        value = update.get(field)
+        if value and value.get('chat'):
+            return value['chat'].get('id')
+    callback = update.get('callback_query')
+    if callback and callback.get('message'):
+        return callback['message'].get('chat', {}).get('id')
+    return None
+
+
+class UpdateDispatcher:
+    """
+    Processa updates em um pool de threads, preservando a ordem dentro de cada chat.
+
+    Cada chat tem uma fila própria, atendida por no máximo uma thread por vez: os
+    updates de um chat são processados na ordem em que chegaram (as boas-vindas saem
+    na ordem das entradas), enquanto chats diferentes avançam em paralelo. Depois de
+    cada update, uma fila com mais itens volta para o fim da fila do pool, para que
+    um chat movimentado não monopolize uma thread.
+
+    Contrapressão: submit() recusa (ou, com timeout, espera por espaço) quando a fila
+    do chat passa de max_chat_depth ou o total pendente passa de max_pending.
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], None], workers: int = UPDATE_WORKERS,
+                 max_pending: int = UPDATE_QUEUE_SIZE, max_chat_depth: int = UPDATE_CHAT_QUEUE_DEPTH):
+        """
+        Inicializa o despachante.
+
+        Args:
+            handler: Função chamada com cada update
+            workers: Threads de processamento
+            max_pending: Máximo de updates pendentes no total
+            max_chat_depth: Máximo de updates pendentes por chat
+        """
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_chat_depth = max_chat_depth
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)
+        self._queues: Dict[Any, Deque[Dict[str, Any]]] = {}
+        self._pending = 0
+
+    def start(self) -> bool:
+        """
+        Inicia o pool de processamento.
+
+        Returns:
+            bool: True se o despachante foi iniciado com sucesso, False caso contrário.
+        """
+        try:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                        thread_name_prefix="UpdateWorker")
+            # Leitura sem lock: basta um valor aproximado na coleta
+            QUEUE_DEPTH.labels(queue='updates').set_function(lambda: self._pending)
+            return True
+        except Exception as e:
+            logger.error("Erro ao iniciar despachante de updates: %s", e)
+            return False
+
+    def stop(self, wait: bool = True) -> bool:
+        """
+        Para o pool, aguardando os updates já aceitos.
+
+        Returns:
+            bool: True se o despachante foi parado com sucesso, False caso contrário.
+        """
+        try:
+            with self._lock:
+                executor, self._executor = self._executor, None
+                self._space.notify_all()
+            if executor is not None:
+                # As filas em andamento terminam de ser drenadas antes do shutdown
+                if wait:
+                    with self._lock:
+                        while self._pending:
+                            self._space.wait()
+                executor.shutdown(wait=wait)
+            return True
+        except Exception as e:
+            logger.error("Erro ao parar despachante de updates: %s", e)
+            return False
+
+    @property
+    def pending(self) -> int:
+        """Número de updates aceitos e ainda não processados"""
+        with self._lock:
+            return self._pending
+
+    def submit(self, update: Dict[str, Any], timeout: float = 0) -> bool:
+        """
+        Enfileira um update na fila do seu chat.
+
+        Args:
+            update: Update do Telegram
+            timeout: Tempo máximo (segundos) de espera por espaço nas filas; 0 = não espera
+
+        Returns:
+            bool: True se o update foi aceito, False se o despachante está parado ou as
+            filas continuam cheias.
+        """
+        chat_id = update_chat_id(update)
+        # Updates sem chat não têm ordem a preservar: cada um tem sua própria fila
+        key = ('chat', chat_id) if chat_id is not None else ('update', id(update))
+
+        with self._lock:
+            if not self._space.wait_for(lambda: self._executor is None or self._has_space(key), timeout):
+                logger.warning("Filas de updates cheias (chat %s); update recusado", chat_id)
+                return False
+            if self._executor is None:
+                return False
+
+            queue = self._queues.get(key)
+            idle = queue is None
+            if idle:
+                queue = self._queues[key] = deque()
+            queue.append(update)
+            self._pending += 1
+            if idle:
+                # Nenhuma thread atende este chat: agenda a fila no pool
+                self._executor.submit(self._drain, key)
+        return True
+
+    def _has_space(self, key) -> bool:
+        queue = self._queues.get(key)
+        return self._pending < self.max_pending and (queue is None or len(queue) < self.max_chat_depth)
+
+    def _drain(self, key):
+        """Processa o próximo update de uma fila e a reagenda se ainda houver itens"""
+        while True:
+            with self._lock:
+                update = self._queues[key][0]
+            try:
+                self.handler(update)
+            except Exception as e:
+                logger.error("Erro ao processar update %s: %s", update.get('update_id'), e)
+
+            with self._lock:
+                queue = self._queues[key]
+                queue.popleft()
+                self._pending -= 1
+                self._space.notify_all()
+                if not queue:
+                    del self._queues[key]
+                    return
+                executor = self._executor
+
+            if executor is not None:
+                try:
+                    executor.submit(self._drain, key)
+                    return
+                except RuntimeError:
+                    pass
+            # Despachante parando: a fila termina de ser processada nesta thread
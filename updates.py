@@ -0,0 +1,271 @@
+import hmac
+import time
+import hashlib
+import logging
+import threading
+from collections import deque
+from typing import Optional, Dict, Any, List
+
+from config import UPDATE_WORKERS, UPDATE_QUEUE_SIZE, UPDATE_CHAT_QUEUE_DEPTH, POLLING_TIMEOUT, WEBHOOK_SECRET
+from update_dispatcher import UpdateDispatcher
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Cabeçalho com o segredo informado no setWebhook
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+# Tipos de update tratados pelo bot
+ALLOWED_UPDATES = ['message']
+
+# Espera (segundos) antes de tentar novamente após uma falha do getUpdates
+POLLING_RETRY_DELAY = 5
+
+# Quantos update_id recentes são lembrados para descartar reentregas
+_SEEN_UPDATES = 1000
+
+
+def webhook_secret(token: str, secret: str = WEBHOOK_SECRET) -> str:
+    """
+    Segredo do webhook: WEBHOOK_SECRET, ou um valor derivado do token do bot.
+
+    O valor derivado é o mesmo em todos os workers do servidor, sem precisar ser
+    configurado, e usa apenas os caracteres aceitos pelo Telegram (A-Z, a-z, 0-9, _ e -).
+    """
+    if secret:
+        return secret
+    return hashlib.sha256(f"webhook:{token}".encode('utf-8')).hexdigest()
+
+
+class UpdateHandler:
+    """Trata os updates recebidos do Telegram (entradas de membros vão para o WelcomeBatcher)"""
+
+    def __init__(self, welcome_batcher=None):
+        """
+        Inicializa o tratador de updates.
+
+        Args:
+            welcome_batcher: WelcomeBatcher que recebe as entradas de novos membros
+        """
+        self.welcome_batcher = welcome_batcher
+
+    def handle(self, update: Dict[str, Any]):
+        """Processa um update"""
+        message = update.get('message') or {}
+        members = message.get('new_chat_members')
+        if members and self.welcome_batcher is not None:
+            chat = message.get('chat') or {}
+            for member in members:
+                self.welcome_batcher.add_member(chat.get('id'), member, group_title=chat.get('title'))
+
+
+class UpdateReceiver:
+    """
+    Recebe updates do Telegram e os repassa a um UpdateDispatcher.
+
+    submit() apenas enfileira o update e retorna: no modo webhook a resposta HTTP
+    sai na hora, sem esperar o processamento. O despachante processa chats
+    diferentes em paralelo, mantendo a ordem dentro de cada chat, e tem filas
+    limitadas: com elas cheias, submit() retorna False e a rota responde com erro,
+    para que o Telegram reenvie o update mais tarde em vez de o servidor acumular
+    trabalho sem limite. Updates reenviados (mesmo update_id) são processados uma
+    única vez.
+    """
+
+    def __init__(self, handler: UpdateHandler, workers: int = UPDATE_WORKERS,
+                 queue_size: int = UPDATE_QUEUE_SIZE, chat_queue_depth: int = UPDATE_CHAT_QUEUE_DEPTH):
+        """
+        Inicializa o receptor.
+
+        Args:
+            handler: Tratador dos updates
+            workers: Threads de processamento
+            queue_size: Máximo de updates pendentes no total
+            chat_queue_depth: Máximo de updates pendentes por chat
+        """
+        self.handler = handler
+        self.workers = workers
+        self.dispatcher = UpdateDispatcher(handler.handle, workers=workers, max_pending=queue_size,
+                                           max_chat_depth=chat_queue_depth)
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._seen_order = deque()
+
+    def start(self) -> bool:
+        """
+        Inicia o processamento.
+
+        Returns:
+            bool: True se o receptor foi iniciado com sucesso, False caso contrário.
+        """
+        return self.dispatcher.start()
+
+    def stop(self, wait: bool = True) -> bool:
+        """
+        Para o processamento, aguardando os updates já recebidos.
+
+        Returns:
+            bool: True se o receptor foi parado com sucesso, False caso contrário.
+        """
+        return self.dispatcher.stop(wait)
+
+    def submit(self, update: Dict[str, Any], timeout: float = 0) -> bool:
+        """
+        Enfileira um update para processamento.
+
+        Args:
+            update: Update do Telegram
+            timeout: Tempo máximo (segundos) de espera por espaço nas filas
+
+        Returns:
+            bool: True se o update foi aceito (ou já havia sido recebido), False se o
+            receptor está parado ou as filas estão cheias.
+        """
+        update_id = update.get('update_id')
+        with self._lock:
+            if update_id is not None and update_id in self._seen:
+                return True
+        if not self.dispatcher.submit(update, timeout):
+            return False
+        if update_id is not None:
+            with self._lock:
+                self._seen.add(update_id)
+                self._seen_order.append(update_id)
+                if len(self._seen_order) > _SEEN_UPDATES:
+                    self._seen.discard(self._seen_order.popleft())
+        return True
+
+
+class WebhookReceiver(UpdateReceiver):
+    """
+    Modo webhook: o Telegram envia cada update por POST para a rota do painel.
+
+    A rota confere o cabeçalho de segredo (verify) e repassa o update a submit().
+    Nenhuma thread de polling fica rodando no processo do servidor web.
+    """
+
+    def __init__(self, handler: UpdateHandler, secret: str, **kwargs):
+        """
+        Inicializa o receptor de webhook.
+
+        Args:
+            handler: Tratador dos updates
+            secret: Segredo informado no setWebhook (secret_token)
+            **kwargs: workers, queue_size e chat_queue_depth, como em UpdateReceiver
+        """
+        super().__init__(handler, **kwargs)
+        self.secret = secret
+
+    def verify(self, header_value: Optional[str]) -> bool:
+        """Confere o cabeçalho X-Telegram-Bot-Api-Secret-Token (comparação em tempo constante)"""
+        return bool(header_value) and hmac.compare_digest(header_value.encode('utf-8'), self.secret.encode('utf-8'))
+
+    def register(self, pipeline, url: str, max_connections: Optional[int] = None) -> bool:
+        """
+        Registra o webhook no Telegram (setWebhook).
+
+        Args:
+            pipeline: SendPipeline em execução
+            url: URL pública da rota do webhook (HTTPS)
+            max_connections: Conexões simultâneas que o Telegram pode abrir (padrão: workers)
+
+        Returns:
+            bool: True se o webhook foi registrado com sucesso, False caso contrário.
+        """
+        try:
+            pipeline.call('setWebhook', {
+                'url': url,
+                'secret_token': self.secret,
+                'allowed_updates': ALLOWED_UPDATES,
+                'max_connections': max_connections or self.workers
+            })
+            logger.info("Webhook registrado: %s", url)
+            return True
+        except Exception as e:
+            logger.error("Erro ao registrar webhook: %s", e)
+            return False
+
+
+class UpdatePoller(UpdateReceiver):
+    """
+    Modo polling: uma thread busca os updates com getUpdates (long polling).
+
+    Alternativa ao webhook quando o servidor não tem URL pública. Ao iniciar, o
+    webhook é removido, pois o Telegram recusa getUpdates enquanto houver um.
+    """
+
+    def __init__(self, handler: UpdateHandler, pipeline, timeout: int = POLLING_TIMEOUT, **kwargs):
+        """
+        Inicializa o poller.
+
+        Args:
+            handler: Tratador dos updates
+            pipeline: SendPipeline usado nas chamadas getUpdates
+            timeout: Tempo máximo (segundos) de cada long polling
+            **kwargs: workers, queue_size e chat_queue_depth, como em UpdateReceiver
+        """
+        super().__init__(handler, **kwargs)
+        self.pipeline = pipeline
+        self.timeout = timeout
+        self.offset = None
+        self.running = False
+        self.thread = None
+
+    def start(self) -> bool:
+        """
+        Remove o webhook e inicia a thread de polling.
+
+        Returns:
+            bool: True se o poller foi iniciado com sucesso, False caso contrário.
+        """
+        if self.running:
+            return True
+        try:
+            self.pipeline.call('deleteWebhook', {'drop_pending_updates': False})
+        except Exception as e:
+            logger.error("Erro ao remover webhook antes do polling: %s", e)
+            return False
+        if not super().start():
+            return False
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="UpdatePoller", daemon=True)
+        self.thread.start()
+        logger.info("Polling de updates iniciado.")
+        return True
+
+    def stop(self, wait: bool = True) -> bool:
+        """
+        Para o polling (a chamada em andamento termina em até timeout segundos).
+
+        Returns:
+            bool: True se o poller foi parado com sucesso, False caso contrário.
+        """
+        self.running = False
+        if wait and self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=self.timeout + 5)
+        self.thread = None
+        return super().stop(wait)
+
+    def poll_once(self) -> List[Dict[str, Any]]:
+        """Faz uma chamada getUpdates e enfileira os updates recebidos"""
+        params = {'timeout': self.timeout, 'allowed_updates': ALLOWED_UPDATES}
+        if self.offset is not None:
+            params['offset'] = self.offset
+        updates = self.pipeline.call('getUpdates', params, timeout=self.timeout + 10) or []
+        for update in updates:
+            # Contrapressão: espera espaço nas filas antes de pedir mais updates; se
+            # continuarem cheias, o update é pedido de novo na próxima chamada
+            if not self.submit(update, timeout=self.timeout):
+                break
+            self.offset = update['update_id'] + 1
+        return updates
+
+    def _run(self):
+        while self.running:
+            try:
+                self.poll_once()
+            except Exception as e:
+                if not self.running:
+                    break
+                logger.error("Erro no polling de updates: %s", e)
+                time.sleep(POLLING_RETRY_DELAY)
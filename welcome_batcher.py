@@ -0,0 +1,242 @@
+import logging
+import threading
+import uuid
+from typing import Optional, Dict, Any, List
+
+from config import WELCOME_BATCH_WINDOW, WELCOME_MAX_BATCH_SIZE, TELEGRAM_MAX_MESSAGE_LENGTH
+from timer_engine import TimerEngine
+from welcome_template import CompiledTemplate
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+def member_name(member: Dict[str, Any]) -> str:
+    """Nome usado para saudar um membro: @username quando existir, senão o primeiro nome"""
+    username = member.get('username')
+    if username:
+        return f"@{username}"
+    return member.get('first_name') or 'membro'
+
+
+def build_context(members: List[Dict[str, Any]], group_title: str = '', member_count='') -> Dict[str, Any]:
+    """
+    Monta os campos do modelo de boas-vindas para um ou mais membros.
+
+    Com vários membros, os campos de nome trazem a lista separada por vírgulas.
+    """
+    return {
+        'first_name': ', '.join(member.get('first_name') or 'membro' for member in members),
+        'last_name': members[0].get('last_name', '') if len(members) == 1 else '',
+        'username': ', '.join(f"@{member['username']}" for member in members if member.get('username')),
+        'mention': ', '.join(member_name(member) for member in members),
+        'group_title': group_title,
+        'member_count': member_count
+    }
+
+
+class WelcomeBatcher:
+    """
+    Agrupa entradas de membros e envia uma única mensagem de boas-vindas por lote.
+
+    A primeira entrada de um chat abre uma janela de batch_window segundos; todas as
+    entradas que chegarem nesse período são saudadas juntas, na mesma mensagem. Um
+    lote que atinge max_batch_size é enviado na hora. Se a mensagem passar do limite
+    de tamanho do Telegram, ela é dividida em várias, e as estatísticas são
+    atualizadas uma única vez por lote.
+    """
+
+    def __init__(self, data_manager, sender, engine: Optional[TimerEngine] = None,
+                 max_length: int = TELEGRAM_MAX_MESSAGE_LENGTH):
+        """
+        Inicializa o agrupador de boas-vindas.
+
+        Args:
+            data_manager: Instância do gerenciador de dados
+            sender: Objeto com send_message(chat_id, text, key=None), ex.: OutboxSender
+            engine: TimerEngine compartilhado opcional; se None, o agrupador cria o seu
+            max_length: Tamanho máximo de cada mensagem enviada
+        """
+        self.data_manager = data_manager
+        self.sender = sender
+        self.max_length = max_length
+        self.running = False
+
+        self.engine = engine
+        self._owns_engine = engine is None
+        self._lock = threading.Lock()
+        self._batches: Dict[str, Dict[str, Any]] = {}
+
+    def start(self) -> bool:
+        """
+        Inicia o agrupador.
+
+        Returns:
+            bool: True se o agrupador foi iniciado com sucesso, False caso contrário.
+        """
+        try:
+            if self.running:
+                return True
+            self.running = True
+            if self._owns_engine:
+                self.engine = TimerEngine("WelcomeBatcher")
+            self.engine.start()
+            logger.info("Agrupador de boas-vindas iniciado com sucesso.")
+            return True
+        except Exception as e:
+            logger.error("Erro ao iniciar agrupador de boas-vindas: %s", e)
+            self.running = False
+            return False
+
+    def stop(self) -> bool:
+        """
+        Envia os lotes em aberto e para o agrupador.
+
+        Returns:
+            bool: True se o agrupador foi parado com sucesso, False caso contrário.
+        """
+        try:
+            if not self.running:
+                return True
+            self.running = False
+            with self._lock:
+                chat_ids = list(self._batches)
+            for chat_id in chat_ids:
+                self.engine.cancel(self._job_key(chat_id))
+                self.flush(chat_id)
+            if self._owns_engine:
+                self.engine.stop(timeout=5)
+            logger.info("Agrupador de boas-vindas parado com sucesso.")
+            return True
+        except Exception as e:
+            logger.error("Erro ao parar agrupador de boas-vindas: %s", e)
+            return False
+
+    def add_member(self, chat_id, member: Dict[str, Any], group_title: Optional[str] = None,
+                   member_count: Optional[int] = None) -> bool:
+        """
+        Registra a entrada de um membro.
+
+        Args:
+            chat_id: ID do chat em que o membro entrou
+            member: Usuário do Telegram (id, first_name, username)
+            group_title: Título do grupo, para o campo {group_title}
+            member_count: Total de membros do grupo, se conhecido, para o campo {member_count}
+
+        Returns:
+            bool: True se o membro foi adicionado a um lote, False se as boas-vindas estão desativadas.
+        """
+        config = self.data_manager.get_welcome_config()
+        if not config.get('enabled', True) or member.get('is_bot'):
+            return False
+
+        window = float(config.get('batch_window', WELCOME_BATCH_WINDOW))
+        max_size = max(1, int(config.get('max_batch_size', WELCOME_MAX_BATCH_SIZE)))
+
+        key = str(chat_id)
+        with self._lock:
+            batch = self._batches.get(key)
+            if batch is None:
+                # Cada lote tem um id próprio: a chave de deduplicação da fila de saída não
+                # pode repetir quando o mesmo membro sai e entra de novo
+                batch = self._batches[key] = {'id': uuid.uuid4().hex, 'members': {}, 'group_title': '',
+                                              'member_count': None}
+            # Entradas repetidas do mesmo usuário no lote são saudadas uma vez
+            batch['members'][str(member.get('id', len(batch['members'])))] = member
+            if group_title:
+                batch['group_title'] = group_title
+            if member_count is not None:
+                batch['member_count'] = member_count
+            size = len(batch['members'])
+
+        if not self.running or size >= max_size or window <= 0:
+            if self.running:
+                self.engine.cancel(self._job_key(key))
+            self.flush(chat_id)
+        elif size == 1:
+            self.engine.schedule(self._job_key(key), window, lambda: self.flush(chat_id))
+        return True
+
+    def flush(self, chat_id) -> bool:
+        """
+        Envia imediatamente o lote de um chat.
+
+        Returns:
+            bool: True se todas as mensagens do lote foram enviadas (ou não havia lote).
+        """
+        with self._lock:
+            batch = self._batches.pop(str(chat_id), None)
+        if not batch:
+            return True
+
+        members = list(batch['members'].values())
+        try:
+            template = self.data_manager.get_welcome_template()
+            messages = self.render(template, members, batch['group_title'], batch['member_count'])
+
+            success = True
+            batch_key = f"welcome:{chat_id}:{batch['id']}"
+            for index, text in enumerate(messages):
+                if not self.sender.send_message(chat_id, text, key=f"{batch_key}:{index}"):
+                    success = False
+
+            # Uma única atualização de estatística por lote
+            self.data_manager.increment_welcome_messages_stat(len(members))
+            logger.info("Boas-vindas enviadas para %s membro(s) em %s mensagem(ns)", len(members), len(messages))
+            return success
+        except Exception as e:
+            logger.error("Erro ao enviar boas-vindas agrupadas: %s", e)
+            return False
+
+    def render(self, template: CompiledTemplate, members: List[Dict[str, Any]],
+               group_title: str = '', member_count: Optional[int] = None) -> List[str]:
+        """
+        Monta as mensagens de um lote, respeitando o tamanho máximo.
+
+        Os campos de nome ({first_name}, {mention}, {username}) recebem a lista de
+        todos os membros; quando o texto fica grande demais, os membros são
+        distribuídos em várias mensagens.
+
+        Args:
+            template: Mensagem de boas-vindas compilada
+            members: Membros do lote
+            group_title: Título do grupo
+            member_count: Total de membros do grupo, se conhecido
+
+        Returns:
+            List[str]: Mensagens a enviar, em ordem.
+        """
+        extra = {'group_title': group_title or '', 'member_count': member_count if member_count is not None else ''}
+        name_fields = ('first_name', 'mention', 'username')
+        if not any(template.uses(field) for field in name_fields):
+            return self._split(template.render(build_context(members, **extra)))
+
+        # Custo estimado de cada membro: o tamanho dos nomes em cada uso dos campos
+        base_length = len(template.render(build_context([], **extra)))
+        messages = []
+        current: List[Dict[str, Any]] = []
+        current_length = base_length
+        for member in members:
+            context = build_context([member])
+            cost = sum(template.uses(field) * (len(str(context[field])) + 2) for field in name_fields)
+            if current and current_length + cost > self.max_length:
+                messages.append(template.render(build_context(current, **extra)))
+                current = []
+                current_length = base_length
+            current.append(member)
+            current_length += cost
+        if current:
+            messages.append(template.render(build_context(current, **extra)))
+
+        # Modelo maior que o limite: divide o próprio texto
+        chunks = []
+        for text in messages:
+            chunks.extend(self._split(text))
+        return chunks
+
+    def _split(self, text: str) -> List[str]:
+        """Divide um texto em partes de no máximo max_length caracteres"""
+        return [text[i:i + self.max_length] for i in range(0, len(text), self.max_length)] or [text]
+
+    def _job_key(self, chat_id) -> str:
+        return f"welcome:{chat_id}"
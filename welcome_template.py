@@ -0,0 +1,148 @@
+import re
+import logging
+from typing import Dict, Any, Callable, List, Tuple
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Campos disponíveis na mensagem de boas-vindas
+PLACEHOLDERS = ('first_name', 'last_name', 'username', 'mention', 'group_title', 'member_count')
+
+_TOKEN_RE = re.compile(
+    r"\{\{|\}\}|\{(?:if\s+(not\s+)?([A-Za-z_]\w*)|(else|end)|([A-Za-z_]\w*))\}"
+)
+
+
+class TemplateError(ValueError):
+    """Erro de sintaxe na mensagem de boas-vindas"""
+
+
+class CompiledTemplate:
+    """
+    Mensagem de boas-vindas compilada.
+
+    Sintaxe:
+        {first_name}, {mention}, {group_title}, {member_count}, ...  campos
+        {if campo}...{else}...{end}                                  seção condicional
+        {if not campo}...{end}                                       seção negada
+        {{ e }}                                                      chaves literais
+
+    O texto é analisado uma única vez e transformado em uma função Python; render()
+    apenas preenche os campos, sem reanalisar o modelo. Campos desconhecidos são
+    mantidos literalmente, como no texto original.
+    """
+
+    def __init__(self, source: str):
+        """
+        Compila um modelo.
+
+        Args:
+            source: Texto da mensagem de boas-vindas
+
+        Raises:
+            TemplateError: Se as seções condicionais estiverem desbalanceadas.
+        """
+        self.source = source
+        tree = _parse(source)
+        self._uses = {}
+        _count_uses(tree, self._uses)
+        expression = _emit(tree)
+        self.render: Callable[[Dict[str, Any]], str] = eval(
+            f"lambda ctx: {expression}", {'__builtins__': {}, '_str': str}
+        )
+
+    def uses(self, field: str) -> int:
+        """Quantas vezes um campo aparece no modelo (somando todos os ramos)"""
+        return self._uses.get(field, 0)
+
+    def __call__(self, context: Dict[str, Any]) -> str:
+        return self.render(context)
+
+
+def compile_template(source: str) -> CompiledTemplate:
+    """Compila uma mensagem de boas-vindas (atalho para CompiledTemplate)"""
+    return CompiledTemplate(source or "")
+
+
+def _parse(source: str) -> List[Any]:
+    """
+    Converte o texto em uma árvore de nós:
+    ('text', str), ('field', nome) e ('if', nome, negado, ramo_sim, ramo_não).
+    """
+    root: List[Any] = []
+    # Pilha de (lista atual, nó condicional aberto)
+    stack: List[Tuple[List[Any], Any]] = []
+    current = root
+    position = 0
+
+    def add_text(text):
+        if not text:
+            return
+        if current and current[-1][0] == 'text':
+            current[-1] = ('text', current[-1][1] + text)
+        else:
+            current.append(('text', text))
+
+    for match in _TOKEN_RE.finditer(source):
+        add_text(source[position:match.start()])
+        position = match.end()
+        token = match.group(0)
+        negated, cond_field, keyword, field = match.groups()
+
+        if token == '{{':
+            add_text('{')
+        elif token == '}}':
+            add_text('}')
+        elif cond_field is not None:
+            node = ['if', cond_field, bool(negated), [], []]
+            current.append(node)
+            stack.append((current, node))
+            current = node[3]
+        elif keyword == 'else':
+            if not stack or current is not stack[-1][1][3]:
+                raise TemplateError(f"{{else}} sem {{if}} correspondente (posição {match.start()})")
+            current = stack[-1][1][4]
+        elif keyword == 'end':
+            if not stack:
+                raise TemplateError(f"{{end}} sem {{if}} correspondente (posição {match.start()})")
+            current, _ = stack.pop()
+        elif field in PLACEHOLDERS:
+            current.append(('field', field))
+        else:
+            add_text(token)
+
+    add_text(source[position:])
+    if stack:
+        raise TemplateError(f"{{if {stack[-1][1][1]}}} sem {{end}}")
+    return root
+
+
+def _emit(nodes: List[Any]) -> str:
+    """Gera a expressão Python que renderiza uma lista de nós"""
+    parts = []
+    for node in nodes:
+        if node[0] == 'text':
+            parts.append(repr(node[1]))
+        elif node[0] == 'field':
+            parts.append(f"_str(ctx.get({node[1]!r}, ''))")
+        else:
+            _, field, negated, then_nodes, else_nodes = node
+            then_expr, else_expr = _emit(then_nodes), _emit(else_nodes)
+            if negated:
+                then_expr, else_expr = else_expr, then_expr
+            parts.append(f"({then_expr} if ctx.get({field!r}) else {else_expr})")
+
+    if not parts:
+        return "''"
+    if len(parts) == 1:
+        return parts[0]
+    return f"''.join(({', '.join(parts)},))"
+
+
+def _count_uses(nodes: List[Any], uses: Dict[str, int]):
+    for node in nodes:
+        if node[0] == 'field':
+            uses[node[1]] = uses.get(node[1], 0) + 1
+        elif node[0] == 'if':
+            _count_uses(node[3], uses)
+            _count_uses(node[4], uses)
@@ -21,14 +21,12 @@ for directory in ['data', 'static', 'templates']:
         except Exception:
             pass  # Ignora erros, aplicação lidará com isso
 
-# Configura o logging para capturar erros de inicialização
+# Configura o logging (gravação assíncrona, ver structured_log.py) antes de importar a
+# aplicação, para capturar também os erros de inicialização no log da aplicação
 import logging
-log_path = os.path.join(path, 'wsgi_startup.log')
-logging.basicConfig(
-    filename=log_path,
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from config import LOG_FILE
+from structured_log import setup_logging
+setup_logging(logging.INFO, log_file=os.path.join(path, LOG_FILE))
 
 try:
     # Importa a aplicação Flask como 'application'
@@ -36,6 +34,6 @@ try:
     from app import app as application
     logging.info("Aplicação Flask carregada com sucesso")
 except Exception as e:
-    logging.error(f"Erro ao carregar a aplicação Flask: {str(e)}")
+    logging.error("Erro ao carregar a aplicação Flask: %s", e)
     # Re-lança a exceção para que o servidor WSGI possa reportá-la
     raise